@@ -37,7 +37,8 @@ from bifrost import pipeline
 from bifrost import device
 from bifrost.ndarray import ndarray, asarray, empty_like, empty, zeros_like, zeros
 from bifrost import views
-from bifrost.map import map, clear_map_cache, list_map_cache
+from bifrost.map import map, map_fused, clear_map_cache, list_map_cache
+from bifrost.map import get_map_cache_entries, get_map_cache_limits, set_map_cache_limits
 from bifrost.pipeline import Pipeline, get_default_pipeline, block_scope
 from bifrost import blocks
 from bifrost.block_chainer import BlockChainer
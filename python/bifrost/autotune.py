@@ -0,0 +1,205 @@
+
+# Copyright (c) 2016-2023, The Bifrost Authors. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# * Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the distribution.
+# * Neither the name of The Bifrost Authors nor the names of its
+#   contributors may be used to endorse or promote products derived
+#   from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS ``AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED.  IN NO EVENT SHALL THE COPYRIGHT OWNER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY
+# OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""
+Automatic selection of pipeline block gulp sizes.
+
+A GulpAutotuner is fed the per-gulp timings that a block measures (the same
+values it writes to its perf proclog) and proposes the gulp size to use for
+the next sequence. Gulp sizes are only ever changed at sequence boundaries,
+and are always the block's original gulp size scaled by a power of 2 so that
+any divisibility constraints the original size satisfied are preserved.
+
+Two targets are supported:
+  'throughput': Hill-climb towards the gulp size that processes the most
+                  frames per second of (reserve + process) time.
+  'latency':    Use the largest gulp size whose predicted latency (the time
+                  taken to accumulate the gulp plus the time taken to process
+                  it) fits within a given budget.
+"""
+
+from bifrost.units import convert_units
+
+from typing import Any, Dict, List, Optional
+
+from bifrost import telemetry
+telemetry.track_module()
+
+__all__ = ['GulpAutotuner', 'frame_duration']
+
+#: The largest factor by which a gulp size may be increased
+MAX_SCALE_LOG2 = 6
+
+def _trailing_zeros(n: int) -> int:
+    count = 0
+    while n > 0 and n % 2 == 0:
+        n //= 2
+        count += 1
+    return count
+
+def frame_duration(header: Dict[str,Any]) -> Optional[float]:
+    """Returns the time spanned by one frame of a sequence in seconds, or
+    None if it cannot be determined from the header.
+    """
+    try:
+        tensor = header['_tensor']
+        frame_axis = tensor['shape'].index(-1)
+        step  = tensor['scales'][frame_axis][1]
+        units = tensor['units'][frame_axis]
+        return float(convert_units(step, units, 's'))
+    except Exception:
+        return None
+
+class GulpAutotuner(object):
+    """Chooses gulp sizes for a block from its measured per-gulp timings
+
+    Args:
+        target:         'throughput' or 'latency'.
+        latency_budget: Target latency in seconds (required when
+                          target='latency').
+        min_gulps:      No. gulps that must be measured at a gulp size before
+                          it is considered by the 'throughput' target.
+    """
+    def __init__(self, target: str='throughput',
+                 latency_budget: Optional[float]=None,
+                 min_gulps: int=4):
+        if target not in ('throughput', 'latency'):
+            raise ValueError(f"Invalid autotune target '{target}'")
+        if target == 'latency':
+            if latency_budget is None or latency_budget <= 0:
+                raise ValueError("A positive latency_budget is required for target='latency'")
+        self.target = target
+        self.latency_budget = latency_budget
+        self.min_gulps = min_gulps
+        self._base_nframes = None
+        self._frame_nbyte  = None
+        self._frame_time   = None
+        self.reset()
+    def reset(self) -> None:
+        """Discards all measurements and returns to the original gulp size"""
+        self.scale_log2 = 0
+        # Maps scale_log2 -> [ngulp, nframe, time]
+        self._stats = {}
+    def _scale(self, nframe: int, scale_log2: int) -> int:
+        if scale_log2 >= 0:
+            return nframe << scale_log2
+        else:
+            return nframe >> -scale_log2
+    @property
+    def _min_scale_log2(self) -> int:
+        return -min(_trailing_zeros(n) for n in self._base_nframes)
+    def _allowed(self, scale_log2: int) -> bool:
+        return self._min_scale_log2 <= scale_log2 <= MAX_SCALE_LOG2
+    def scale(self, nframe: int) -> int:
+        """Applies the current gulp scale factor to `nframe`"""
+        return self._scale(nframe, self.scale_log2)
+    def begin_sequence(self, base_nframes: List[int], frame_nbyte: int,
+                       frame_time: Optional[float]=None) -> List[int]:
+        """Returns the gulp size to use for each input of a new sequence
+
+        Args:
+            base_nframes: The gulp size that each input would use without
+                            autotuning.
+            frame_nbyte:  The size of a frame of the (first) input.
+            frame_time:   The time spanned by a frame of the (first) input in
+                            seconds, if known.
+        """
+        if (base_nframes != self._base_nframes or
+            frame_nbyte  != self._frame_nbyte):
+            # Measurements are not comparable across different data shapes
+            self._base_nframes = list(base_nframes)
+            self._frame_nbyte  = frame_nbyte
+            self.reset()
+        self._frame_time = frame_time
+        if self.target == 'throughput':
+            self.scale_log2 = self._choose_throughput()
+        else:
+            self.scale_log2 = self._choose_latency()
+        return [self.scale(n) for n in self._base_nframes]
+    def record(self, nframe: int, reserve_time: float, process_time: float) -> None:
+        """Records the timings of a single gulp of `nframe` frames"""
+        stats = self._stats.setdefault(self.scale_log2, [0, 0, 0.])
+        stats[0] += 1
+        stats[1] += nframe
+        stats[2] += reserve_time + process_time
+    def _rate(self, scale_log2: int) -> Optional[float]:
+        if scale_log2 not in self._stats:
+            return None
+        ngulp, nframe, elapsed = self._stats[scale_log2]
+        if ngulp < self.min_gulps:
+            return None
+        return nframe / max(elapsed, 1e-9)
+    def _choose_throughput(self) -> int:
+        rates = {k: self._rate(k) for k in self._stats}
+        rates = {k: r for k, r in rates.items() if r is not None}
+        if self.scale_log2 not in rates:
+            # Keep measuring the current size
+            return self.scale_log2
+        # Note: Ties are broken in favour of larger gulps
+        best = max(rates, key=lambda k: (rates[k], k))
+        # Explore the neighbours of the best size, preferring larger gulps
+        for k in (best + 1, best - 1):
+            if self._allowed(k) and k not in rates:
+                return k
+        return best
+    def _gulp_cost_model(self):
+        """Fits cost = a + b*nframe to the mean measured per-gulp costs"""
+        points = []
+        for k, (ngulp, nframe, elapsed) in self._stats.items():
+            if ngulp > 0:
+                points.append((nframe / ngulp, elapsed / ngulp))
+        if not points:
+            return None
+        if len(points) == 1:
+            n, cost = points[0]
+            return 0., cost / n
+        mean_n    = sum(n for n, _ in points) / len(points)
+        mean_cost = sum(c for _, c in points) / len(points)
+        var = sum((n - mean_n)**2 for n, _ in points)
+        cov = sum((n - mean_n) * (c - mean_cost) for n, c in points)
+        b = max(cov / var, 0.) if var > 0 else mean_cost / mean_n
+        a = max(mean_cost - b * mean_n, 0.)
+        return a, b
+    def predict_latency(self, nframe: int) -> Optional[float]:
+        """Returns the predicted latency in seconds of a gulp of `nframe` frames"""
+        model = self._gulp_cost_model()
+        if model is None:
+            return None
+        a, b = model
+        latency = a + b * nframe
+        if self._frame_time is not None:
+            latency += nframe * self._frame_time
+        return latency
+    def _choose_latency(self) -> int:
+        base_nframe = self._base_nframes[0]
+        if not self._stats:
+            return self.scale_log2
+        best = self._min_scale_log2
+        for k in range(self._min_scale_log2, MAX_SCALE_LOG2 + 1):
+            if self.predict_latency(self._scale(base_nframe, k)) <= self.latency_budget:
+                best = k
+        return best
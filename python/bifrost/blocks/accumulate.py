@@ -46,9 +46,10 @@ class AccumulateBlock(TransformBlock):
                                               *args, **kwargs)
         self.nframe = nframe
         self.dtype  = dtype
+        self._accumulate = bf_map.compile("b = beta * b + (b_type)a")
     def define_valid_input_spaces(self):
         """Return set of valid spaces (or 'any') for each input"""
-        return ('cuda',)
+        return ('system', 'cuda')
     def on_sequence(self, iseq):
         ihdr = iseq.header
         ohdr = deepcopy(ihdr)
@@ -64,7 +65,7 @@ class AccumulateBlock(TransformBlock):
         idata = ispan.data
         odata = ospan.data
         beta = 0. if self.frame_count == 0 else 1.
-        bf_map("b = beta * b + (b_type)a", {'a': idata, 'b': odata, 'beta': beta})
+        self._accumulate({'a': idata, 'b': odata, 'beta': beta})
         self.frame_count += 1
         if self.frame_count == self.nframe:
             ncommit = 1
@@ -92,8 +93,8 @@ def accumulate(iring, nframe, dtype=None,
 
     Tensor semantics
     ----------------
-    Input:  [..., 'time', ...], dtype = any, space = CUDA
-    Output: [..., 'time'/nframe, ...], dtype = any, space = CUDA
+    Input:  [..., 'time', ...], dtype = any, space = SYSTEM or CUDA
+    Output: [..., 'time'/nframe, ...], dtype = any, space = SYSTEM or CUDA
 
     Returns
     -------
@@ -35,13 +35,76 @@ from math import sqrt
 from bifrost import telemetry
 telemetry.track_module()
 
+_MATRIX_TO_MATRIX_FUNC = '''
+bool in_lower_triangle = (i > j);
+if( in_lower_triangle ) {
+    odata(t,c,i,0,j,0) = idata(t,c,i,0,j,0);
+    odata(t,c,i,1,j,0) = idata(t,c,i,1,j,0);
+} else {
+    auto x = idata(t,c,j,0,i,0);
+    auto y = idata(t,c,j,1,i,0);
+    auto x1 = x[1];
+    x[0] = x[0].conj();
+    x[1] = y[0].conj();
+    if( i != j ) {
+        y[0] = x1.conj();
+    }
+    y[1] = y[1].conj();
+    odata(t,c,i,0,j,0) = x;
+    odata(t,c,i,1,j,0) = y;
+}
+'''
+
+# TODO: Support L/R as well as X/Y pols
+_MATRIX_TO_STORAGE_FUNC = '''
+// TODO: This only works up to 2048 in single-precision
+#define project_triangular(i, j) ((i)*((i)+1)/2 + (j))
+int i = int((sqrt(8.f*(b)+1)-1)/2);
+int j = b - project_triangular(i, 0);
+auto x = idata(t,c,i,0,j,0);
+auto y = idata(t,c,i,1,j,0);
+if( i == j ) {
+    x[1] = y[0].conj();
+}
+idata_type::value_type eye(0, 1);
+auto I = (x[0] + y[1]);
+auto Q = (x[0] - y[1]);
+auto U = (x[1] + y[0]);
+auto V = (x[1] - y[0]) * eye;
+odata(t,b,c,0) = odata_type(I,Q,U,V);
+'''
+
+_STORAGE_TO_MATRIX_FUNC = '''
+bool in_upper_triangle = (i < j);
+auto b = in_upper_triangle ? j*(j+1)/2 + i : i*(i+1)/2 + j;
+auto IQUV = idata(t,b,c,0);
+auto I = IQUV[0], Q = IQUV[1], U = IQUV[2], V = IQUV[3];
+idata_type::value_type eye(0, 1);
+auto xx = 0.5f*(I + Q);
+auto xy = 0.5f*(U - V*eye);
+auto yx = 0.5f*(U + V*eye);
+auto yy = 0.5f*(I - Q);
+if( i == j ) {
+    xy = yx.conj();
+}
+if( in_upper_triangle ) {
+    auto tmp_xy = xy;
+    xx = xx.conj();
+    xy = yx.conj();
+    yx = tmp_xy.conj();
+    yy = yy.conj();
+}
+odata(t,c,i,0,j,0) = odata_type(xx, xy);
+odata(t,c,i,1,j,0) = odata_type(yx, yy);
+'''
+
 class ConvertVisibilitiesBlock(TransformBlock):
     def __init__(self, iring, fmt,
                  *args, **kwargs):
         super(ConvertVisibilitiesBlock, self).__init__(iring, *args, **kwargs)
         self.ofmt = fmt
     def define_valid_input_spaces(self):
-        return ('cuda',)
+        return ('system', 'cuda')
     def on_sequence(self, iseq):
         ihdr = iseq.header
         itensor = ihdr['_tensor']
@@ -57,6 +120,8 @@ class ConvertVisibilitiesBlock(TransformBlock):
             self.ifmt = 'matrix'
             if self.ofmt == 'matrix':
                 ohdr['matrix_fill_mode'] = 'hermitian'
+                self._map = bf_map.compile(_MATRIX_TO_MATRIX_FUNC,
+                                           axis_names=['t', 'c', 'i', 'j'])
             elif self.ofmt == 'storage':
                 nbaseline = nstand*(nstand+1)//2
                 del ohdr['matrix_fill_mode']
@@ -64,6 +129,9 @@ class ConvertVisibilitiesBlock(TransformBlock):
                 otensor['shape']  = [-1, nbaseline, nchan, npol*npol]
                 time_units, freq_units, stand_units, pol_units, _, _ = itensor['units']
                 otensor['units']  = [time_units, None, freq_units, ('I', 'Q', 'U', 'V')]
+                self._map = bf_map.compile(_MATRIX_TO_STORAGE_FUNC,
+                                           axis_names=['t', 'b', 'c'],
+                                           block_shape=[64,8]) # TODO: Tune this
             else:
                 raise NotImplementedError("Unsupported conversion from " +
                                           self.ifmt + " to " + self.ofmt)
@@ -79,6 +147,9 @@ class ConvertVisibilitiesBlock(TransformBlock):
                 otensor['labels'] = ['time', 'freq', 'station_i', 'pol_i', 'station_j', 'pol_j']
                 otensor['shape']  = [-1, nchan, nstand, npol, nstand, npol]
                 otensor['units']  = [time_units, freq_units, None, pol_units, None, pol_units]
+                self._map = bf_map.compile(_STORAGE_TO_MATRIX_FUNC,
+                                           axis_names=['t', 'c', 'i', 'j'],
+                                           block_shape=[64,8]) # TODO: Tune this
         else:
             raise NotImplementedError("Cannot convert input from %s to %s"
                                       % (ilabels, self.ofmt))
@@ -96,53 +167,12 @@ class ConvertVisibilitiesBlock(TransformBlock):
             del shape_nopols[3]
             idata = idata.view(itype.as_vector(2))
             odata = odata.view(otype.as_vector(2))
-            bf_map(
-                '''
-                bool in_lower_triangle = (i > j);
-                if( in_lower_triangle ) {
-                    odata(t,c,i,0,j,0) = idata(t,c,i,0,j,0);
-                    odata(t,c,i,1,j,0) = idata(t,c,i,1,j,0);
-                } else {
-                    auto x = idata(t,c,j,0,i,0);
-                    auto y = idata(t,c,j,1,i,0);
-                    auto x1 = x[1];
-                    x[0] = x[0].conj();
-                    x[1] = y[0].conj();
-                    if( i != j ) {
-                        y[0] = x1.conj();
-                    }
-                    y[1] = y[1].conj();
-                    odata(t,c,i,0,j,0) = x;
-                    odata(t,c,i,1,j,0) = y;
-                }
-                ''',
-                   shape=shape_nopols, axis_names=['t', 'c', 'i', 'j'],
-                   data={'idata': idata, 'odata': odata})
+            self._map({'idata': idata, 'odata': odata}, shape=shape_nopols)
         elif self.ifmt == 'matrix' and self.ofmt == 'storage':
             assert(idata.shape[2] <= 2048)
             idata = idata.view(itype.as_vector(2))
             odata = odata.view(otype.as_vector(4))
-            # TODO: Support L/R as well as X/Y pols
-            bf_map('''
-            // TODO: This only works up to 2048 in single-precision
-            #define project_triangular(i, j) ((i)*((i)+1)/2 + (j))
-            int i = int((sqrt(8.f*(b)+1)-1)/2);
-            int j = b - project_triangular(i, 0);
-            auto x = idata(t,c,i,0,j,0);
-            auto y = idata(t,c,i,1,j,0);
-            if( i == j ) {
-                x[1] = y[0].conj();
-            }
-            idata_type::value_type eye(0, 1);
-            auto I = (x[0] + y[1]);
-            auto Q = (x[0] - y[1]);
-            auto U = (x[1] + y[0]);
-            auto V = (x[1] - y[0]) * eye;
-            odata(t,b,c,0) = odata_type(I,Q,U,V);
-            ''',
-                   shape=odata.shape[:-1], axis_names=['t', 'b', 'c'],
-                   data={'idata': idata, 'odata': odata},
-                   block_shape=[64,8]) # TODO: Tune this
+            self._map({'idata': idata, 'odata': odata}, shape=odata.shape[:-1])
         #elif self.ifmt == 'matrix' and self.ofmt == 'triangular':
         elif self.ifmt == 'storage' and self.ofmt == 'matrix':
             oshape_nopols = list(odata.shape)
@@ -150,32 +180,7 @@ class ConvertVisibilitiesBlock(TransformBlock):
             del oshape_nopols[3]
             idata = idata.view(itype.as_vector(4))
             odata = odata.view(otype.as_vector(2))
-            bf_map('''
-            bool in_upper_triangle = (i < j);
-            auto b = in_upper_triangle ? j*(j+1)/2 + i : i*(i+1)/2 + j;
-            auto IQUV = idata(t,b,c,0);
-            auto I = IQUV[0], Q = IQUV[1], U = IQUV[2], V = IQUV[3];
-            idata_type::value_type eye(0, 1);
-            auto xx = 0.5f*(I + Q);
-            auto xy = 0.5f*(U - V*eye);
-            auto yx = 0.5f*(U + V*eye);
-            auto yy = 0.5f*(I - Q);
-            if( i == j ) {
-                xy = yx.conj();
-            }
-            if( in_upper_triangle ) {
-                auto tmp_xy = xy;
-                xx = xx.conj();
-                xy = yx.conj();
-                yx = tmp_xy.conj();
-                yy = yy.conj();
-            }
-            odata(t,c,i,0,j,0) = odata_type(xx, xy);
-            odata(t,c,i,1,j,0) = odata_type(yx, yy);
-            ''',
-                   shape=oshape_nopols, axis_names=['t', 'c', 'i', 'j'],
-                   data={'idata': idata, 'odata': odata},
-                   block_shape=[64,8]) # TODO: Tune this
+            self._map({'idata': idata, 'odata': odata}, shape=oshape_nopols)
         else:
             raise NotImplementedError
 
@@ -193,15 +198,15 @@ def convert_visibilities(iring, fmt, *args, **kwargs):
 
     **Tensor semantics**::
 
-        Input:  ['time', 'freq', 'station_i', 'pol_i', 'station_j', 'pol_j'], dtype = any complex, space = CUDA
+        Input:  ['time', 'freq', 'station_i', 'pol_i', 'station_j', 'pol_j'], dtype = any complex, space = SYSTEM or CUDA
         fmt = 'matrix' (produces a fully-filled matrix from a lower-filled one)
-        Output: ['time', 'freq', 'station_i', 'pol_i', 'station_j', 'pol_j'], dtype = any complex, space = CUDA
+        Output: ['time', 'freq', 'station_i', 'pol_i', 'station_j', 'pol_j'], dtype = any complex, space = SYSTEM or CUDA
         fmt = 'storage' (suitable for common on-disk data formats such as UVFITS, FITS-IDI, MS etc.)
-        Output: ['time', 'baseline', 'freq', 'stokes'], dtype = any complex, space = CUDA
+        Output: ['time', 'baseline', 'freq', 'stokes'], dtype = any complex, space = SYSTEM or CUDA
 
-        Input:  ['time', 'baseline', 'freq', 'stokes'], dtype = any complex, space = CUDA
+        Input:  ['time', 'baseline', 'freq', 'stokes'], dtype = any complex, space = SYSTEM or CUDA
         fmt = 'matrix' (fully-filled matrix suitable for linear algebra operations)
-        Output: ['time', 'freq', 'station_i', 'pol_i', 'station_j', 'pol_j'], dtype = any complex, space = CUDA
+        Output: ['time', 'freq', 'station_i', 'pol_i', 'station_j', 'pol_j'], dtype = any complex, space = SYSTEM or CUDA
 
     Returns:
         ConvertVisibilitiesBlock: A new block instance.
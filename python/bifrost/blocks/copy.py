@@ -39,6 +39,7 @@ class CopyBlock(TransformBlock):
         if space is None:
             space = self.iring.space
         self.orings = [self.create_ring(space=space)]
+        self.out_proclog.update({'nring': 1, 'ring0': self.orings[0].name})
     def on_sequence(self, iseq):
         ohdr = deepcopy(iseq.header)
         return ohdr
@@ -43,7 +43,7 @@ class DetectBlock(TransformBlock):
         self.mode = mode.lower()
     def define_valid_input_spaces(self):
         """Return set of valid spaces (or 'any') for each input"""
-        return ('cuda',)
+        return ('system', 'cuda')
     def on_sequence(self, iseq):
         ihdr = iseq.header
         itensor = ihdr['_tensor']
@@ -79,15 +79,11 @@ class DetectBlock(TransformBlock):
         else:
             otype = itype.as_real()
         otensor['dtype'] = otype.as_floating_point()
-        return ohdr
-    def on_data(self, ispan, ospan):
-        idata = ispan.data
-        odata = ospan.data
         if self.npol == 1:
-            bf_map("b = Complex<b_type>(a).mag2()", {'a': idata, 'b': odata})
+            self._map = bf_map.compile("b = Complex<b_type>(a).mag2()")
         else:
-            shape = idata.shape[:self.axis] + idata.shape[self.axis + 1:]
-            inds = ['i%i' % i for i in range(idata.ndim)]
+            ndim = len(itensor['shape'])
+            inds = ['i%i' % i for i in range(ndim)]
             inds[self.axis] = '%i'
             inds_pol = ','.join(inds)
             inds_ = [inds_pol % i for i in range(4)]
@@ -134,8 +130,16 @@ class DetectBlock(TransformBlock):
                 b(%s) = xy.imag;
                 """ % (inds_[0], inds_[1],
                        inds_[0], inds_[1], inds_[2], inds_[3])
-            bf_map(func, shape=shape, axis_names=inds,
-                   data={'a': ispan.data, 'b': ospan.data})
+            self._map = bf_map.compile(func, axis_names=inds)
+        return ohdr
+    def on_data(self, ispan, ospan):
+        idata = ispan.data
+        odata = ospan.data
+        if self.npol == 1:
+            self._map({'a': idata, 'b': odata})
+        else:
+            shape = idata.shape[:self.axis] + idata.shape[self.axis + 1:]
+            self._map({'a': idata, 'b': odata}, shape=shape)
 
 def detect(iring, mode: str, axis: Optional[Union[int,str]] = None, *args, **kwargs):
     """Apply square-law detection to create polarization products.
@@ -151,8 +155,8 @@ def detect(iring, mode: str, axis: Optional[Union[int,str]] = None, *args, **kwa
         *args: Arguments to ``bifrost.pipeline.TransformBlock``.
         **kwargs: Keyword Arguments to ``bifrost.pipeline.TransformBlock``.
     **Tensor semantics**::
-        Input:  [..., 'pol', ...], dtype = any complex, space = CUDA
-        Output: [..., 'pol', ...], dtype = real or complex, space = CUDA
+        Input:  [..., 'pol', ...], dtype = any complex, space = SYSTEM or CUDA
+        Output: [..., 'pol', ...], dtype = real or complex, space = SYSTEM or CUDA
     Returns:
         DetectBlock: A new block instance.
     """
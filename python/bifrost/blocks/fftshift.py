@@ -42,7 +42,7 @@ class FftShiftBlock(TransformBlock):
         self.specified_axes = axes
         self.inverse = inverse
     def define_valid_input_spaces(self):
-        return ('cuda',)
+        return ('system', 'cuda')
     def on_sequence(self, iseq):
         ihdr = iseq.header
         itensor = ihdr['_tensor']
@@ -63,12 +63,7 @@ class FftShiftBlock(TransformBlock):
                 # TODO: Double-check that this does what we want when scale_delta is negative
                 scale_shift = sgn * (oshape[ax] // 2) * scale_step
                 otensor['scales'][ax][0] += scale_shift
-        return ohdr
-    def on_data(self, ispan, ospan):
-        idata = ispan.data
-        odata = ospan.data
-        shape = idata.shape
-        ind_names = ['i%i' % i for i in range(idata.ndim)]
+        ind_names = ['i%i' % i for i in range(len(itensor['shape']))]
         inds = list(ind_names)
         for ax in self.axes:
             if self.inverse:
@@ -76,8 +71,12 @@ class FftShiftBlock(TransformBlock):
             else:
                 inds[ax] += '-a.shape(%i)/2' % ax
         inds = ','.join(inds)
-        bf_map("b = a(%s)" % inds, shape=shape, axis_names=ind_names,
-               data={'a': idata, 'b': odata})
+        self._map = bf_map.compile("b = a(%s)" % inds, axis_names=ind_names)
+        return ohdr
+    def on_data(self, ispan, ospan):
+        idata = ispan.data
+        odata = ospan.data
+        self._map({'a': idata, 'b': odata}, shape=idata.shape)
 
 def fftshift(iring, axes, inverse=False, *args, **kwargs):
     """Apply an FFT shift to data along specified axes.
@@ -94,8 +93,8 @@ def fftshift(iring, axes, inverse=False, *args, **kwargs):
 
     **Tensor semantics**::
 
-        Input:  [...], dtype = any, space = CUDA
-        Output: [...], dtype = any, space = CUDA
+        Input:  [...], dtype = any, space = SYSTEM or CUDA
+        Output: [...], dtype = any, space = SYSTEM or CUDA
 
     Returns:
         FftShiftBlock: A new block instance.
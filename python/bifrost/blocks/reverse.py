@@ -40,7 +40,7 @@ class ReverseBlock(TransformBlock):
             axes = [axes]
         self.specified_axes = axes
     def define_valid_input_spaces(self):
-        return ('cuda',)
+        return ('system', 'cuda')
     def on_sequence(self, iseq):
         ihdr = iseq.header
         itensor = ihdr['_tensor']
@@ -60,18 +60,17 @@ class ReverseBlock(TransformBlock):
                 scale_shift = oshape[ax] * scale_step
                 otensor['scales'][ax][0] += scale_shift
                 otensor['scales'][ax][1]  = -scale_step
-        return ohdr
-    def on_data(self, ispan, ospan):
-        idata = ispan.data
-        odata = ospan.data
-        shape = idata.shape
-        ind_names = ['i%i' % i for i in range(idata.ndim)]
+        ind_names = ['i%i' % i for i in range(len(itensor['shape']))]
         inds = list(ind_names)
         for ax in self.axes:
             inds[ax] = '-' + inds[ax]
         inds = ','.join(inds)
-        bf_map("b = a(%s)" % inds, shape=shape, axis_names=ind_names,
-               data={'a': idata, 'b': odata})
+        self._map = bf_map.compile("b = a(%s)" % inds, axis_names=ind_names)
+        return ohdr
+    def on_data(self, ispan, ospan):
+        idata = ispan.data
+        odata = ospan.data
+        self._map({'a': idata, 'b': odata}, shape=idata.shape)
 
 def reverse(iring, axes, *args, **kwargs):
     """Reverse data along an axis or set of axes.
@@ -84,8 +83,8 @@ def reverse(iring, axes, *args, **kwargs):
 
     **Tensor semantics**::
 
-        Input:  [...], dtype = any, space = CUDA
-        Output: [...], dtype = any, space = CUDA
+        Input:  [...], dtype = any, space = SYSTEM or CUDA
+        Output: [...], dtype = any, space = SYSTEM or CUDA
 
     Returns:
         ReverseBlock: A new block instance.
@@ -27,6 +27,7 @@
 
 from bifrost.pipeline import SinkBlock, SourceBlock
 from bifrost.ring2 import Ring, ReadSequence, ReadSpan, WriteSpan
+from bifrost.ndarray import ndarray
 import os
 import warnings
 try:
@@ -168,75 +169,101 @@ def deserialize(filenames: List[str], gulp_nframe: int,
     """
     return DeserializeBlock(filenames, gulp_nframe, *args, **kwargs)
 
-# **TODO: Write a DeserializeBlock that does the inverse of this
-class SerializeBlock(SinkBlock):
-    def __init__(self, iring: Ring, path: str, max_file_size: Optional[int]=None, *args, **kwargs):
-        super(SerializeBlock, self).__init__(iring, *args, **kwargs)
-        if path is None:
-            path = ''
-        self.path = path
+class BifrostWriter(object):
+    """Writes a sequence to a set of files in the format read by BifrostReader
+
+    Args:
+        basename:      Output filename prefix; '.bf' is appended to it.
+        header:        The sequence header, which must include '_tensor'.
+        max_file_size: Max no. bytes to write to a single file (per ringlet)
+                         before rolling over to a new file. If set to -1, no
+                         limit is applied.
+    """
+    def __init__(self, basename: str, header: Dict[str,Any],
+                 max_file_size: Optional[int]=None):
         if max_file_size is None:
             max_file_size = 1024**3
+        self.basename = basename
         self.max_file_size = max_file_size
-    def _close_data_files(self):
-        if hasattr(self, 'ofiles'):
-            for ofile in self.ofiles:
-                ofile.close()
-    def _open_new_data_files(self, frame_offset):
-        self._close_data_files()
+        shape = header['_tensor']['shape']
+        self.frame_axis = shape.index(-1)
+        self.nringlet = reduce(lambda a, b: a * b, shape[:self.frame_axis], 1)
+        if self.frame_axis > 1:
+            # TODO: Need to deal with separating multiple ringlet axes
+            #         E.g., separate each ringlet dim with a dot
+            #         Will have to lift/project the indices
+            raise NotImplementedError("Multiple ringlet axes not supported")
+        # Write sequence header file
+        with open(self.basename + '.bf.json', 'w') as hdr_file:
+            hdr_file.write(json.dumps(header, indent=4, sort_keys=True))
+        self.ofiles = []
+        self._open_new_data_files(frame_offset=0)
+    def __enter__(self):
+        return self
+    def __exit__(self, type, value, tb):
+        self.close()
+    def close(self) -> None:
+        for ofile in self.ofiles:
+            ofile.close()
+        self.ofiles = []
+    def _open_new_data_files(self, frame_offset: int) -> None:
+        self.close()
         self.bytes_written = 0
         if self.frame_axis == 0:
             # No ringlets, we can write all data to one file
             filenames = [self.basename + '.bf.%012i.dat' % frame_offset]
-        elif self.frame_axis == 1:
+        else:
             # Ringlets, we must write each to a separate file
             ndigit    = len(str(self.nringlet-1))
             filenames = [self.basename + ('.bf.%012i.%0'+str(ndigit)+'i.dat') %
                          (frame_offset, i)
                          for i in range(self.nringlet)]
-        else:
-            # TODO: Need to deal with separating multiple ringlet axes
-            #         E.g., separate each ringlet dim with a dot
-            #         Will have to lift/project the indices
-            raise NotImplementedError("Multiple ringlet axes not supported")
         # Open data files
         self.ofiles = [open(fname, 'wb') for fname in filenames]
+    def write(self, frame_offset: int, data: ndarray) -> None:
+        """Writes a span of `data` that begins at `frame_offset` in the sequence"""
+        if self.nringlet == 1:
+            bytes_to_write = data.nbytes
+        else:
+            bytes_to_write = data[0].nbytes
+        # Check if file size limit has been reached
+        if (self.max_file_size >= 0 and self.bytes_written > 0 and
+            self.bytes_written + bytes_to_write > self.max_file_size):
+            self._open_new_data_files(frame_offset)
+        self.bytes_written += bytes_to_write
+        # Write data to file(s)
+        if self.nringlet == 1:
+            data.tofile(self.ofiles[0])
+        else:
+            for r in range(self.nringlet):
+                data[r].tofile(self.ofiles[r])
+
+class SerializeBlock(SinkBlock):
+    def __init__(self, iring: Ring, path: str, max_file_size: Optional[int]=None, *args, **kwargs):
+        super(SerializeBlock, self).__init__(iring, *args, **kwargs)
+        if path is None:
+            path = ''
+        self.path = path
+        self.max_file_size = max_file_size
+        self.writer = None
     def on_sequence(self, iseq: ReadSequence) -> None:
         hdr = iseq.header
-        tensor = hdr['_tensor']
         if hdr['name'] != '':
-            self.basename = hdr['name']
+            basename = hdr['name']
         else:
-            self.basename = '%020i' % hdr['time_tag']
+            basename = '%020i' % hdr['time_tag']
         if self.path != '':
             # TODO: May need more flexibility in path handling
             #         E.g., may want to keep subdirs from original name
-            self.basename = os.path.basename(self.basename)
-            self.basename = os.path.join(self.path, self.basename)
-        # Write sequence header file
-        with open(self.basename + '.bf.json', 'w') as hdr_file:
-            hdr_file.write(json.dumps(hdr, indent=4, sort_keys=True))
-        shape = tensor['shape']
-        self.frame_axis = shape.index(-1)
-        self.nringlet = reduce(lambda a, b: a * b, shape[:self.frame_axis], 1)
-        self._open_new_data_files(frame_offset=0)
+            basename = os.path.basename(basename)
+            basename = os.path.join(self.path, basename)
+        self.writer = BifrostWriter(basename, hdr, self.max_file_size)
     def on_sequence_end(self, iseq: ReadSequence) -> None:
-        self._close_data_files()
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
     def on_data(self, ispan: ReadSpan) -> None:
-        if self.nringlet == 1:
-            bytes_to_write = ispan.data.nbytes
-        else:
-            bytes_to_write = ispan.data[0].nbytes
-        # Check if file size limit has been reached
-        if self.bytes_written + bytes_to_write > self.max_file_size:
-            self._open_new_data_files(ispan.frame_offset)
-        self.bytes_written += bytes_to_write
-        # Write data to file(s)
-        if self.nringlet == 1:
-            ispan.data.tofile(self.ofiles[0])
-        else:
-            for r in range(self.nringlet):
-                ispan.data[r].tofile(self.ofiles[r])
+        self.writer.write(ispan.frame_offset, ispan.data)
 
 def serialize(iring: Ring, path: str=None, max_file_size: Optional[int]=None,
               *args, **kwargs) -> SerializeBlock:
@@ -32,7 +32,9 @@ import numpy as np
 import ctypes
 import glob
 import os
-from typing import Any, Dict, List, Optional
+import re
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
 from bifrost.libbifrost_generated import BF_MAP_KERNEL_DISK_CACHE
 
 from bifrost import telemetry
@@ -55,6 +57,176 @@ def _convert_to_array(arg: Any) -> ndarray:
         arg = arr
     return asarray(arg)
 
+_ASSIGNMENT_RE = re.compile(r'^\s*([A-Za-z_]\w*)\s*=(?!=)(.*)$', re.DOTALL)
+
+def _fuse_stages(stages: Sequence[str], arg_names: Sequence[str]) -> str:
+    """Joins a sequence of map statements into the body of a single kernel
+
+    A stage of the form "name = expr", where name is not one of the arguments
+    and has not already been defined, defines an intermediate value
+    ("auto name = expr;") that is held in a local variable rather than being
+    written to memory. All other stages are used verbatim.
+    """
+    defined = set(arg_names)
+    body = []
+    for stage in stages:
+        stage = stage.strip()
+        match = _ASSIGNMENT_RE.match(stage)
+        if match is not None and match.group(1) not in defined:
+            name = match.group(1)
+            if name.startswith('_'):
+                raise ValueError(f"Invalid intermediate name '{name}'")
+            defined.add(name)
+            stage = f"auto {name} = {match.group(2).strip()}"
+        if not stage.endswith((';', '}')):
+            stage += ';'
+        body.append(stage)
+    return '\n'.join(body)
+
+def _signature(arg: Any) -> Any:
+    """Returns what must stay the same for an argument's binding to be reused"""
+    if _is_literal(arg):
+        return (type(arg), arg)
+    if not isinstance(arg, ndarray):
+        # Note: Other arrays may be copied on conversion, so are always rebound
+        return None
+    return (arg.shape, arg.strides, arg.bf.dtype, arg.bf.space,
+            arg.flags['WRITEABLE'], arg.bf.conjugated, arg.bf.native)
+
+class MapFunction(object):
+    """A bf.map function whose argument binding is prepared in advance
+
+    Instances are created by `compile` and are called with the same `data`
+    dict that would be passed to `map`. The BFarray structures and ctypes
+    arrays passed to the library are built on the first call and reused by
+    later calls, with only the data pointers updated, for as long as the
+    names, shapes, strides, dtypes and spaces of the arrays (and the values
+    of any scalars) stay the same. Any change causes the affected arguments
+    to be rebound.
+
+    If `func_string` is a sequence of statements they are fused into a single
+    kernel as described in `map_fused`.
+
+    Note:
+        A MapFunction must not be called from more than one thread at a time.
+    """
+    def __init__(self, func_string: Union[str,Sequence[str]],
+                 axis_names: Optional[List[str]]=None,
+                 shape: Optional[List[int]]=None,
+                 func_name: Optional[str]=None,
+                 extra_code: Optional[str]=None,
+                 block_shape: Optional[List[int]]=None,
+                 block_axes: Optional[List[int]]=None):
+        if block_axes is not None:
+            # Allow referencing axes by name
+            block_axes = [axis_names.index(bax) if isinstance(bax, str)
+                          else bax
+                          for bax in block_axes]
+        if block_axes is not None and len(block_axes) != 2:
+            raise ValueError("block_axes must contain exactly 2 entries")
+        if block_shape is not None and len(block_shape) != 2:
+            raise ValueError("block_shape must contain exactly 2 entries")
+        if isinstance(func_string, str):
+            self._stages = None
+            self.func_string = func_string
+            self._func_string = func_string.encode()
+        else:
+            # Note: Intermediates depend on the argument names, so the fused
+            #         function is generated when the arguments are bound
+            self._stages = list(func_string)
+            self.func_string = None
+        self._func_name   = func_name.encode()  if func_name  is not None else None
+        self._extra_code  = extra_code.encode() if extra_code is not None else None
+        self._axis_names  = _array(axis_names)
+        self._block_shape = _array(block_shape)
+        self._block_axes  = _array(block_axes)
+        self._shape = tuple(shape) if shape is not None else None
+        self._set_call_shape(self._shape)
+        self._names = None
+    def _set_call_shape(self, shape: Optional[Tuple[int]]) -> None:
+        # Note: The converted shape is cached, as most calls use the same one
+        self._call_shape = shape
+        self._ndim       = len(shape) if shape is not None else 0
+        self._c_shape    = _array(shape, dtype=ctypes.c_long)
+    def _bind_arg(self, index: int, arg: Any) -> None:
+        sig = _signature(arg)
+        arg = _convert_to_array(arg)
+        # Note: We must keep a reference to each array lest they be garbage
+        #         collected before their corresponding BFarray is used.
+        self._arrays[index]  = arg
+        self._structs[index] = arg.as_BFarray()
+        self._sigs[index]    = sig
+        if self._c_args is not None:
+            self._c_args[index] = ctypes.pointer(self._structs[index])
+    def _bind(self, data: Dict[str,Any]) -> None:
+        narg = len(data)
+        self._names   = list(data.keys())
+        self._arrays  = [None] * narg
+        self._structs = [None] * narg
+        self._sigs    = [None] * narg
+        self._c_args  = None
+        for i, arg in enumerate(data.values()):
+            self._bind_arg(i, arg)
+        self._c_args  = _array(self._structs)
+        self._c_names = _array(self._names)
+        if self._stages is not None:
+            self.func_string = _fuse_stages(self._stages, self._names)
+            self._func_string = self.func_string.encode()
+    def __call__(self, data: Dict[str,Any],
+                 shape: Optional[List[int]]=None) -> None:
+        """Apply the function to a set of ndarrays
+
+        Args:
+          data (dict): Map of string names to ndarrays or scalars.
+          shape:       The shape of the computation, overriding the shape
+                         given to `compile` for this call only (e.g., for a
+                         partial gulp).
+        """
+        shape = tuple(shape) if shape is not None else self._shape
+        if shape != self._call_shape:
+            self._set_call_shape(shape)
+        if self._names is None or len(data) != len(self._names):
+            self._bind(data)
+        else:
+            for i, (key, arg) in enumerate(data.items()):
+                if key != self._names[i]:
+                    self._bind(data)
+                    break
+                sig = _signature(arg)
+                if sig is None or sig != self._sigs[i]:
+                    self._bind_arg(i, arg)
+                elif not _is_literal(arg):
+                    self._arrays[i] = arg
+                    self._structs[i].data = arg.ctypes.data
+        _check(_bf.bfMap(self._ndim, self._c_shape, self._axis_names,
+                         len(self._names), self._c_args, self._c_names,
+                         self._func_name, self._func_string, self._extra_code,
+                         self._block_shape, self._block_axes))
+
+def compile(func_string: Union[str,Sequence[str]],
+            axis_names: Optional[List[str]]=None,
+            shape: Optional[List[int]]=None,
+            func_name: Optional[str]=None,
+            extra_code: Optional[str]=None,
+            block_shape: Optional[List[int]]=None,
+            block_axes: Optional[List[int]]=None) -> MapFunction:
+    """Prepare a function for repeated application to sets of ndarrays
+
+    Takes the same arguments as `map` (except for `data`) and returns a
+    MapFunction that is called with the `data` dict. `func_string` may also
+    be a sequence of statements to be fused (see `map_fused`). This avoids most of the
+    per-call overhead of `map` when the function is applied repeatedly to
+    arrays with the same shapes, e.g., once per gulp in a pipeline block.
+
+    Examples::
+
+      add = bf.map.compile("c = a + b")
+      for a, b, c in gulps:
+          add({'c': c, 'a': a, 'b': b})
+    """
+    return MapFunction(func_string, axis_names, shape, func_name, extra_code,
+                       block_shape, block_axes)
+
 def map(func_string: str, data: Dict[str,Any],
         axis_names: Optional[List[str]]=None,
         shape: Optional[List[int]]=None,
@@ -89,7 +261,12 @@ def map(func_string: str, data: Dict[str,Any],
                    kernel.
 
     Note:
-        Only GPU computation is currently supported.
+        If all of the arrays are in system memory the function is compiled
+        with the system C++ compiler (set by $BF_MAP_CXX, default 'c++') and
+        run on the host using OpenMP. Compiler flags may be overridden with
+        $BF_MAP_CXXFLAGS (default '-O3 -march=native -ffast-math'). Host
+        kernels are always cached on disk. block_shape and block_axes are
+        ignored for host kernels.
 
     Examples::
 
@@ -110,37 +287,144 @@ def map(func_string: str, data: Dict[str,Any],
       # Slice an array with a scalar index
       bf.map("c(i) = a(i,k)", {'c': c, 'a': a, 'k': 7}, ['i'], shape=c.shape)
     """
-    func_string = func_string.encode()
-    if func_name is not None:
-        func_name = func_name.encode()
-    if extra_code is not None:
-        extra_code = extra_code.encode()
-    narg = len(data)
-    ndim = len(shape) if shape is not None else 0
-    arg_arrays = []
-    args = []
-    arg_names = []
-    if block_axes is not None:
-        # Allow referencing axes by name
-        block_axes = [axis_names.index(bax) if isinstance(bax, str)
-                      else bax
-                      for bax in block_axes]
-    if block_axes is not None and len(block_axes) != 2:
-        raise ValueError("block_axes must contain exactly 2 entries")
-    if block_shape is not None and len(block_shape) != 2:
-        raise ValueError("block_shape must contain exactly 2 entries")
-    for key, arg in data.items():
-        arg = _convert_to_array(arg)
-        # Note: We must keep a reference to each array lest they be garbage
-        #         collected before their corresponding BFarray is used.
-        arg_arrays.append(arg)
-        args.append(arg.as_BFarray())
-        arg_names.append(key)
-    _check(_bf.bfMap(ndim, _array(shape, dtype=ctypes.c_long),
-                     _array(axis_names),
-                     narg, _array(args), _array(arg_names),
-                     func_name, func_string, extra_code,
-                     _array(block_shape), _array(block_axes)))
+    MapFunction(func_string, axis_names, shape, func_name, extra_code,
+                block_shape, block_axes)(data)
+
+def map_fused(stages: Sequence[str], data: Dict[str,Any],
+              axis_names: Optional[List[str]]=None,
+              shape: Optional[List[int]]=None,
+              func_name: Optional[str]=None,
+              extra_code: Optional[str]=None,
+              block_shape: Optional[List[int]]=None,
+              block_axes: Optional[List[int]]=None) -> None:
+    """Apply a chain of functions to a set of ndarrays using a single kernel.
+
+    Each stage is a statement in the same form as the func_string passed to
+    `map`, and the stages are executed in order for each element. A stage of
+    the form "name = expr", where name is not a key of `data`, defines a
+    named intermediate that later stages may use. Intermediates are held in
+    registers instead of being written to and read back from memory as they
+    would be by separate calls to `map`.
+
+    Intermediates are per-element values, so later stages may only use the
+    intermediate for the current element (i.e., they cannot be indexed).
+
+    Args:
+      stages (list): The statements to apply, in order.
+      data (dict): Map of string names to ndarrays or scalars.
+
+    All other arguments are as for `map`.
+
+    Examples::
+
+      # Detect, scale and accumulate without storing the power or scaled
+      #   power arrays
+      bf.map_fused(["p = x.mag2()",
+                    "s = p * gain",
+                    "y += s"],
+                   {'x': x, 'y': y, 'gain': 0.5})
+    """
+    if isinstance(stages, str):
+        raise TypeError("stages must be a sequence of strings")
+    MapFunction(stages, axis_names, shape, func_name, extra_code,
+                block_shape, block_axes)(data)
+
+# Note: This allows bf.map.compile(...), as bf.map refers to the function
+map.compile = compile
+
+def get_map_cache_limits() -> Tuple[int,int]:
+    """Returns the (max_entries, max_bytes) size limits of the on-disk map
+    kernel caches, where 0 means no limit.
+    """
+    max_entries, max_bytes = ctypes.c_long(), ctypes.c_long()
+    _check(_bf.bfMapGetCacheLimits(ctypes.byref(max_entries),
+                                   ctypes.byref(max_bytes)))
+    return max_entries.value, max_bytes.value
+
+def set_map_cache_limits(max_entries: Optional[int]=None,
+                         max_bytes: Optional[int]=None) -> None:
+    """Sets the size limits of the on-disk map kernel caches
+
+    When a newly-compiled kernel takes a cache over either limit, its
+    least-recently-loaded entries (i.e., those least recently compiled or
+    read from disk by any process) are evicted. The GPU (PTX) and CPU (shared
+    object) caches are limited separately.
+
+    Args:
+        max_entries: The maximum number of kernels in each cache, or 0 for no
+                       limit. If None, the current limit is kept.
+        max_bytes:   The maximum size in bytes of each cache, or 0 for no
+                       limit. If None, the current limit is kept.
+
+    Note:
+        The default limits may also be set with the BF_MAP_CACHE_MAX_ENTRIES
+        and BF_MAP_CACHE_MAX_BYTES environment variables.
+    """
+    cur_entries, cur_bytes = get_map_cache_limits()
+    if max_entries is None:
+        max_entries = cur_entries
+    if max_bytes is None:
+        max_bytes = cur_bytes
+    _check(_bf.bfMapSetCacheLimits(max_entries, max_bytes))
+
+def _read_map_cache_entry(basename: str, backend: str) -> Optional[Dict[str,Any]]:
+    data_suffix = '.ptx' if backend == 'cuda' else '.so'
+    try:
+        with open(basename+'.inf', 'r') as fh:
+            if backend == 'cuda':
+                # Skip the PTX size
+                fh.readline()
+            kernel_name = fh.readline().strip()
+        nbyte = 0
+        for suffix in ('.inf', data_suffix, '.hit'):
+            if os.path.exists(basename+suffix):
+                nbyte += os.path.getsize(basename+suffix)
+    except OSError:
+        # Removed by another process
+        return None
+    hits, last_loaded = 0, None
+    try:
+        with open(basename+'.hit', 'r') as fh:
+            hits, last_loaded_us = fh.read().split()[:2]
+            hits, last_loaded = int(hits, 10), int(last_loaded_us, 10) / 1e6
+    except (OSError, ValueError):
+        pass
+    return {'backend':     backend,
+            'kernel_name': kernel_name,
+            'nbyte':       nbyte,
+            'hits':        hits,
+            'last_loaded': last_loaded,
+            'path':        basename}
+
+def get_map_cache_entries() -> List[Dict[str,Any]]:
+    """Returns the usage statistics of each kernel in the on-disk map caches
+
+    Each entry is a dict with the keys:
+      'backend':     'cuda' or 'cpu'.
+      'kernel_name': The name of the compiled kernel.
+      'nbyte':       The space taken up by the entry on disk.
+      'hits':        The no. times the kernel was loaded instead of compiled.
+      'last_loaded': The time the kernel was last compiled or loaded from
+                       disk, in seconds since the epoch (or None if unknown).
+                       Reuse of a kernel already in a process's memory is
+                       not counted.
+      'path':        The path of the entry's files, minus their extension.
+
+    Entries are returned from most to least recently loaded.
+    """
+    cache_path = os.path.join(os.path.expanduser('~'), '.bifrost',
+                              _bf.BF_MAP_KERNEL_DISK_CACHE_SUBDIR)
+    entries = []
+    for backend, path in (('cuda', cache_path),
+                          ('cpu',  os.path.join(cache_path, 'cpu'))):
+        if backend == 'cuda' and not BF_MAP_KERNEL_DISK_CACHE:
+            continue
+        for filename in glob.glob(os.path.join(path, '*.inf')):
+            entry = _read_map_cache_entry(filename[:-4], backend)
+            if entry is not None:
+                entries.append(entry)
+    entries.sort(key=lambda e: e['last_loaded'] or 0, reverse=True)
+    return entries
 
 def list_map_cache() -> None:
     output = "Cache enabled: %s" % ('yes' if BF_MAP_KERNEL_DISK_CACHE else 'no')
@@ -164,6 +448,18 @@ def list_map_cache() -> None:
             output += f"\nCache entries: {len(entries)}"
         except OSError:
             pass
+    cpu_entries = glob.glob(os.path.join(os.path.expanduser('~'), '.bifrost',
+                                         _bf.BF_MAP_KERNEL_DISK_CACHE_SUBDIR,
+                                         'cpu', '*.inf'))
+    output += f"\nCPU cache entries: {len(cpu_entries)}"
+    max_entries, max_bytes = get_map_cache_limits()
+    output += f"\nCache limits: {max_entries or 'unlimited'} entries, {max_bytes or 'unlimited'} bytes"
+    for entry in get_map_cache_entries():
+        last_loaded = '-'
+        if entry['last_loaded'] is not None:
+            last_loaded = time.strftime('%Y-%m-%d %H:%M:%S',
+                                        time.localtime(entry['last_loaded']))
+        output += f"\n  {entry['backend']:4s} {entry['kernel_name']:32s} {entry['nbyte']:9d} B  {entry['hits']:6d} hits  last loaded {last_loaded}"
             
     print(output)
 
@@ -29,7 +29,7 @@
 from bifrost.libbifrost import _bf, _check, _get, _string2space
 import ctypes
 
-from typing import Any, List
+from typing import Any, Dict, List
 
 from bifrost import telemetry
 telemetry.track_module()
@@ -60,6 +60,49 @@ def alignment() -> int:
     ret, _ = _bf.bfGetAlignment()
     return ret
 
+def pool_stats(space: str='system') -> Dict[str,Any]:
+    """Returns the statistics of the memory pool used by raw_malloc (and
+    hence bf.ndarray) for the given space
+
+    The result contains:
+
+      nbyte_in_use: No. bytes currently allocated
+      nbyte_peak:   Peak value of nbyte_in_use
+      nbyte_cached: No. bytes of freed blocks held in the pool for reuse
+      max_cached:   The limit on nbyte_cached (see set_pool_limit)
+      nalloc:       Total no. allocations
+      nhit:         Total no. allocations served from the pool
+      hit_rate:     nhit / nalloc
+
+    The same statistics are written to the process's "memory/<space>" ProcLog.
+    """
+    raw = _bf.BFmempoolstats()
+    _check(_bf.bfMemoryPoolGetStats(_string2space(space), raw))
+    return {'nbyte_in_use': raw.nbyte_in_use,
+            'nbyte_peak':   raw.nbyte_peak,
+            'nbyte_cached': raw.nbyte_cached,
+            'max_cached':   get_pool_limit(space),
+            'nalloc':       raw.nalloc,
+            'nhit':         raw.nhit,
+            'hit_rate':     raw.nhit / raw.nalloc if raw.nalloc else 0.}
+def get_pool_limit(space: str='system') -> int:
+    """Returns the max. no. bytes of freed blocks that the memory pool for
+    the given space holds for reuse"""
+    return _get(_bf.bfMemoryPoolGetLimit, _string2space(space))
+def set_pool_limit(space: str, nbyte: int) -> None:
+    """Sets the max. no. bytes of freed blocks that the memory pool for the
+    given space holds for reuse; 0 disables pooling. Allocations larger than
+    this always go directly to the underlying allocator.
+
+    The default may also be set with the BF_MEMORY_POOL_MAX_BYTES
+    environment variable.
+    """
+    _check(_bf.bfMemoryPoolSetLimit(_string2space(space), nbyte))
+def release_pool(space: str='system') -> None:
+    """Frees the blocks held for reuse in the memory pool for the given
+    space (except those in the free lists of other threads)"""
+    _check(_bf.bfMemoryPoolRelease(_string2space(space)))
+
 # **TODO: Deprecate below here!
 
 def _get_space(arr: Any) -> str:
@@ -0,0 +1,198 @@
+
+# Copyright (c) 2016-2023, The Bifrost Authors. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# * Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the distribution.
+# * Neither the name of The Bifrost Authors nor the names of its
+#   contributors may be used to endorse or promote products derived
+#   from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS ``AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED.  IN NO EVENT SHALL THE COPYRIGHT OWNER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY
+# OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""
+Fixed-memory histograms of block performance measurements.
+
+Each pipeline block records the acquire, reserve and process time of every
+gulp, along with the throughput of the gulp, into log-bucketed histograms.
+Percentiles of these are published to the block's "perf_hist" proclog so that
+tail latency and jitter can be monitored while the pipeline runs.
+"""
+
+from bifrost.proclog import ProcLog
+
+import math
+import time
+import threading
+import numpy as np
+
+from typing import Dict, List, Optional
+
+from bifrost import telemetry
+telemetry.track_module()
+
+__all__ = ['LogHistogram', 'PerfHistograms']
+
+#: The percentiles that are reported by PerfHistograms.summary()
+PERCENTILES = {'p50': 50., 'p99': 99., 'p999': 99.9}
+
+class LogHistogram(object):
+    """A histogram of positive values with logarithmically-spaced buckets
+
+    Values below `min_value` and above `max_value` are counted in underflow and
+    overflow buckets, so memory use is fixed regardless of how many values are
+    recorded. Percentiles are accurate to within one bucket width (a factor of
+    10**(1/buckets_per_decade)).
+    """
+    def __init__(self, min_value: float, max_value: float,
+                 buckets_per_decade: int=20):
+        if not 0 < min_value < max_value:
+            raise ValueError("Histogram range must satisfy 0 < min_value < max_value")
+        self.min_value = min_value
+        self.max_value = max_value
+        self.buckets_per_decade = buckets_per_decade
+        self._log_min = math.log10(min_value)
+        nbucket = int(math.ceil((math.log10(max_value) - self._log_min) *
+                                buckets_per_decade))
+        # Note: Bucket 0 is underflow and bucket nbucket+1 is overflow
+        self._counts = np.zeros(nbucket + 2, dtype=np.int64)
+        self.reset()
+    def reset(self) -> None:
+        """Discards all recorded values"""
+        self._counts[...] = 0
+        self.count = 0
+        self.total = 0.
+        self.max = None
+    def _bucket(self, value: float) -> int:
+        if value < self.min_value:
+            return 0
+        index = int((math.log10(value) - self._log_min) *
+                    self.buckets_per_decade) + 1
+        return min(index, len(self._counts) - 1)
+    def _bucket_upper_bound(self, index: int) -> float:
+        return 10**(self._log_min + index / self.buckets_per_decade)
+    def record(self, value: float) -> None:
+        """Adds a single value to the histogram"""
+        self._counts[self._bucket(value)] += 1
+        self.count += 1
+        self.total += value
+        if self.max is None or value > self.max:
+            self.max = value
+    @property
+    def mean(self) -> Optional[float]:
+        """The mean of the recorded values, or None if there are none"""
+        if self.count == 0:
+            return None
+        return self.total / self.count
+    def percentile(self, q: float) -> Optional[float]:
+        """Returns (an upper bound on) the q'th percentile of the recorded
+        values, or None if no values have been recorded.
+        """
+        if self.count == 0:
+            return None
+        rank = max(int(math.ceil(q / 100. * self.count)), 1)
+        index = int(np.searchsorted(np.cumsum(self._counts), rank))
+        if index == 0:
+            return min(self.min_value, self.max)
+        if index == len(self._counts) - 1:
+            return self.max
+        return min(self._bucket_upper_bound(index), self.max)
+
+class PerfHistograms(object):
+    """Histograms of the per-gulp performance measurements of a block
+
+    Args:
+        name:            Name of the proclog that percentiles are written to.
+        window:          If not None, the histograms are reset automatically
+                           every `window` seconds.
+        update_interval: Minimum time in seconds between proclog updates.
+
+    The histograms are:
+        acquire_time, reserve_time, process_time: Seconds per gulp.
+        throughput:                               Bytes per second per gulp.
+        output_fill<i>:                           Fill level of output ring i
+                                                    (see Ring.fill_level)
+                                                    after each reserve.
+    """
+    def __init__(self, name: str, window: Optional[float]=None,
+                 update_interval: float=1.):
+        self.window = window
+        self.update_interval = update_interval
+        self.histograms = {
+            'acquire_time': LogHistogram(1e-7, 1e3),
+            'reserve_time': LogHistogram(1e-7, 1e3),
+            'process_time': LogHistogram(1e-7, 1e3),
+            'throughput':   LogHistogram(1e0, 1e13)}
+        self.proclog = ProcLog(name)
+        self._lock = threading.Lock()
+        self._last_update = 0.
+        self.reset()
+    def __getitem__(self, key: str) -> LogHistogram:
+        return self.histograms[key]
+    def reset(self) -> None:
+        """Starts a new measurement window"""
+        with self._lock:
+            for hist in self.histograms.values():
+                hist.reset()
+            self.window_start = time.time()
+    def record(self, acquire_time: Optional[float], reserve_time: float,
+               process_time: float, nbyte: int,
+               output_fills: Optional[List[float]]=None) -> None:
+        """Records the measurements of one gulp of `nbyte` bytes
+
+        `acquire_time` may be None for blocks that do not acquire input.
+        """
+        with self._lock:
+            for i, fill in enumerate(output_fills or []):
+                key = f"output_fill{i}"
+                if key not in self.histograms:
+                    self.histograms[key] = LogHistogram(1e-4, 1e0)
+                self.histograms[key].record(fill)
+            gulp_time = reserve_time + process_time
+            if acquire_time is not None:
+                self.histograms['acquire_time'].record(acquire_time)
+                gulp_time += acquire_time
+            self.histograms['reserve_time'].record(reserve_time)
+            self.histograms['process_time'].record(process_time)
+            if gulp_time > 0:
+                self.histograms['throughput'].record(nbyte / gulp_time)
+        now = time.time()
+        if now - self._last_update >= self.update_interval:
+            self._last_update = now
+            self.update_proclog()
+            if self.window is not None and now - self.window_start >= self.window:
+                self.reset()
+    def summary(self) -> Dict[str,Dict[str,Optional[float]]]:
+        """Returns the count, percentiles and maximum of each histogram"""
+        with self._lock:
+            summary = {}
+            for key, hist in self.histograms.items():
+                stats = {'count': hist.count}
+                for pname, q in PERCENTILES.items():
+                    stats[pname] = hist.percentile(q)
+                stats['mean'] = hist.mean
+                stats['max'] = hist.max
+                summary[key] = stats
+            return summary
+    def update_proclog(self) -> None:
+        """Writes the current summary to the proclog"""
+        contents = {'window_start': self.window_start}
+        for key, stats in self.summary().items():
+            for stat, value in stats.items():
+                contents[f"{key}_{stat}"] = -1 if value is None else value
+        self.proclog.update(contents)
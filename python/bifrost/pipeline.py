@@ -26,13 +26,17 @@
 # OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
 import sys
+import json
 import threading
+import multiprocessing
 import queue
 import time
 import signal
+import select
 import warnings
-from copy import copy
+from copy import copy, deepcopy
 from collections import defaultdict
+from functools import partial
 try:
     from contextlib import ExitStack
 except ImportError:
@@ -40,16 +44,21 @@ except ImportError:
 import traceback
 
 from bifrost import device, memory, core, affinity
-from bifrost.ring2 import Ring, ring_view
+from bifrost.ring2 import Ring, ring_view, SequenceBase, ReadSequence, SequenceSelector, SpanBase, _clear_event_fd, set_thread_wait_policy
+from bifrost.ring_server import RemoteRing, serve_ring_reader, unlink_shared_memory
 from bifrost.temp_storage import TempStorage
+from bifrost.autotune import GulpAutotuner, frame_duration
 from bifrost.proclog import ProcLog
+from bifrost.perf_histogram import PerfHistograms
+from bifrost.pipeline_analysis import PipelineAnalysis, analyze as analyze_pipeline
+from bifrost.placement import CPUTopology, plan_placement, apply_placement
 from bifrost.ndarray import memset_array # TODO: This feels a bit hacky
-from bifrost.libbifrost import EndOfDataStop
+from bifrost.libbifrost import _bf, EndOfDataStop
 
 from graphviz import Digraph
 
 from collections.abc import Iterable
-from typing import Any, Callable, List, Optional, Union
+from typing import Any, Callable, Dict, List, Optional, Union
 
 from bifrost import telemetry
 telemetry.track_module()
@@ -66,6 +75,54 @@ def izip(*iterables: Iterable) -> List:
         except (EndOfDataStop, StopIteration):
             return
 
+class _Wait(object):
+    """Yielded by blocks run with the cooperative scheduler before any
+    operation that could block, with a predicate that becomes True once the
+    operation can proceed"""
+    __slots__ = ['ready']
+    def __init__(self, ready: Callable[[], bool]):
+        self.ready = ready
+
+def _read_sequences_cooperatively(irings: List[Ring], guarantee: bool) -> List:
+    """Equivalent to izip(*[iring.read(guarantee=guarantee) ...]), but yields
+    a _Wait instead of blocking"""
+    with ExitStack() as iseq_stack:
+        iseqs = []
+        for iring in irings:
+            yield _Wait(iring._sequence_available)
+            try:
+                iseq = ReadSequence(iring, which='earliest', guarantee=guarantee,
+                                    header_transform=iring.header_transform)
+            except EndOfDataStop:
+                return
+            iseqs.append(iseq_stack.enter_context(iseq))
+        while True:
+            yield iseqs
+            for iseq in iseqs:
+                yield _Wait(iseq._next_available)
+                try:
+                    iseq.increment()
+                except EndOfDataStop:
+                    return
+
+def _read_spans_cooperatively(iseqs: List[ReadSequence], nframes: List[int],
+                              strides: List[int], begins: List[int]) -> List:
+    """Equivalent to izip(*[iseq.read(nframe, stride, begin) ...]), but yields
+    a _Wait instead of blocking"""
+    offsets = list(begins)
+    while True:
+        with ExitStack() as ispan_stack:
+            ispans = []
+            for iseq, offset, nframe in zip(iseqs, offsets, nframes):
+                yield _Wait(partial(iseq._frames_available, offset, nframe))
+                try:
+                    ispan = iseq.acquire(offset, nframe)
+                except EndOfDataStop:
+                    return
+                ispans.append(ispan_stack.enter_context(ispan))
+            yield ispans
+        offsets = [offset + stride for offset, stride in zip(offsets, strides)]
+
 thread_local = threading.local()
 thread_local.pipeline_stack = []
 def get_default_pipeline() -> "Pipeline":
@@ -91,7 +148,13 @@ class BlockScope(object):
                  core: Optional[int]=None,
                  gpu: Optional[int]=None,
                  share_temp_storage: bool=False,
-                 fuse: bool=False):
+                 fuse: bool=False,
+                 share_process: Optional[bool]=None,
+                 autotune: Optional[str]=None,
+                 latency_budget: Optional[float]=None,
+                 perf_window: Optional[float]=None,
+                 wait_policy: Optional[str]=None,
+                 spin_time: Optional[float]=None):
         if name is None:
             name = f"BlockScope_{BlockScope.instance_count}"
             BlockScope.instance_count += 1
@@ -103,7 +166,18 @@ class BlockScope(object):
         self._gpu           = gpu
         self._share_temp_storage = share_temp_storage
         self._temp_storage_ = {}
+        self._fused_temp_storage_ = {}
         self._fused = fuse
+        # Note: This only affects pipelines run with executor='process'
+        self._share_process = share_process
+        # Note: See bifrost.autotune.GulpAutotuner for the supported targets
+        self._autotune       = autotune
+        self._latency_budget = latency_budget
+        self._perf_window    = perf_window
+        # Note: See Ring for the supported wait policies. These override the
+        #         policies of the rings that the block waits on.
+        self._wait_policy    = wait_policy
+        self._spin_time      = spin_time
         if fuse:
             #if self._buffer_factor is None:
             #    self._buffer_factor = 1.0
@@ -136,6 +210,13 @@ class BlockScope(object):
         if space not in self._temp_storage_:
             self._temp_storage_[space] = TempStorage(space)
         return self._temp_storage_[space]
+    def _get_fused_temp_storage(self, space: str, index: int) -> TempStorage:
+        """Returns the storage for the index'th intermediate result of a
+        chain of fused blocks within this scope"""
+        key = (space, index)
+        if key not in self._fused_temp_storage_:
+            self._fused_temp_storage_[key] = TempStorage(space)
+        return self._fused_temp_storage_[key]
     def _get_scope_hierarchy(self):
         """Returns list of BlockScopes from root ancestor to self"""
         scope_hierarchy = []
@@ -218,6 +299,22 @@ def join_all(threads: List[threading.Thread], timeout: Union[int,float]):
 class PipelineInitError(Exception):
     pass
 
+class _ProcessInitQueue(object):
+    """Forwards block initialization results from pipeline processes
+
+    Blocks are identified by their index in the pipeline so that they
+    do not need to be pickled.
+    """
+    def __init__(self, context: Any, blocks: List["Block"]):
+        self._queue = context.SimpleQueue()
+        self._blocks = blocks
+    def put(self, item):
+        block, init_succeeded = item
+        self._queue.put((self._blocks.index(block), init_succeeded))
+    def get(self):
+        index, init_succeeded = self._queue.get()
+        return self._blocks[index], init_succeeded
+
 class Pipeline(BlockScope):
     instance_count = 0
     def __init__(self, name: str=None, **kwargs):
@@ -226,6 +323,8 @@ class Pipeline(BlockScope):
             Pipeline.instance_count += 1
         super(Pipeline, self).__init__(name=name, **kwargs)
         self.blocks = []
+        self.threads = []
+        self.processes = []
         self.shutdown_timeout = 5.
         self.all_blocks_finished_initializing_event = threading.Event()
         self.block_init_queue = queue.Queue()
@@ -246,10 +345,47 @@ class Pipeline(BlockScope):
                     f"The following block failed to initialize: {block.name}")
         # Tell blocks that they can begin data processing
         self.all_blocks_finished_initializing_event.set()
-    def run(self) -> None:
+    def run(self, executor: str='thread', preallocate: bool=False,
+            scheduler: Optional[str]=None, prewarm: bool=False) -> None:
+        """Runs the pipeline until all blocks have finished processing
+
+        Args:
+            executor (str): 'thread' to run each block in a thread of this
+                process, or 'process' to run each block (or each block_scope
+                created with share_process=True) in its own process. Rings
+                that are read from a different process than the one that
+                writes them must be in system space.
+            preallocate (bool): Size and pre-fault all rings before any data
+                flow begins (see Pipeline.preallocate).
+            scheduler (str): None to run each block in its own thread, or
+                'cooperative' to run all blocks in the calling thread,
+                stepping whichever block can make progress. The latter gives
+                deterministic profiles and lower overheads for pipelines of
+                many small blocks, but requires that blocks do not override
+                main() and implies preallocate=True. As rings cannot be
+                resized while it runs, autotuned blocks and source blocks
+                whose sourcenames are not a list or tuple are not supported.
+            prewarm (bool): Compile the kernels used by each block before
+                any data flow begins (see Pipeline.prewarm). This also
+                sizes each ring.
+        """
+        if scheduler not in (None, 'cooperative'):
+            raise ValueError(f"Invalid scheduler '{scheduler}'; must be one of: None, 'cooperative'")
+        if prewarm:
+            self.prewarm()
+        if executor == 'process':
+            if scheduler is not None:
+                raise ValueError("The cooperative scheduler requires executor='thread'")
+            return self._run_processes(preallocate)
+        elif executor != 'thread':
+            raise ValueError(f"Invalid executor '{executor}'; must be one of: 'thread', 'process'")
+        if scheduler == 'cooperative':
+            return self._run_cooperative()
+        if preallocate:
+            self.preallocate()
         # Launch blocks as threads
         self.threads = [threading.Thread(target=block.run, name=block.name)
-                        for block in self.blocks]
+                        for block in self._fuse_blocks(self.blocks)]
         for thread in self.threads:
             thread.daemon = True
             thread.start()
@@ -259,15 +395,366 @@ class Pipeline(BlockScope):
             # Note: Doing it this way allows signals to be caught here
             while thread.is_alive():
                 thread.join(timeout=2**30)
+    def _run_cooperative(self) -> None:
+        runnables = self._fuse_blocks(self.blocks)
+        for block in runnables:
+            if type(block).main not in (SourceBlock.main, MultiTransformBlock.main):
+                raise ValueError(f"Block {block.name} overrides main() and cannot be run by the cooperative scheduler")
+        # Note: Ring reallocations wait for all open spans to be released,
+        #         which would deadlock the scheduler if another block held
+        #         one, so rings are sized before any block runs and anything
+        #         that could resize them later is rejected.
+        for block in self.blocks:
+            if isinstance(block, MultiTransformBlock) and block.autotune:
+                raise ValueError(f"Block {block.name} is autotuned, which is not supported by the cooperative scheduler")
+        sizes = self.preallocate()
+        rings = set()
+        for block in runnables:
+            rings.update(_get_base_ring(oring) for oring in block.orings)
+        unsized = sorted(ring.name for ring in rings if ring.name not in sizes)
+        if unsized:
+            raise ValueError("The cooperative scheduler requires every ring to be sized before the pipeline is run, "
+                             "but the sequences written to the following rings could not be determined "
+                             "(e.g., because their source's sourcenames are not a list or tuple): " + ', '.join(unsized))
+        event_fds = {ring: ring._open_event_fd() for ring in rings}
+        tasks = {block: block._run(cooperative=True) for block in runnables}
+        waits = {block: None for block in runnables}
+        uninitialized_blocks = set(self.blocks)
+        try:
+            while tasks:
+                if all(block.shutdown_event.is_set() for block in self.blocks):
+                    break
+                progress = False
+                for block in list(tasks):
+                    wait = waits[block]
+                    if wait is not None and not wait.ready():
+                        continue
+                    progress = True
+                    try:
+                        waits[block] = next(tasks[block])
+                    except StopIteration:
+                        del tasks[block]
+                    except Exception:
+                        if not self.all_blocks_finished_initializing_event.is_set():
+                            # Raises PipelineInitError for the failed block
+                            self._update_block_initializations(uninitialized_blocks)
+                        raise
+                if not self.all_blocks_finished_initializing_event.is_set():
+                    self._update_block_initializations(uninitialized_blocks)
+                    progress |= self.all_blocks_finished_initializing_event.is_set()
+                if not progress:
+                    # Wait for any ring to change state
+                    fds = list(event_fds.values())
+                    ready_fds, _, _ = select.select(fds, [], [], 0.1)
+                    for fd in ready_fds:
+                        _clear_event_fd(fd)
+        finally:
+            # Note: This ends any open sequences and spans
+            for task in tasks.values():
+                task.close()
+            for ring, fd in event_fds.items():
+                ring._close_event_fd(fd)
+    def _update_block_initializations(self, uninitialized_blocks: set) -> None:
+        """Non-blocking version of synchronize_block_initializations"""
+        while not self.block_init_queue.empty():
+            block, init_succeeded = self.block_init_queue.get()
+            uninitialized_blocks.discard(block)
+            if not init_succeeded:
+                self.shutdown()
+                raise PipelineInitError(
+                    f"The following block failed to initialize: {block.name}")
+        if not uninitialized_blocks:
+            self.all_blocks_finished_initializing_event.set()
+    def preallocate(self, prefault: bool=True) -> Dict[str,int]:
+        """Allocates every ring at its final size before the pipeline is run
+
+        This performs a dry run in which the header of each sequence from each
+        source block is pushed through the on_sequence methods of the
+        downstream blocks without any data. Each ring is resized as it would
+        be by the writer and readers of each sequence, so that reallocations
+        (and the latency spikes they cause) do not occur when the first gulps
+        are processed or when sequences change.
+
+        Note that this calls create_reader and on_sequence for every source
+        block sequence, and on_sequence and on_sequence_end for every
+        transform block sequence. Sink blocks (those without output rings)
+        only have their input rings sized, as their on_sequence methods
+        typically have external side effects. Source blocks whose sourcenames are not a
+        list or tuple (e.g., live streams) are skipped, along with the blocks
+        downstream of them. Blocks that are autotuned may still resize their
+        input rings at run time.
+
+        Args:
+            prefault: Also touch every page of each (host-accessible) ring so
+                        that page faults are not incurred by the first gulps.
+
+        Returns:
+            The no. bytes allocated for each ring, keyed by ring name.
+        """
+        oheaders = self._dry_run_blocks(prewarm=False)
+        # Note: Any remaining blocks read rings written outside the pipeline
+        sizes = {}
+        for oring, oheader_list in oheaders.items():
+            if not oheader_list:
+                continue
+            if prefault:
+                oring.prefault()
+            sizes[oring.name] = oring.nbyte
+        return sizes
+    def prewarm(self) -> List[str]:
+        """Compiles every kernel that the pipeline will use before it is run
+
+        This performs the same dry run as Pipeline.preallocate, but also
+        passes the first gulp of each sequence through the on_data method of
+        each transform block, using zero-filled temporary buffers in place of
+        ring data. Kernels that are compiled on first use (e.g., those of
+        bf.map) are thus compiled and stored in the on-disk kernel cache
+        ahead of time, so that the first gulps processed by the pipeline do
+        not stall while they are compiled.
+
+        Note that source and sink blocks are not prewarmed (their on_data
+        methods read and write external data), nor are gulps that are
+        shorter than gulp_nframe (e.g., at the end of a sequence).
+
+        Returns:
+            The names of the blocks that were prewarmed.
+        """
+        prewarmed = []
+        self._dry_run_blocks(prewarm=True, prewarmed=prewarmed)
+        return prewarmed
+    def _dry_run_blocks(self, prewarm: bool, prewarmed: Optional[List[str]]=None):
+        """Dry-runs each block in dependency order, returning the headers of
+        the sequences written to each (base) ring"""
+        # Maps each base ring to the headers of the sequences written to it
+        oheaders = {}
+        pending = self._fuse_blocks(self.blocks)
+        progress = True
+        while progress:
+            progress = False
+            for block in list(pending):
+                irings = [_get_base_ring(iring) for iring in block.irings]
+                if not all(iring in oheaders for iring in irings):
+                    continue
+                pending.remove(block)
+                progress = True
+                iheaders = [oheaders[iring] for iring in irings]
+                if any(iheader_list is None for iheader_list in iheaders):
+                    oheader_lists = None
+                else:
+                    try:
+                        if prewarm and block.gpu is not None:
+                            device.set_device(block.gpu)
+                        oheader_lists = block._dry_run(iheaders, prewarm)
+                    except Exception as e:
+                        raise PipelineInitError(
+                            f"The following block failed to initialize: {block.name}") from e
+                    if prewarm and isinstance(block, MultiTransformBlock) and block.orings:
+                        prewarmed.append(block.name)
+                for i, oring in enumerate(block.orings):
+                    oheaders[_get_base_ring(oring)] = (oheader_lists[i]
+                                                       if oheader_lists is not None
+                                                       else None)
+        return oheaders
+    def _fuse_blocks(self, blocks: List["Block"]) -> List["Block"]:
+        """Replaces each chain of blocks in a fused scope with a single block
+        that runs the whole chain in one thread"""
+        for block in self.blocks:
+            block.cache_scope_hierarchy()
+        readers = defaultdict(list)
+        for block in self.blocks:
+            for iring in block.irings:
+                readers[_get_base_ring(iring)].append(block)
+        # Find the links between blocks that can be fused
+        successors = {}
+        for block in blocks:
+            if not _FusedChainBlock.can_lead(block):
+                continue
+            oring_readers = readers[_get_base_ring(block.orings[0])]
+            if len(oring_readers) != 1:
+                continue
+            reader = oring_readers[0]
+            if (reader in blocks and
+                reader.is_fused_with(block) and
+                _FusedChainBlock.can_follow(reader)):
+                successors[block] = reader
+        # Assemble the links into chains, starting from their first blocks
+        fused_blocks = []
+        followers = set(successors.values())
+        for block in blocks:
+            if block in followers:
+                continue
+            chain = [block]
+            while chain[-1] in successors:
+                chain.append(successors[chain[-1]])
+            if len(chain) > 1:
+                fused_blocks.append(_FusedChainBlock(chain))
+            else:
+                fused_blocks.append(block)
+        return fused_blocks
+    def _get_process_groups(self) -> List[List["Block"]]:
+        """Returns the lists of blocks that will share each process"""
+        groups = {}
+        for block in self.blocks:
+            key = block
+            for scope in block._get_scope_hierarchy():
+                # Note: Fused scopes must run in a single process
+                if scope._share_process or scope._fused:
+                    key = scope
+                    break
+            groups.setdefault(key, []).append(block)
+        return list(groups.values())
+    def _run_processes(self, preallocate: bool=False) -> None:
+        # Note: Blocks are inherited by the child processes rather than
+        #         pickled, so this relies on the 'fork' start method.
+        context = multiprocessing.get_context('fork')
+        groups = self._get_process_groups()
+        # Note: Readers query their source blocks' scopes, which would
+        #         otherwise only be cached in the writing process.
+        for block in self.blocks:
+            block.cache_scope_hierarchy()
+        group_idx = {}
+        for i, group in enumerate(groups):
+            for block in group:
+                group_idx[block] = i
+        # Set up a connection for each ring that is read from another process
+        served_rings = [[] for _ in groups]
+        remote_irings = {}
+        for block in self.blocks:
+            for i, iring in enumerate(block.irings):
+                if iring.owner not in group_idx:
+                    raise ValueError(f"Ring {iring.name} (input {i} of block {block.name}) must be written by a block in the pipeline")
+                owner_idx = group_idx[iring.owner]
+                if owner_idx == group_idx[block]:
+                    continue
+                if iring.space != 'system':
+                    raise ValueError(f"Ring {iring.name} (input {i} of block {block.name}) is shared between processes and must be in system space")
+                iring.shared = True
+                server_conn, client_conn = context.Pipe()
+                served_rings[owner_idx].append((iring, server_conn))
+                remote_irings[block, i] = client_conn
+        # Note: This must follow the setup of shared rings, whose memory
+        #         cannot be shared once allocated.
+        if preallocate:
+            self.preallocate()
+        # Replace the synchronization primitives with process-safe versions
+        self.all_blocks_finished_initializing_event = context.Event()
+        self.block_init_queue = _ProcessInitQueue(context, self.blocks)
+        for block in self.blocks:
+            block.shutdown_event = context.Event()
+        self.processes = [context.Process(target=self._run_process_group,
+                                          args=(group, served_rings[i],
+                                                remote_irings),
+                                          name=group[0].name)
+                          for i, group in enumerate(groups)]
+        for process in self.processes:
+            process.daemon = True
+            process.start()
+        try:
+            self.synchronize_block_initializations()
+            # Wait for blocks to finish processing
+            for process in self.processes:
+                # Note: Doing it this way allows signals to be caught here
+                while process.is_alive():
+                    process.join(timeout=2**20)
+        finally:
+            # Note: Child processes exit without destroying their rings, so
+            #         their shared memory is cleaned up here instead.
+            for process in self.processes:
+                if not process.is_alive():
+                    unlink_shared_memory(process.pid)
+    def _run_process_group(self, blocks, served_rings, remote_irings) -> None:
+        # Note: Signals are handled by the parent process, which shuts down
+        #         the blocks in this process via their shutdown_events.
+        for sig in [signal.SIGHUP,
+                    signal.SIGINT,
+                    signal.SIGQUIT,
+                    signal.SIGTSTP]:
+            signal.signal(sig, signal.SIG_IGN)
+        servers = [threading.Thread(target=serve_ring_reader, args=(iring, conn),
+                                    name=f"{iring.name}_server")
+                   for iring, conn in served_rings]
+        for server in servers:
+            server.daemon = True
+            server.start()
+        remote_rings = []
+        for block in blocks:
+            for i, iring in enumerate(block.irings):
+                if (block, i) in remote_irings:
+                    remote_ring = RemoteRing(iring, remote_irings[block, i])
+                    block.irings[i] = remote_ring
+                    if getattr(block, 'iring', None) is iring:
+                        block.iring = remote_ring
+                    remote_rings.append(remote_ring)
+        threads = [threading.Thread(target=block.run, name=block.name)
+                   for block in self._fuse_blocks(blocks)]
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+        for thread in threads:
+            thread.join()
+        for remote_ring in remote_rings:
+            remote_ring.detach()
+        # Rings written by this process must remain available until all of
+        #   their remote readers have finished.
+        for server in servers:
+            server.join()
+    def analyze(self) -> PipelineAnalysis:
+        """Reports the bottleneck, per-block slack, critical path and rings
+        that run near capacity (see bifrost.pipeline_analysis).
+
+        This uses the performance histograms that each block keeps, so it can
+        be called while the pipeline is running or after it has finished.
+        Note that with executor='process' the blocks run (and measure) in
+        child processes, which must instead be analyzed by PID using
+        tools/analyze_pipeline.py.
+        """
+        blocks = []
+        for block in self.blocks:
+            perf_histograms = getattr(block, 'perf_histograms', None)
+            blocks.append({
+                'name':    block.name,
+                'inputs':  [iring.name for iring in block.irings],
+                'outputs': [oring.name for oring in block.orings],
+                'perf':    (perf_histograms.summary()
+                            if perf_histograms is not None else None)})
+        return analyze_pipeline(blocks)
+    def place(self, reserved_cores: List[int]=(), capture_cores: List[int]=(),
+              topology: Optional[CPUTopology]=None) -> Dict[str,int]:
+        """Pins each block that does not already have a core to one chosen
+        from the machine topology (see bifrost.placement), and binds the
+        memory of each block's output rings to the NUMA node of its core.
+
+        This must be called before the pipeline is run.
+
+        Args:
+            reserved_cores: Cores that must not be used.
+            capture_cores:  Cores used by packet capture threads; these and
+                              their hyperthread siblings are not used.
+            topology:       The CPU topology to use (default: read from sysfs).
+
+        Returns:
+            A dict mapping block names to the cores they were assigned.
+        """
+        if topology is None:
+            topology = CPUTopology.from_sysfs()
+        placement = plan_placement(self.blocks, topology,
+                                   reserved_cores, capture_cores)
+        apply_placement(placement)
+        return {block.name: core for block, core in placement.items()}
     def shutdown(self) -> None:
         for block in self.blocks:
             block.shutdown()
         # Ensure all blocks can make progress
         self.all_blocks_finished_initializing_event.set()
-        join_all(self.threads, timeout=self.shutdown_timeout)
+        join_all(self.threads + self.processes, timeout=self.shutdown_timeout)
         for thread in self.threads:
             if thread.is_alive():
                 warnings.warn(f"Thread {thread.name} did not shut down on time and will be killed", RuntimeWarning)
+        for process in self.processes:
+            if process.is_alive():
+                warnings.warn(f"Process {process.name} did not shut down on time and will be killed", RuntimeWarning)
+                process.terminate()
+                process.join()
     def shutdown_on_signals(self, signals: Optional[List[signal.Signals]]=None) -> None:
         if signals is None:
             signals = [signal.SIGHUP,
@@ -302,6 +789,12 @@ def get_ring(block_or_ring: Union["Block", Ring]) -> Ring:
     except AttributeError:
         return block_or_ring
 
+def _get_base_ring(ring: Ring) -> Ring:
+    # Note: Views of a ring share its underlying buffer
+    while ring.base is not None:
+        ring = ring.base
+    return ring
+
 def block_view(block: "Block", header_transform: Callable) -> "Block":
     """View a block with modified output headers
 
@@ -356,24 +849,51 @@ class Block(BlockScope):
     def create_ring(self, *args, **kwargs) -> Ring:
         return Ring(*args, owner=self, **kwargs)
     def run(self) -> None:
-        #affinity.set_openmp_cores(cpus) # TODO
+        for _ in self._run(cooperative=False):
+            pass
+    def _run(self, cooperative: bool):
+        """Runs the block, yielding a _Wait before any operation that would
+        block if `cooperative` is True (see Pipeline.run)"""
         core = self.core
-        if core is not None:
-            affinity.set_core(core if isinstance(core, int) else core[0])
-        self.bind_proclog.update({'ncore': 1,
-                                  'core0': affinity.get_core()})
+        if core is None or cooperative:
+            # Note: Blocks run by the cooperative scheduler share its thread
+            cores = []
+        else:
+            cores = [core] if isinstance(core, int) else list(core)
+        if cores:
+            affinity.set_core(cores[0])
+            if len(cores) > 1:
+                # Note: Any OpenMP threads started by the block use all of its
+                #         cores.
+                try:
+                    affinity.set_openmp_cores(cores)
+                except RuntimeError:
+                    # OpenMP support is not enabled
+                    pass
+        bind = {'ncore': max(len(cores), 1),
+                'core0': affinity.get_core()}
+        for i, c in enumerate(cores[1:], 1):
+            bind[f"core{i}"] = c
+        self.bind_proclog.update(bind)
         if self.gpu is not None:
             device.set_device(self.gpu)
+        if self.wait_policy is not None and not cooperative:
+            set_thread_wait_policy(self.wait_policy, self.spin_time or 0.)
         self.cache_scope_hierarchy()
         with ExitStack() as oring_stack:
             active_orings = self.begin_writing(oring_stack, self.orings)
             try:
-                self.main(active_orings)
+                if cooperative:
+                    yield from self._main_steps(active_orings, cooperative=True)
+                else:
+                    self.main(active_orings)
             except Exception:
-                self.pipeline.block_init_queue.put((self, False))
+                self._set_init_status(False)
                 sys.stderr.write("From block instantiated here:\n")
                 sys.stderr.write(self.init_trace)
                 raise
+    def _set_init_status(self, init_succeeded: bool) -> None:
+        self.pipeline.block_init_queue.put((self, init_succeeded))
     def num_outputs(self) -> int:
         # TODO: This is a little hacky
         return len(self.orings)
@@ -381,17 +901,9 @@ class Block(BlockScope):
         return [exit_stack.enter_context(oring.begin_writing())
                 for oring in orings]
     def begin_sequences(self, exit_stack, orings, oheaders,
-                        igulp_nframes, istride_nframes):
-        # Note: The gulp_nframe that is set in the output header does not
-        #         include the overlap (i.e., it's based on stride not gulp).
-        ostride_nframes = self._define_output_nframes(istride_nframes)
-        for ohdr, ostride_nframe in zip(oheaders, ostride_nframes):
-            ohdr['gulp_nframe'] = ostride_nframe
-        ogulp_nframes = self._define_output_nframes(igulp_nframes)
-        # Note: This always specifies buffer_factor=1 on the assumption that
-        #         additional buffering is defined by the reader(s) rather
-        #         than the writer.
-        obuf_nframes = [1 * ogulp_nframe for ogulp_nframe in ogulp_nframes]
+                        igulp_nframes, istride_nframes, synchronize=True):
+        ogulp_nframes, obuf_nframes, ostride_nframes = \
+            self.define_output_sequences(oheaders, igulp_nframes, istride_nframes)
         oseqs = [exit_stack.enter_context(oring.begin_sequence(ohdr,
                                                                ogulp_nframe,
                                                                obuf_nframe))
@@ -399,13 +911,58 @@ class Block(BlockScope):
                  in zip(orings, oheaders, ogulp_nframes, obuf_nframes)]
 
         # Synchronize all blocks here to ensure no sequence race conditions
-        self.pipeline.block_init_queue.put((self, True))
-        self.pipeline.all_blocks_finished_initializing_event.wait()
+        # Note: The cooperative scheduler waits for this event itself
+        self._set_init_status(True)
+        if synchronize:
+            self.pipeline.all_blocks_finished_initializing_event.wait()
 
         ogulp_overlaps = [ogulp_nframe - ostride_nframe
                           for ogulp_nframe, ostride_nframe
                           in zip(ogulp_nframes, ostride_nframes)]
         return oseqs, ogulp_overlaps
+    def define_output_sequences(self, oheaders, igulp_nframes, istride_nframes):
+        """Sets the gulp_nframe of each output header and returns the gulp,
+        buffer and stride nframe for each output."""
+        # Note: The gulp_nframe that is set in the output header does not
+        #         include the overlap (i.e., it's based on stride not gulp).
+        ostride_nframes = self._define_output_nframes(istride_nframes)
+        for ohdr, ostride_nframe in zip(oheaders, ostride_nframes):
+            ohdr['gulp_nframe'] = ostride_nframe
+        ogulp_nframes = self._define_output_nframes(igulp_nframes)
+        # Note: This always specifies buffer_factor=1 on the assumption that
+        #         additional buffering is defined by the reader(s) rather
+        #         than the writer.
+        obuf_nframes = [1 * ogulp_nframe for ogulp_nframe in ogulp_nframes]
+        return ogulp_nframes, obuf_nframes, ostride_nframes
+    def _presize_outputs(self, oheaders, igulp_nframes, istride_nframes,
+                         oheader_lists):
+        """Resizes the output rings as begin_sequences would, and appends the
+        headers that readers would see to oheader_lists"""
+        ogulp_nframes, obuf_nframes, _ = self.define_output_sequences(
+            oheaders, igulp_nframes, istride_nframes)
+        for oring, ohdr, ogulp_nframe, obuf_nframe, oheader_list in zip(
+                self.orings, oheaders, ogulp_nframes, obuf_nframes,
+                oheader_lists):
+            oseq = _HeaderSequence(oring, ohdr)
+            tensor = oseq.tensor
+            oring.resize(ogulp_nframe * tensor['frame_nbyte'],
+                         obuf_nframe * tensor['frame_nbyte'],
+                         tensor['nringlet'])
+            # Note: Headers are passed to readers in serialized form
+            oheader_list.append(json.loads(json.dumps(oseq.header)))
+    def _dry_run(self, iheaders, prewarm=False):
+        """Pushes the headers of each input's sequences through the block
+        without any data, resizing its rings as it would when processing
+        them, and returns the headers of each output's sequences (or None if
+        they cannot be determined). If prewarm, each sequence's first gulp
+        is also processed using zeroed temporary buffers (see
+        Pipeline.prewarm)."""
+        raise NotImplementedError
+    def _output_space_available(self, oseqs, igulp_nframes):
+        ogulp_nframes = self._define_output_nframes(igulp_nframes)
+        return all(oseq.ring._space_available(ogulp_nframe *
+                                              oseq.tensor['frame_nbyte'])
+                   for oseq, ogulp_nframe in zip(oseqs, ogulp_nframes))
     def reserve_spans(self, exit_stack, oseqs, igulp_nframes=[]):
         ogulp_nframes = self._define_output_nframes(igulp_nframes)
         return [exit_stack.enter_context(oseq.reserve(ogulp_nframe))
@@ -443,6 +1000,8 @@ class SourceBlock(Block):
         self.orings = [self.create_ring(space=space)]
         self._seq_count = 0
         self.perf_proclog = ProcLog(self.name + "/perf")
+        self.perf_histograms = PerfHistograms(self.name + "/perf_hist",
+                                              window=self.perf_window)
         self.out_proclog = ProcLog(self.name + "/out")
 
         rnames = {'nring': len(self.orings)}
@@ -451,6 +1010,9 @@ class SourceBlock(Block):
         self.out_proclog.update(rnames)
 
     def main(self, orings):
+        for _ in self._main_steps(orings, cooperative=False):
+            pass
+    def _main_steps(self, orings, cooperative):
         for sourcename in self.sourcenames:
             if self.shutdown_event.is_set():
                 break
@@ -466,14 +1028,21 @@ class SourceBlock(Block):
                     oseqs, ogulp_overlaps = self.begin_sequences(
                         oseq_stack, orings, oheaders,
                         igulp_nframes=[],
-                        istride_nframes=[])
+                        istride_nframes=[],
+                        synchronize=not cooperative)
+                    if cooperative:
+                        yield _Wait(self.pipeline.all_blocks_finished_initializing_event.is_set)
                     while not self.shutdown_event.is_set():
+                        if cooperative:
+                            yield _Wait(partial(self._output_space_available,
+                                                oseqs, []))
                         prev_time = time.time()
                         with ExitStack() as ospan_stack:
                             ospans = self.reserve_spans(ospan_stack, oseqs)
                             cur_time = time.time()
                             reserve_time = cur_time - prev_time
                             prev_time = cur_time
+                            ofills = [oring.fill_level for oring in self.orings]
                             ostrides_actual = self.on_data(ireader, ospans)
                             device.stream_synchronize()
                             self.commit_spans(ospans, ostrides_actual, ogulp_overlaps)
@@ -487,6 +1056,29 @@ class SourceBlock(Block):
                             'acquire_time': -1,
                             'reserve_time': reserve_time,
                             'process_time': process_time})
+                        self.perf_histograms.record(
+                            None, reserve_time, process_time,
+                            _committed_nbyte(ospans, ostrides_actual),
+                            ofills)
+                self.perf_histograms.update_proclog()
+    def _dry_run(self, iheaders, prewarm=False):
+        # Note: Source blocks are not prewarmed, as their on_data reads data
+        if not isinstance(self.sourcenames, (list, tuple)):
+            # Note: Sources given as iterators (e.g., live streams) cannot be
+            #         read more than once.
+            return None
+        oheader_lists = [[] for _ in self.orings]
+        for seq_count, sourcename in enumerate(self.sourcenames):
+            with self.create_reader(sourcename) as ireader:
+                oheaders = self.on_sequence(ireader, sourcename)
+            seq_count += self._seq_count
+            for ohdr in oheaders:
+                if 'time_tag' not in ohdr:
+                    ohdr['time_tag'] = seq_count
+                if 'name' not in ohdr:
+                    ohdr['name'] = f"unnamed-sequence-{seq_count}"
+            self._presize_outputs(oheaders, [], [], oheader_lists)
+        return oheader_lists
     def define_output_nframes(self, _):
         """Return output nframe for each output, given input_nframes.
         """
@@ -507,6 +1099,12 @@ class SourceBlock(Block):
         raise NotImplementedError
 
 
+def _committed_nbyte(ospans, ostrides_actual):
+    if ostrides_actual is None:
+        ostrides_actual = [None] * len(ospans)
+    return sum([(ospan.nframe if ostride is None else ostride) * ospan.frame_nbyte
+                for ospan, ostride in zip(ospans, ostrides_actual)])
+
 def _span_slice(soft_slice):
     # Infers optional values in soft_slice (i.e., those that are None)
     start = soft_slice.start or 0
@@ -524,9 +1122,15 @@ class MultiTransformBlock(Block):
                        for iring in self.irings]
         self._seq_count = 0
         self.perf_proclog = ProcLog(self.name + "/perf")
+        self.perf_histograms = PerfHistograms(self.name + "/perf_hist",
+                                              window=self.perf_window)
         self.sequence_proclogs = [ProcLog(self.name + f"/sequence{i}")
                                   for i in range(len(self.irings))]
         self.out_proclog = ProcLog(self.name + "/out")
+        self.autotuner = None
+        if self.autotune:
+            self.autotuner = GulpAutotuner(self.autotune, self.latency_budget)
+            self.autotune_proclog = ProcLog(self.name + "/autotune")
 
         rnames = {'nring': len(self.orings)}
         for i, r in enumerate(self.orings):
@@ -534,8 +1138,19 @@ class MultiTransformBlock(Block):
         self.out_proclog.update(rnames)
 
     def main(self, orings):
-        for iseqs in izip(*[iring.read(guarantee=self.guarantee)
-                            for iring in self.irings]):
+        for _ in self._main_steps(orings, cooperative=False):
+            pass
+    def _main_steps(self, orings, cooperative):
+        if cooperative:
+            iseqs_iter = _read_sequences_cooperatively(self.irings,
+                                                       self.guarantee)
+        else:
+            iseqs_iter = izip(*[iring.read(guarantee=self.guarantee)
+                                for iring in self.irings])
+        for iseqs in iseqs_iter:
+            if isinstance(iseqs, _Wait):
+                yield iseqs
+                continue
             if self.shutdown_event.is_set():
                 break
             for i, iseq in enumerate(iseqs):
@@ -546,26 +1161,7 @@ class MultiTransformBlock(Block):
                     ohdr['time_tag'] = self._seq_count
             self._seq_count += 1
 
-            igulp_nframes = [self.gulp_nframe or iseq.header['gulp_nframe']
-                             for iseq in iseqs]
-            igulp_overlaps = self._define_input_overlap_nframe(iseqs)
-            istride_nframes = igulp_nframes[:]
-            igulp_nframes = [igulp_nframe + nframe_overlap
-                             for igulp_nframe, nframe_overlap
-                             in zip(igulp_nframes, igulp_overlaps)]
-
-            for iseq, igulp_nframe in zip(iseqs, igulp_nframes):
-                if self.buffer_factor is None:
-                    src_block = iseq.ring.owner
-                    if src_block is not None and self.is_fused_with(src_block):
-                        buffer_factor = 1
-                    else:
-                        buffer_factor = None
-                else:
-                    buffer_factor = self.buffer_factor
-                iseq.resize(gulp_nframe=igulp_nframe,
-                            buf_nframe=self.buffer_nframe,
-                            buffer_factor=buffer_factor)
+            igulp_nframes, istride_nframes = self.resize_input_sequences(iseqs)
 
             # TODO: Ever need to specify starting offset?
             iframe0s = [0 for _ in igulp_nframes]
@@ -575,15 +1171,26 @@ class MultiTransformBlock(Block):
             with ExitStack() as oseq_stack:
                 oseqs, ogulp_overlaps = self.begin_sequences(
                     oseq_stack, orings, oheaders,
-                    igulp_nframes, istride_nframes)
+                    igulp_nframes, istride_nframes,
+                    synchronize=not cooperative)
+                if cooperative:
+                    yield _Wait(self.pipeline.all_blocks_finished_initializing_event.is_set)
                 if self.shutdown_event.is_set():
                     break
                 prev_time = time.time()
-                for ispans in izip(*[iseq.read(igulp_nframe,
-                                               istride_nframe,
-                                               iframe0)
-                                    for (iseq, igulp_nframe, istride_nframe, iframe0)
-                                    in zip(iseqs, igulp_nframes, istride_nframes, iframe0s)]):
+                if cooperative:
+                    ispans_iter = _read_spans_cooperatively(
+                        iseqs, igulp_nframes, istride_nframes, iframe0s)
+                else:
+                    ispans_iter = izip(*[iseq.read(igulp_nframe,
+                                                   istride_nframe,
+                                                   iframe0)
+                                        for (iseq, igulp_nframe, istride_nframe, iframe0)
+                                        in zip(iseqs, igulp_nframes, istride_nframes, iframe0s)])
+                for ispans in ispans_iter:
+                    if isinstance(ispans, _Wait):
+                        yield ispans
+                        continue
                     if self.shutdown_event.is_set():
                         return
 
@@ -597,6 +1204,9 @@ class MultiTransformBlock(Block):
                                             zip(iframe0s, istride_nframes, ispans)]
                             iskip_nframes = [ispan.nframe_skipped
                                              for ispan in ispans]
+                            if cooperative:
+                                yield _Wait(partial(self._output_space_available,
+                                                    oseqs, iskip_nframes))
                             # ***TODO: Need to loop over multiple ospans here,
                             #            because iskip_nframes can be
                             #            arbitrarily large!
@@ -609,6 +1219,11 @@ class MultiTransformBlock(Block):
                         # No data to see here, move right along
                         continue
 
+                    if cooperative:
+                        yield _Wait(partial(self._output_space_available,
+                                            oseqs,
+                                            [ispan.nframe for ispan in ispans]))
+
                     cur_time = time.time()
                     acquire_time = cur_time - prev_time
                     prev_time = cur_time
@@ -619,6 +1234,7 @@ class MultiTransformBlock(Block):
                         cur_time = time.time()
                         reserve_time = cur_time - prev_time
                         prev_time = cur_time
+                        ofills = [oring.fill_level for oring in self.orings]
 
                         if not force_skip:
                             # *TODO: See if can fuse together multiple on_data calls here before
@@ -650,9 +1266,110 @@ class MultiTransformBlock(Block):
                         'acquire_time': acquire_time,
                         'reserve_time': reserve_time,
                         'process_time': process_time})
+                    self.perf_histograms.record(
+                        acquire_time, reserve_time, process_time,
+                        sum([ispan.nframe * ispan.frame_nbyte
+                             for ispan in ispans]),
+                        ofills)
+                    if self.autotuner is not None:
+                        self.autotuner.record(igulp_nframes[0],
+                                              reserve_time, process_time)
             # **TODO: This will not be called if an exception is raised
             #           Need to call it from a context manager somehow
             self._on_sequence_end(iseqs)
+            self.perf_histograms.update_proclog()
+    def _dry_run(self, iheaders, prewarm=False):
+        oheader_lists = [[] for _ in self.orings]
+        for seq_count, ihdrs in enumerate(zip(*iheaders)):
+            iseqs = []
+            for iring, ihdr in zip(self.irings, ihdrs):
+                ihdr = deepcopy(ihdr)
+                if iring.header_transform is not None:
+                    ihdr = iring.header_transform(ihdr)
+                iseqs.append(_HeaderSequence(iring, ihdr))
+            if not self.orings:
+                # Note: Sink blocks only need their input rings sized; their
+                #         on_sequence typically has external side effects
+                #         (e.g., creating output files).
+                self.resize_input_sequences(iseqs, autotune=False)
+                continue
+            oheaders = self._on_sequence(iseqs)
+            for ohdr in oheaders:
+                if 'time_tag' not in ohdr:
+                    ohdr['time_tag'] = self._seq_count + seq_count
+            # Note: Autotuned gulp sizes are chosen at run time
+            igulp_nframes, istride_nframes = self.resize_input_sequences(
+                iseqs, autotune=False)
+            self._presize_outputs(oheaders, igulp_nframes, istride_nframes,
+                                  oheader_lists)
+            if prewarm:
+                self._prewarm_gulp(iseqs, igulp_nframes, oheaders)
+            self._on_sequence_end(iseqs)
+        return oheader_lists
+    @staticmethod
+    def _zeroed_span(seq, nframe, writeable, storages):
+        """Returns a span of nframe zeros in temporary storage, which is
+        appended to storages to keep it alive"""
+        nbyte = nframe * seq.tensor['frame_nbyte']
+        storage = TempStorage(seq.ring.space)
+        # Note: Empty spans still need a valid data pointer
+        storage._allocate(max(nbyte * seq.nringlet, 1))
+        storages.append(storage)
+        span = _FusedSpan(seq, storage.ptr, 0, nbyte, nbyte, writeable=True)
+        if nbyte:
+            memset_array(span.data, 0)
+        if not writeable:
+            span = span.as_input(seq, nframe)
+        return span
+    def _prewarm_gulp(self, iseqs, igulp_nframes, oheaders):
+        """Processes one gulp of zeros from temporary buffers, so that any
+        kernels that on_data uses (e.g., bf.map) are compiled and cached"""
+        storages = []
+        ispans = [self._zeroed_span(iseq, igulp_nframe, False, storages)
+                  for iseq, igulp_nframe in zip(iseqs, igulp_nframes)]
+        oseqs = [_HeaderSequence(oring, deepcopy(ohdr))
+                 for oring, ohdr in zip(self.orings, oheaders)]
+        ogulp_nframes = self._define_output_nframes(igulp_nframes)
+        ospans = [self._zeroed_span(oseq, ogulp_nframe, True, storages)
+                  for oseq, ogulp_nframe in zip(oseqs, ogulp_nframes)]
+        self._on_data(ispans, ospans)
+        device.stream_synchronize()
+    def resize_input_sequences(self, iseqs, autotune=True):
+        """Resizes the input rings to suit the gulps that will be read from
+        iseqs, and returns the gulp (including any overlap) and stride
+        nframe for each input."""
+        igulp_nframes = [self.gulp_nframe or iseq.header['gulp_nframe']
+                         for iseq in iseqs]
+        buffer_nframe = self.buffer_nframe
+        if autotune and self.autotuner is not None:
+            igulp_nframes = self.autotuner.begin_sequence(
+                igulp_nframes, iseqs[0].tensor['frame_nbyte'],
+                frame_duration(iseqs[0].header))
+            if buffer_nframe is not None:
+                buffer_nframe = self.autotuner.scale(buffer_nframe)
+            self.autotune_proclog.update({
+                'target':      self.autotuner.target,
+                'gulp_nframe': igulp_nframes[0],
+                'scale_log2':  self.autotuner.scale_log2})
+        igulp_overlaps = self._define_input_overlap_nframe(iseqs)
+        istride_nframes = igulp_nframes[:]
+        igulp_nframes = [igulp_nframe + nframe_overlap
+                         for igulp_nframe, nframe_overlap
+                         in zip(igulp_nframes, igulp_overlaps)]
+
+        for iseq, igulp_nframe in zip(iseqs, igulp_nframes):
+            if self.buffer_factor is None:
+                src_block = iseq.ring.owner
+                if src_block is not None and self.is_fused_with(src_block):
+                    buffer_factor = 1
+                else:
+                    buffer_factor = None
+            else:
+                buffer_factor = self.buffer_factor
+            iseq.resize(gulp_nframe=igulp_nframe,
+                        buf_nframe=buffer_nframe,
+                        buffer_factor=buffer_factor)
+        return igulp_nframes, istride_nframes
     def _on_sequence(self, iseqs):
         return self.on_sequence(iseqs)
     def _on_sequence_end(self, iseqs):
@@ -777,3 +1494,272 @@ class SinkBlock(MultiTransformBlock):
     def on_data(self, ispan):
         """Return nothing"""
         raise NotImplementedError
+
+class SelectBlock(MultiTransformBlock):
+    """A block that processes gulps from whichever of its inputs has data
+    ready, instead of reading its inputs in lockstep
+
+    This allows merge and arbitration blocks (e.g., combining inputs that
+    arrive with different latencies) to make progress on any input without
+    waiting for the slowest one, and without extra threads. Sequences are
+    still read in lockstep: on_sequence is called once every input has begun
+    its next sequence, and the output sequences end once every input's
+    sequence has ended.
+
+    Subclasses implement on_sequence(iseqs) as for MultiTransformBlock, and
+    on_data(index, ispan, ospans) to process a gulp from input `index`. By
+    default there is one output per input, and each gulp produces frames
+    only in the corresponding output; subclasses with different outputs
+    must set self.orings and override define_output_nframes, which is
+    passed the gulp nframe of each input (zero for inputs other than the
+    one that is ready).
+
+    Note that this block cannot be run by the cooperative scheduler.
+    """
+    def main(self, orings):
+        iseqs_iter = izip(*[iring.read(guarantee=self.guarantee)
+                            for iring in self.irings])
+        for iseqs in iseqs_iter:
+            if self.shutdown_event.is_set():
+                break
+            for i, iseq in enumerate(iseqs):
+                self.sequence_proclogs[i].update(iseq.header)
+            oheaders = self._on_sequence(iseqs)
+            for ohdr in oheaders:
+                if 'time_tag' not in ohdr:
+                    ohdr['time_tag'] = self._seq_count
+            self._seq_count += 1
+            igulp_nframes, istride_nframes = self.resize_input_sequences(iseqs)
+            with ExitStack() as oseq_stack:
+                oseqs, ogulp_overlaps = self.begin_sequences(
+                    oseq_stack, orings, oheaders,
+                    igulp_nframes, istride_nframes)
+                if self.shutdown_event.is_set():
+                    break
+                with SequenceSelector(iseqs) as selector:
+                    self._select_spans(selector, oseqs, ogulp_overlaps,
+                                       igulp_nframes, istride_nframes)
+            self._on_sequence_end(iseqs)
+            self.perf_histograms.update_proclog()
+    def _select_spans(self, selector, oseqs, ogulp_overlaps,
+                      igulp_nframes, istride_nframes):
+        ninput = len(self.irings)
+        iframe0s = [0] * ninput
+        # Note: Inputs are removed from the selection as their sequences end
+        pending_nframes = list(igulp_nframes)
+        prev_time = time.time()
+        while any(nframe is not None for nframe in pending_nframes):
+            index = selector.select(iframe0s, pending_nframes)
+            if self.shutdown_event.is_set():
+                return
+            try:
+                ispan = selector.sequences[index].acquire(iframe0s[index],
+                                                          igulp_nframes[index])
+            except EndOfDataStop:
+                pending_nframes[index] = None
+                continue
+            with ispan:
+                iframe0s[index] += istride_nframes[index]
+                if ispan.nframe_skipped:
+                    iskip_slice = slice(ispan.frame_offset - ispan.nframe_skipped,
+                                        ispan.frame_offset,
+                                        istride_nframes[index])
+                    with ExitStack() as ospan_stack:
+                        ospans = self.reserve_spans(
+                            ospan_stack, oseqs,
+                            self._input_nframes(index, ispan.nframe_skipped))
+                        ostrides_actual = self._on_skip(index, iskip_slice, ospans)
+                        device.stream_synchronize()
+                        self.commit_spans(ospans, ostrides_actual, ogulp_overlaps)
+                if ispan.nframe == 0:
+                    continue
+                cur_time = time.time()
+                acquire_time = cur_time - prev_time
+                prev_time = cur_time
+                with ExitStack() as ospan_stack:
+                    ospans = self.reserve_spans(
+                        ospan_stack, oseqs,
+                        self._input_nframes(index, ispan.nframe))
+                    cur_time = time.time()
+                    reserve_time = cur_time - prev_time
+                    prev_time = cur_time
+                    ofills = [oring.fill_level for oring in self.orings]
+                    ostrides_actual = self._on_data(index, ispan, ospans)
+                    device.stream_synchronize()
+                    self.commit_spans(ospans, ostrides_actual, ogulp_overlaps)
+                cur_time = time.time()
+                process_time = cur_time - prev_time
+                prev_time = cur_time
+                self.perf_proclog.update({
+                    'acquire_time': acquire_time,
+                    'reserve_time': reserve_time,
+                    'process_time': process_time,
+                    'input':        index})
+                self.perf_histograms.record(
+                    acquire_time, reserve_time, process_time,
+                    ispan.nframe * ispan.frame_nbyte, ofills)
+    def _input_nframes(self, index, nframe):
+        nframes = [0] * len(self.irings)
+        nframes[index] = nframe
+        return nframes
+    def _prewarm_gulp(self, iseqs, igulp_nframes, oheaders):
+        # Note: One gulp of zeros is processed from each input in turn
+        storages = []
+        oseqs = [_HeaderSequence(oring, deepcopy(ohdr))
+                 for oring, ohdr in zip(self.orings, oheaders)]
+        for index, (iseq, igulp_nframe) in enumerate(zip(iseqs, igulp_nframes)):
+            ispan = self._zeroed_span(iseq, igulp_nframe, False, storages)
+            ogulp_nframes = self._define_output_nframes(
+                self._input_nframes(index, igulp_nframe))
+            ospans = [self._zeroed_span(oseq, ogulp_nframe, True, storages)
+                      for oseq, ogulp_nframe in zip(oseqs, ogulp_nframes)]
+            self._on_data(index, ispan, ospans)
+            device.stream_synchronize()
+    def _on_data(self, index, ispan, ospans):
+        return self.on_data(index, ispan, ospans)
+    def _on_skip(self, index, islice, ospans):
+        return self.on_skip(index, islice, ospans)
+    def on_data(self, index, ispan, ospans):
+        """Process a gulp of data from input `index` into ospans and return the
+        number of frames to commit for each output (or None to commit
+        complete spans)."""
+        raise NotImplementedError
+    def on_skip(self, index, islice, ospans):
+        """Handle frames of input `index` that were skipped (overwritten)"""
+        for ospan in ospans:
+            memset_array(ospan.data, 0)
+
+class _HeaderSequence(SequenceBase):
+    """A sequence that exists only as a header, used to describe the
+    intermediate data passed between fused blocks and the sequences seen by
+    blocks during a dry run (see Pipeline.preallocate)"""
+    def __init__(self, ring: Ring, header: dict):
+        SequenceBase.__init__(self, ring)
+        # This allows passing DataType instances instead of string types
+        header['_tensor']['dtype'] = str(header['_tensor']['dtype'])
+        self._header = header
+    @property
+    def name(self) -> str:
+        return self._header['name']
+    @property
+    def time_tag(self) -> int:
+        return self._header['time_tag']
+    @property
+    def nringlet(self) -> int:
+        return self.tensor['nringlet']
+    @property
+    def header_size(self) -> int:
+        return 0
+    def resize(self, gulp_nframe: int, buf_nframe: Optional[int]=None,
+               buffer_factor: Optional[int]=None) -> None:
+        return ReadSequence.resize(self, gulp_nframe, buf_nframe, buffer_factor)
+
+class _FusedSpan(SpanBase):
+    """A span of intermediate data held in temporary storage"""
+    def __init__(self, sequence: _HeaderSequence, data_ptr: int,
+                 offset: int, size: int, stride: int, writeable: bool):
+        SpanBase.__init__(self, sequence.ring, sequence, writeable)
+        self._info = _bf.BFspan_info()
+        self._info.data     = data_ptr
+        self._info.size     = size
+        self._info.stride   = stride
+        self._info.offset   = offset
+        self._info.nringlet = sequence.nringlet
+        self.nframe_skipped     = 0
+        self.nframe_overwritten = 0
+    def as_input(self, sequence: _HeaderSequence, nframe: int) -> "_FusedSpan":
+        """Returns the first nframe frames as a read-only span of the
+        given (reader's view of the) sequence"""
+        return _FusedSpan(sequence, self._info.data, self._info.offset,
+                          nframe * self.frame_nbyte, self._info.stride,
+                          writeable=False)
+
+class _FusedChainBlock(MultiTransformBlock):
+    """Runs a linear chain of blocks within a fused scope as a single block
+
+    The first block reads from its input ring as usual, but the output of each
+    block is passed directly to the on_data of the next block via temporary
+    storage owned by the fused scope, and only the last block writes to its
+    output ring(s). All of the blocks run in the first block's thread.
+    """
+    @staticmethod
+    def can_lead(block: Block) -> bool:
+        return (isinstance(block, TransformBlock) and
+                len(block.orings) == 1)
+    @staticmethod
+    def can_follow(block: Block) -> bool:
+        # Note: Blocks that overlap successive input spans need to see data
+        #         from previous gulps, which are not retained when fused.
+        if isinstance(block, TransformBlock):
+            base_class = TransformBlock
+        elif isinstance(block, SinkBlock):
+            base_class = SinkBlock
+        else:
+            return False
+        return (type(block).define_input_overlap_nframe is
+                base_class.define_input_overlap_nframe)
+    def __init__(self, blocks: List[Block]):
+        # Note: This deliberately does not call Block.__init__, as it acts as
+        #         the first block (sharing its state) rather than as a new
+        #         block in the pipeline.
+        self.__dict__.update(blocks[0].__dict__)
+        self.blocks = blocks
+        self.orings = blocks[-1].orings
+    def _set_init_status(self, init_succeeded: bool) -> None:
+        for block in self.blocks:
+            block._set_init_status(init_succeeded)
+    def _on_sequence(self, iseqs):
+        gulp_nframe = self.gulp_nframe or iseqs[0].header['gulp_nframe']
+        # Note: Each intermediate result is described by the sequence its
+        #         block writes and the sequence (view) the next block reads.
+        self._fused_oseqs = []
+        self._fused_iseqs = []
+        for block, next_block in zip(self.blocks[:-1], self.blocks[1:]):
+            ohdr = block._on_sequence(iseqs)[0]
+            if 'time_tag' not in ohdr:
+                ohdr['time_tag'] = self._seq_count
+            gulp_nframe = block._define_output_nframes([gulp_nframe])[0]
+            ohdr['gulp_nframe'] = gulp_nframe
+            self._fused_oseqs.append(_HeaderSequence(block.orings[0], ohdr))
+            iring = next_block.irings[0]
+            if iring.header_transform is not None:
+                ohdr = iring.header_transform(deepcopy(ohdr))
+            iseqs = [_HeaderSequence(iring, ohdr)]
+            self._fused_iseqs.append(iseqs[0])
+        self._fused_offsets = [0] * len(self._fused_oseqs)
+        return self.blocks[-1]._on_sequence(iseqs)
+    def _on_sequence_end(self, iseqs):
+        for block, fused_seqs in zip(self.blocks,
+                                     [iseqs] + [[seq] for seq in self._fused_iseqs]):
+            block._on_sequence_end(fused_seqs)
+    def _on_data(self, ispans, ospans):
+        with ExitStack() as storage_stack:
+            for i, block in enumerate(self.blocks[:-1]):
+                oseq = self._fused_oseqs[i]
+                nframe = block._define_output_nframes([ispan.nframe
+                                                       for ispan in ispans])[0]
+                stride = nframe * oseq.tensor['frame_nbyte']
+                storage = self.fused_ancestor._get_fused_temp_storage(oseq.ring.space, i)
+                allocation = storage_stack.enter_context(
+                    storage.allocate(stride * oseq.nringlet))
+                ospan = _FusedSpan(oseq, allocation.ptr, self._fused_offsets[i],
+                                   stride, stride, writeable=True)
+                nframe_commit = block._on_data(ispans, [ospan])[0]
+                if nframe_commit is None:
+                    nframe_commit = nframe
+                if nframe_commit == 0:
+                    # No data to pass on (e.g., while accumulating)
+                    return [0] * len(ospans)
+                self._fused_offsets[i] += nframe_commit * ospan.frame_nbyte
+                ispans = [ospan.as_input(self._fused_iseqs[i], nframe_commit)]
+            return self.blocks[-1]._on_data(ispans, ospans)
+    def _on_skip(self, islices, ospans):
+        # Note: Skipped input frames are substituted directly in the output
+        #         of the chain by its last block.
+        return self.blocks[-1]._on_skip(islices, ospans)
+    def _define_input_overlap_nframe(self, iseqs):
+        return self.blocks[0]._define_input_overlap_nframe(iseqs)
+    def _define_output_nframes(self, input_nframes):
+        for block in self.blocks:
+            input_nframes = block._define_output_nframes(input_nframes)
+        return input_nframes
@@ -0,0 +1,220 @@
+
+# Copyright (c) 2016-2023, The Bifrost Authors. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# * Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the distribution.
+# * Neither the name of The Bifrost Authors nor the names of its
+#   contributors may be used to endorse or promote products derived
+#   from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS ``AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED.  IN NO EVENT SHALL THE COPYRIGHT OWNER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY
+# OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""
+Bottleneck and critical-path analysis of pipelines.
+
+This combines the per-gulp performance histograms that every block keeps (see
+bifrost.perf_histogram) with the fill levels of the rings between blocks to
+report:
+  * the block that limits end-to-end throughput (the bottleneck),
+  * how much slack (time spent waiting on other blocks) each block has,
+  * the chain of blocks with the largest total processing time per gulp
+    (the critical path), and
+  * rings that run near capacity.
+
+The analysis can be run on a live Pipeline via Pipeline.analyze(), or from
+the proclogs of a running process via load_by_pid() (see
+tools/analyze_pipeline.py).
+"""
+
+from bifrost.proclog import load_by_pid as load_proclogs_by_pid
+
+from typing import Any, Dict, List, Optional, Union
+
+from bifrost import telemetry
+telemetry.track_module()
+
+__all__ = ['PipelineAnalysis', 'analyze', 'load_by_pid']
+
+#: Rings whose p99 fill level is at least this are reported as near capacity
+NEAR_CAPACITY_FILL = 0.9
+
+def _mean(perf: Dict[str,Any], key: str) -> float:
+    stats = perf.get(key)
+    if stats is None or stats.get('mean') is None:
+        return 0.
+    return stats['mean']
+
+class PipelineAnalysis(object):
+    """The result of analyzing a pipeline
+
+    Attributes:
+        blocks:        List of dicts with each block's name, gulp count, mean
+                         acquire/reserve/process times, throughput (bytes/s),
+                         utilization (fraction of time spent processing),
+                         slack (1 - utilization) and headroom (factor by which
+                         the data rate could grow before it saturates).
+        rings:         List of dicts with each ring's name, writer, readers,
+                         fill level percentiles and near_capacity flag.
+        bottleneck:    Name of the block with the highest utilization.
+        critical_path: Names of the source-to-sink chain of blocks with the
+                         largest total mean process time per gulp.
+    """
+    def __init__(self, blocks: List[Dict[str,Any]], rings: List[Dict[str,Any]],
+                 bottleneck: Optional[str], critical_path: List[str]):
+        self.blocks        = blocks
+        self.rings         = rings
+        self.bottleneck    = bottleneck
+        self.critical_path = critical_path
+    def __str__(self) -> str:
+        lines = []
+        lines.append(f"{'Block':32s} {'Gulps':>7s} {'Acquire':>9s} {'Reserve':>9s} "
+                     f"{'Process':>9s} {'MB/s':>9s} {'Util':>6s} {'Slack':>6s} {'Headroom':>8s}")
+        for b in self.blocks:
+            marker = '*' if b['name'] == self.bottleneck else ' '
+            headroom = 'inf' if b['headroom'] is None else f"{b['headroom']:.2f}x"
+            lines.append(f"{marker}{b['name'][:31]:31s} {b['ngulp']:7d} "
+                         f"{b['acquire_time']:9.6f} {b['reserve_time']:9.6f} "
+                         f"{b['process_time']:9.6f} {b['throughput'] / 1e6:9.2f} "
+                         f"{b['utilization']:6.1%} {b['slack']:6.1%} {headroom:>8s}")
+        lines.append('')
+        lines.append(f"{'Ring':32s} {'Writer':24s} {'Fill p50':>8s} {'p99':>6s} {'max':>6s}")
+        for r in self.rings:
+            marker = '!' if r['near_capacity'] else ' '
+            fills = [r['fill_p50'], r['fill_p99'], r['fill_max']]
+            fills = ['-' if f is None else f"{f:.1%}" for f in fills]
+            lines.append(f"{marker}{r['name'][:31]:31s} {str(r['writer'])[:24]:24s} "
+                         f"{fills[0]:>8s} {fills[1]:>6s} {fills[2]:>6s}")
+        lines.append('')
+        lines.append(f"Bottleneck:    {self.bottleneck}")
+        lines.append(f"Critical path: {' -> '.join(self.critical_path)}")
+        near_capacity = [r['name'] for r in self.rings if r['near_capacity']]
+        if near_capacity:
+            lines.append(f"Rings near capacity: {', '.join(near_capacity)}")
+        return '\n'.join(lines)
+
+def analyze(blocks: List[Dict[str,Any]]) -> PipelineAnalysis:
+    """Analyzes a pipeline described by a list of blocks
+
+    Args:
+        blocks: One dict per block containing its 'name', the names of its
+                  'inputs' and 'outputs' rings, and its 'perf' summary (as
+                  returned by PerfHistograms.summary()).
+    """
+    block_results = []
+    for block in blocks:
+        perf = block['perf'] or {}
+        acquire_time = _mean(perf, 'acquire_time')
+        reserve_time = _mean(perf, 'reserve_time')
+        process_time = _mean(perf, 'process_time')
+        gulp_time = acquire_time + reserve_time + process_time
+        utilization = process_time / gulp_time if gulp_time > 0 else 0.
+        block_results.append({
+            'name':         block['name'],
+            'ngulp':        perf.get('process_time', {}).get('count', 0),
+            'acquire_time': acquire_time,
+            'reserve_time': reserve_time,
+            'process_time': process_time,
+            'throughput':   _mean(perf, 'throughput'),
+            'utilization':  utilization,
+            'slack':        1. - utilization,
+            'headroom':     1. / utilization if utilization > 0 else None})
+
+    ring_results = []
+    ring_index = {}
+    for block in blocks:
+        perf = block['perf'] or {}
+        for i, ring_name in enumerate(block['outputs']):
+            fill = perf.get(f"output_fill{i}") or {}
+            p99 = fill.get('p99')
+            ring_index[ring_name] = len(ring_results)
+            ring_results.append({
+                'name':          ring_name,
+                'writer':        block['name'],
+                'readers':       [],
+                'fill_p50':      fill.get('p50'),
+                'fill_p99':      p99,
+                'fill_max':      fill.get('max'),
+                'near_capacity': p99 is not None and p99 >= NEAR_CAPACITY_FILL})
+    for block in blocks:
+        for ring_name in block['inputs']:
+            if ring_name in ring_index:
+                ring_results[ring_index[ring_name]]['readers'].append(block['name'])
+
+    measured = [b for b in block_results if b['ngulp'] > 0]
+    bottleneck = None
+    if measured:
+        bottleneck = max(measured, key=lambda b: b['utilization'])['name']
+
+    return PipelineAnalysis(block_results, ring_results, bottleneck,
+                            _critical_path(blocks, block_results, ring_results))
+
+def _critical_path(blocks, block_results, ring_results) -> List[str]:
+    process_time = {b['name']: b['process_time'] for b in block_results}
+    writers = {r['name']: r['writer'] for r in ring_results}
+    inputs = {block['name']: block['inputs'] for block in blocks}
+    # Maps block name -> (cost, path) of the most expensive path ending there
+    best = {}
+    def path_to(name):
+        if name in best:
+            return best[name]
+        cost, path = 0., []
+        for ring_name in inputs.get(name, []):
+            writer = writers.get(ring_name)
+            if writer is None:
+                continue
+            upstream_cost, upstream_path = path_to(writer)
+            if upstream_cost > cost or not path:
+                cost, path = upstream_cost, upstream_path
+        best[name] = (cost + process_time.get(name, 0.), path + [name])
+        return best[name]
+    paths = [path_to(block['name']) for block in blocks]
+    if not paths:
+        return []
+    return max(paths, key=lambda p: p[0])[1]
+
+def _summary_from_proclog(contents: Dict[str,Any]) -> Dict[str,Dict[str,Any]]:
+    summary = {}
+    for key, value in contents.items():
+        if key == 'window_start':
+            continue
+        name, stat = key.rsplit('_', 1)
+        summary.setdefault(name, {})[stat] = None if value == -1 else value
+    return summary
+
+def _ring_names(contents: Dict[str,Any]) -> List[str]:
+    return [contents[f"ring{i}"] for i in range(contents.get('nring', 0))]
+
+def load_by_pid(pid: Union[int,List[int]]) -> PipelineAnalysis:
+    """Analyzes the pipeline running in process `pid` from its proclogs
+
+    A list of PIDs may be given to analyze a pipeline that was run with
+    executor='process'.
+    """
+    pids = pid if isinstance(pid, (list, tuple)) else [pid]
+    blocks = []
+    for pid in pids:
+        for name, logs in load_proclogs_by_pid(pid).items():
+            if 'perf_hist' not in logs:
+                continue
+            blocks.append({
+                'name':    name,
+                'inputs':  _ring_names(logs.get('in',  {})),
+                'outputs': _ring_names(logs.get('out', {})),
+                'perf':    _summary_from_proclog(logs['perf_hist'])})
+    return analyze(blocks)
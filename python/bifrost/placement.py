@@ -0,0 +1,242 @@
+
+# Copyright (c) 2016-2023, The Bifrost Authors. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# * Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the distribution.
+# * Neither the name of The Bifrost Authors nor the names of its
+#   contributors may be used to endorse or promote products derived
+#   from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS ``AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED.  IN NO EVENT SHALL THE COPYRIGHT OWNER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY
+# OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""
+Topology-aware placement of pipeline blocks onto CPU cores.
+
+The planner reads the machine's CPU topology (from sysfs) and the block graph
+(each block's input rings and their writers) and assigns each block that has
+not already been pinned to its own physical core such that:
+  * blocks that exchange data through a ring are placed on neighbouring
+      cores, which share an L3 cache and NUMA node where possible,
+  * separate chains of blocks are not split across L3 cache domains if they
+      fit within one,
+  * hyperthread siblings are only used once every physical core is in use,
+      and
+  * the cores running packet capture threads, along with their hyperthread
+      siblings, are left free.
+Each ring's memory is then bound to the NUMA node of the core that writes it.
+"""
+
+import os
+import glob
+
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional
+
+from bifrost import telemetry
+telemetry.track_module()
+
+__all__ = ['CPUTopology', 'plan_placement', 'apply_placement']
+
+SYSFS_DIR = '/sys/devices/system'
+
+def _parse_cpulist(text: str) -> FrozenSet[int]:
+    """Parses a sysfs CPU list such as "0-3,8,10-11" """
+    cpus = set()
+    for field in text.strip().split(','):
+        if not field:
+            continue
+        if '-' in field:
+            first, last = field.split('-')
+            cpus.update(range(int(first), int(last) + 1))
+        else:
+            cpus.add(int(field))
+    return frozenset(cpus)
+
+def _read(filename: str) -> Optional[str]:
+    try:
+        with open(filename, 'r') as fh:
+            return fh.read().strip()
+    except (IOError, OSError):
+        return None
+
+class CPUTopology(object):
+    """The layout of a machine's CPUs
+
+    Args:
+        cpus: Maps each CPU (OS index) to a dict with its 'package' and
+                'core' IDs, the set of its hyperthread 'siblings' (including
+                itself), the set of CPUs sharing its 'l3' cache and its NUMA
+                'node'.
+    """
+    def __init__(self, cpus: Dict[int,Dict[str,Any]]):
+        self.cpus = cpus
+    @classmethod
+    def from_sysfs(cls, sysfs_dir: str=SYSFS_DIR,
+                   allowed: Optional[Iterable[int]]=None) -> "CPUTopology":
+        """Reads the topology of the CPUs that this process may run on"""
+        if allowed is None:
+            allowed = os.sched_getaffinity(0)
+        allowed = set(allowed)
+        node_of = {}
+        for node_dir in glob.glob(os.path.join(sysfs_dir, 'node', 'node[0-9]*')):
+            node = int(os.path.basename(node_dir)[4:])
+            for cpu in _parse_cpulist(_read(os.path.join(node_dir, 'cpulist')) or ''):
+                node_of[cpu] = node
+        cpus = {}
+        for cpu in sorted(allowed):
+            cpu_dir = os.path.join(sysfs_dir, 'cpu', f"cpu{cpu}")
+            topo_dir = os.path.join(cpu_dir, 'topology')
+            siblings = _read(os.path.join(topo_dir, 'thread_siblings_list'))
+            l3 = None
+            for cache_dir in glob.glob(os.path.join(cpu_dir, 'cache', 'index[0-9]*')):
+                if _read(os.path.join(cache_dir, 'level')) == '3':
+                    l3 = _read(os.path.join(cache_dir, 'shared_cpu_list'))
+            cpus[cpu] = {
+                'package':  int(_read(os.path.join(topo_dir, 'physical_package_id')) or 0),
+                'core':     int(_read(os.path.join(topo_dir, 'core_id')) or cpu),
+                'siblings': _parse_cpulist(siblings) if siblings else frozenset([cpu]),
+                'l3':       _parse_cpulist(l3) if l3 else None,
+                'node':     node_of.get(cpu, 0)}
+        return cls(cpus)
+    def siblings(self, cpu: int) -> FrozenSet[int]:
+        """Returns the hyperthread siblings of `cpu` (including itself)"""
+        if cpu not in self.cpus:
+            return frozenset([cpu])
+        return self.cpus[cpu]['siblings']
+    def _sort_key(self, cpu: int):
+        info = self.cpus[cpu]
+        l3 = min(info['l3']) if info['l3'] else info['package']
+        return (info['node'], l3, info['package'], info['core'], cpu)
+    def _domain(self, cpu: int):
+        return self._sort_key(cpu)[:2]
+
+def _writer(ring: Any) -> Any:
+    # Note: Views of a ring share its writer
+    while ring.base is not None:
+        ring = ring.base
+    return ring.owner
+
+def _order_blocks(blocks: List[Any]) -> List[List[Any]]:
+    """Returns the blocks grouped into connected chains, each in data-flow
+    order (every reader immediately follows its writer where possible).
+    """
+    block_set = set(blocks)
+    readers = {block: [] for block in blocks}
+    writers = {block: [] for block in blocks}
+    for block in blocks:
+        for iring in block.irings:
+            writer = _writer(iring)
+            if writer in block_set:
+                readers[writer].append(block)
+                writers[block].append(writer)
+    visited = set()
+    chains = []
+    for root in blocks:
+        if root in visited or writers[root]:
+            continue
+        chain = []
+        stack = [root]
+        while stack:
+            block = stack.pop()
+            if block in visited:
+                continue
+            visited.add(block)
+            chain.append(block)
+            # Note: Readers are pushed in reverse so the first is visited next
+            stack.extend(reversed(readers[block]))
+        chains.append(chain)
+    # Any blocks left over are in cycles of rings, which should not happen
+    leftover = [block for block in blocks if block not in visited]
+    if leftover:
+        chains.append(leftover)
+    return chains
+
+def plan_placement(blocks: List[Any], topology: CPUTopology,
+                   reserved_cores: Iterable[int]=(),
+                   capture_cores: Iterable[int]=()) -> Dict[Any,int]:
+    """Chooses a core for each block that is not already pinned
+
+    Args:
+        blocks:         The pipeline's blocks.
+        topology:       The machine's CPU topology.
+        reserved_cores: Cores that must not be used.
+        capture_cores:  Cores used by packet capture threads; these and their
+                          hyperthread siblings are not used.
+
+    Returns:
+        A dict mapping each unpinned block to its core. If there are more
+        blocks than free cores, cores are shared by neighbouring blocks.
+    """
+    excluded = set(reserved_cores)
+    for cpu in capture_cores:
+        excluded |= topology.siblings(cpu)
+    for block in blocks:
+        core = block.core
+        if core is not None:
+            excluded |= set([core] if isinstance(core, int) else core)
+    cpus = sorted([cpu for cpu in topology.cpus if cpu not in excluded],
+                  key=topology._sort_key)
+    primaries, secondaries = [], []
+    # Note: Physical cores that are already partly in use only offer their
+    #         remaining hyperthreads as secondaries.
+    seen = set((topology.cpus[cpu]['package'], topology.cpus[cpu]['core'])
+               for cpu in excluded if cpu in topology.cpus)
+    for cpu in cpus:
+        key = (topology.cpus[cpu]['package'], topology.cpus[cpu]['core'])
+        (secondaries if key in seen else primaries).append(cpu)
+        seen.add(key)
+    pool = primaries + secondaries
+    if not pool:
+        return {}
+
+    placement = {}
+    pos = 0
+    for chain in _order_blocks(blocks):
+        chain = [block for block in chain if block.core is None]
+        if not chain:
+            continue
+        if pos < len(primaries):
+            # Start the chain in a fresh L3 domain if it does not fit in the
+            #   remainder of the current one but would fit in the next one.
+            domain = topology._domain(primaries[pos])
+            end = pos
+            while end < len(primaries) and topology._domain(primaries[end]) == domain:
+                end += 1
+            next_end = end
+            while (next_end < len(primaries) and
+                   topology._domain(primaries[next_end]) == topology._domain(primaries[end])):
+                next_end += 1
+            if end - pos < len(chain) <= next_end - end:
+                pos = end
+        for block in chain:
+            placement[block] = pool[pos % len(pool)]
+            pos += 1
+    return placement
+
+def apply_placement(placement: Dict[Any,int]) -> None:
+    """Pins each block to its core and binds its output rings' memory to the
+    NUMA node of that core.
+    """
+    for block, core in placement.items():
+        block._core = core
+        for oring in block.orings:
+            try:
+                oring.core = core
+            except RuntimeError:
+                # Note: Memory binding requires hwloc support
+                pass
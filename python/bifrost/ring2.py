@@ -30,13 +30,19 @@
 
 from bifrost.libbifrost import _bf, _check, _get, BifrostObject, _string2space, EndOfDataStop
 from bifrost.DataType import DataType
-from bifrost.ndarray import ndarray, _address_as_buffer
+from bifrost.ndarray import ndarray
 from copy import copy, deepcopy
 from functools import reduce
 
+import asyncio
 import ctypes
+import os
+import select
 import string
+import threading
+import time
 import warnings
+import weakref
 import numpy as np
 
 try:
@@ -51,6 +57,9 @@ from typing import Any, Callable, Dict, List, Optional, Tuple, Union
 from bifrost import telemetry
 telemetry.track_module()
 
+# The end offset reported for sequences that are still being written
+_SEQUENCE_OPEN = ctypes.c_uint64(-1).value
+
 def _slugify(name):
     valid_chars = "-_.() %s%s" % (string.ascii_letters, string.digits)
     valid_chars = frozenset(valid_chars)
@@ -69,9 +78,64 @@ def split_shape(shape: Union[List[int],Tuple[int]]) -> Tuple[List[int], List[int
         ringlet_shape.append(dim)
     raise ValueError("No time dimension (-1) found in shape")
 
+#: Max no. decoded sequence headers cached per ring
+MAX_CACHED_HEADERS = 64
+
+def _encode_header(header: Dict[str,Any]) -> bytes:
+    """Serializes a sequence header as compact JSON"""
+    return json.dumps(header, separators=(',', ':')).encode()
+
+def _decode_header(ptr: int, size: int) -> Dict[str,Any]:
+    return json.loads(ctypes.string_at(ptr, size))
+
 def compose_unary_funcs(f: Callable, g: Callable) -> Callable:
     return lambda x: f(g(x))
 
+def _clear_event_fd(fd: int) -> None:
+    """Resets an event file descriptor returned by Ring._open_event_fd"""
+    try:
+        os.read(fd, 8)
+    except BlockingIOError:
+        pass
+
+class _RingNotifier(object):
+    """Wakes coroutines that are waiting on a ring from an asyncio event loop
+
+    This owns an eventfd that the ring signals whenever a reader or writer may
+    have become unblocked, and which is watched by the loop only while there
+    are waiters. The descriptor is closed when the notifier is closed or
+    garbage collected.
+    """
+    def __init__(self, ring: "Ring"):
+        # Note: The loop is not referenced here so that it can be collected
+        self._ring = ring
+        self._fd = ring._open_event_fd()
+        self._waiters = []
+    def __del__(self):
+        self.close()
+    def close(self) -> None:
+        """Closes the eventfd (without waking any remaining waiters)"""
+        if self._fd is not None:
+            if self._ring.obj:
+                self._ring._close_event_fd(self._fd)
+            self._fd = None
+        self._waiters = []
+    def _on_event(self, loop: asyncio.AbstractEventLoop) -> None:
+        _clear_event_fd(self._fd)
+        loop.remove_reader(self._fd)
+        waiters, self._waiters = self._waiters, []
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+    async def wait(self) -> None:
+        """Waits until the ring next changes state"""
+        loop = asyncio.get_running_loop()
+        if not self._waiters:
+            loop.add_reader(self._fd, self._on_event, loop)
+        waiter = loop.create_future()
+        self._waiters.append(waiter)
+        await waiter
+
 def ring_view(ring: "Ring", header_transform: Callable) -> "Ring":
     new_ring = ring.view()
     old_header_transform = ring.header_transform
@@ -81,9 +145,90 @@ def ring_view(ring: "Ring", header_transform: Callable) -> "Ring":
     new_ring.header_transform = header_transform
     return new_ring
 
+_HUGEPAGE_POLICIES = {None:          _bf.BF_RING_POLICY_DEFAULT,
+                      'transparent': _bf.BF_RING_POLICY_THP,
+                      'explicit':    _bf.BF_RING_POLICY_HUGETLB}
+
+def _decode_alloc_policy(policy: int) -> Dict[str,Any]:
+    if policy & _bf.BF_RING_POLICY_HUGETLB:
+        hugepages = 'explicit'
+    elif policy & _bf.BF_RING_POLICY_THP:
+        hugepages = 'transparent'
+    else:
+        hugepages = None
+    return {'hugepages': hugepages,
+            'mlock':     bool(policy & _bf.BF_RING_POLICY_MLOCK),
+            'prefault':  bool(policy & _bf.BF_RING_POLICY_PREFAULT),
+            'mirror':    bool(policy & _bf.BF_RING_POLICY_MIRROR)}
+
+_WAIT_POLICIES = {'block': _bf.BF_RING_WAIT_BLOCK,
+                  'spin':  _bf.BF_RING_WAIT_SPIN,
+                  'yield': _bf.BF_RING_WAIT_YIELD}
+_WAIT_POLICY_NAMES = {v: k for k, v in _WAIT_POLICIES.items()}
+
+def _encode_wait_policy(policy: Optional[str], spin_time: float) -> Tuple[int,int]:
+    if policy is None:
+        return _bf.BF_RING_WAIT_DEFAULT, 0
+    if policy not in _WAIT_POLICIES:
+        raise ValueError(f"Invalid wait policy '{policy}'; must be one of: 'block', 'spin', 'yield'")
+    if spin_time < 0:
+        raise ValueError("spin_time must be non-negative")
+    return _WAIT_POLICIES[policy], int(round(spin_time * 1e9))
+
+def set_thread_wait_policy(policy: Optional[str], spin_time: float=0.) -> None:
+    """Sets how the calling thread waits on all rings, overriding the rings'
+    own wait policies (see Ring), or reverts to them if `policy` is None
+    """
+    _check( _bf.bfRingSetThreadWaitPolicy(*_encode_wait_policy(policy, spin_time)) )
+
+def get_thread_wait_policy() -> Tuple[Optional[str],float]:
+    """Returns the calling thread's wait policy and spin time (see
+    set_thread_wait_policy)"""
+    policy  = ctypes.c_int()
+    spin_ns = _bf.BFsize()
+    _check( _bf.bfRingGetThreadWaitPolicy(ctypes.byref(policy), ctypes.byref(spin_ns)) )
+    return _WAIT_POLICY_NAMES.get(policy.value), spin_ns.value * 1e-9
+
 class Ring(BifrostObject):
+    """A thread-safe circular memory buffer
+
+    Args:
+        space:     The memory space in which to allocate the ring.
+        name:      The name of the ring (defaults to a unique name).
+        owner:     The block that writes to the ring, if any.
+        core:      CPU core whose NUMA node the ring's memory is bound to.
+        hugepages: None, 'transparent' or 'explicit' (hugetlbfs, falling back
+                     to transparent if no hugepages are reserved). System
+                     space only.
+        mlock:     Lock the ring's memory into RAM (system space only).
+        prefault:  Touch every page of the ring's memory when it is
+                     allocated, so that page faults do not occur while data
+                     are flowing.
+        mirror:    Map the ring's memory twice back-to-back so that spans
+                     that wrap around the end of the buffer need no ghost
+                     region copies (system space only, not shared).
+        backing_file: Store the ring's memory and sequences in this file so
+                     that they survive the process (system space only, not
+                     shared). If the file already holds a ring, its
+                     sequences are restored and can be read as if writing
+                     had ended, and a new writer may append to it.
+        wait_policy: How threads wait on the ring: 'block' (sleep until
+                     woken; the default), 'spin' (busy-spin) or 'yield'
+                     (spin, then yield the CPU between checks). Spinning
+                     wakes waiters within a fraction of a microsecond but
+                     keeps their cores busy, so is best used on isolated
+                     cores.
+        spin_time: Time in seconds to spin before sleeping ('block') or
+                     yielding ('yield').
+
+    The allocation policy is applied on a best-effort basis; see alloc_policy
+    for the policy that took effect.
+    """
     instance_count = 0
-    def __init__(self, space: str='system', name: Optional[str]=None, owner: Optional[Any]=None, core: Optional[int]=None):
+    def __init__(self, space: str='system', name: Optional[str]=None, owner: Optional[Any]=None, core: Optional[int]=None,
+                 hugepages: Optional[str]=None, mlock: bool=False, prefault: bool=False,
+                 mirror: bool=False, backing_file: Optional[str]=None,
+                 wait_policy: Optional[str]=None, spin_time: float=0.):
         # If this is non-None, then the object is wrapping a base Ring instance
         self.base = None
         self.is_view = False   # This gets set to True by use of .view()
@@ -100,9 +245,32 @@ class Ring(BifrostObject):
                                               core) )
             except RuntimeError:
                 pass
+        if hugepages not in _HUGEPAGE_POLICIES:
+            raise ValueError(f"Invalid hugepages policy '{hugepages}'; must be one of: None, 'transparent', 'explicit'")
+        policy = _HUGEPAGE_POLICIES[hugepages]
+        if mlock:
+            policy |= _bf.BF_RING_POLICY_MLOCK
+        if prefault:
+            policy |= _bf.BF_RING_POLICY_PREFAULT
+        if mirror:
+            policy |= _bf.BF_RING_POLICY_MIRROR
+        if policy != _bf.BF_RING_POLICY_DEFAULT:
+            _check( _bf.bfRingSetAllocPolicy(self.obj, policy) )
+        if backing_file is not None:
+            _check( _bf.bfRingSetBackingFile(self.obj, backing_file.encode()) )
+        if wait_policy is not None:
+            self.set_wait_policy(wait_policy, spin_time)
         self.owner = owner
         self.header_transform = None
+        # Note: These are shared with views of the ring
+        self._notifiers = weakref.WeakKeyDictionary()
+        self._readers = weakref.WeakSet()
+        self._readers_lock = threading.Lock()
+        self._last_stats = {}
+        self._header_cache = {}
     def __del__(self):
+        if not self.is_view and hasattr(self, '_notifiers'):
+            self._close_notifiers()
         if self.base is not None and not self.is_view:
             BifrostObject.__del__(self)
     def view(self) -> "Ring":
@@ -122,6 +290,170 @@ class Ring(BifrostObject):
     @property
     def core(self) -> int:
         return _get(_bf.bfRingGetAffinity, self.obj)
+    @core.setter
+    def core(self, core: int) -> None:
+        # Note: The ring's memory is bound to the NUMA node of this core when
+        #         it is next (re)allocated
+        _check( _bf.bfRingSetAffinity(self.obj, core) )
+    @property
+    def shared(self) -> bool:
+        return bool(_get(_bf.bfRingGetShared, self.obj))
+    @shared.setter
+    def shared(self, value: bool) -> None:
+        # Note: This must be set before the ring's memory is first allocated
+        _check( _bf.bfRingSetShared(self.obj, value) )
+    @property
+    def backing_file(self) -> Optional[str]:
+        path = _get(_bf.bfRingGetBackingFile, self.obj).decode()
+        return path if path else None
+    def set_wait_policy(self, policy: str, spin_time: float=0.) -> None:
+        """Sets how threads wait on the ring (see Ring)"""
+        if policy is None:
+            raise ValueError("A ring's wait policy cannot be None")
+        _check( _bf.bfRingSetWaitPolicy(self.obj, *_encode_wait_policy(policy, spin_time)) )
+    @property
+    def wait_policy(self) -> Tuple[str,float]:
+        """The ring's wait policy and spin time in seconds"""
+        policy  = ctypes.c_int()
+        spin_ns = _bf.BFsize()
+        _check( _bf.bfRingGetWaitPolicy(self.obj, ctypes.byref(policy), ctypes.byref(spin_ns)) )
+        return _WAIT_POLICY_NAMES[policy.value], spin_ns.value * 1e-9
+    @property
+    def alloc_policy(self) -> Dict[str,Any]:
+        """The allocation policy that took effect for the ring's current
+        memory (or all False/None if it has not been allocated)"""
+        _check( _bf.bfRingLock(self.obj) )
+        try:
+            policy = _get(_bf.bfRingLockedGetAllocPolicy, self.obj)
+        finally:
+            _check( _bf.bfRingUnlock(self.obj) )
+        return _decode_alloc_policy(policy)
+    def stats(self) -> Dict[str,Any]:
+        """Returns the ring's occupancy, throughput and reader lag
+
+        This does not take the ring's lock, so it can be polled while the
+        ring is in use without slowing down its readers or writers. The
+        result contains:
+
+          tail, head, reserve_head, guaranteed_tail: Byte offsets in the ring
+          capacity:       Total capacity of the ring in bytes
+          occupancy:      Fraction of the capacity holding committed data
+          max_lag:        No. committed bytes that the slowest guaranteed
+                            reader has yet to release
+          commit_rate:    Bytes committed per second since the previous call
+                            (None on the first call)
+          ncommitted:     Total no. bytes committed
+          nskipped:       Total no. bytes that were overwritten before
+                            readers could acquire them
+          noverwritten:   Total no. bytes that were overwritten while
+                            readers held them
+          nread_open, nwrite_open: No. currently open spans
+          alloc_policy:   See alloc_policy
+          nread_wait, nwrite_wait: Total no. times that readers (for data
+                            or sequences) and writers (for space) have had
+                            to wait
+          read_wait, write_wait: Total time in seconds that readers and
+                            writers have spent waiting
+          readers:        For each sequence open for reading in this
+                            process, its name, whether it holds a guarantee,
+                            and its lag (committed bytes not yet acquired)
+        """
+        raw = _bf.BFringstats()
+        _check( _bf.bfRingGetStats(self.obj, raw) )
+        now = time.time()
+        last = self._last_stats
+        commit_rate = None
+        if last and now > last['time']:
+            commit_rate = (raw.ncommitted - last['ncommitted']) / (now - last['time'])
+        last['time'] = now
+        last['ncommitted'] = raw.ncommitted
+        capacity = raw.span
+        nbyte_buffered = raw.head - raw.tail
+        with self._readers_lock:
+            readers = list(self._readers)
+        reader_stats = []
+        for seq in readers:
+            begin = _get(_bf.bfRingSequenceGetBegin, seq._base_obj)
+            end   = _get(_bf.bfRingSequenceGetEnd,   seq._base_obj)
+            head  = raw.head if end == _SEQUENCE_OPEN else min(raw.head, end)
+            reader_stats.append({
+                'sequence':  seq.name,
+                'guarantee': seq.guarantee,
+                'lag':       max(head - (begin + seq._nbyte_acquired), 0)})
+        return {'tail':            raw.tail,
+                'head':            raw.head,
+                'reserve_head':    raw.reserve_head,
+                'guaranteed_tail': raw.guaranteed_tail,
+                'capacity':        capacity,
+                'occupancy':       nbyte_buffered / capacity if capacity else 0.,
+                'max_lag':         max(raw.head - raw.guaranteed_tail, 0),
+                'commit_rate':     commit_rate,
+                'ncommitted':      raw.ncommitted,
+                'nskipped':        raw.nskipped,
+                'noverwritten':    raw.noverwritten,
+                'nread_open':      raw.nread_open,
+                'nwrite_open':     raw.nwrite_open,
+                'alloc_policy':    _decode_alloc_policy(raw.alloc_policy),
+                'nread_wait':      raw.nread_wait,
+                'read_wait':       raw.read_wait_ns * 1e-9,
+                'nwrite_wait':     raw.nwrite_wait,
+                'write_wait':      raw.write_wait_ns * 1e-9,
+                'readers':         reader_stats}
+    def _get_shared_memory(self) -> Tuple[str,int,int]:
+        """Returns the name, base address and size of the shared memory
+        object that currently backs the ring.
+        """
+        _check( _bf.bfRingLock(self.obj) )
+        try:
+            name     = _get(_bf.bfRingLockedGetSharedName, self.obj)
+            data     = _get(_bf.bfRingLockedGetData,       self.obj)
+            stride   = _get(_bf.bfRingLockedGetStride,     self.obj)
+            nringlet = _get(_bf.bfRingLockedGetNRinglet,   self.obj)
+        finally:
+            _check( _bf.bfRingUnlock(self.obj) )
+        return name.decode(), data, stride * nringlet
+    def _get_buffer(self) -> Tuple[int,int]:
+        """Returns the address and size of the ring's current allocation"""
+        _check( _bf.bfRingLock(self.obj) )
+        try:
+            data     = _get(_bf.bfRingLockedGetData,     self.obj)
+            stride   = _get(_bf.bfRingLockedGetStride,   self.obj)
+            nringlet = _get(_bf.bfRingLockedGetNRinglet, self.obj)
+        finally:
+            _check( _bf.bfRingUnlock(self.obj) )
+        return data, stride * nringlet
+    @property
+    def nbyte(self) -> int:
+        """The no. bytes currently allocated for the ring, including its
+        ghost region and all ringlets"""
+        return self._get_buffer()[1]
+    def prefault(self) -> None:
+        """Touches every page of the ring's memory so that the page faults
+        are not incurred by the first gulps written to it.
+
+        This only has an effect for rings in host-accessible spaces, and must
+        not be called while the ring holds data.
+        """
+        if self.space not in ('system', 'cuda_host'):
+            return
+        data, nbyte = self._get_buffer()
+        if data and nbyte:
+            ctypes.memset(data, 0, nbyte)
+    @property
+    def fill_level(self) -> float:
+        """The fraction of the ring that the writer cannot currently reuse
+        because it holds data not yet released by guaranteed readers.
+        """
+        _check( _bf.bfRingLock(self.obj) )
+        try:
+            span         = _get(_bf.bfRingLockedGetTotalSpan,      self.obj)
+            reserve_head = _get(_bf.bfRingLockedGetReserveHead,    self.obj)
+            tail         = _get(_bf.bfRingLockedGetGuaranteedTail, self.obj)
+        finally:
+            _check( _bf.bfRingUnlock(self.obj) )
+        if span == 0:
+            return 0.
+        return (reserve_head - tail) / span
     def begin_writing(self) -> "RingWriter":
         return RingWriter(self)
     def _begin_writing(self):
@@ -146,6 +478,140 @@ class Ring(BifrostObject):
                     cur_seq.increment()
                 except EndOfDataStop:
                     return
+    def tap(self, nframe: int, poll_interval: float=0.01) -> "ReadSpan":
+        """Yields the newest `nframe` committed frames of the latest sequence
+        whenever new data are committed, for monitoring the ring without
+        affecting its writer.
+
+        Taps never hold a guarantee and skip over any data committed between
+        iterations, jumping to newer sequences as they begin, so they never
+        block the writer. This can be used outside of a running pipeline,
+        e.g., from a separate monitoring thread.
+
+        Note that each span may be overwritten while it is being used (see
+        ReadSpan.nframe_overwritten), and should be released (i.e., the loop
+        advanced) promptly as open spans delay reallocation of the ring.
+
+        Args:
+            nframe:        Max no. frames to return in each span (limited to
+                             the contiguous span of the ring).
+            poll_interval: Time in seconds to wait between checks for new data.
+        """
+        prev_begin = None
+        while True:
+            try:
+                seq = ReadSequence(self, which='latest', guarantee=False,
+                                   header_transform=self.header_transform)
+            except EndOfDataStop:
+                return
+            with seq:
+                if seq.begin == prev_begin:
+                    # No new sequence has begun since the last one finished
+                    if self.writing_ended:
+                        return
+                    time.sleep(poll_interval)
+                    continue
+                prev_begin = seq.begin
+                for span in seq.tap(nframe, poll_interval):
+                    yield span
+    def snapshot(self, path: str, frame_offset: int=0, nframe: Optional[int]=None,
+                 time_tag: Optional[int]=None, name: Optional[str]=None,
+                 gulp_nframe: Optional[int]=None,
+                 max_file_size: Optional[int]=None) -> "RingSnapshot":
+        """Freezes a range of frames and writes them to disk in the background
+
+        The range is guaranteed from the moment this is called, so it may
+        extend into the past (as far back as the ring's contents go) as well
+        as into the future. The files are written in the format used by
+        bifrost.blocks.serialize (see bifrost.ring_snapshot.RingSnapshot).
+
+        Args:
+            path:          Directory in which to write the snapshot files.
+            frame_offset:  First frame to write. If negative, this is relative
+                             to the no. frames committed when triggered.
+            nframe:        No. frames to write (default: until the sequence
+                             ends).
+            time_tag:      Snapshot the sequence at this time tag.
+            name:          Snapshot the sequence with this name (default: the
+                             latest sequence).
+            gulp_nframe:   Max no. frames to write at a time (limited to the
+                             contiguous span of the ring).
+            max_file_size: Max no. bytes to write to a single file.
+
+        Returns:
+            A RingSnapshot; call its wait() method to wait for it to finish.
+        """
+        from bifrost.ring_snapshot import RingSnapshot
+        return RingSnapshot(self, path, frame_offset, nframe, time_tag, name,
+                            gulp_nframe, max_file_size)
+    @property
+    def writing_ended(self) -> bool:
+        return bool(_get(_bf.bfRingWritingEnded, self.obj))
+    def _open_event_fd(self) -> int:
+        """Returns a new eventfd that is signalled whenever a reader or writer
+        of the ring may have become unblocked"""
+        return _get(_bf.bfRingCreateEventFD, self.obj)
+    def _close_event_fd(self, fd: int) -> None:
+        _check( _bf.bfRingDestroyEventFD(self.obj, fd) )
+    def _space_available(self, nbyte: int) -> bool:
+        """Returns whether `nbyte` bytes can currently be reserved without
+        blocking"""
+        _check( _bf.bfRingLock(self.obj) )
+        try:
+            span         = _get(_bf.bfRingLockedGetTotalSpan,      self.obj)
+            reserve_head = _get(_bf.bfRingLockedGetReserveHead,    self.obj)
+            tail         = _get(_bf.bfRingLockedGetGuaranteedTail, self.obj)
+        finally:
+            _check( _bf.bfRingUnlock(self.obj) )
+        return reserve_head + nbyte - tail <= span
+    def _get_notifier(self) -> _RingNotifier:
+        loop = asyncio.get_running_loop()
+        # Note: Entries for loops that have been collected drop out of the
+        #         (weakly-keyed) dict by themselves; closed loops are pruned
+        #         here so that their eventfds do not accumulate.
+        for old_loop in [l for l in self._notifiers if l.is_closed()]:
+            self._notifiers.pop(old_loop).close()
+        if loop not in self._notifiers:
+            self._notifiers[loop] = _RingNotifier(self)
+        return self._notifiers[loop]
+    def _close_notifiers(self) -> None:
+        for notifier in list(self._notifiers.values()):
+            notifier.close()
+        self._notifiers.clear()
+    async def _wait_until(self, predicate: Callable[[], bool]) -> None:
+        """Waits in the running event loop until predicate() is True"""
+        notifier = self._get_notifier()
+        while not predicate():
+            await notifier.wait()
+    def _sequence_available(self) -> bool:
+        _check( _bf.bfRingLock(self.obj) )
+        try:
+            nsequence     = _get(_bf.bfRingLockedGetNSequence, self.obj)
+            writing_ended = _get(_bf.bfRingWritingEnded,       self.obj)
+        finally:
+            _check( _bf.bfRingUnlock(self.obj) )
+        return nsequence > 0 or bool(writing_ended)
+    async def aread(self, whence: str='earliest', guarantee: bool=True) -> "ReadSequence":
+        """Asynchronous version of read() for use with 'async for'
+
+        This waits on the ring from the running asyncio event loop rather than
+        blocking a thread (see also ReadSequence.aread).
+        """
+        if whence in ('earliest', 'latest'):
+            await self._wait_until(self._sequence_available)
+        try:
+            cur_seq = ReadSequence(self, which=whence, guarantee=guarantee,
+                                   header_transform=self.header_transform)
+        except EndOfDataStop:
+            return
+        with cur_seq:
+            while True:
+                yield cur_seq
+                await self._wait_until(cur_seq._next_available)
+                try:
+                    cur_seq.increment()
+                except EndOfDataStop:
+                    return
 
 class RingWriter(object):
     def __init__(self, ring: Ring):
@@ -167,6 +633,11 @@ class SequenceBase(object):
         self._ring = ring
         self._header = None
         self._tensor = None
+        self._layout = None
+        # The header after any header_transform, and the header it came from
+        self._transformed_header = None
+        # A released span that can be reused for the next acquire/reserve
+        self._free_span = None
     @property
     def _base_obj(self):
         return ctypes.cast(self.obj, _bf.BFsequence)
@@ -211,7 +682,18 @@ class SequenceBase(object):
         self._tensor['dtype_nbyte']   = nbit // 8
         return self._tensor
     @property
+    def _span_layout(self) -> "_SpanLayout":
+        tensor = self.tensor
+        if self._layout is None or self._layout.tensor is not tensor:
+            self._layout = _SpanLayout(tensor)
+        return self._layout
+    @property
     def header(self) -> Dict[str,Any]:
+        """The sequence's header
+
+        Note: Decoded headers are shared by all readers of the sequence
+        within a process, and so must not be modified.
+        """
         if self._header is not None:
             return self._header
         size = self.header_size
@@ -220,11 +702,20 @@ class SequenceBase(object):
             hdr_array = np.empty(0, dtype=np.uint8)
             hdr_array.flags['WRITEABLE'] = False
             return json.loads(hdr_array.tobytes())
-        hdr_buffer = _address_as_buffer(self._header_ptr, size, readonly=True)
-        hdr_array = np.frombuffer(hdr_buffer, dtype=np.uint8)
-        hdr_array.flags['WRITEABLE'] = False
-        self._header = json.loads(hdr_array.tobytes())
-        return self._header
+        # Note: Sequences that exist at the same time never share a name or
+        #         time tag, and sequences never begin before the end of one
+        #         that has been overwritten.
+        key = (_get(_bf.bfRingSequenceGetBegin, self._base_obj),
+               self.time_tag, self.name)
+        cache = self._ring._header_cache
+        header = cache.get(key, None)
+        if header is None:
+            header = _decode_header(self._header_ptr, size)
+            if len(cache) >= MAX_CACHED_HEADERS:
+                cache.clear()
+            cache[key] = header
+        self._header = header
+        return header
 
 class WriteSequence(SequenceBase):
     def __init__(self, ring: Ring, header: Dict[str,Any], gulp_nframe: int, buf_nframe: int):
@@ -232,8 +723,8 @@ class WriteSequence(SequenceBase):
         self._header = header
         # This allows passing DataType instances instead of string types
         header['_tensor']['dtype'] = str(header['_tensor']['dtype'])
-        header_str = json.dumps(header)
-        header_size = len(header_str)
+        hstr = _encode_header(header)
+        header_size = len(hstr)
         tensor = self.tensor
         # **TODO: Consider moving this into bfRingSequenceBegin
         self.ring.resize(gulp_nframe * tensor['frame_nbyte'],
@@ -243,7 +734,6 @@ class WriteSequence(SequenceBase):
         # TODO: How to allow time_tag to be optional? Probably need to plumb support through to backend.
         self.obj = _bf.BFwsequence()
         hname = header['name'].encode()
-        hstr = header_str.encode()
         _check(_bf.bfRingSequenceBegin(
             self.obj,
             ring.obj,
@@ -261,7 +751,26 @@ class WriteSequence(SequenceBase):
         offset_from_head = 0
         _check(_bf.bfRingSequenceEnd(self.obj, offset_from_head))
     def reserve(self, nframe: int, nonblocking: bool=False) -> "WriteSpan":
-        return WriteSpan(self.ring, self, nframe, nonblocking)
+        span = self._free_span
+        if span is None:
+            return WriteSpan(self.ring, self, nframe, nonblocking)
+        self._free_span = None
+        try:
+            span._reserve(nframe, nonblocking)
+        except BaseException:
+            self._free_span = span
+            raise
+        return span
+    async def areserve(self, nframe: int) -> "WriteSpan":
+        """Asynchronous version of reserve() that waits for space from the
+        running asyncio event loop rather than blocking a thread."""
+        notifier = self.ring._get_notifier()
+        while True:
+            try:
+                return self.reserve(nframe, nonblocking=True)
+            except IOError:
+                # BF_STATUS_WOULD_BLOCK
+                await notifier.wait()
 
 class ReadSequence(SequenceBase):
     def __init__(self, ring: Ring, which: str='specific', name: str="", time_tag: Optional[int]=None,
@@ -271,8 +780,11 @@ class ReadSequence(SequenceBase):
         self._ring = ring
         # A function for transforming the header before it's read
         self.header_transform = header_transform
+        self.guarantee = guarantee
         self.obj = _bf.BFrsequence()
         if which == 'specific':
+            if isinstance(name, str):
+                name = name.encode()
             _check(_bf.bfRingSequenceOpen(self.obj, ring.obj, name, guarantee))
         elif which == 'at':
             assert(time_tag is not None)
@@ -283,21 +795,37 @@ class ReadSequence(SequenceBase):
             _check(_bf.bfRingSequenceOpenEarliest(self.obj, ring.obj, guarantee))
         else:
             raise ValueError("Invalid 'which' parameter; must be one of: 'specific', 'latest', 'earliest'")
+        # Note: This tracks the reader's position for Ring.stats
+        self._nbyte_acquired = 0
+        with ring._readers_lock:
+            ring._readers.add(self)
 
     def __enter__(self):
         return self
     def __exit__(self, type, value, tb):
         self.close()
     def close(self) -> None:
+        with self._ring._readers_lock:
+            self._ring._readers.discard(self)
         _check(_bf.bfRingSequenceClose(self.obj))
     def increment(self) -> None:
         _check(_bf.bfRingSequenceNext(self.obj))
+        self._nbyte_acquired = 0
         # Must invalidate cached header and tensor because this is now
         #   a new sequence.
         self._header = None
         self._tensor = None
     def acquire(self, frame_offset: int, nframe: int) -> "ReadSpan":
-        return ReadSpan(self, frame_offset, nframe)
+        span = self._free_span
+        if span is None:
+            return ReadSpan(self, frame_offset, nframe)
+        self._free_span = None
+        try:
+            span._acquire(frame_offset, nframe)
+        except BaseException:
+            self._free_span = span
+            raise
+        return span
     def read(self, nframe: int, stride: Optional[int]=None, begin: int=0) -> "ReadSpan":
         if stride is None:
             stride = nframe
@@ -309,6 +837,79 @@ class ReadSequence(SequenceBase):
                     offset += stride
             except EndOfDataStop:
                 return
+    @property
+    def begin(self) -> int:
+        """The byte offset in the ring at which the sequence begins"""
+        return _get(_bf.bfRingSequenceGetBegin, self._base_obj)
+    def _get_committed(self) -> Tuple[int,bool,int]:
+        """Returns the no. bytes committed to the sequence so far, whether it
+        has finished, and the ring's current contiguous span"""
+        _check( _bf.bfRingLock(self._ring.obj) )
+        try:
+            head  = _get(_bf.bfRingLockedGetHead,           self._ring.obj)
+            span  = _get(_bf.bfRingLockedGetContiguousSpan, self._ring.obj)
+            begin = _get(_bf.bfRingSequenceGetBegin,        self._base_obj)
+            end   = _get(_bf.bfRingSequenceGetEnd,          self._base_obj)
+        finally:
+            _check( _bf.bfRingUnlock(self._ring.obj) )
+        finished = end != _SEQUENCE_OPEN
+        if finished:
+            head = end
+        return head - begin, finished, span
+    def _next_available(self) -> bool:
+        _check( _bf.bfRingLock(self._ring.obj) )
+        try:
+            has_next      = _get(_bf.bfRingSequenceHasNext, self._base_obj)
+            writing_ended = _get(_bf.bfRingWritingEnded,    self._ring.obj)
+        finally:
+            _check( _bf.bfRingUnlock(self._ring.obj) )
+        return bool(has_next) or bool(writing_ended)
+    def _frames_available(self, frame_offset: int, nframe: int) -> bool:
+        nbyte_committed, finished, _ = self._get_committed()
+        frame_nbyte = self.tensor['frame_nbyte']
+        return finished or nbyte_committed >= (frame_offset + nframe) * frame_nbyte
+    async def aread(self, nframe: int, stride: Optional[int]=None, begin: int=0) -> "ReadSpan":
+        """Asynchronous version of read() for use with 'async for'"""
+        if stride is None:
+            stride = nframe
+        offset = begin
+        while True:
+            await self._ring._wait_until(
+                lambda: self._frames_available(offset, nframe))
+            try:
+                ispan = self.acquire(offset, nframe)
+            except EndOfDataStop:
+                return
+            with ispan:
+                yield ispan
+                offset += stride
+    def tap(self, nframe: int, poll_interval: float=0.01) -> "ReadSpan":
+        """Yields the newest `nframe` committed frames of the sequence
+        whenever new data are committed, until the sequence has finished
+        (see Ring.tap). The sequence must not hold a guarantee.
+        """
+        if self.guarantee:
+            raise ValueError("Taps require a sequence opened with guarantee=False")
+        frame_nbyte = self.tensor['frame_nbyte']
+        prev_nframe_committed = 0
+        while True:
+            nbyte_committed, finished, contiguous_span = self._get_committed()
+            nframe_committed = nbyte_committed // frame_nbyte
+            if nframe_committed > prev_nframe_committed:
+                prev_nframe_committed = nframe_committed
+                ntap = min(nframe, contiguous_span // frame_nbyte,
+                           nframe_committed)
+                try:
+                    span = self.acquire(nframe_committed - ntap, ntap)
+                except EndOfDataStop:
+                    # The sequence has finished and been overwritten
+                    return
+                with span:
+                    yield span
+            elif finished:
+                return
+            else:
+                time.sleep(poll_interval)
     def resize(self, gulp_nframe: int, buf_nframe: Optional[int]=None, buffer_factor: Optional[int]=None) -> None:
         if buf_nframe is None:
             if buffer_factor is None:
@@ -320,11 +921,17 @@ class ReadSequence(SequenceBase):
     @property
     def header(self) -> Dict[str,Any]:
         hdr = super(ReadSequence, self).header
-        if self.header_transform is not None:
-            hdr = self.header_transform(deepcopy(hdr))
-            if hdr is None:
-                raise ValueError("Header transform returned None")
-        return hdr
+        if self.header_transform is None:
+            return hdr
+        # Note: The transform is only applied once per sequence
+        if (self._transformed_header is not None and
+            self._transformed_header[0] is hdr):
+            return self._transformed_header[1]
+        transformed = self.header_transform(deepcopy(hdr))
+        if transformed is None:
+            raise ValueError("Header transform returned None")
+        self._transformed_header = (hdr, transformed)
+        return transformed
 
 def accumulate(vals: Iterable, op: str='+', init: Optional=None, reverse: bool=False) -> List:
     if   op == '+':   op = lambda a, b: a + b
@@ -344,18 +951,132 @@ def accumulate(vals: Iterable, op: str='+', init: Optional=None, reverse: bool=F
         results = list(reversed(results))
     return results
 
+class SequenceSelector(object):
+    """Waits for whichever of several read sequences first has data available
+
+    This allows a single thread to wait on many rings at once (e.g., to merge
+    inputs that arrive with different latencies) instead of reading them in
+    lockstep. The rings are watched using event file descriptors, so this is
+    only supported on Linux.
+
+    Args:
+        sequences: The ReadSequences to wait on (from any rings).
+    """
+    def __init__(self, sequences: List["ReadSequence"]):
+        self.sequences = list(sequences)
+        # Note: Sequences in the same ring (or views of it) share a descriptor
+        self._fds = {}
+        for seq in self.sequences:
+            ring = seq.ring
+            if id(ring.obj) not in self._fds:
+                self._fds[id(ring.obj)] = (ring, ring._open_event_fd())
+        self._next_index = 0
+    def close(self) -> None:
+        for ring, fd in self._fds.values():
+            ring._close_event_fd(fd)
+        self._fds = {}
+    def __enter__(self) -> "SequenceSelector":
+        return self
+    def __exit__(self, type, value, tb) -> None:
+        self.close()
+    def select(self, frame_offsets: List[int], nframes: List[Optional[int]],
+               timeout: Optional[float]=None) -> Optional[int]:
+        """Waits until a span can be acquired from one of the sequences without
+        blocking, and returns its index
+
+        Args:
+            frame_offsets: The frame offset of the next span of each sequence.
+            nframes:       The no. frames in the next span of each sequence, or
+                             None to ignore a sequence.
+            timeout:       Max time to wait in seconds (default: forever).
+
+        Returns:
+            The index of a sequence that has `nframes[i]` frames committed
+            from `frame_offsets[i]`, or that has finished (in which case
+            acquire may raise EndOfDataStop), or None if the timeout expired.
+            When several sequences are ready, they are chosen in turn so that
+            none is starved.
+        """
+        if all(nframe is None for nframe in nframes):
+            raise ValueError("At least one sequence must be selected")
+        fds = [fd for _, fd in self._fds.values()]
+        deadline = None if timeout is None else time.time() + timeout
+        nseq = len(self.sequences)
+        while True:
+            # Note: The descriptors are cleared before the sequences are
+            #         checked so that no change of state can be missed.
+            for fd in fds:
+                _clear_event_fd(fd)
+            for k in range(nseq):
+                i = (self._next_index + k) % nseq
+                if nframes[i] is None:
+                    continue
+                if self.sequences[i]._frames_available(frame_offsets[i], nframes[i]):
+                    self._next_index = (i + 1) % nseq
+                    return i
+            remaining = None
+            if deadline is not None:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return None
+            select.select(fds, [], [], remaining)
+
+#: Max no. data views cached per sequence (see _SpanLayout)
+MAX_CACHED_SPAN_VIEWS = 64
+
+class _SpanLayout(object):
+    """Describes the data of the spans of a sequence
+
+    This is computed once per sequence, rather than once per span. It also
+    caches the ndarray views of span data, which are reused whenever a span
+    lands at the same place in the ring (as they do when gulps divide the
+    ring's span).
+    """
+    __slots__ = ['tensor', 'frame_nbyte', 'ringlet_shape', 'frame_shape',
+                 'dtype', 'frame_strides', 'ringlet_factors', 'views']
+    def __init__(self, tensor: Dict[str,Any]):
+        self.tensor        = tensor
+        self.frame_nbyte   = tensor['frame_nbyte']
+        self.ringlet_shape = list(tensor['ringlet_shape'])
+        self.frame_shape   = list(tensor['frame_shape'])
+        self.dtype         = tensor['dtype']
+        strides = [tensor['dtype_nbyte']]
+        for dim in reversed(self.frame_shape):
+            strides.append(dim * strides[-1])
+        self.frame_strides = list(reversed(strides))
+        # The ringlet dims' strides are multiples of the ring's stride
+        factors = [1]
+        for dim in reversed(self.ringlet_shape[1:]):
+            factors.append(dim * factors[-1])
+        self.ringlet_factors = list(reversed(factors)) if self.ringlet_shape else []
+        self.views = {}
+    def shape(self, nframe: int) -> List[int]:
+        return self.ringlet_shape + [nframe] + self.frame_shape
+    def strides(self, stride_bytes: int) -> List[int]:
+        return [stride_bytes * f for f in self.ringlet_factors] + self.frame_strides
+
 class SpanBase(object):
+    """A region of a sequence's data
+
+    Note: ReadSequence.acquire and WriteSequence.reserve reuse span objects
+    once they have been released, so a span must not be used after it has
+    been released.
+    """
+    __slots__ = ['_ring', '_sequence', 'writeable', '_base_obj', '_info', '_data']
     def __init__(self, ring: Ring, sequence: SequenceBase, writeable: bool):
         self._ring     = ring
         self._sequence = sequence
         self.writeable = writeable
+        self._info = None
         self._data = None
     def _set_base_obj(self, obj):
         self._base_obj = ctypes.cast(obj, _bf.BFspan)
         self._cache_info()
     def _cache_info(self):
-        self._info = _bf.BFspan_info()
+        if self._info is None:
+            self._info = _bf.BFspan_info()
         _check(_bf.bfRingSpanGetInfo(self._base_obj, self._info))
+        self._data = None
     @property
     def ring(self) -> Ring:
         return self._ring
@@ -375,7 +1096,7 @@ class SpanBase(object):
         return int(self._info.stride)
     @property
     def frame_nbyte(self) -> int:
-        return self._sequence.tensor['frame_nbyte']
+        return self._sequence._span_layout.frame_nbyte
     @property
     def frame_offset(self) -> int:
         
@@ -389,8 +1110,9 @@ class SpanBase(object):
         
         # **TODO: Change back-end to use long instead of uint64_t
         byte_offset = int(self._info.offset)
-        assert(byte_offset % self.frame_nbyte == 0)
-        return byte_offset // self.frame_nbyte
+        frame_nbyte = self.frame_nbyte
+        assert(byte_offset % frame_nbyte == 0)
+        return byte_offset // frame_nbyte
     @property
     def _nringlet(self):
         # **TODO: Change back-end to use long instead of uint64_t
@@ -401,69 +1123,62 @@ class SpanBase(object):
     @property
     def nframe(self) -> int:
         size_bytes = self._size_bytes
-        assert(size_bytes % self.sequence.tensor['frame_nbyte'] == 0)
-        nframe  = size_bytes // self.sequence.tensor['frame_nbyte']
-        return nframe
+        frame_nbyte = self.frame_nbyte
+        assert(size_bytes % frame_nbyte == 0)
+        return size_bytes // frame_nbyte
     @property
     def shape(self) -> Union[List[int],Tuple[int]]:
-        shape = (self._sequence.tensor['ringlet_shape'] +
-                 [self.nframe] +
-                 self._sequence.tensor['frame_shape'])
-        return shape
+        return self._sequence._span_layout.shape(self.nframe)
     @property
     def strides(self) -> List[int]:
-        tensor = self._sequence.tensor
-        strides = [tensor['dtype_nbyte']]
-        for dim in reversed(tensor['frame_shape']):
-            strides.append(dim * strides[-1])
-        if len(tensor['ringlet_shape']) > 0:
-            strides.append(self._stride_bytes) # First ringlet dimension
-        for dim in reversed(tensor['ringlet_shape'][1:]):
-            strides.append(dim * strides[-1])
-        strides = list(reversed(strides))
-        return strides
+        return self._sequence._span_layout.strides(self._stride_bytes)
     @property
     def dtype(self) -> Union[str,np.dtype]:
-        return self._sequence.tensor['dtype']
+        return self._sequence._span_layout.dtype
     @property
     def data(self) -> ndarray:
-
-        # TODO: This function used to be super slow due to pyclibrary calls
-        #         Check whether it still is!
-
         if self._data is not None:
             return self._data
-        data_ptr = self._data_ptr
-
-        space = self.ring.space
-        # **TODO: Need to integrate support for endianness and conjugatedness
-        #         Also need support in headers for units of the actual values,
-        #           in addition to the axis scales.
-        data_array = ndarray(space=space,
-                             shape=self.shape,
-                             strides=self.strides,
-                             buffer=data_ptr,
-                             dtype=self.dtype)
-        data_array.flags['WRITEABLE'] = self.writeable
-        
+        layout = self._sequence._span_layout
+        info = self._info
+        key = (info.data, info.size, info.stride, self.writeable)
+        data_array = layout.views.get(key, None)
+        if data_array is None:
+            space = self.ring.space
+            # **TODO: Need to integrate support for endianness and conjugatedness
+            #         Also need support in headers for units of the actual values,
+            #           in addition to the axis scales.
+            data_array = ndarray(space=space,
+                                 shape=self.shape,
+                                 strides=self.strides,
+                                 buffer=self._data_ptr,
+                                 dtype=layout.dtype)
+            data_array.flags['WRITEABLE'] = self.writeable
+            if len(layout.views) >= MAX_CACHED_SPAN_VIEWS:
+                layout.views.clear()
+            layout.views[key] = data_array
+        self._data = data_array
         return data_array
 
 class WriteSpan(SpanBase):
+    __slots__ = ['obj', 'commit_nframe']
     def __init__(self,
                  ring: Ring,
                  sequence: WriteSequence,
                  nframe: int,
                  nonblocking: bool=False):
         SpanBase.__init__(self, ring, sequence, writeable=True)
-        nbyte = nframe * self._sequence.tensor['frame_nbyte']
         self.obj = _bf.BFwspan()
-        _check(_bf.bfRingSpanReserve(self.obj, ring.obj, nbyte, nonblocking))
+        self._reserve(nframe, nonblocking)
+        # TODO: Why do exceptions here not show up properly?
+        #raise ValueError("SHOW ME THE ERROR")
+    def _reserve(self, nframe: int, nonblocking: bool) -> None:
+        nbyte = nframe * self._sequence._span_layout.frame_nbyte
+        _check(_bf.bfRingSpanReserve(self.obj, self._ring.obj, nbyte, nonblocking))
         self._set_base_obj(self.obj)
         # Note: We default to 0 instead of nframe so that we don't accidentally
         #         commit bogus data if a block throws an exception.
         self.commit_nframe = 0
-        # TODO: Why do exceptions here not show up properly?
-        #raise ValueError("SHOW ME THE ERROR")
     def commit(self, nframe: int) -> None:
         assert(nframe <= self.nframe)
         self.commit_nframe = nframe
@@ -472,20 +1187,26 @@ class WriteSpan(SpanBase):
     def __exit__(self, type, value, tb):
         self.close()
     def close(self) -> None:
-        commit_nbyte = self.commit_nframe * self._sequence.tensor['frame_nbyte']
+        commit_nbyte = self.commit_nframe * self._sequence._span_layout.frame_nbyte
         _check(_bf.bfRingSpanCommit(self.obj, commit_nbyte))
+        self._sequence._free_span = self
 
 class ReadSpan(SpanBase):
+    __slots__ = ['obj', 'nframe_skipped', 'requested_frame_offset']
     def __init__(self, sequence: ReadSequence, frame_offset: int, nframe: int):
         SpanBase.__init__(self, sequence.ring, sequence, writeable=False)
-        tensor = sequence.tensor
         self.obj = _bf.BFrspan()
+        self._acquire(frame_offset, nframe)
+    def _acquire(self, frame_offset: int, nframe: int) -> None:
+        sequence = self._sequence
+        frame_nbyte = sequence._span_layout.frame_nbyte
         _check(_bf.bfRingSpanAcquire(
             self.obj,
             sequence.obj,
-            frame_offset * tensor['frame_nbyte'],
-            nframe * tensor['frame_nbyte']))
+            frame_offset * frame_nbyte,
+            nframe * frame_nbyte))
         self._set_base_obj(self.obj)
+        sequence._nbyte_acquired = (frame_offset + nframe) * frame_nbyte
         self.nframe_skipped = min(self.frame_offset - frame_offset, nframe)
         self.requested_frame_offset = frame_offset
     @property
@@ -501,3 +1222,4 @@ class ReadSpan(SpanBase):
         self.release()
     def release(self) -> None:
         _check(_bf.bfRingSpanRelease(self.obj))
+        self._sequence._free_span = self
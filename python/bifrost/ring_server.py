@@ -0,0 +1,399 @@
+# Copyright (c) 2016-2023, The Bifrost Authors. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# * Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the distribution.
+# * Neither the name of The Bifrost Authors nor the names of its
+#   contributors may be used to endorse or promote products derived
+#   from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS ``AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED.  IN NO EVENT SHALL THE COPYRIGHT OWNER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY
+# OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""
+Access to rings that live in another process.
+
+The process that owns a ring (i.e., the one that writes to it) runs
+serve_ring_reader() for each remote reader, and the reader accesses the ring
+through a RemoteRing proxy. Only the control operations (opening sequences,
+acquiring and releasing spans) are forwarded over the connection; span data
+are read directly from the ring's shared memory (see Ring.shared) without
+being copied.
+
+Unrelated processes can find a ring by name: the owner publishes it with
+RingPublisher, and readers call attach_ring() with the same name. Each reader
+gets full sequence, span and guarantee semantics, and any guarantee it holds
+is released if it exits, so readers can be restarted independently of the
+writer.
+"""
+
+from bifrost.libbifrost import _bf, EndOfDataStop
+from bifrost.ring2 import SequenceBase, ReadSequence, SpanBase, ReadSpan
+
+import os
+import glob
+import mmap
+import time
+import socket
+import threading
+import numpy as np
+from multiprocessing.connection import Listener, Client
+
+from typing import Any, Callable, Dict, Optional
+
+from bifrost import telemetry
+telemetry.track_module()
+
+__all__ = ['RemoteRing', 'RingPublisher', 'attach_ring', 'serve_ring_reader',
+           'unlink_shared_memory']
+
+SHM_DIR = '/dev/shm'
+
+def _ring_address(name: str) -> str:
+    if not name or '/' in name or '\0' in name:
+        raise ValueError(f"Invalid ring name '{name}'")
+    return os.path.join(SHM_DIR, f"bifrost_ring_{name}.sock")
+
+def _sequence_info(seq: ReadSequence) -> Dict[str,Any]:
+    return {'name':     seq.name,
+            'time_tag': seq.time_tag,
+            'nringlet': seq.nringlet,
+            'header':   SequenceBase.header.fget(seq)}
+
+def serve_ring_reader(ring: "bifrost.ring2.Ring", conn: Any) -> None:
+    """Services requests from a RemoteRing until it detaches
+
+    Args:
+        ring: The (shared) ring being read.
+        conn: The server end of a multiprocessing connection.
+    """
+    seq  = None
+    span = None
+    # Note: Releases are not acknowledged, so any error is deferred until
+    #         the next request.
+    deferred_error = None
+    try:
+        while True:
+            request = conn.recv()
+            cmd, args = request[0], request[1:]
+            if cmd == 'detach':
+                break
+            if cmd == 'release':
+                try:
+                    span.release()
+                except Exception as e:
+                    deferred_error = e
+                span = None
+                continue
+            try:
+                if deferred_error is not None:
+                    raise deferred_error
+                if cmd == 'describe':
+                    result = {'name':  ring.name,
+                              'space': ring.space}
+                elif cmd == 'open':
+                    which, name, time_tag, guarantee = args
+                    seq = ReadSequence(ring, which=which, name=name,
+                                       time_tag=time_tag, guarantee=guarantee)
+                    result = _sequence_info(seq)
+                elif cmd == 'increment':
+                    seq.increment()
+                    result = _sequence_info(seq)
+                elif cmd == 'close':
+                    seq.close()
+                    seq = None
+                    result = None
+                elif cmd == 'resize':
+                    result = seq.resize(*args)
+                elif cmd == 'acquire':
+                    frame_offset, nframe = args
+                    span = seq.acquire(frame_offset, nframe)
+                    shm_name, base, nbyte = ring._get_shared_memory()
+                    result = {'shm_name':    shm_name,
+                              'shm_nbyte':   nbyte,
+                              'data_offset': span._info.data - base,
+                              'size':        span._info.size,
+                              'stride':      span._info.stride,
+                              'offset':      span._info.offset,
+                              'nringlet':    span._info.nringlet}
+                elif cmd == 'overwritten':
+                    result = span.nframe_overwritten
+                else:
+                    raise ValueError(f"Invalid ring request '{cmd}'")
+            except Exception as e:
+                deferred_error = None
+                conn.send(('raise', e))
+            else:
+                conn.send(('ok', result))
+    except (EOFError, ConnectionError):
+        # The reader has exited
+        pass
+    finally:
+        if span is not None:
+            span.release()
+        if seq is not None:
+            seq.close()
+
+class _SharedMapping(object):
+    """A read-only mapping of a ring's shared memory object"""
+    def __init__(self, name: str, nbyte: int):
+        self.name = name
+        fd = os.open(os.path.join(SHM_DIR, name.lstrip('/')), os.O_RDONLY)
+        try:
+            self._mmap = mmap.mmap(fd, nbyte, prot=mmap.PROT_READ)
+        finally:
+            os.close(fd)
+        self._array = np.frombuffer(self._mmap, dtype=np.uint8)
+        self.address = self._array.ctypes.data
+    def close(self) -> None:
+        # Note: Any arrays still referring to the mapping become invalid here,
+        #         just as they would if the ring were reallocated.
+        self._array = None
+        self._mmap.close()
+
+class RemoteRing(object):
+    """Proxy for reading a ring that is written by another process
+
+    This supports the subset of the Ring interface that is used by readers,
+    with header transforms (views) applied on the reading side.
+
+    Args:
+        ring: The process's copy of the ring being read, or None if the ring
+                was created by an unrelated process (see attach_ring).
+        conn: The client end of a connection to serve_ring_reader.
+    """
+    def __init__(self, ring: Optional["bifrost.ring2.Ring"], conn: Any):
+        self.is_view = False
+        self._conn = conn
+        self._mapping = None
+        if ring is None:
+            info = self._request('describe')
+            self.base = None
+            self.space = info['space']
+            self.owner = None
+            self.header_transform = None
+            self._name = info['name']
+        else:
+            self.base = ring
+            self.space = ring.space
+            self.owner = ring.owner
+            self.header_transform = ring.header_transform
+            self._name = ring.name
+    @property
+    def name(self) -> str:
+        return self._name
+    def _request(self, *request: Any) -> Any:
+        self._conn.send(request)
+        status, result = self._conn.recv()
+        if status == 'raise':
+            raise result
+        return result
+    def _notify(self, *request: Any) -> None:
+        self._conn.send(request)
+    def _get_data_address(self, shm_name: str, nbyte: int, offset: int) -> int:
+        if self._mapping is None or self._mapping.name != shm_name:
+            # The ring has been (re)allocated since the last span
+            if self._mapping is not None:
+                self._mapping.close()
+            self._mapping = _SharedMapping(shm_name, nbyte)
+        return self._mapping.address + offset
+    def detach(self) -> None:
+        """Tells the owning process that this reader has finished"""
+        self._notify('detach')
+        if self._mapping is not None:
+            self._mapping.close()
+            self._mapping = None
+    def open_sequence(self, name: str, guarantee: bool=True) -> "RemoteReadSequence":
+        return RemoteReadSequence(self, name=name, guarantee=guarantee)
+    def open_sequence_at(self, time_tag: int, guarantee: bool=True) -> "RemoteReadSequence":
+        return RemoteReadSequence(self, which='at', time_tag=time_tag, guarantee=guarantee)
+    def open_latest_sequence(self, guarantee: bool=True) -> "RemoteReadSequence":
+        return RemoteReadSequence(self, which='latest', guarantee=guarantee)
+    def open_earliest_sequence(self, guarantee: bool=True) -> "RemoteReadSequence":
+        return RemoteReadSequence(self, which='earliest', guarantee=guarantee)
+    def read(self, whence: str='earliest', guarantee: bool=True) -> "RemoteReadSequence":
+        with RemoteReadSequence(self, which=whence, guarantee=guarantee,
+                                header_transform=self.header_transform) as cur_seq:
+            while True:
+                try:
+                    yield cur_seq
+                    cur_seq.increment()
+                except EndOfDataStop:
+                    return
+
+class RemoteReadSequence(ReadSequence):
+    def __init__(self, ring: RemoteRing, which: str='specific', name: str="",
+                 time_tag: Optional[int]=None, guarantee: bool=True,
+                 header_transform: Optional[Callable]=None):
+        SequenceBase.__init__(self, ring)
+        self.header_transform = header_transform
+        self.guarantee = guarantee
+        self._set_info(ring._request('open', which, name, time_tag, guarantee))
+    def _set_info(self, info: Dict[str,Any]) -> None:
+        self._info = info
+        self._header = info['header']
+        self._tensor = None
+    @property
+    def name(self) -> str:
+        return self._info['name']
+    @property
+    def time_tag(self) -> int:
+        return self._info['time_tag']
+    @property
+    def nringlet(self) -> int:
+        return self._info['nringlet']
+    def close(self) -> None:
+        self._ring._request('close')
+    def increment(self) -> None:
+        self._set_info(self._ring._request('increment'))
+    def acquire(self, frame_offset: int, nframe: int) -> "RemoteReadSpan":
+        return RemoteReadSpan(self, frame_offset, nframe)
+    def resize(self, gulp_nframe: int, buf_nframe: Optional[int]=None, buffer_factor: Optional[int]=None) -> None:
+        return self._ring._request('resize', gulp_nframe, buf_nframe, buffer_factor)
+
+class RemoteReadSpan(ReadSpan):
+    def __init__(self, sequence: RemoteReadSequence, frame_offset: int, nframe: int):
+        SpanBase.__init__(self, sequence.ring, sequence, writeable=False)
+        ring = sequence.ring
+        info = ring._request('acquire', frame_offset, nframe)
+        self._info = _bf.BFspan_info()
+        self._info.data = ring._get_data_address(info['shm_name'],
+                                                 info['shm_nbyte'],
+                                                 info['data_offset'])
+        self._info.size     = info['size']
+        self._info.stride   = info['stride']
+        self._info.offset   = info['offset']
+        self._info.nringlet = info['nringlet']
+        self.nframe_skipped = min(self.frame_offset - frame_offset, nframe)
+        self.requested_frame_offset = frame_offset
+    @property
+    def nframe_overwritten(self) -> int:
+        if self._sequence.guarantee:
+            # Guaranteed spans can never be overwritten
+            return 0
+        return self._ring._request('overwritten')
+    def release(self) -> None:
+        self._ring._notify('release')
+
+class RingPublisher(object):
+    """Serves a ring to readers in other processes that attach to it by name
+
+    The ring must be in system space and must be published before its memory
+    is first allocated (i.e., before it is resized or written to), so that
+    the allocation is made in shared memory.
+
+    Args:
+        ring: The ring to publish.
+        name: The name that readers attach to. Defaults to the ring's name.
+    """
+    def __init__(self, ring: "bifrost.ring2.Ring", name: Optional[str]=None):
+        if ring.space != 'system':
+            raise ValueError(f"Ring {ring.name} must be in system space to be published")
+        self.ring = ring
+        self.name = name or ring.name
+        self._address = _ring_address(self.name)
+        if os.path.exists(self._address):
+            self._remove_stale_address()
+        if not ring.shared:
+            ring.shared = True
+        self._closed = False
+        self._listener = Listener(self._address, family='AF_UNIX')
+        os.chmod(self._address, 0o600)
+        self._thread = threading.Thread(target=self._accept_readers,
+                                        name=f"publish_{self.name}")
+        self._thread.daemon = True
+        self._thread.start()
+    def _remove_stale_address(self) -> None:
+        sock = socket.socket(socket.AF_UNIX)
+        try:
+            sock.connect(self._address)
+        except ConnectionRefusedError:
+            # Left behind by a process that did not exit cleanly
+            os.unlink(self._address)
+            return
+        finally:
+            sock.close()
+        raise ValueError(f"A ring named '{self.name}' is already published")
+    def _accept_readers(self) -> None:
+        while True:
+            try:
+                conn = self._listener.accept()
+            except OSError:
+                break
+            if self._closed:
+                conn.close()
+                break
+            server = threading.Thread(target=serve_ring_reader,
+                                      args=(self.ring, conn),
+                                      name=f"serve_{self.name}")
+            server.daemon = True
+            server.start()
+    def close(self) -> None:
+        """Stops accepting new readers
+
+        Readers that are already attached continue to be served.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        # Note: Closing the listener does not interrupt a blocking accept, so
+        #         the accepting thread is woken with a dummy connection.
+        try:
+            Client(self._address, family='AF_UNIX').close()
+        except OSError:
+            pass
+        self._thread.join()
+        self._listener.close()
+    def __enter__(self) -> "RingPublisher":
+        return self
+    def __exit__(self, type, value, tb) -> None:
+        self.close()
+
+def attach_ring(name: str, timeout: Optional[float]=0.) -> RemoteRing:
+    """Attaches to a ring published by another process (see RingPublisher)
+
+    Args:
+        name:    The name that the ring was published under.
+        timeout: Seconds to wait for the ring to be published, or None to
+                   wait indefinitely.
+
+    Returns:
+        A RemoteRing, which must be detached when it is no longer needed.
+    """
+    address = _ring_address(name)
+    deadline = None if timeout is None else time.time() + timeout
+    while True:
+        try:
+            conn = Client(address, family='AF_UNIX')
+            break
+        except (FileNotFoundError, ConnectionRefusedError):
+            if deadline is not None and time.time() >= deadline:
+                raise ValueError(f"No ring named '{name}' is published")
+            time.sleep(0.01)
+    return RemoteRing(None, conn)
+
+def unlink_shared_memory(pid: int) -> None:
+    """Removes any ring shared memory objects left behind by process `pid`
+
+    This is used to clean up after processes that exited without destroying
+    their rings.
+    """
+    for filename in glob.glob(os.path.join(SHM_DIR, f"bifrost_{pid}_*")):
+        try:
+            os.unlink(filename)
+        except OSError:
+            pass
@@ -0,0 +1,157 @@
+# Copyright (c) 2016-2023, The Bifrost Authors. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# * Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the distribution.
+# * Neither the name of The Bifrost Authors nor the names of its
+#   contributors may be used to endorse or promote products derived
+#   from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS ``AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED.  IN NO EVENT SHALL THE COPYRIGHT OWNER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY
+# OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""
+Triggered snapshots of ring contents to disk.
+
+A snapshot (e.g., a 'voltage dump' triggered by a transient detection)
+freezes a range of frames in a ring and streams them to disk in a background
+thread using the same file format as SerializeBlock, so that the result can
+be read back with bifrost.blocks.deserialize. Processing of the ring
+continues while the snapshot is written.
+
+The range is protected by a guarantee that is opened as soon as the snapshot
+is triggered and is then moved forward as each gulp is written, so frames
+that were still in the ring when the trigger happened are never lost. Note
+that this means the ring's writer will stall if the snapshot falls a whole
+ring buffer behind it (e.g., when writing to a slow disk); size the ring
+accordingly.
+"""
+
+from bifrost.libbifrost import EndOfDataStop
+from bifrost.blocks.serialize import BifrostWriter
+from bifrost.memory import space_accessible
+from copy import deepcopy
+
+import os
+import threading
+
+from typing import Optional
+
+from bifrost import telemetry
+telemetry.track_module()
+
+__all__ = ['RingSnapshot']
+
+class RingSnapshot(object):
+    """Writes a range of frames from a ring to disk in a background thread
+
+    See Ring.snapshot for a description of the arguments.
+
+    The output files are named '<basename>.bf.*', where `basename` is the
+    sequence's name (or time tag) followed by the first frame offset of the
+    snapshot. The frame-axis scale in the written header is adjusted so that
+    it refers to the first frame in the snapshot.
+    """
+    def __init__(self, ring, path: str, frame_offset: int=0,
+                 nframe: Optional[int]=None, time_tag: Optional[int]=None,
+                 name: Optional[str]=None, gulp_nframe: Optional[int]=None,
+                 max_file_size: Optional[int]=None):
+        if not space_accessible(ring.space, ['system']):
+            raise ValueError(f"Cannot snapshot a ring in space '{ring.space}'")
+        if name is not None and time_tag is not None:
+            raise ValueError("Only one of name and time_tag may be specified")
+        if nframe is not None and nframe < 0:
+            raise ValueError("nframe must not be negative")
+        if gulp_nframe is not None and gulp_nframe <= 0:
+            raise ValueError("gulp_nframe must be positive")
+        # Note: The guarantee is opened here rather than in the writer thread
+        #         so that the ring's contents are frozen at the trigger time
+        if name is not None:
+            seq = ring.open_sequence(name, guarantee=True)
+        elif time_tag is not None:
+            seq = ring.open_sequence_at(time_tag, guarantee=True)
+        else:
+            seq = ring.open_latest_sequence(guarantee=True)
+        try:
+            frame_nbyte = seq.tensor['frame_nbyte']
+            nbyte_committed, _, contiguous_span = seq._get_committed()
+            if frame_offset < 0:
+                nframe_committed = nbyte_committed // frame_nbyte
+                frame_offset = max(nframe_committed + frame_offset, 0)
+            max_gulp_nframe = max(contiguous_span // frame_nbyte, 1)
+            if gulp_nframe is None:
+                gulp_nframe = max_gulp_nframe
+            self.gulp_nframe = min(gulp_nframe, max_gulp_nframe)
+            header = deepcopy(seq.header)
+            tensor = header['_tensor']
+            frame_axis = tensor['shape'].index(-1)
+            if 'scales' in tensor and tensor['scales'][frame_axis] is not None:
+                tensor['scales'][frame_axis][0] += \
+                    frame_offset * tensor['scales'][frame_axis][1]
+            seq_name = header['name'] or '%020i' % header['time_tag']
+            basename = '%s_%012i' % (os.path.basename(seq_name), frame_offset)
+            self.basename = os.path.join(path, basename) + '.bf'
+            writer = BifrostWriter(self.basename[:-3], header, max_file_size)
+        except Exception:
+            seq.close()
+            raise
+        self.frame_offset = frame_offset
+        self.nframe = nframe
+        self.nframe_written = 0
+        self.nframe_skipped = 0
+        self.error = None
+        self._sequence = seq
+        self._writer = writer
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+    def _run(self) -> None:
+        try:
+            with self._sequence, self._writer:
+                offset = self.frame_offset
+                end = None if self.nframe is None else offset + self.nframe
+                while end is None or offset < end:
+                    nframe = self.gulp_nframe
+                    if end is not None:
+                        nframe = min(nframe, end - offset)
+                    try:
+                        span = self._sequence.acquire(offset, nframe)
+                    except EndOfDataStop:
+                        break
+                    with span:
+                        # Note: Frames can only be skipped at the start, if
+                        #         they were overwritten before the trigger
+                        self.nframe_skipped += span.nframe_skipped
+                        if span.nframe:
+                            self._writer.write(span.frame_offset - self.frame_offset,
+                                               span.data)
+                            self.nframe_written += span.nframe
+                    if span.nframe_skipped + span.nframe < nframe:
+                        # The sequence has ended
+                        break
+                    offset += nframe
+        except Exception as e:
+            self.error = e
+    @property
+    def done(self) -> bool:
+        return not self._thread.is_alive()
+    def wait(self, timeout: Optional[float]=None) -> bool:
+        """Waits for the snapshot to finish, re-raising any error that occurred
+        while writing it. Returns whether it has finished."""
+        self._thread.join(timeout)
+        if self.error is not None:
+            raise self.error
+        return self.done
@@ -93,9 +93,24 @@ BFstatus bfMap(int                  ndim,
 
 BFstatus bfMapClearCache();
 
+/*! \p bfMapSetCacheLimits sets the size limits of the on-disk map kernel
+ *     caches. When a newly-compiled kernel takes a cache over either limit,
+ *     its least-recently-loaded entries (i.e., those least recently compiled
+ *     or loaded from disk by any process) are evicted.
+ *
+ *  \param max_entries The maximum number of kernels in each cache, or 0 for no limit
+ *  \param max_nbyte   The maximum size in bytes of each cache, or 0 for no limit
+ *  \note The defaults may also be set with the \p BF_MAP_CACHE_MAX_ENTRIES and
+ *        \p BF_MAP_CACHE_MAX_BYTES environment variables.
+ */
+BFstatus bfMapSetCacheLimits(long max_entries, long max_nbyte);
+BFstatus bfMapGetCacheLimits(long* max_entries, long* max_nbyte);
+
 #define BF_MAP_KERNEL_CACHE_SIZE 128
 #define BF_MAP_KERNEL_DISK_CACHE_SUBDIR "map_cache"
 #define BF_MAP_KERNEL_DISK_CACHE_VERSION_FILE "cache.version"
+#define BF_MAP_KERNEL_DISK_CACHE_MAX_ENTRIES 1024
+#define BF_MAP_KERNEL_DISK_CACHE_MAX_BYTES (512*1024*1024)
 
 #ifdef __cplusplus
 } // extern "C"
@@ -48,9 +48,41 @@ typedef enum BFspace_ {
 	BF_SPACE_CUDA_MANAGED = 4  // cudaMallocManaged
 } BFspace;
 
+/*! \p bfMalloc allocates memory in the given space.
+ * \note Allocations are served from a per-space pool of previously-freed
+ *       blocks where possible. Sizes are rounded up to one of four size
+ *       classes per power of 2, and blocks freed by \p bfFree are kept for
+ *       reuse (first in a small per-thread free list, then in a list shared
+ *       between threads) until the pool holds its limit of idle bytes (see
+ *       \p bfMemoryPoolSetLimit). Allocations too large for the pool go
+ *       directly to the underlying allocator.
+ */
 BFstatus bfMalloc(void** ptr, BFsize size, BFspace space);
 BFstatus bfFree(void* ptr, BFspace space);
 
+/*! Memory pool statistics (see \p bfMemoryPoolGetStats) */
+typedef struct BFmempoolstats_ {
+	BFsize nbyte_in_use; // No. bytes currently allocated with bfMalloc
+	BFsize nbyte_peak;   // Peak value of nbyte_in_use
+	BFsize nbyte_cached; // No. bytes of freed blocks held for reuse
+	BFsize nalloc;       // Total no. calls to bfMalloc
+	BFsize nhit;         // Total no. allocations served from the pool
+} BFmempoolstats;
+BFstatus bfMemoryPoolGetStats(BFspace space, BFmempoolstats* stats);
+/*! \p bfMemoryPoolSetLimit sets the maximum no. bytes of freed blocks that
+ *     the pool for \p space may hold for reuse; 0 disables pooling.
+ * \note The default may also be set with the \p BF_MEMORY_POOL_MAX_BYTES
+ *       environment variable.
+ */
+BFstatus bfMemoryPoolSetLimit(BFspace space, BFsize max_cached_nbyte);
+BFstatus bfMemoryPoolGetLimit(BFspace space, BFsize* max_cached_nbyte);
+/*! \p bfMemoryPoolRelease frees all of the blocks held for reuse in the pool
+ *     for \p space, except those in the free lists of other threads.
+ */
+BFstatus bfMemoryPoolRelease(BFspace space);
+
+#define BF_MEMORY_POOL_MAX_CACHED_NBYTE (256*1024*1024)
+
 BFstatus bfGetSpace(const void* ptr, BFspace* space);
 
 const char* bfGetSpaceString(BFspace space);
@@ -104,6 +104,83 @@ BFstatus bfRingSetAffinity(BFring ring, int  core);
  *        set to a value of -1.
  */
 BFstatus bfRingGetAffinity(BFring ring, int* core);
+/*! \p bfRingSetShared causes subsequent ring memory allocations to be backed
+ *       by named POSIX shared memory so that the buffer can be mapped by
+ *       other processes (see \p bfRingLockedGetSharedName).
+ * \param shared Whether to use shared memory. Only supported for rings in
+ *          system space, and must be set before the ring is first resized.
+ */
+BFstatus bfRingSetShared(BFring ring, BFbool  shared);
+BFstatus bfRingGetShared(BFring ring, BFbool* shared);
+
+/*! Ring memory allocation policy flags (see \p bfRingSetAllocPolicy) */
+typedef enum BFringpolicy_ {
+	BF_RING_POLICY_DEFAULT  = 0,
+	BF_RING_POLICY_THP      = 1 << 0, // Transparent hugepages (madvise)
+	BF_RING_POLICY_HUGETLB  = 1 << 1, // Explicit hugepages (MAP_HUGETLB)
+	BF_RING_POLICY_MLOCK    = 1 << 2, // Lock the buffer into RAM
+	BF_RING_POLICY_PREFAULT = 1 << 3, // Touch every page when allocated
+	BF_RING_POLICY_MIRROR   = 1 << 4  // Map each ringlet's ghost region onto
+	                                  //   its front (no ghost copies)
+} BFringpolicy;
+/*! \p bfRingSetAllocPolicy sets the policy used for subsequent ring memory
+ *       allocations.
+ * \param policy A combination of \p BFringpolicy flags. Hugepages and
+ *          mlock are only supported for rings in system space, and
+ *          prefaulting only for rings in system or cuda_host space.
+ * \note Each flag is applied on a best-effort basis (e.g., explicit
+ *       hugepages fall back to transparent hugepages if none are reserved,
+ *       and mlock may be prevented by RLIMIT_MEMLOCK). Mirroring is only
+ *       supported for rings in system space that are not shared, and only
+ *       when the ghost region is no larger than the ring's total span.
+ *       \p bfRingLockedGetAllocPolicy returns the flags that actually took
+ *       effect for the current allocation.
+ */
+BFstatus bfRingSetAllocPolicy(BFring ring, int  policy);
+BFstatus bfRingGetAllocPolicy(BFring ring, int* policy);
+/*! \p bfRingSetBackingFile causes ring memory allocations to be backed by
+ *       a memory-mapped file at \p path, with the ring's sequences (names,
+ *       time tags, headers and offsets) persisted alongside it in
+ *       \p path.seq, so that the ring's contents survive the process.
+ *       If \p path already holds a ring (e.g., from a process that crashed),
+ *       its buffer and sequences are restored into this ring, as if writing
+ *       had ended; a new writer may then append further sequences.
+ * \param path The file in which to store the ring. Only supported for rings
+ *          in system space that are not shared, and must be set before the
+ *          ring is first resized.
+ * \note Only one ring (in one process) may use a given file at a time.
+ *       Hugepage and mirroring policies do not apply to file-backed rings.
+ */
+BFstatus bfRingSetBackingFile(BFring ring, const char*  path);
+BFstatus bfRingGetBackingFile(BFring ring, const char** path);
+/*! Ring wait policies (see \p bfRingSetWaitPolicy) */
+typedef enum BFringwait_ {
+	BF_RING_WAIT_DEFAULT = -1, // Use the ring's policy (thread policy only)
+	BF_RING_WAIT_BLOCK   =  0, // Sleep until woken (after spinning for spin_ns)
+	BF_RING_WAIT_SPIN    =  1, // Busy-spin until the wait is satisfied
+	BF_RING_WAIT_YIELD   =  2  // Spin for spin_ns, then yield the CPU between
+	                           //   checks until the wait is satisfied
+} BFringwait;
+/*! \p bfRingSetWaitPolicy sets how threads wait for space to write into,
+ *       data to read or new sequences in the ring.
+ * \param policy  A \p BFringwait value (not \p BF_RING_WAIT_DEFAULT).
+ * \param spin_ns How long to spin before sleeping (\p BF_RING_WAIT_BLOCK) or
+ *          yielding (\p BF_RING_WAIT_YIELD); ignored by
+ *          \p BF_RING_WAIT_SPIN.
+ * \note Spinning threads poll the ring without taking its lock, so they
+ *       wake within a fraction of a microsecond instead of the tens of
+ *       microseconds needed to wake a sleeping thread, at the cost of
+ *       keeping their core busy. They are best used on isolated cores.
+ *       The default is \p BF_RING_WAIT_BLOCK with no spinning.
+ */
+BFstatus bfRingSetWaitPolicy(BFring ring, int  policy, BFsize  spin_ns);
+BFstatus bfRingGetWaitPolicy(BFring ring, int* policy, BFsize* spin_ns);
+/*! \p bfRingSetThreadWaitPolicy sets the wait policy used by the calling
+ *       thread for all rings, overriding their own policies. Pass
+ *       \p BF_RING_WAIT_DEFAULT to revert to the rings' policies.
+ */
+BFstatus bfRingSetThreadWaitPolicy(int  policy, BFsize  spin_ns);
+BFstatus bfRingGetThreadWaitPolicy(int* policy, BFsize* spin_ns);
 
 //BFsize   bfRingGetNRinglet(BFring ring);
 // TODO: BFsize bfRingGetSizeBytes
@@ -119,6 +196,72 @@ BFstatus bfRingLockedGetContiguousSpan(BFring ring, BFsize* val);
 BFstatus bfRingLockedGetTotalSpan(BFring ring, BFsize* val);
 BFstatus bfRingLockedGetNRinglet(BFring ring, BFsize* val);
 BFstatus bfRingLockedGetStride(BFring ring, BFsize* val);
+/*! \p bfRingLockedGetSharedName returns the name of the shared memory object
+ *       backing the current ring allocation, or an empty string if the ring
+ *       is not shared or has not yet been allocated.
+ */
+BFstatus bfRingLockedGetSharedName(BFring ring, const char** name);
+BFstatus bfRingLockedGetAllocPolicy(BFring ring, int* policy);
+/*! \p bfRingLockedGetTail, \p bfRingLockedGetHead and
+ *     \p bfRingLockedGetReserveHead return the current byte offsets of the
+ *     oldest data in the ring, the end of the committed data and the end of
+ *     the reserved data respectively.
+ *  \p bfRingLockedGetGuaranteedTail returns the offset of the oldest data
+ *     that is guaranteed to a reader, or the reserve head if there are no
+ *     guarantees. The writer cannot reserve space beyond this offset plus
+ *     the total span of the ring.
+ */
+BFstatus bfRingLockedGetTail(BFring ring, BFoffset* offset);
+BFstatus bfRingLockedGetHead(BFring ring, BFoffset* offset);
+BFstatus bfRingLockedGetReserveHead(BFring ring, BFoffset* offset);
+BFstatus bfRingLockedGetGuaranteedTail(BFring ring, BFoffset* offset);
+/*! \p bfRingLockedGetNSequence returns the no. sequences currently held in
+ *     the ring (i.e., whether opening the earliest or latest sequence would
+ *     block).
+ */
+BFstatus bfRingLockedGetNSequence(BFring ring, BFsize* n);
+
+/*! \p bfRingCreateEventFD returns a new eventfd that is signalled whenever
+ *     the state of the ring changes in a way that may unblock a reader or
+ *     writer (e.g., data are committed or released, or a sequence begins or
+ *     ends). This allows waiting on the ring from an event loop; the caller
+ *     should read the descriptor to reset it, and then re-check whatever it
+ *     is waiting for.
+ *  \p bfRingDestroyEventFD unregisters and closes such a descriptor. Any
+ *     remaining descriptors are closed when the ring is destroyed.
+ * \note Only supported on Linux.
+ */
+BFstatus bfRingCreateEventFD(BFring ring, int* fd);
+BFstatus bfRingDestroyEventFD(BFring ring, int  fd);
+
+/*! Ring monitoring statistics (see \p bfRingGetStats) */
+typedef struct BFringstats_ {
+	BFoffset tail;            // Offset of the oldest data in the ring
+	BFoffset head;            // Offset of the end of the committed data
+	BFoffset reserve_head;    // Offset of the end of the reserved data
+	BFoffset guaranteed_tail; // Offset of the oldest guaranteed data
+	BFsize   span;            // Total capacity of the ring in bytes
+	BFsize   nread_open;      // No. read spans currently open
+	BFsize   nwrite_open;     // No. write spans currently open
+	BFsize   ncommitted;      // Total no. bytes committed
+	BFsize   nskipped;        // Total no. bytes overwritten before readers
+	                          //   could acquire them
+	BFsize   noverwritten;    // Total no. bytes overwritten while readers
+	                          //   held them
+	int      alloc_policy;    // Policy of the current allocation
+	BFsize   nread_wait;      // Total no. times readers waited for data or
+	                          //   sequences
+	BFsize   read_wait_ns;    // Total time readers spent waiting
+	BFsize   nwrite_wait;     // Total no. times writers waited for space or
+	                          //   for earlier spans to be committed
+	BFsize   write_wait_ns;   // Total time writers spent waiting
+} BFringstats;
+/*! \p bfRingGetStats returns a snapshot of the ring's state and counters.
+ * \note This does not take the ring's lock, so it can be called at any rate
+ *       without affecting readers or writers. Each field is individually
+ *       up to date, but the fields are not updated together atomically.
+ */
+BFstatus bfRingGetStats(BFring ring, BFringstats* stats);
 
 // Note: These allow one to ensure that processing is completed before
 //         the ring is destroyed. EndWriting effects an end to the
@@ -177,6 +320,19 @@ BFstatus bfRingSequenceGetTimeTag(BFsequence sequence, BFoffset* time_tag);
 BFstatus bfRingSequenceGetHeader(BFsequence sequence, const void** hdr);
 BFstatus bfRingSequenceGetHeaderSize(BFsequence sequence, BFsize* size);
 BFstatus bfRingSequenceGetNRinglet(BFsequence sequence, BFsize* nringlet);
+/*! \p bfRingSequenceGetBegin and \p bfRingSequenceGetEnd return the byte
+ *     offsets in the ring of the beginning and end of the sequence. The end
+ *     is BFoffset(-1) while the sequence is still being written. These should
+ *     be called while holding the ring's lock (see \p bfRingLock) in order
+ *     to be consistent with \p bfRingLockedGetHead.
+ */
+BFstatus bfRingSequenceGetBegin(BFsequence sequence, BFoffset* offset);
+BFstatus bfRingSequenceGetEnd(BFsequence sequence, BFoffset* offset);
+/*! \p bfRingSequenceHasNext returns whether a following sequence has begun
+ *     (i.e., whether \p bfRingSequenceNext would block if writing has not
+ *     ended). This should be called while holding the ring's lock.
+ */
+BFstatus bfRingSequenceHasNext(BFsequence sequence, BFbool* has_next);
 
 typedef struct BFsequence_info_ {
 	BFring      ring;
@@ -49,17 +49,20 @@ bfMap(3, c.shape, {"dm", "t"},
 #include "ObjectCache.hpp"
 #include "EnvVars.hpp"
 
+#if BF_CUDA_ENABLED
 #include <cuda.h>
 #include <nvrtc.h>
 
-#include "IndexArray.cuh.jit"
 #include "ArrayIndexer.cuh"
-#include "ArrayIndexer.cuh.jit"
 #include "ShapeIndexer.cuh"
-#include "ShapeIndexer.cuh.jit"
 #include "Complex.hpp"
-#include "Complex.hpp.jit"
 #include "Vector.hpp"
+#endif
+
+#include "IndexArray.cuh.jit"
+#include "ArrayIndexer.cuh.jit"
+#include "ShapeIndexer.cuh.jit"
+#include "Complex.hpp.jit"
 #include "Vector.hpp.jit"
 #include "int_fastdiv.h.jit"
 
@@ -77,9 +80,21 @@ using std::endl;
 #include <set>
 #include <mutex>
 
+#include <memory>
+#include <cstdio>     // For popen
+#include <functional> // For std::hash
+
 #include <sys/types.h>
 #include <dirent.h>
+#include <dlfcn.h>    // For dlopen
+#include <unistd.h>   // For getpid
+#include <thread>
+#include <atomic>
+#include <chrono>
+#include <tuple>
+#include <algorithm>
 
+#if BF_CUDA_ENABLED
 #define BF_CHECK_NVRTC(call) \
 	do { \
 		nvrtcResult ret = call; \
@@ -106,21 +121,34 @@ BFstatus bifrost_status(nvrtcResult status) {
 	default: return BF_STATUS_INTERNAL_ERROR;
     }
 }
+#endif // BF_CUDA_ENABLED
 
-BFstatus build_map_kernel(int*                 external_ndim,
-                          long*                external_shape,
-                          long                 block_x_axis,
-                          long                 block_y_axis,
-                          char const*const*    axis_names,
-                          int                  narg,
-                          BFarray const*const* args,
-                          char const*const*    arg_names,
-                          char const*          func_name,
-                          char const*          func,
-                          char const*          extra_code,
-                          bool                 basic_indexing_only,
-                          std::string*         ptx_string,
-                          std::string*         kernel_name_ptr) {
+// Returns whether an argument is passed to the kernel by value
+static bool is_scalar_param(BFarray const* arg) {
+	return (arg->ndim     == 1 &&
+	        arg->shape[0] == 1 &&
+	        arg->immutable &&
+	        space_accessible_from(arg->space, BF_SPACE_SYSTEM));
+}
+
+// Generates the source of a map kernel, either as a CUDA kernel or, if
+//   host=true, as a host function that takes a pointer to each argument (as
+//   for a CUDA kernel launch) and is threaded with OpenMP.
+static BFstatus generate_map_kernel(int*                 external_ndim,
+                                    long*                external_shape,
+                                    long                 block_x_axis,
+                                    long                 block_y_axis,
+                                    char const*const*    axis_names,
+                                    int                  narg,
+                                    BFarray const*const* args,
+                                    char const*const*    arg_names,
+                                    char const*          func_name,
+                                    char const*          func,
+                                    char const*          extra_code,
+                                    bool                 basic_indexing_only,
+                                    bool                 host,
+                                    std::string*         code_string,
+                                    std::string*         kernel_name_ptr) {
 	// Make local copies of ndim and shape to avoid corrupting external copies
 	//   until we know that this function has succeeded.
 	// TODO: This is not very elegant
@@ -149,8 +177,10 @@ BFstatus build_map_kernel(int*                 external_ndim,
 			flatten(args[a], mutable_array_ptrs[a], keep_dims_mask);
 		}
 		args = &mutable_array_ptrs[0];
-	} else {
+	} else if( !host ) {
 		// TODO: This code is duplicated in the main bfMap function below
+		// Note: Host kernels loop over the whole shape instead of over
+		//         thread blocks.
 		if( ndim >= 2 ) {
 			y_size = shape[block_y_axis];
 			shape[block_y_axis] = 1;
@@ -168,6 +198,15 @@ BFstatus build_map_kernel(int*                 external_ndim,
 	}
 	kernel_name += "map_kernel";
 	std::stringstream code;
+	if( host ) {
+		code << "#include <algorithm>\n"
+		        "#include <cmath>\n"
+		        "#define __host__\n"
+		        "#define __device__\n"
+		        "#define __forceinline__ inline __attribute__((always_inline))\n"
+		        "struct __attribute__((aligned(8)))  int2 { int x, y; };\n"
+		        "struct __attribute__((aligned(16))) int4 { int x, y, z, w; };\n";
+	}
 	code << "#include \"Complex.hpp\"" << endl;
 	code << "#include \"Vector.hpp\"" << endl;
 	code << "#include \"ArrayIndexer.cuh\"" << endl;
@@ -176,30 +215,44 @@ BFstatus build_map_kernel(int*                 external_ndim,
 		code << "\n" << extra_code << "\n" << endl;
 	}
 	code << "extern \"C\"\n";
-	code << "__global__\n";
-	code << "void " << kernel_name << "(";
-	for( int a=0; a<narg; ++a ) {
-		std::string ctype_string = dtype2ctype_string(args[a]->dtype);
-		BF_ASSERT(ctype_string.size(), BF_STATUS_INVALID_ARGUMENT);
-		if( args[a]->ndim     == 1 &&
-		    args[a]->shape[0] == 1 &&
-		    args[a]->immutable &&
-		    space_accessible_from(args[a]->space, BF_SPACE_SYSTEM) ) {
-			// Special case for scalar parameters
-			code << "  " << ctype_string
-			     << " const"
-			     << " " << arg_names[a];
-				
-		} else {
-			code << ctype_string
-			     << (args[a]->immutable ? " const" : "")
-			     << "* " << arg_names[a] << "_ptr";
+	if( host ) {
+		code << "void " << kernel_name << "(void* const* _args) {\n";
+		for( int a=0; a<narg; ++a ) {
+			std::string ctype_string = dtype2ctype_string(args[a]->dtype);
+			BF_ASSERT(ctype_string.size(), BF_STATUS_INVALID_ARGUMENT);
+			std::string const_string = args[a]->immutable ? " const" : "";
+			if( is_scalar_param(args[a]) ) {
+				code << "  " << ctype_string << " const " << arg_names[a]
+				     << " = *(" << ctype_string << " const*)_args[" << a << "];\n";
+			} else {
+				code << "  " << ctype_string << const_string << "* "
+				     << arg_names[a] << "_ptr = *(" << ctype_string
+				     << const_string << "**)_args[" << a << "];\n";
+			}
 		}
-		if( a != narg-1 ) {
-			code << ",\n";
+	} else {
+		code << "__global__\n";
+		code << "void " << kernel_name << "(";
+		for( int a=0; a<narg; ++a ) {
+			std::string ctype_string = dtype2ctype_string(args[a]->dtype);
+			BF_ASSERT(ctype_string.size(), BF_STATUS_INVALID_ARGUMENT);
+			if( is_scalar_param(args[a]) ) {
+				// Special case for scalar parameters
+				code << "  " << ctype_string
+				     << " const"
+				     << " " << arg_names[a];
+					
+			} else {
+				code << ctype_string
+				     << (args[a]->immutable ? " const" : "")
+				     << "* " << arg_names[a] << "_ptr";
+			}
+			if( a != narg-1 ) {
+				code << ",\n";
+			}
 		}
+		code << ") {\n";
 	}
-	code << ") {\n";
 	code << "  enum { NDIM = " << ndim << " };\n";
 	code << "  typedef StaticIndexArray<int,";
 	for( int d=0; d<ndim; ++d ) {
@@ -230,9 +283,9 @@ BFstatus build_map_kernel(int*                 external_ndim,
 	// Add a _shape array for the user to use if needed
 	code << "  const int _shape[NDIM] = {";
 	for( int d=0; d<ndim; ++d ) {
-		if( d == block_x_axis && !basic_indexing_only ) {
+		if( d == block_x_axis && !basic_indexing_only && !host ) {
 			code << x_size;
-		} else if( d == block_y_axis && !basic_indexing_only ) {
+		} else if( d == block_y_axis && !basic_indexing_only && !host ) {
 			code << y_size;
 		} else {
 			code << shape[d];
@@ -242,7 +295,12 @@ BFstatus build_map_kernel(int*                 external_ndim,
 		}
 	}
 	code << "}; (void)_shape[0];\n"; // Note: Prevents unused variable warning
-	if( basic_indexing_only ) {
+	if( host ) {
+		code <<
+			"#pragma omp parallel for\n"
+			"  for( int _x=0; _x<_ShapeIndexer::SIZE; ++_x ) {\n"
+			"    auto const& _  = _ShapeIndexer::lift(_x);\n";
+	} else if( basic_indexing_only ) {
 		code <<
 			"  int _x0 = threadIdx.x + blockIdx.x*blockDim.x;\n"
 			"  for( int _x=_x0; _x<_ShapeIndexer::SIZE; _x+=blockDim.x*gridDim.x ) {\n"
@@ -272,10 +330,7 @@ BFstatus build_map_kernel(int*                 external_ndim,
 		code << "    auto const& _  = _composite_index;\n";
 	}
 	for( int a=0; a<narg; ++a ) {
-		if( args[a]->ndim     == 1 &&
-		    args[a]->shape[0] == 1 &&
-		    args[a]->immutable &&
-		    space_accessible_from(args[a]->space, BF_SPACE_SYSTEM) ) {
+		if( is_scalar_param(args[a]) ) {
 			// pass
 		} else {
 			// TODO: De-dupe this with the one above
@@ -302,13 +357,137 @@ BFstatus build_map_kernel(int*                 external_ndim,
 	}
 	code << "    " << func << ";\n";
 	code << "  }\n"; // End _x loop
-	if( !basic_indexing_only ) {
+	if( !basic_indexing_only && !host ) {
 		if( y_size > 1 ) {
 			code << "  }\n"; // End _y loop
 		}
 		code << "  }\n"; // End _z loop
 	}
 	code << "}\n"; // End kernel
+	*code_string = code.str();
+	*kernel_name_ptr = kernel_name;
+	return BF_STATUS_SUCCESS;
+}
+
+// Size limits applied to each on-disk kernel cache; 0 means no limit
+static std::atomic<long> g_disk_cache_max_entries(
+	std::atol(EnvVars::get("BF_MAP_CACHE_MAX_ENTRIES",
+	                       std::to_string(BF_MAP_KERNEL_DISK_CACHE_MAX_ENTRIES)).c_str()));
+static std::atomic<long> g_disk_cache_max_nbyte(
+	std::atol(EnvVars::get("BF_MAP_CACHE_MAX_BYTES",
+	                       std::to_string(BF_MAP_KERNEL_DISK_CACHE_MAX_BYTES)).c_str()));
+
+static long get_file_nbyte(std::string path) {
+	struct stat st;
+	return (::stat(path.c_str(), &st) == 0) ? st.st_size : 0;
+}
+
+static long get_time_us() {
+	return std::chrono::duration_cast<std::chrono::microseconds>(
+		std::chrono::system_clock::now().time_since_epoch()).count();
+}
+
+// Updates the usage statistics of a disk cache entry, which are stored
+//   alongside it as "<hits> <last loaded time in us>" in a .hit file. A
+//   hit is an entry being loaded instead of compiled.
+// Note: This is only called when an entry is compiled or loaded from disk,
+//         not when a kernel is found in a process's in-memory cache, as
+//         that would add file I/O to every bfMap call.
+// NOTE:  Must be called from within a LockFile lock
+static void record_disk_cache_use(std::string basename, bool hit) {
+	long nhit = 0;
+	if( hit ) {
+		std::ifstream stats(basename + ".hit", std::ios::in);
+		stats >> nhit;
+		nhit += 1;
+	}
+	try {
+		std::ofstream stats(basename + ".hit", std::ios::out);
+		stats << nhit << " " << get_time_us() << endl;
+	} catch( std::exception const& ) {}
+}
+
+// Evicts least-recently-loaded entries from a disk cache until it is within
+//   the size limits. The entry with basename 'keep' is never evicted.
+// NOTE:  Must be called from within a LockFile lock
+static void enforce_disk_cache_limits(std::string cachedir,
+                                      std::string data_suffix,
+                                      std::string keep) {
+	long max_entries = g_disk_cache_max_entries;
+	long max_nbyte   = g_disk_cache_max_nbyte;
+	if( max_entries <= 0 && max_nbyte <= 0 ) {
+		return;
+	}
+	// Entries as (last loaded time, nbyte, basename)
+	std::vector<std::tuple<long,long,std::string> > entries;
+	long total_nbyte = 0;
+	DIR* dir = opendir(cachedir.c_str());
+	if( !dir ) {
+		return;
+	}
+	struct dirent *entry;
+	while( (entry = readdir(dir)) != NULL ) {
+		std::string name(entry->d_name);
+		if( name.size() < 4 || name.compare(name.size()-4, 4, ".inf") != 0 ) {
+			continue;
+		}
+		std::string basename = cachedir + name.substr(0, name.size()-4);
+		long nbyte = (get_file_nbyte(basename + ".inf") +
+		              get_file_nbyte(basename + data_suffix) +
+		              get_file_nbyte(basename + ".hit"));
+		long nhit = 0, last_loaded = 0;
+		std::ifstream stats(basename + ".hit", std::ios::in);
+		stats >> nhit >> last_loaded;
+		entries.push_back(std::make_tuple(last_loaded, nbyte, basename));
+		total_nbyte += nbyte;
+	}
+	closedir(dir);
+	std::sort(entries.begin(), entries.end());
+	long nentry = entries.size();
+	for( auto const& e : entries ) {
+		if( (max_entries <= 0 || nentry      <= max_entries) &&
+		    (max_nbyte   <= 0 || total_nbyte <= max_nbyte) ) {
+			break;
+		}
+		std::string const& basename = std::get<2>(e);
+		if( basename == keep ) {
+			continue;
+		}
+		try {
+			// Note: The index is removed first so that the entry is never
+			//         seen without its data
+			remove_file(basename + ".inf");
+			remove_file(basename + data_suffix);
+			remove_file(basename + ".hit");
+		} catch( std::exception const& ) {}
+		nentry      -= 1;
+		total_nbyte -= std::get<1>(e);
+	}
+}
+
+#if BF_CUDA_ENABLED
+BFstatus build_map_kernel(int*                 ndim,
+                          long*                shape,
+                          long                 block_x_axis,
+                          long                 block_y_axis,
+                          char const*const*    axis_names,
+                          int                  narg,
+                          BFarray const*const* args,
+                          char const*const*    arg_names,
+                          char const*          func_name,
+                          char const*          func,
+                          char const*          extra_code,
+                          bool                 basic_indexing_only,
+                          std::string*         ptx_string,
+                          std::string*         kernel_name_ptr) {
+	std::string code_string;
+	std::string kernel_name;
+	BF_CHECK(generate_map_kernel(ndim, shape, block_x_axis, block_y_axis,
+	                             axis_names, narg, args, arg_names,
+	                             func_name, func, extra_code,
+	                             basic_indexing_only, false,
+	                             &code_string, &kernel_name));
+	std::stringstream code(code_string);
 	
 	const char* program_name = func_name ? func_name : "bfMap";
 	const char* header_codes[] = {
@@ -412,7 +591,7 @@ class DiskCacheMgr {
 	std::string            _cachefile;
 	std::set<std::string>  _created_dirs;
 	mutable std::mutex     _mutex;
-	bool                   _loaded;
+	bool                   _validated;
 	std::hash<std::string> _get_name;
 	
 	void tag_cache(void) {
@@ -461,6 +640,7 @@ class DiskCacheMgr {
 		    try {
           remove_files_with_suffix(_cachedir, ".inf");
           remove_files_with_suffix(_cachedir, ".ptx");
+          remove_files_with_suffix(_cachedir, ".hit");
           remove_file(_cachedir + BF_MAP_KERNEL_DISK_CACHE_VERSION_FILE);
 	        } catch( std::exception const& ) {}
 	    }
@@ -477,10 +657,9 @@ class DiskCacheMgr {
         this->tag_cache();
         
         // Get the name to save the kernel to
-        std::stringstream basename;
-        basename << std::hex << std::uppercase << _get_name(cache_key);
-        _indexfile = _cachedir + basename.str() + ".inf";
-        _cachefile = _cachedir + basename.str() + ".ptx";
+        std::string basename = this->get_basename(cache_key);
+        _indexfile = basename + ".inf";
+        _cachefile = basename + ".ptx";
         
         std::ofstream index, cache;
         try {
@@ -505,77 +684,79 @@ class DiskCacheMgr {
 	        index.close();
 	        cache.close();
 	    } catch( std::exception const& ) {}
+	    
+	    record_disk_cache_use(basename, false);
+	    enforce_disk_cache_limits(_cachedir, ".ptx", basename);
 	}
 	
-	void load_from_disk(ObjectCache<std::string,std::pair<CUDAKernel,bool> > *kernel_cache) {
+	bool load_from_disk(std::string  cache_key,
+	                    CUDAKernel*  kernel,
+	                    bool*        basic_indexing_only) {
 	    // Do this with a file lock to avoid interference from other processes
 			LockFile lock(_cachedir + ".lock");
 
       // Validate the cache
-			this->validate_cache();
-
+      if( !_validated ) {
+          this->validate_cache();
+          _validated = true;
+      }
+      
+      // Find the files
+      std::string basename = this->get_basename(cache_key);
+      _indexfile = basename + ".inf";
+      _cachefile = basename + ".ptx";
+      if( !file_exists(_indexfile) ) {
+          return false;
+      }
+      
     	std::ifstream index, cache;
       size_t kernel_size;
       std::string kernel_name;
-      bool basic_indexing_only;
-      std::string cache_key;
+      std::string cached_key;
       std::string ptx;
-      CUDAKernel kernel;
       
       std::string field;
       
-      // Find the files
-      DIR* dir = opendir(_cachedir.c_str());
-      struct dirent *entry;
-      while( (entry = readdir(dir)) != NULL ) {
-      		_indexfile = _cachedir + std::string(entry->d_name);
-          if( _indexfile.size() < 4 ) {
-              continue;
-          }
-          if( _indexfile.compare(_indexfile.size()-4, 4, ".inf") == 0 ) {
-              // We have an info file, get the corresponding ptx file
-              _cachefile = _indexfile.substr(0, _indexfile.size()-4) + ".ptx";
+      try {
+          // Open
+          index.open(_indexfile, std::ios::in);
+          cache.open(_cachefile, std::ios::in|std::ios::binary);
               
-              try {
-                  // Open
-                  index.open(_indexfile, std::ios::in);
-                  cache.open(_cachefile, std::ios::in|std::ios::binary);
-                      
-                  // Read in info and then build the kernels
-                  //  * PTX size
-                  std::getline(index, field);
-                  kernel_size = std::atoi(field.c_str());
-                  //  * Kernel name
-                  std::getline(index, kernel_name);
-                  //  * Whether or not the kernel supports basic indexing only
-                  std::getline(index, field);
-                  basic_indexing_only = false;
-                  if( std::atoi(field.c_str()) > 0 ) {
-                      basic_indexing_only = true;
-                  }
-                  //  * In-memory cache name
-                  std::getline(index, cache_key);
-                  while( std::getline(index, field) ) {
-                      cache_key = cache_key + "\n" + field;
-                  }
-                  
-                  // Check the cache to see if it is aleady there...
-                  if( !kernel_cache->contains(cache_key) ) {
-                      ptx.resize(kernel_size);
-                      cache.read(&ptx[0], kernel_size);
-                      kernel.set(kernel_name.c_str(), ptx.c_str());
-                      
-                      kernel_cache->insert(cache_key,
-	                                         std::make_pair(kernel, basic_indexing_only));         
-			            }
-									
-		            	// Done
-	      	        index.close();
-	                cache.close();
-	            } catch( std::exception const&) {}
-	        }
-	    }
-	    closedir(dir);
+          // Read in info and then build the kernel
+          //  * PTX size
+          std::getline(index, field);
+          kernel_size = std::atoi(field.c_str());
+          //  * Kernel name
+          std::getline(index, kernel_name);
+          //  * Whether or not the kernel supports basic indexing only
+          std::getline(index, field);
+          *basic_indexing_only = false;
+          if( std::atoi(field.c_str()) > 0 ) {
+              *basic_indexing_only = true;
+          }
+          //  * In-memory cache name
+          std::getline(index, cached_key);
+          while( std::getline(index, field) ) {
+              cached_key = cached_key + "\n" + field;
+          }
+          
+          // Check that this is the right kernel (i.e., not a hash collision)
+          if( cached_key != cache_key ) {
+              return false;
+          }
+          ptx.resize(kernel_size);
+          cache.read(&ptx[0], kernel_size);
+          kernel->set(kernel_name.c_str(), ptx.c_str());
+          
+          // Done
+          index.close();
+          cache.close();
+      } catch( std::exception const&) {
+          return false;
+      }
+      
+      record_disk_cache_use(basename, true);
+      return true;
 	}
 	
 	void clear_cache() {
@@ -585,12 +766,13 @@ class DiskCacheMgr {
     try {
         remove_files_with_suffix(_cachedir, ".inf");
         remove_files_with_suffix(_cachedir, ".ptx");
+        remove_files_with_suffix(_cachedir, ".hit");
     } catch( std::exception const& ) {}
   }
 
 	DiskCacheMgr()
 		: _cachedir(get_home_dir()+"/.bifrost/"+BF_MAP_KERNEL_DISK_CACHE_SUBDIR+"/"),
-		  _loaded(false) {
+		  _validated(false) {
 				make_dir(_cachedir);
 	}
 public:
@@ -602,13 +784,19 @@ public:
 		return cache;
 	}
 	
-	bool load(ObjectCache<std::string,std::pair<CUDAKernel,bool> > *kernel_cache) {
-		if( !_loaded ) {
-		    std::lock_guard<std::mutex> lock(_mutex);
-		    this->load_from_disk(kernel_cache);
-	        _loaded = true;
-		}
-		return _loaded;
+	// Returns the basename of the files holding the kernel for cache_key
+	std::string get_basename(std::string cache_key) const {
+		std::stringstream basename;
+		basename << _cachedir << std::hex << std::uppercase << _get_name(cache_key);
+		return basename.str();
+	}
+	
+	// Loads a previously-compiled kernel, returning false if there is none
+	bool load(std::string  cache_key,
+	          CUDAKernel*  kernel,
+	          bool*        basic_indexing_only) {
+		std::lock_guard<std::mutex> lock(_mutex);
+		return this->load_from_disk(cache_key, kernel, basic_indexing_only);
 	}
 	
 	void save(std::string  cache_key, 
@@ -622,10 +810,329 @@ public:
     void clear() {
         std::lock_guard<std::mutex> lock(_mutex);
         this->clear_cache();
-        _loaded = false;
     }
 };
 #endif
+#endif // BF_CUDA_ENABLED
+
+// A map kernel compiled for the host and loaded from a shared object
+class HostKernel {
+	typedef void (*func_type)(void* const*);
+	std::shared_ptr<void> _lib;
+	func_type             _func;
+public:
+	HostKernel() : _func(0) {}
+	void set(std::string libname, std::string func_name) {
+		void* lib = dlopen(libname.c_str(), RTLD_NOW | RTLD_LOCAL);
+		if( !lib ) {
+			throw std::runtime_error(dlerror());
+		}
+		_lib = std::shared_ptr<void>(lib, dlclose);
+		_func = (func_type)dlsym(lib, func_name.c_str());
+		if( !_func ) {
+			throw std::runtime_error(dlerror());
+		}
+	}
+	void launch(std::vector<void*> const& args) const {
+		_func(args.data());
+	}
+};
+
+// Compiles host map kernels with the system C++ compiler and caches the
+//   resulting shared objects on disk. Unlike PTX, a shared object must be
+//   loaded from a file, so this cache is always enabled.
+// Note: Kernels are compiled for the local CPU by default, so the name of
+//         each object includes the compile command and the CPU model.
+class HostKernelCacheMgr {
+	std::string            _cachedir;
+	std::string            _includedir;
+	std::string            _compile_cmd;
+	std::string            _host_tag;
+	bool                   _headers_written;
+	mutable std::mutex     _mutex;
+	std::hash<std::string> _get_name;
+	
+	static std::string get_cpu_tag() {
+		std::ifstream cpuinfo("/proc/cpuinfo");
+		std::string line, model, flags;
+		while( std::getline(cpuinfo, line) && (model.empty() || flags.empty()) ) {
+			if( model.empty() && line.compare(0, 10, "model name") == 0 ) {
+				model = line;
+			} else if( flags.empty() && (line.compare(0, 5, "flags") == 0 ||
+			                             line.compare(0, 8, "Features") == 0) ) {
+				flags = line;
+			}
+		}
+		return model + "\n" + flags;
+	}
+	void write_headers() {
+		// NOTE:  Must be called from within a LockFile lock
+		const char* header_codes[] = {
+			Complex_hpp,
+			Vector_hpp,
+			ArrayIndexer_cuh,
+			ShapeIndexer_cuh,
+			IndexArray_cuh,
+			int_fastdiv_h
+		};
+		const char* header_names[] = {
+			"Complex.hpp",
+			"Vector.hpp",
+			"ArrayIndexer.cuh",
+			"ShapeIndexer.cuh",
+			"IndexArray.cuh",
+			"int_fastdiv.h"
+		};
+		size_t nheader = sizeof(header_codes) / sizeof(const char*);
+		std::stringstream tmp_suffix;
+		tmp_suffix << ".tmp" << getpid();
+		for( size_t i=0; i<nheader; ++i ) {
+			// Note: Written to a temporary file first so that concurrent
+			//         compiles never see a partial header
+			std::string filename = _includedir + header_names[i];
+			std::ofstream header(filename + tmp_suffix.str(), std::ios::out);
+			header << header_codes[i];
+			header.close();
+			::rename((filename + tmp_suffix.str()).c_str(), filename.c_str());
+		}
+		_headers_written = true;
+	}
+	bool read_index(std::string indexfile,
+	                std::string cache_key,
+	                std::string* kernel_name,
+	                bool*        basic_indexing_only) {
+		std::ifstream index(indexfile, std::ios::in);
+		if( !index ) {
+			return false;
+		}
+		std::string field, key;
+		//  * Kernel name
+		std::getline(index, *kernel_name);
+		//  * Whether or not the kernel supports basic indexing only
+		std::getline(index, field);
+		*basic_indexing_only = std::atoi(field.c_str()) > 0;
+		//  * In-memory cache key
+		std::getline(index, key);
+		while( std::getline(index, field) ) {
+			key = key + "\n" + field;
+		}
+		return key == cache_key;
+	}
+	
+	HostKernelCacheMgr()
+		: _cachedir(get_home_dir()+"/.bifrost/"+BF_MAP_KERNEL_DISK_CACHE_SUBDIR+"/cpu/"),
+		  _includedir(_cachedir+"include/"),
+		  _headers_written(false) {
+		make_dir(_includedir);
+		std::stringstream cmd;
+		cmd << EnvVars::get("BF_MAP_CXX", "c++")
+		    << " -std=" << BF_MAP_KERNEL_STDCXX
+		    << " " << EnvVars::get("BF_MAP_CXXFLAGS", "-O3 -march=native -ffast-math")
+#if defined(BF_OPENMP_ENABLED) && BF_OPENMP_ENABLED
+		    << " -fopenmp"
+#endif
+		    << " -fPIC -shared -I" << _includedir;
+		_compile_cmd = cmd.str();
+		_host_tag = _compile_cmd + "\n" + get_cpu_tag();
+	}
+public:
+	HostKernelCacheMgr(HostKernelCacheMgr& ) = delete;
+	HostKernelCacheMgr& operator=(HostKernelCacheMgr& ) = delete;
+	
+	static HostKernelCacheMgr& get() {
+		static HostKernelCacheMgr cache;
+		return cache;
+	}
+	
+	// Returns the basename of the files holding the kernel for cache_key
+	std::string get_basename(std::string cache_key) const {
+		std::stringstream basename;
+		basename << _cachedir << std::hex << std::uppercase
+		         << _get_name(_host_tag + "\n" + cache_key);
+		return basename.str();
+	}
+	
+	// Loads a previously-compiled kernel, returning false if there is none
+	bool load(std::string  cache_key,
+	          HostKernel*  kernel,
+	          bool*        basic_indexing_only) {
+		std::lock_guard<std::mutex> lock(_mutex);
+		std::string basename = this->get_basename(cache_key);
+		std::string kernel_name;
+		if( !this->read_index(basename + ".inf", cache_key,
+		                      &kernel_name, basic_indexing_only) ) {
+			return false;
+		}
+		try {
+			kernel->set(basename + ".so", kernel_name);
+			LockFile lock_file(_cachedir + ".lock");
+			record_disk_cache_use(basename, true);
+		} catch( std::exception const& ) {
+			return false;
+		}
+		return true;
+	}
+	
+	// Compiles code into a shared object, returning false on failure
+	bool compile(std::string  cache_key,
+	             std::string  code,
+	             bool         print_log,
+	             std::string* libname) {
+		std::string basename = this->get_basename(cache_key);
+		std::stringstream tmp_suffix;
+		tmp_suffix << ".tmp" << getpid() << "_" << std::this_thread::get_id();
+		std::string srcfile = basename + tmp_suffix.str() + ".cpp";
+		std::string tmpfile = basename + tmp_suffix.str() + ".so";
+		try {
+			std::lock_guard<std::mutex> lock(_mutex);
+			if( !_headers_written ) {
+				LockFile lock_file(_cachedir + ".lock");
+				this->write_headers();
+			}
+		} catch( std::exception const& ) {
+			return false;
+		}
+		std::ofstream source(srcfile, std::ios::out);
+		source << code;
+		source.close();
+		std::string cmd = _compile_cmd + " -o " + tmpfile + " " + srcfile + " 2>&1";
+		std::string log;
+		FILE* pipe = ::popen(cmd.c_str(), "r");
+		if( !pipe ) {
+			::remove(srcfile.c_str());
+			return false;
+		}
+		char buf[4096];
+		size_t nread;
+		while( (nread = ::fread(buf, 1, sizeof(buf), pipe)) > 0 ) {
+			log.append(buf, nread);
+		}
+		int ret = ::pclose(pipe);
+		::remove(srcfile.c_str());
+#if BF_DEBUG_ENABLED
+		if( (!log.empty() || EnvVars::get("BF_PRINT_MAP_KERNELS", "0") != "0") &&
+		    print_log ) {
+			std::stringstream code_ss(code);
+			int i = 1;
+			for( std::string line; std::getline(code_ss, line); ++i ) {
+				std::cout << std::setfill(' ') << std::setw(3) << i << " " << line << endl;
+			}
+			std::cout << "---------------------------------------------------" << std::endl;
+			std::cout << "--- Host compile log for command " << cmd << " ---" << std::endl;
+			std::cout << "---------------------------------------------------" << std::endl;
+			std::cout << log << std::endl;
+			std::cout << "---------------------------------------------------" << std::endl;
+		}
+#endif
+		if( ret != 0 ) {
+			// Note: Don't print debug msg here, failure may not be expected
+			::remove(tmpfile.c_str());
+			return false;
+		}
+		*libname = tmpfile;
+		return true;
+	}
+	
+	// Moves a compiled shared object into the cache
+	void save(std::string  cache_key,
+	          std::string  libname,
+	          std::string  kernel_name,
+	          bool         basic_indexing_only) {
+		std::lock_guard<std::mutex> lock(_mutex);
+		LockFile lock_file(_cachedir + ".lock");
+		std::string basename = this->get_basename(cache_key);
+		// Note: Renames are atomic, so other processes only ever see
+		//         complete files
+		::rename(libname.c_str(), (basename + ".so").c_str());
+		std::string indexfile = basename + ".inf";
+		std::string tmpfile   = libname.substr(0, libname.size()-3) + ".inf";
+		try {
+			std::ofstream index(tmpfile, std::ios::out);
+			index << kernel_name << endl;
+			index << basic_indexing_only << endl;
+			index << cache_key;
+			index.close();
+			::rename(tmpfile.c_str(), indexfile.c_str());
+		} catch( std::exception const& ) {}
+		record_disk_cache_use(basename, false);
+		enforce_disk_cache_limits(_cachedir, ".so", basename);
+	}
+	
+	void clear() {
+		std::lock_guard<std::mutex> lock(_mutex);
+		LockFile lock_file(_cachedir + ".lock");
+		try {
+			remove_files_with_suffix(_cachedir, ".inf");
+			remove_files_with_suffix(_cachedir, ".so");
+			remove_files_with_suffix(_cachedir, ".hit");
+		} catch( std::exception const& ) {}
+	}
+};
+
+static BFstatus build_host_map_kernel(std::string          cache_key,
+                                      int*                 ndim,
+                                      long*                shape,
+                                      char const*const*    axis_names,
+                                      int                  narg,
+                                      BFarray const*const* args,
+                                      char const*const*    arg_names,
+                                      char const*          func_name,
+                                      char const*          func,
+                                      char const*          extra_code,
+                                      bool                 force_advanced_indexing,
+                                      HostKernel*          kernel,
+                                      bool*                basic_indexing_only) {
+	HostKernelCacheMgr* mgr_ptr;
+	BF_TRY(mgr_ptr = &HostKernelCacheMgr::get());
+	HostKernelCacheMgr& mgr = *mgr_ptr;
+	if( mgr.load(cache_key, kernel, basic_indexing_only) ) {
+		return BF_STATUS_SUCCESS;
+	}
+	std::string code;
+	std::string kernel_name;
+	std::string libname;
+	// First we try with basic_indexing_only = true
+	*basic_indexing_only = true;
+	if( force_advanced_indexing ||
+	    generate_map_kernel(ndim, shape, 0, 0,
+	                        axis_names, narg,
+	                        args, arg_names,
+	                        func_name, func, extra_code,
+	                        *basic_indexing_only, true,
+	                        &code, &kernel_name) != BF_STATUS_SUCCESS ||
+	    !mgr.compile(cache_key, code, false, &libname) ) {
+		// Then we fall back to basic_indexing_only = false
+		*basic_indexing_only = false;
+		BF_CHECK(generate_map_kernel(ndim, shape, 0, 0,
+		                             axis_names, narg,
+		                             args, arg_names,
+		                             func_name, func, extra_code,
+		                             *basic_indexing_only, true,
+		                             &code, &kernel_name));
+		BF_ASSERT(mgr.compile(cache_key, code, true, &libname),
+		          BF_STATUS_INVALID_ARGUMENT);
+	}
+	mgr.save(cache_key, libname, kernel_name, *basic_indexing_only);
+	BF_TRY(kernel->set(mgr.get_basename(cache_key) + ".so", kernel_name));
+	return BF_STATUS_SUCCESS;
+}
+
+// Returns whether a map should be run on the host rather than on the GPU
+static bool use_host_map(int narg, BFarray const*const* args) {
+#if defined(BF_CUDA_ENABLED) && BF_CUDA_ENABLED
+	if( narg == 0 ) {
+		return false;
+	}
+	for( int a=0; a<narg; ++a ) {
+		if( !is_scalar_param(args[a]) &&
+		    (!space_accessible_from(args[a]->space, BF_SPACE_SYSTEM) ||
+		     space_accessible_from(args[a]->space, BF_SPACE_CUDA)) ) {
+			return false;
+		}
+	}
+#endif
+	return true;
+}
 
 BFstatus bfMap(int                  ndim,
                long const*          shape,
@@ -638,9 +1145,6 @@ BFstatus bfMap(int                  ndim,
                char const*          extra_code,
                int  const           block_shape[2],
                int  const           block_axes[2]) {
-	// Map containing compiled kernels and basic_indexing_only flag
-	thread_local static ObjectCache<std::string,std::pair<CUDAKernel,bool> >
-	kernel_cache(BF_MAP_KERNEL_CACHE_SIZE);
 	BF_ASSERT(ndim >= 0,           BF_STATUS_INVALID_ARGUMENT);
 	//BF_ASSERT(!ndim || shape,      BF_STATUS_INVALID_POINTER);
 	//BF_ASSERT(!ndim || axis_names, BF_STATUS_INVALID_POINTER);
@@ -700,40 +1204,83 @@ BFstatus bfMap(int                  ndim,
 	}
 	std::string cache_key = cache_key_ss.str();
 	
-#if defined(BF_MAP_KERNEL_DISK_CACHE) && BF_MAP_KERNEL_DISK_CACHE
-    DiskCacheMgr::get().load(&kernel_cache);
-#endif
+	if( use_host_map(narg, args) ) {
+		// Map containing loaded host kernels and basic_indexing_only flag
+		thread_local static ObjectCache<std::string,std::pair<HostKernel,bool> >
+		host_kernel_cache(BF_MAP_KERNEL_CACHE_SIZE);
+		if( !host_kernel_cache.contains(cache_key) ) {
+			HostKernel kernel;
+			bool basic_indexing_only;
+			BF_CHECK(build_host_map_kernel(cache_key, &ndim, mutable_shape,
+			                               axis_names, narg,
+			                               args, arg_names,
+			                               func_name, func, extra_code,
+			                               force_advanced_indexing,
+			                               &kernel, &basic_indexing_only));
+			host_kernel_cache.insert(cache_key,
+			                         std::make_pair(kernel, basic_indexing_only));
+		}
+		HostKernel const& kernel = host_kernel_cache.get(cache_key).first;
+		
+		std::vector<void*> kernel_args;
+		kernel_args.reserve(narg);
+		for( int a=0; a<narg; ++a ) {
+			if( is_scalar_param(args[a]) ) {
+				// Special case for scalar parameters
+				kernel_args.push_back(args[a]->data);
+			} else {
+				BF_ASSERT(args[a]->data, BF_STATUS_INVALID_POINTER);
+				BF_ASSERT(space_accessible_from(args[a]->space, BF_SPACE_SYSTEM),
+				          BF_STATUS_INVALID_SPACE);
+				kernel_args.push_back((void**)&args[a]->data);
+			}
+		}
+		kernel.launch(kernel_args);
+		return BF_STATUS_SUCCESS;
+	}
+	
+#if BF_CUDA_ENABLED
+	// Map containing compiled kernels and basic_indexing_only flag
+	thread_local static ObjectCache<std::string,std::pair<CUDAKernel,bool> >
+	kernel_cache(BF_MAP_KERNEL_CACHE_SIZE);
 	
 	if( !kernel_cache.contains(cache_key) ) {
-		std::string ptx;
-		std::string kernel_name;
-		// First we try with basic_indexing_only = true
-		bool basic_indexing_only = true;
-		if( force_advanced_indexing ||
-		    build_map_kernel(&ndim, mutable_shape,
-		                     block_x_axis, block_y_axis,
-		                     axis_names, narg,
-		                     args, arg_names,
-		                     func_name, func, extra_code,
-		                     basic_indexing_only,
-		                     &ptx, &kernel_name) != BF_STATUS_SUCCESS ) {
-			// Then we fall back to basic_indexing_only = false
-			basic_indexing_only = false;
-			BF_CHECK(build_map_kernel(&ndim, mutable_shape,
-			                          block_x_axis, block_y_axis,
-			                          axis_names, narg,
-			                          args, arg_names,
-			                          func_name, func, extra_code,
-			                          basic_indexing_only,
-			                          &ptx, &kernel_name));
-		}
 		CUDAKernel kernel;
-		BF_TRY(kernel.set(kernel_name.c_str(), ptx.c_str()));
-		kernel_cache.insert(cache_key,
-		                    std::make_pair(kernel, basic_indexing_only));
+		bool basic_indexing_only;
+		bool loaded = false;
+#if defined(BF_MAP_KERNEL_DISK_CACHE) && BF_MAP_KERNEL_DISK_CACHE
+		loaded = DiskCacheMgr::get().load(cache_key, &kernel, &basic_indexing_only);
+#endif
+		if( !loaded ) {
+			std::string ptx;
+			std::string kernel_name;
+			// First we try with basic_indexing_only = true
+			basic_indexing_only = true;
+			if( force_advanced_indexing ||
+			    build_map_kernel(&ndim, mutable_shape,
+			                     block_x_axis, block_y_axis,
+			                     axis_names, narg,
+			                     args, arg_names,
+			                     func_name, func, extra_code,
+			                     basic_indexing_only,
+			                     &ptx, &kernel_name) != BF_STATUS_SUCCESS ) {
+				// Then we fall back to basic_indexing_only = false
+				basic_indexing_only = false;
+				BF_CHECK(build_map_kernel(&ndim, mutable_shape,
+				                          block_x_axis, block_y_axis,
+				                          axis_names, narg,
+				                          args, arg_names,
+				                          func_name, func, extra_code,
+				                          basic_indexing_only,
+				                          &ptx, &kernel_name));
+			}
+			BF_TRY(kernel.set(kernel_name.c_str(), ptx.c_str()));
 #if defined(BF_MAP_KERNEL_DISK_CACHE) && BF_MAP_KERNEL_DISK_CACHE
-		DiskCacheMgr::get().save(cache_key, kernel_name, ptx, basic_indexing_only);
+			DiskCacheMgr::get().save(cache_key, kernel_name, ptx, basic_indexing_only);
 #endif
+		}
+		kernel_cache.insert(cache_key,
+		                    std::make_pair(kernel, basic_indexing_only));
 	}
 	auto& cache_entry = kernel_cache.get(cache_key);
 	CUDAKernel& kernel = cache_entry.first;
@@ -754,10 +1301,7 @@ BFstatus bfMap(int                  ndim,
 	std::vector<void*> kernel_args;
 	kernel_args.reserve(narg);
 	for( int a=0; a<narg; ++a ) {
-		if( args[a]->ndim     == 1 &&
-		    args[a]->shape[0] == 1 &&
-		    args[a]->immutable &&
-		    space_accessible_from(args[a]->space, BF_SPACE_SYSTEM) ) {
+		if( is_scalar_param(args[a]) ) {
 			// Special case for scalar parameters
 			kernel_args.push_back(args[a]->data);
 		} else {
@@ -792,13 +1336,31 @@ BFstatus bfMap(int                  ndim,
 	                        0, g_cuda_stream,
 	                        kernel_args) == CUDA_SUCCESS,
 	          BF_STATUS_DEVICE_ERROR);
+#endif // BF_CUDA_ENABLED
 	
 	return BF_STATUS_SUCCESS;
 }
 
 BFstatus bfMapClearCache() {
-#if defined(BF_MAP_KERNEL_DISK_CACHE) && BF_MAP_KERNEL_DISK_CACHE
+#if BF_CUDA_ENABLED && defined(BF_MAP_KERNEL_DISK_CACHE) && BF_MAP_KERNEL_DISK_CACHE
     DiskCacheMgr::get().clear();
 #endif
+    BF_TRY(HostKernelCacheMgr::get().clear());
     return BF_STATUS_SUCCESS;
 }
+
+BFstatus bfMapSetCacheLimits(long max_entries, long max_nbyte) {
+	BF_ASSERT(max_entries >= 0, BF_STATUS_INVALID_ARGUMENT);
+	BF_ASSERT(max_nbyte   >= 0, BF_STATUS_INVALID_ARGUMENT);
+	g_disk_cache_max_entries = max_entries;
+	g_disk_cache_max_nbyte   = max_nbyte;
+	return BF_STATUS_SUCCESS;
+}
+
+BFstatus bfMapGetCacheLimits(long* max_entries, long* max_nbyte) {
+	BF_ASSERT(max_entries, BF_STATUS_INVALID_POINTER);
+	BF_ASSERT(max_nbyte,   BF_STATUS_INVALID_POINTER);
+	*max_entries = g_disk_cache_max_entries;
+	*max_nbyte   = g_disk_cache_max_nbyte;
+	return BF_STATUS_SUCCESS;
+}
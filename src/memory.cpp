@@ -29,13 +29,27 @@
 
 #include <bifrost/config.h>
 #include <bifrost/memory.h>
+#include "memory.hpp"
 #include "utils.hpp"
 #include "cuda.hpp"
 #include "trace.hpp"
+#include "proclog.hpp"
+#include "EnvVars.hpp"
 
 #include <cstdlib> // For posix_memalign
 #include <cstring> // For memcpy
 #include <iostream>
+#include <atomic>
+#include <chrono>
+#include <memory>
+#include <mutex>
+#include <unordered_map>
+#include <vector>
+
+// Smallest size class of the memory pool
+#define BF_MEMORY_POOL_MIN_NBYTE     256
+// Max no. freed blocks of each size class kept in each thread's free lists
+#define BF_MEMORY_POOL_THREAD_NBLOCK 8
 
 #define BF_IS_POW2(x) (x) && !((x) & ((x) - 1))
 static_assert(BF_IS_POW2(BF_ALIGNMENT), "BF_ALIGNMENT must be a power of 2");
@@ -107,7 +121,7 @@ const char* bfGetSpaceString(BFspace space) {
 	}
 }
 
-BFstatus bfMalloc(void** ptr, BFsize size, BFspace space) {
+BFstatus raw_malloc(void** ptr, BFsize size, BFspace space) {
 	//printf("bfMalloc(%p, %lu, %i)\n", ptr, size, space);
 	void* data;
 	switch( space ) {
@@ -144,7 +158,7 @@ BFstatus bfMalloc(void** ptr, BFsize size, BFspace space) {
 	*ptr = data;
 	return BF_STATUS_SUCCESS;
 }
-BFstatus bfFree(void* ptr, BFspace space) {
+BFstatus raw_free(void* ptr, BFspace space) {
 	BF_ASSERT(ptr, BF_STATUS_INVALID_POINTER);
 	if( space == BF_SPACE_AUTO ) {
 		bfGetSpace(ptr, &space);
@@ -160,6 +174,311 @@ BFstatus bfFree(void* ptr, BFspace space) {
 	}
 	return BF_STATUS_SUCCESS;
 }
+
+// Rounds an allocation size up to its size class. There are four classes per
+//   power of 2, so at most 25% of each pooled block is wasted.
+static BFsize get_size_class(BFsize size) {
+	if( size <= BF_MEMORY_POOL_MIN_NBYTE ) {
+		return BF_MEMORY_POOL_MIN_NBYTE;
+	}
+	int log2_size = 63 - __builtin_clzll(size - 1);
+	BFsize step = BFsize(1) << (log2_size - 2);
+	return (size + step - 1) & ~(step - 1);
+}
+
+class MemoryPool;
+
+// Per-thread free lists, whose blocks are returned to the shared lists when
+//   the thread exits
+class ThreadFreeLists {
+	typedef std::unordered_map<BFsize,std::vector<void*> > list_map;
+	MemoryPool* _pool;
+	list_map    _lists;
+public:
+	ThreadFreeLists(MemoryPool* pool) : _pool(pool) {}
+	~ThreadFreeLists();
+	bool pop(BFsize nbyte, void** ptr) {
+		auto iter = _lists.find(nbyte);
+		if( iter == _lists.end() || iter->second.empty() ) {
+			return false;
+		}
+		*ptr = iter->second.back();
+		iter->second.pop_back();
+		return true;
+	}
+	bool push(BFsize nbyte, void* ptr) {
+		std::vector<void*>& list = _lists[nbyte];
+		if( list.size() >= BF_MEMORY_POOL_THREAD_NBLOCK ) {
+			return false;
+		}
+		list.push_back(ptr);
+		return true;
+	}
+	void release();
+};
+
+// A pool of freed blocks in one memory space
+// Note: Pools are never destroyed, as blocks may be freed during static
+//         destruction (e.g., by rings).
+class MemoryPool {
+	typedef std::chrono::steady_clock clock_type;
+	enum { NSHARD = 16 };
+	// The sizes of the live allocations, sharded by address to limit
+	//   contention between threads
+	struct Shard {
+		std::mutex                        mutex;
+		std::unordered_map<void*,BFsize>  sizes;
+	};
+	BFspace             _space;
+	Shard               _shards[NSHARD];
+	std::mutex          _mutex;
+	std::unordered_map<BFsize,std::vector<void*> > _lists;
+	std::atomic<BFsize> _max_cached_nbyte;
+	std::atomic<BFsize> _nbyte_in_use;
+	std::atomic<BFsize> _nbyte_peak;
+	std::atomic<BFsize> _nbyte_cached;
+	std::atomic<BFsize> _nalloc;
+	std::atomic<BFsize> _nhit;
+	std::atomic<clock_type::rep> _proclog_time;
+	std::unique_ptr<ProcLog>     _proclog;
+	std::once_flag               _proclog_once;
+	
+	Shard& get_shard(void* ptr) {
+		return _shards[(reinterpret_cast<uintptr_t>(ptr) / BF_MEMORY_POOL_MIN_NBYTE) % NSHARD];
+	}
+	ThreadFreeLists& thread_lists() {
+		thread_local std::unique_ptr<ThreadFreeLists> lists[BF_SPACE_CUDA_MANAGED+1];
+		if( !lists[_space] ) {
+			lists[_space].reset(new ThreadFreeLists(this));
+		}
+		return *lists[_space];
+	}
+	bool pop_shared(BFsize nbyte, void** ptr) {
+		std::lock_guard<std::mutex> lock(_mutex);
+		auto iter = _lists.find(nbyte);
+		if( iter == _lists.end() || iter->second.empty() ) {
+			return false;
+		}
+		*ptr = iter->second.back();
+		iter->second.pop_back();
+		return true;
+	}
+	void release_shared() {
+		std::unordered_map<BFsize,std::vector<void*> > lists;
+		{
+			std::lock_guard<std::mutex> lock(_mutex);
+			lists.swap(_lists);
+		}
+		for( auto const& item : lists ) {
+			for( void* ptr : item.second ) {
+				raw_free(ptr, _space);
+				_nbyte_cached -= item.first;
+			}
+		}
+	}
+	void update_peak(BFsize nbyte_in_use) {
+		BFsize peak = _nbyte_peak.load();
+		while( nbyte_in_use > peak &&
+		       !_nbyte_peak.compare_exchange_weak(peak, nbyte_in_use) ) {}
+	}
+	void update_proclog() {
+		// Note: The ProcLog entry is updated at most once per second
+		clock_type::rep now  = clock_type::now().time_since_epoch().count();
+		clock_type::rep last = _proclog_time.load(std::memory_order_relaxed);
+		if( now - last < std::chrono::duration_cast<clock_type::duration>(
+		        std::chrono::seconds(1)).count() ||
+		    !_proclog_time.compare_exchange_strong(last, now) ) {
+			return;
+		}
+		std::call_once(_proclog_once, [this]() {
+			_proclog.reset(new ProcLog(std::string("memory/") +
+			                           bfGetSpaceString(_space)));
+		});
+		BFmempoolstats stats;
+		this->get_stats(&stats);
+		_proclog->update("nbyte_in_use : %llu\n"
+		                 "nbyte_peak   : %llu\n"
+		                 "nbyte_cached : %llu\n"
+		                 "max_cached   : %llu\n"
+		                 "nalloc       : %llu\n"
+		                 "nhit         : %llu\n"
+		                 "hit_rate     : %f\n",
+		                 (unsigned long long)stats.nbyte_in_use,
+		                 (unsigned long long)stats.nbyte_peak,
+		                 (unsigned long long)stats.nbyte_cached,
+		                 (unsigned long long)_max_cached_nbyte.load(),
+		                 (unsigned long long)stats.nalloc,
+		                 (unsigned long long)stats.nhit,
+		                 stats.nalloc ? double(stats.nhit) / stats.nalloc : 0.);
+	}
+	MemoryPool(BFspace space)
+		: _space(space),
+		  _max_cached_nbyte(std::atoll(EnvVars::get(
+			  "BF_MEMORY_POOL_MAX_BYTES",
+			  std::to_string(BF_MEMORY_POOL_MAX_CACHED_NBYTE)).c_str())),
+		  _nbyte_in_use(0), _nbyte_peak(0), _nbyte_cached(0),
+		  _nalloc(0), _nhit(0), _proclog_time(0) {}
+	friend class ThreadFreeLists;
+public:
+	MemoryPool(MemoryPool const& ) = delete;
+	MemoryPool& operator=(MemoryPool const& ) = delete;
+	static MemoryPool& get(BFspace space) {
+		static MemoryPool* pools[BF_SPACE_CUDA_MANAGED+1] = {
+			nullptr,
+			new MemoryPool(BF_SPACE_SYSTEM),
+			new MemoryPool(BF_SPACE_CUDA),
+			new MemoryPool(BF_SPACE_CUDA_HOST),
+			new MemoryPool(BF_SPACE_CUDA_MANAGED)
+		};
+		return *pools[space];
+	}
+	BFstatus malloc(void** ptr, BFsize size) {
+		BFsize nbyte = get_size_class(size);
+		bool pooled = (nbyte <= _max_cached_nbyte);
+		if( !pooled ) {
+			nbyte = size;
+		}
+		++_nalloc;
+		if( pooled && (this->thread_lists().pop(nbyte, ptr) ||
+		               this->pop_shared(nbyte, ptr)) ) {
+			++_nhit;
+			_nbyte_cached -= nbyte;
+		} else if( raw_malloc(ptr, nbyte, _space) != BF_STATUS_SUCCESS ) {
+			// Note: Return cached blocks to the system and try again
+			this->release();
+			BF_CHECK(raw_malloc(ptr, nbyte, _space));
+		}
+		{
+			Shard& shard = this->get_shard(*ptr);
+			std::lock_guard<std::mutex> lock(shard.mutex);
+			shard.sizes[*ptr] = nbyte;
+		}
+		this->update_peak(_nbyte_in_use += nbyte);
+		this->update_proclog();
+		return BF_STATUS_SUCCESS;
+	}
+	// Returns false if ptr was not allocated from this pool
+	bool free(void* ptr) {
+		BFsize nbyte;
+		{
+			Shard& shard = this->get_shard(ptr);
+			std::lock_guard<std::mutex> lock(shard.mutex);
+			auto iter = shard.sizes.find(ptr);
+			if( iter == shard.sizes.end() ) {
+				return false;
+			}
+			nbyte = iter->second;
+			shard.sizes.erase(iter);
+		}
+		_nbyte_in_use -= nbyte;
+		if( (_nbyte_cached += nbyte) > _max_cached_nbyte ) {
+			_nbyte_cached -= nbyte;
+			raw_free(ptr, _space);
+		} else {
+#if defined BF_CUDA_ENABLED && BF_CUDA_ENABLED
+			if( _space != BF_SPACE_SYSTEM ) {
+				// Note: Like cudaFree, wait for work queued on any stream (not
+				//         just this thread's) before the block can be reused
+				cudaDeviceSynchronize();
+			}
+#endif
+			if( !this->thread_lists().push(nbyte, ptr) ) {
+				std::lock_guard<std::mutex> lock(_mutex);
+				_lists[nbyte].push_back(ptr);
+			}
+		}
+		this->update_proclog();
+		return true;
+	}
+	void release() {
+		this->thread_lists().release();
+		this->release_shared();
+	}
+	void get_stats(BFmempoolstats* stats) const {
+		stats->nbyte_in_use = _nbyte_in_use;
+		stats->nbyte_peak   = _nbyte_peak;
+		stats->nbyte_cached = _nbyte_cached;
+		stats->nalloc       = _nalloc;
+		stats->nhit         = _nhit;
+	}
+	void set_limit(BFsize max_cached_nbyte) {
+		_max_cached_nbyte = max_cached_nbyte;
+		if( _nbyte_cached > max_cached_nbyte ) {
+			this->release();
+		}
+	}
+	BFsize get_limit() const {
+		return _max_cached_nbyte;
+	}
+};
+
+ThreadFreeLists::~ThreadFreeLists() {
+	std::lock_guard<std::mutex> lock(_pool->_mutex);
+	for( auto& item : _lists ) {
+		std::vector<void*>& shared = _pool->_lists[item.first];
+		shared.insert(shared.end(), item.second.begin(), item.second.end());
+	}
+}
+void ThreadFreeLists::release() {
+	for( auto const& item : _lists ) {
+		for( void* ptr : item.second ) {
+			raw_free(ptr, _pool->_space);
+			_pool->_nbyte_cached -= item.first;
+		}
+	}
+	_lists.clear();
+}
+
+static bool valid_pool_space(BFspace space) {
+	switch( space ) {
+	case BF_SPACE_SYSTEM:       return true;
+#if defined BF_CUDA_ENABLED && BF_CUDA_ENABLED
+	case BF_SPACE_CUDA:         return true;
+	case BF_SPACE_CUDA_HOST:    return true;
+	case BF_SPACE_CUDA_MANAGED: return true;
+#endif
+	default: return false;
+	}
+}
+
+BFstatus bfMalloc(void** ptr, BFsize size, BFspace space) {
+	BF_ASSERT(ptr, BF_STATUS_INVALID_POINTER);
+	BF_ASSERT(valid_pool_space(space), BF_STATUS_INVALID_SPACE);
+	return MemoryPool::get(space).malloc(ptr, size);
+}
+BFstatus bfFree(void* ptr, BFspace space) {
+	BF_ASSERT(ptr, BF_STATUS_INVALID_POINTER);
+	if( space == BF_SPACE_AUTO ) {
+		bfGetSpace(ptr, &space);
+	}
+	if( valid_pool_space(space) && MemoryPool::get(space).free(ptr) ) {
+		return BF_STATUS_SUCCESS;
+	}
+	// Note: The memory was not allocated by bfMalloc
+	return raw_free(ptr, space);
+}
+BFstatus bfMemoryPoolGetStats(BFspace space, BFmempoolstats* stats) {
+	BF_ASSERT(stats, BF_STATUS_INVALID_POINTER);
+	BF_ASSERT(valid_pool_space(space), BF_STATUS_INVALID_SPACE);
+	MemoryPool::get(space).get_stats(stats);
+	return BF_STATUS_SUCCESS;
+}
+BFstatus bfMemoryPoolSetLimit(BFspace space, BFsize max_cached_nbyte) {
+	BF_ASSERT(valid_pool_space(space), BF_STATUS_INVALID_SPACE);
+	MemoryPool::get(space).set_limit(max_cached_nbyte);
+	return BF_STATUS_SUCCESS;
+}
+BFstatus bfMemoryPoolGetLimit(BFspace space, BFsize* max_cached_nbyte) {
+	BF_ASSERT(max_cached_nbyte, BF_STATUS_INVALID_POINTER);
+	BF_ASSERT(valid_pool_space(space), BF_STATUS_INVALID_SPACE);
+	*max_cached_nbyte = MemoryPool::get(space).get_limit();
+	return BF_STATUS_SUCCESS;
+}
+BFstatus bfMemoryPoolRelease(BFspace space) {
+	BF_ASSERT(valid_pool_space(space), BF_STATUS_INVALID_SPACE);
+	MemoryPool::get(space).release();
+	return BF_STATUS_SUCCESS;
+}
 BFstatus bfMemcpy(void*       dst,
                   BFspace     dst_space,
                   const void* src,
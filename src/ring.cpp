@@ -77,6 +77,53 @@ BFstatus bfRingGetAffinity(BFring ring, int* core) {
 	BF_ASSERT(core,  BF_STATUS_INVALID_POINTER);
 	BF_TRY_RETURN(*core = ring->core());
 }
+BFstatus bfRingSetShared(BFring ring, BFbool shared) {
+	BF_ASSERT(ring, BF_STATUS_INVALID_HANDLE);
+	BF_TRY_RETURN(ring->set_shared(shared));
+}
+BFstatus bfRingGetShared(BFring ring, BFbool* shared) {
+	BF_ASSERT(ring,   BF_STATUS_INVALID_HANDLE);
+	BF_ASSERT(shared, BF_STATUS_INVALID_POINTER);
+	BF_TRY_RETURN(*shared = ring->shared());
+}
+BFstatus bfRingSetAllocPolicy(BFring ring, int policy) {
+	BF_ASSERT(ring, BF_STATUS_INVALID_HANDLE);
+	BF_TRY_RETURN(ring->set_alloc_policy(policy));
+}
+BFstatus bfRingGetAllocPolicy(BFring ring, int* policy) {
+	BF_ASSERT(ring,   BF_STATUS_INVALID_HANDLE);
+	BF_ASSERT(policy, BF_STATUS_INVALID_POINTER);
+	BF_TRY_RETURN(*policy = ring->alloc_policy());
+}
+BFstatus bfRingSetBackingFile(BFring ring, const char* path) {
+	BF_ASSERT(ring, BF_STATUS_INVALID_HANDLE);
+	BF_ASSERT(path, BF_STATUS_INVALID_POINTER);
+	BF_TRY_RETURN(ring->set_backing_file(path));
+}
+BFstatus bfRingGetBackingFile(BFring ring, const char** path) {
+	BF_ASSERT(ring, BF_STATUS_INVALID_HANDLE);
+	BF_ASSERT(path, BF_STATUS_INVALID_POINTER);
+	BF_TRY_RETURN_ELSE(*path = ring->backing_file(),
+	                   *path = 0);
+}
+BFstatus bfRingSetWaitPolicy(BFring ring, int policy, BFsize spin_ns) {
+	BF_ASSERT(ring, BF_STATUS_INVALID_HANDLE);
+	BF_TRY_RETURN(ring->set_wait_policy(policy, spin_ns));
+}
+BFstatus bfRingGetWaitPolicy(BFring ring, int* policy, BFsize* spin_ns) {
+	BF_ASSERT(ring,    BF_STATUS_INVALID_HANDLE);
+	BF_ASSERT(policy,  BF_STATUS_INVALID_POINTER);
+	BF_ASSERT(spin_ns, BF_STATUS_INVALID_POINTER);
+	BF_TRY_RETURN(ring->get_wait_policy(policy, spin_ns));
+}
+BFstatus bfRingSetThreadWaitPolicy(int policy, BFsize spin_ns) {
+	BF_TRY_RETURN(BFring_impl::set_thread_wait_policy(policy, spin_ns));
+}
+BFstatus bfRingGetThreadWaitPolicy(int* policy, BFsize* spin_ns) {
+	BF_ASSERT(policy,  BF_STATUS_INVALID_POINTER);
+	BF_ASSERT(spin_ns, BF_STATUS_INVALID_POINTER);
+	BF_TRY_RETURN(BFring_impl::get_thread_wait_policy(policy, spin_ns));
+}
 BFstatus bfRingLock(BFring ring) {
 	BF_ASSERT(ring, BF_STATUS_INVALID_HANDLE);
 	BF_TRY_RETURN(ring->lock());
@@ -110,6 +157,42 @@ BFstatus   bfRingLockedGetStride(BFring ring, BFsize* size) {
 	BF_TRY_RETURN_ELSE(*size = ring->locked_stride(),
 	                   *size = 0);
 }
+BFstatus bfRingLockedGetSharedName(BFring ring, const char** name) {
+	BF_ASSERT(ring, BF_STATUS_INVALID_HANDLE);
+	BF_ASSERT(name, BF_STATUS_INVALID_POINTER);
+	BF_TRY_RETURN_ELSE(*name = ring->locked_shared_name(),
+	                   *name = 0);
+}
+BFstatus bfRingLockedGetAllocPolicy(BFring ring, int* policy) {
+	BF_ASSERT(ring,   BF_STATUS_INVALID_HANDLE);
+	BF_ASSERT(policy, BF_STATUS_INVALID_POINTER);
+	BF_TRY_RETURN_ELSE(*policy = ring->locked_alloc_policy(),
+	                   *policy = 0);
+}
+BFstatus bfRingLockedGetTail(BFring ring, BFoffset* offset) {
+	BF_ASSERT(ring,   BF_STATUS_INVALID_HANDLE);
+	BF_ASSERT(offset, BF_STATUS_INVALID_POINTER);
+	BF_TRY_RETURN_ELSE(*offset = ring->locked_tail(),
+	                   *offset = 0);
+}
+BFstatus bfRingLockedGetHead(BFring ring, BFoffset* offset) {
+	BF_ASSERT(ring,   BF_STATUS_INVALID_HANDLE);
+	BF_ASSERT(offset, BF_STATUS_INVALID_POINTER);
+	BF_TRY_RETURN_ELSE(*offset = ring->locked_head(),
+	                   *offset = 0);
+}
+BFstatus bfRingLockedGetReserveHead(BFring ring, BFoffset* offset) {
+	BF_ASSERT(ring,   BF_STATUS_INVALID_HANDLE);
+	BF_ASSERT(offset, BF_STATUS_INVALID_POINTER);
+	BF_TRY_RETURN_ELSE(*offset = ring->locked_reserve_head(),
+	                   *offset = 0);
+}
+BFstatus bfRingLockedGetGuaranteedTail(BFring ring, BFoffset* offset) {
+	BF_ASSERT(ring,   BF_STATUS_INVALID_HANDLE);
+	BF_ASSERT(offset, BF_STATUS_INVALID_POINTER);
+	BF_TRY_RETURN_ELSE(*offset = ring->locked_guaranteed_tail(),
+	                   *offset = 0);
+}
 
 BFstatus bfRingBeginWriting(BFring ring) {
 	BF_ASSERT(ring, BF_STATUS_INVALID_HANDLE);
@@ -119,6 +202,27 @@ BFstatus bfRingEndWriting(BFring ring) {
 	BF_ASSERT(ring, BF_STATUS_INVALID_HANDLE);
 	BF_TRY_RETURN(ring->end_writing());
 }
+BFstatus bfRingCreateEventFD(BFring ring, int* fd) {
+	BF_ASSERT(ring, BF_STATUS_INVALID_HANDLE);
+	BF_ASSERT(fd,   BF_STATUS_INVALID_POINTER);
+	BF_TRY_RETURN_ELSE(*fd = ring->create_event_fd(),
+	                   *fd = -1);
+}
+BFstatus bfRingDestroyEventFD(BFring ring, int fd) {
+	BF_ASSERT(ring, BF_STATUS_INVALID_HANDLE);
+	BF_TRY_RETURN(ring->destroy_event_fd(fd));
+}
+BFstatus bfRingGetStats(BFring ring, BFringstats* stats) {
+	BF_ASSERT(ring,  BF_STATUS_INVALID_HANDLE);
+	BF_ASSERT(stats, BF_STATUS_INVALID_POINTER);
+	BF_TRY_RETURN(ring->get_stats(stats));
+}
+BFstatus bfRingLockedGetNSequence(BFring ring, BFsize* n) {
+	BF_ASSERT(ring, BF_STATUS_INVALID_HANDLE);
+	BF_ASSERT(n,    BF_STATUS_INVALID_POINTER);
+	BF_TRY_RETURN_ELSE(*n = ring->locked_nsequence(),
+	                   *n = 0);
+}
 BFstatus bfRingWritingEnded(BFring ring, BFbool* writing_ended) {
 	BF_ASSERT(ring, BF_STATUS_INVALID_HANDLE);
 	BF_TRY_RETURN(*writing_ended = ring->writing_ended());
@@ -240,6 +344,24 @@ BFstatus bfRingSequenceGetNRinglet(BFsequence sequence, BFsize* n) {
 	BF_TRY_RETURN_ELSE(*n = sequence->nringlet(),
 	                   *n = 0);
 }
+BFstatus bfRingSequenceGetBegin(BFsequence sequence, BFoffset* offset) {
+	BF_ASSERT(sequence, BF_STATUS_INVALID_HANDLE);
+	BF_ASSERT(offset,   BF_STATUS_INVALID_POINTER);
+	BF_TRY_RETURN_ELSE(*offset = sequence->begin(),
+	                   *offset = 0);
+}
+BFstatus bfRingSequenceGetEnd(BFsequence sequence, BFoffset* offset) {
+	BF_ASSERT(sequence, BF_STATUS_INVALID_HANDLE);
+	BF_ASSERT(offset,   BF_STATUS_INVALID_POINTER);
+	BF_TRY_RETURN_ELSE(*offset = sequence->end(),
+	                   *offset = 0);
+}
+BFstatus bfRingSequenceHasNext(BFsequence sequence, BFbool* has_next) {
+	BF_ASSERT(sequence, BF_STATUS_INVALID_HANDLE);
+	BF_ASSERT(has_next, BF_STATUS_INVALID_POINTER);
+	BF_TRY_RETURN_ELSE(*has_next = sequence->has_next(),
+	                   *has_next = false);
+}
 
 BFstatus   bfRingSpanReserve(BFwspan* span,
                              BFring   ring,
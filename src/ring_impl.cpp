@@ -51,10 +51,27 @@
 #include "assert.hpp"
 #include <bifrost/config.h>
 #include <bifrost/memory.h>
+#include "memory.hpp"
 
 #include <bifrost/cuda.h>
 #include "cuda.hpp"
 
+#include <sys/mman.h> // For shm_open, mmap
+#include <sys/stat.h> // For mode constants
+#include <fcntl.h>    // For O_* constants
+#include <unistd.h>   // For ftruncate, getpid
+#include <cctype>     // For isalnum
+#include <algorithm>  // For std::find
+#if defined __linux__ && __linux__
+#include <sys/eventfd.h>
+#endif
+#include <sstream>
+#include <fstream>
+#include <limits>
+#include <cstring>    // For memset
+#include <cstdio>     // For rename
+#include <thread>     // For std::this_thread::yield
+
 // This implements a lock with the condition that no reads or writes
 //   can be open while it is held.
 class RingReallocLock {
@@ -80,6 +97,7 @@ public:
 		--_ring->_nrealloc_pending;
 		_ring->_read_condition.notify_all();
 		_ring->_write_condition.notify_all();
+		_ring->_signal_events();
 	}
 };
 
@@ -90,7 +108,19 @@ BFring_impl::BFring_impl(const char* name, BFspace space)
 	  _ghost_dirty_beg(_ghost_span),
 	  _writing_begun(false), _writing_ended(false), _eod(0),
 	  _nread_open(0), _nwrite_open(0), _nrealloc_pending(0),
-	  _core(-1), _size_log(std::string("rings/")+name) {
+	  _core(-1), _shared(false), _shared_count(0),
+	  _policy(BF_RING_POLICY_DEFAULT), _buf_policy(BF_RING_POLICY_DEFAULT),
+	  _buf_mapped_nbyte(0), _file_header(nullptr),
+	  _size_log(std::string("rings/")+name),
+	  _stat_tail(0), _stat_head(0), _stat_reserve_head(0),
+	  _stat_guaranteed_tail(0), _stat_span(0),
+	  _stat_nread_open(0), _stat_nwrite_open(0),
+	  _stat_ncommitted(0), _stat_nskipped(0), _stat_noverwritten(0),
+	  _stat_alloc_policy(BF_RING_POLICY_DEFAULT),
+	  _stat_nread_wait(0), _stat_read_wait_ns(0),
+	  _stat_nwrite_wait(0), _stat_write_wait_ns(0),
+	  _state_version(0), _wait_policy(BF_RING_WAIT_BLOCK), _wait_spin_ns(0),
+	  _proclog_time(clock_type::now()), _proclog_ncommitted(0) {
 
 #if defined BF_CUDA_ENABLED && BF_CUDA_ENABLED
 	BF_ASSERT_EXCEPTION(space==BF_SPACE_SYSTEM       ||
@@ -109,8 +139,594 @@ BFring_impl::BFring_impl(const char* name, BFspace space)
 BFring_impl::~BFring_impl() {
 	// TODO: Should check if anything is still open here?
 	if( _buf ) {
-		bfFree(_buf, _space);
+		this->_deallocate(_buf, _stride*_nringlet, _shared_name,
+		                  _buf_mapped_nbyte);
+	}
+	for( int fd : _event_fds ) {
+		::close(fd);
+	}
+}
+int BFring_impl::create_event_fd() {
+#if defined __linux__ && __linux__
+	int fd = ::eventfd(0, EFD_NONBLOCK | EFD_CLOEXEC);
+	BF_ASSERT_EXCEPTION(fd != -1, BF_STATUS_INTERNAL_ERROR);
+	lock_guard_type lock(_mutex);
+	_event_fds.push_back(fd);
+	return fd;
+#else
+	BF_FAIL_EXCEPTION("Ring event file descriptors are only supported on Linux",
+	                  BF_STATUS_UNSUPPORTED);
+#endif
+}
+void BFring_impl::destroy_event_fd(int fd) {
+	lock_guard_type lock(_mutex);
+	auto iter = std::find(_event_fds.begin(), _event_fds.end(), fd);
+	BF_ASSERT_EXCEPTION(iter != _event_fds.end(), BF_STATUS_INVALID_ARGUMENT);
+	_event_fds.erase(iter);
+	::close(fd);
+}
+void BFring_impl::_signal_events() {
+	// Note: This must be called with the ring's mutex held
+	_state_version.fetch_add(1, std::memory_order_release);
+	uint64_t one = 1;
+	for( int fd : _event_fds ) {
+		// Note: This can only fail if the counter would overflow, in which
+		//         case the descriptor is already readable.
+		ssize_t ret = ::write(fd, &one, sizeof(one));
+		(void)ret;
+	}
+}
+void BFring_impl::_update_stats() {
+	// Note: This must be called with the ring's mutex held
+	_state_version.fetch_add(1, std::memory_order_release);
+	_stat_tail.store(           _tail,                    std::memory_order_relaxed);
+	_stat_head.store(           _head,                    std::memory_order_relaxed);
+	_stat_reserve_head.store(   _reserve_head,            std::memory_order_relaxed);
+	_stat_guaranteed_tail.store(locked_guaranteed_tail(), std::memory_order_relaxed);
+	_stat_span.store(           _span,                    std::memory_order_relaxed);
+	_stat_nread_open.store(     _nread_open,              std::memory_order_relaxed);
+	_stat_nwrite_open.store(    _nwrite_open,             std::memory_order_relaxed);
+	_stat_alloc_policy.store(   _buf_policy,              std::memory_order_relaxed);
+}
+void BFring_impl::get_stats(BFringstats* stats) const {
+	stats->tail            = _stat_tail.load(std::memory_order_relaxed);
+	stats->head            = _stat_head.load(std::memory_order_relaxed);
+	stats->reserve_head    = _stat_reserve_head.load(std::memory_order_relaxed);
+	stats->guaranteed_tail = _stat_guaranteed_tail.load(std::memory_order_relaxed);
+	stats->span            = _stat_span.load(std::memory_order_relaxed);
+	stats->nread_open      = _stat_nread_open.load(std::memory_order_relaxed);
+	stats->nwrite_open     = _stat_nwrite_open.load(std::memory_order_relaxed);
+	stats->ncommitted      = _stat_ncommitted.load(std::memory_order_relaxed);
+	stats->nskipped        = _stat_nskipped.load(std::memory_order_relaxed);
+	stats->noverwritten    = _stat_noverwritten.load(std::memory_order_relaxed);
+	stats->alloc_policy    = _stat_alloc_policy.load(std::memory_order_relaxed);
+	stats->nread_wait      = _stat_nread_wait.load(std::memory_order_relaxed);
+	stats->read_wait_ns    = _stat_read_wait_ns.load(std::memory_order_relaxed);
+	stats->nwrite_wait     = _stat_nwrite_wait.load(std::memory_order_relaxed);
+	stats->write_wait_ns   = _stat_write_wait_ns.load(std::memory_order_relaxed);
+}
+void BFring_impl::set_shared(bool shared) {
+	lock_guard_type lock(_mutex);
+	BF_ASSERT_EXCEPTION(!shared || _space==BF_SPACE_SYSTEM,
+	                    BF_STATUS_UNSUPPORTED_SPACE);
+	BF_ASSERT_EXCEPTION(!shared || _backing_path.empty(),
+	                    BF_STATUS_INVALID_STATE);
+	// Note: The backing of an existing allocation cannot be changed
+	BF_ASSERT_EXCEPTION(!_buf, BF_STATUS_INVALID_STATE);
+	_shared = shared;
+}
+void BFring_impl::set_backing_file(const char* path) {
+	lock_guard_type lock(_mutex);
+	BF_ASSERT_EXCEPTION(_space==BF_SPACE_SYSTEM, BF_STATUS_UNSUPPORTED_SPACE);
+	BF_ASSERT_EXCEPTION(*path,                   BF_STATUS_INVALID_ARGUMENT);
+	BF_ASSERT_EXCEPTION(!_shared,                BF_STATUS_INVALID_STATE);
+	// Note: The backing of an existing allocation cannot be changed
+	BF_ASSERT_EXCEPTION(!_buf,                   BF_STATUS_INVALID_STATE);
+	BF_ASSERT_EXCEPTION(!_writing_begun,         BF_STATUS_INVALID_STATE);
+	_backing_path = path;
+	if( ::access(path, F_OK) == 0 ) {
+		try {
+			this->_restore_from_backing_file();
+		} catch( ... ) {
+			_backing_path.clear();
+			throw;
+		}
+	}
+}
+void BFring_impl::set_alloc_policy(int policy) {
+	lock_guard_type lock(_mutex);
+	int all_flags = (BF_RING_POLICY_THP     | BF_RING_POLICY_HUGETLB |
+	                 BF_RING_POLICY_MLOCK   | BF_RING_POLICY_PREFAULT |
+	                 BF_RING_POLICY_MIRROR);
+	BF_ASSERT_EXCEPTION(!(policy & ~all_flags), BF_STATUS_INVALID_ARGUMENT);
+	int system_flags = (BF_RING_POLICY_THP   | BF_RING_POLICY_HUGETLB |
+	                    BF_RING_POLICY_MLOCK | BF_RING_POLICY_MIRROR);
+	BF_ASSERT_EXCEPTION(!(policy & system_flags) || _space==BF_SPACE_SYSTEM,
+	                    BF_STATUS_UNSUPPORTED_SPACE);
+	BF_ASSERT_EXCEPTION(!(policy & BF_RING_POLICY_PREFAULT) ||
+	                    _space==BF_SPACE_SYSTEM || _space==BF_SPACE_CUDA_HOST,
+	                    BF_STATUS_UNSUPPORTED_SPACE);
+	_policy = policy;
+}
+static thread_local int    thread_wait_policy  = BF_RING_WAIT_DEFAULT;
+static thread_local BFsize thread_wait_spin_ns = 0;
+static bool is_valid_wait_policy(int policy) {
+	return (policy == BF_RING_WAIT_BLOCK ||
+	        policy == BF_RING_WAIT_SPIN  ||
+	        policy == BF_RING_WAIT_YIELD);
+}
+void BFring_impl::set_wait_policy(int policy, BFsize spin_ns) {
+	BF_ASSERT_EXCEPTION(is_valid_wait_policy(policy), BF_STATUS_INVALID_ARGUMENT);
+	lock_guard_type lock(_mutex);
+	_wait_policy  = policy;
+	_wait_spin_ns = spin_ns;
+	_write_proclog_entry();
+}
+void BFring_impl::get_wait_policy(int* policy, BFsize* spin_ns) const {
+	lock_guard_type lock(_mutex);
+	*policy  = _wait_policy;
+	*spin_ns = _wait_spin_ns;
+}
+void BFring_impl::set_thread_wait_policy(int policy, BFsize spin_ns) {
+	BF_ASSERT_EXCEPTION(policy == BF_RING_WAIT_DEFAULT ||
+	                    is_valid_wait_policy(policy),
+	                    BF_STATUS_INVALID_ARGUMENT);
+	thread_wait_policy  = policy;
+	thread_wait_spin_ns = spin_ns;
+}
+void BFring_impl::get_thread_wait_policy(int* policy, BFsize* spin_ns) {
+	*policy  = thread_wait_policy;
+	*spin_ns = thread_wait_spin_ns;
+}
+static inline void cpu_relax() {
+#if defined __x86_64__ || defined __i386__
+	__builtin_ia32_pause();
+#elif defined __aarch64__
+	asm volatile("yield" ::: "memory");
+#endif
+}
+template<typename Predicate>
+void BFring_impl::_wait(unique_lock_type& lock, condition_type& condition,
+                        Predicate pred, bool writer) const {
+	// Note: This must be called with the ring's mutex held, and returns with
+	//         it held and pred() satisfied.
+	if( pred() ) {
+		return;
+	}
+	int    policy  = _wait_policy;
+	BFsize spin_ns = _wait_spin_ns;
+	if( thread_wait_policy != BF_RING_WAIT_DEFAULT ) {
+		policy  = thread_wait_policy;
+		spin_ns = thread_wait_spin_ns;
+	}
+	clock_type::time_point start    = clock_type::now();
+	clock_type::time_point spin_end = start + std::chrono::nanoseconds(spin_ns);
+	bool yielding = false;
+	do {
+		if( policy == BF_RING_WAIT_BLOCK &&
+		    (spin_ns == 0 || clock_type::now() >= spin_end) ) {
+			condition.wait(lock, pred);
+			break;
+		}
+		// Note: The version is read with the lock held, so any state change
+		//         made after pred() was checked will change it.
+		BFsize version = _state_version.load(std::memory_order_acquire);
+		lock.unlock();
+		while( _state_version.load(std::memory_order_acquire) == version ) {
+			if( yielding ) {
+				std::this_thread::yield();
+			} else {
+				cpu_relax();
+				if( policy != BF_RING_WAIT_SPIN && clock_type::now() >= spin_end ) {
+					if( policy == BF_RING_WAIT_BLOCK ) {
+						break;
+					}
+					yielding = true;
+				}
+			}
+		}
+		lock.lock();
+	} while( !pred() );
+	BFsize elapsed_ns = std::chrono::duration_cast<std::chrono::nanoseconds>(
+		clock_type::now() - start).count();
+	if( writer ) {
+		_stat_nwrite_wait.fetch_add(1, std::memory_order_relaxed);
+		_stat_write_wait_ns.fetch_add(elapsed_ns, std::memory_order_relaxed);
+	} else {
+		_stat_nread_wait.fetch_add(1, std::memory_order_relaxed);
+		_stat_read_wait_ns.fetch_add(elapsed_ns, std::memory_order_relaxed);
+	}
+}
+// The header at the start of a ring's backing file. The buffer follows it,
+//   and the ring's sequences are stored separately in <path>.seq.
+// Note: tail and head are updated in place as data are written, so that the
+//         committed data can be found after a crash.
+struct BFringfile_header {
+	char     magic[8];
+	uint64_t header_nbyte;
+	uint64_t ghost_span;
+	uint64_t span;
+	uint64_t stride;
+	uint64_t nringlet;
+	uint64_t offset0;
+	uint64_t tail;
+	uint64_t head;
+};
+static const char BF_RINGFILE_MAGIC[8]     = {'B','F','R','I','N','G','0','1'};
+static const char BF_RINGFILE_SEQ_MAGIC[8] = {'B','F','R','S','E','Q','0','1'};
+// The buffer is page-aligned within the file
+static BFsize get_ringfile_header_nbyte() {
+	return std::max((BFsize)::sysconf(_SC_PAGESIZE), (BFsize)bfGetAlignment());
+}
+static void write_u64(std::ostream& out, uint64_t value) {
+	out.write((const char*)&value, sizeof(value));
+}
+static uint64_t read_u64(std::istream& in) {
+	uint64_t value = 0;
+	in.read((char*)&value, sizeof(value));
+	return value;
+}
+// Returns the default hugepage size, which MAP_HUGETLB mappings must be a
+//   multiple of.
+static BFsize get_hugepage_size() {
+	static BFsize size = 0;
+	if( !size ) {
+		size = 2*1024*1024;
+		std::ifstream meminfo("/proc/meminfo");
+		std::string key;
+		BFsize value;
+		while( meminfo >> key ) {
+			if( key == "Hugepagesize:" && (meminfo >> value) ) {
+				size = value * 1024;
+				break;
+			}
+			meminfo.ignore(std::numeric_limits<std::streamsize>::max(), '\n');
+		}
+	}
+	return size;
+}
+BFring_impl::pointer BFring_impl::_allocate(BFsize       nbyte,
+                                            std::string& shared_name,
+                                            int&         policy,
+                                            BFsize&      mapped_nbyte) {
+	pointer buf = nullptr;
+	policy = _policy & (BF_RING_POLICY_MLOCK | BF_RING_POLICY_PREFAULT);
+	mapped_nbyte = 0;
+	if( !_backing_path.empty() ) {
+		return this->_allocate_file(nbyte, mapped_nbyte);
+	}
+	if( !_shared ) {
+		if( !(_policy & (BF_RING_POLICY_THP | BF_RING_POLICY_HUGETLB)) ) {
+			// Note: Ring buffers bypass the memory pool, as they may be
+			//         NUMA-bound or locked
+			BF_ASSERT_EXCEPTION(raw_malloc((void**)&buf, nbyte, _space) == BF_STATUS_SUCCESS,
+			                    BF_STATUS_MEM_ALLOC_FAILED);
+			return buf;
+		}
+		// Note: Hugepage-backed buffers are mapped directly, rounding up to
+		//         a whole number of hugepages.
+		mapped_nbyte = round_up(nbyte, get_hugepage_size());
+		void* ptr = MAP_FAILED;
+#ifdef MAP_HUGETLB
+		if( _policy & BF_RING_POLICY_HUGETLB ) {
+			ptr = ::mmap(nullptr, mapped_nbyte, PROT_READ | PROT_WRITE,
+			             MAP_PRIVATE | MAP_ANONYMOUS | MAP_HUGETLB, -1, 0);
+			if( ptr != MAP_FAILED ) {
+				policy |= BF_RING_POLICY_HUGETLB;
+			}
+		}
+#endif
+		if( ptr == MAP_FAILED ) {
+			// Note: Explicit hugepages fall back to transparent ones if none
+			//         are available.
+			ptr = ::mmap(nullptr, mapped_nbyte, PROT_READ | PROT_WRITE,
+			             MAP_PRIVATE | MAP_ANONYMOUS, -1, 0);
+			BF_ASSERT_EXCEPTION(ptr != MAP_FAILED, BF_STATUS_MEM_ALLOC_FAILED);
+#ifdef MADV_HUGEPAGE
+			if( ::madvise(ptr, mapped_nbyte, MADV_HUGEPAGE) == 0 ) {
+				policy |= BF_RING_POLICY_THP;
+			}
+#endif
+		}
+		return (pointer)ptr;
 	}
+	// Note: Each allocation gets a new name so that processes that still
+	//         have the previous allocation mapped are not affected.
+	std::stringstream ss;
+	ss << "/bifrost_" << ::getpid() << "_";
+	for( char c : _name.substr(0, 64) ) {
+		ss << (std::isalnum(c) ? c : '_');
+	}
+	ss << "_" << _shared_count++;
+	shared_name = ss.str();
+	int fd = ::shm_open(shared_name.c_str(), O_CREAT | O_EXCL | O_RDWR, 0600);
+	BF_ASSERT_EXCEPTION(fd != -1, BF_STATUS_MEM_ALLOC_FAILED);
+	if( ::ftruncate(fd, nbyte) == 0 ) {
+		void* ptr = ::mmap(nullptr, nbyte, PROT_READ | PROT_WRITE,
+		                   MAP_SHARED, fd, 0);
+		if( ptr != MAP_FAILED ) {
+			buf = (pointer)ptr;
+		}
+	}
+	::close(fd);
+	if( !buf ) {
+		::shm_unlink(shared_name.c_str());
+		throw BFexception(BF_STATUS_MEM_ALLOC_FAILED);
+	}
+#ifdef MADV_HUGEPAGE
+	// Note: This only has an effect if shmem_enabled allows it
+	if( (_policy & (BF_RING_POLICY_THP | BF_RING_POLICY_HUGETLB)) &&
+	    ::madvise(buf, nbyte, MADV_HUGEPAGE) == 0 ) {
+		policy |= BF_RING_POLICY_THP;
+	}
+#endif
+	return buf;
+}
+BFring_impl::pointer BFring_impl::_allocate_mirrored(BFsize  span,
+                                                     BFsize  ghost_span,
+                                                     BFsize  nringlet,
+                                                     int&    policy,
+                                                     BFsize& mapped_nbyte) {
+	// Note: This returns nullptr if a mirrored mapping cannot be made, in
+	//         which case the caller falls back to a ghosted allocation.
+#if defined __linux__ && __linux__ && defined MFD_CLOEXEC
+	BFsize stride = span + ghost_span;
+	int fd = ::memfd_create(_name.c_str(), MFD_CLOEXEC);
+	if( fd == -1 ) {
+		return nullptr;
+	}
+	pointer buf = nullptr;
+	if( ::ftruncate(fd, span*nringlet) == 0 ) {
+		// Reserve the whole address range, then map each ringlet's pages
+		//   followed by its first ghost_span bytes again
+		void* base = ::mmap(nullptr, stride*nringlet, PROT_NONE,
+		                    MAP_PRIVATE | MAP_ANONYMOUS, -1, 0);
+		if( base != MAP_FAILED ) {
+			buf = (pointer)base;
+			for( BFsize r=0; r<nringlet; ++r ) {
+				pointer ringlet = buf + r*stride;
+				if( ::mmap(ringlet, span, PROT_READ | PROT_WRITE,
+				           MAP_SHARED | MAP_FIXED, fd, r*span) == MAP_FAILED ||
+				    (ghost_span &&
+				     ::mmap(ringlet + span, ghost_span, PROT_READ | PROT_WRITE,
+				            MAP_SHARED | MAP_FIXED, fd, r*span) == MAP_FAILED) ) {
+					::munmap(base, stride*nringlet);
+					buf = nullptr;
+					break;
+				}
+			}
+		}
+	}
+	::close(fd);
+	if( !buf ) {
+		return nullptr;
+	}
+	policy = ((_policy & (BF_RING_POLICY_MLOCK | BF_RING_POLICY_PREFAULT)) |
+	          BF_RING_POLICY_MIRROR);
+#ifdef MADV_HUGEPAGE
+	// Note: This only has an effect if shmem_enabled allows it
+	if( (_policy & (BF_RING_POLICY_THP | BF_RING_POLICY_HUGETLB)) &&
+	    ::madvise(buf, stride*nringlet, MADV_HUGEPAGE) == 0 ) {
+		policy |= BF_RING_POLICY_THP;
+	}
+#endif
+	mapped_nbyte = stride*nringlet;
+	return buf;
+#else
+	return nullptr;
+#endif
+}
+BFring_impl::pointer BFring_impl::_allocate_file(BFsize  nbyte,
+                                                 BFsize& mapped_nbyte) {
+	// Note: The new buffer is mapped from a temporary file that only
+	//         replaces the backing file once it is complete (see
+	//         _commit_backing_file), so that the previous contents remain
+	//         restorable until then.
+	BFsize header_nbyte = get_ringfile_header_nbyte();
+	std::string tmp_path = _backing_path + ".tmp";
+	int fd = ::open(tmp_path.c_str(), O_CREAT | O_TRUNC | O_RDWR | O_CLOEXEC, 0600);
+	BF_ASSERT_EXCEPTION(fd != -1, BF_STATUS_MEM_ALLOC_FAILED);
+	void* ptr = MAP_FAILED;
+	if( ::ftruncate(fd, header_nbyte + nbyte) == 0 ) {
+		ptr = ::mmap(nullptr, header_nbyte + nbyte, PROT_READ | PROT_WRITE,
+		             MAP_SHARED, fd, 0);
+	}
+	::close(fd);
+	if( ptr == MAP_FAILED ) {
+		::unlink(tmp_path.c_str());
+		throw BFexception(BF_STATUS_MEM_ALLOC_FAILED);
+	}
+	mapped_nbyte = header_nbyte + nbyte;
+	return (pointer)ptr + header_nbyte;
+}
+void BFring_impl::_commit_backing_file() {
+	// Note: This must be called with the ring's mutex held, after the
+	//         buffer allocated by _allocate_file has been filled
+	BFsize header_nbyte = get_ringfile_header_nbyte();
+	_file_header = (BFringfile_header*)(_buf - header_nbyte);
+	std::memcpy(_file_header->magic, BF_RINGFILE_MAGIC, sizeof(BF_RINGFILE_MAGIC));
+	_file_header->header_nbyte = header_nbyte;
+	_file_header->ghost_span   = _ghost_span;
+	_file_header->span         = _span;
+	_file_header->stride       = _stride;
+	_file_header->nringlet     = _nringlet;
+	_file_header->offset0      = _offset0;
+	this->_persist_offsets();
+	std::string tmp_path = _backing_path + ".tmp";
+	BF_ASSERT_EXCEPTION(::rename(tmp_path.c_str(), _backing_path.c_str()) == 0,
+	                    BF_STATUS_INTERNAL_ERROR);
+}
+void BFring_impl::_persist_offsets() {
+	// Note: This must be called with the ring's mutex held
+	if( _file_header ) {
+		_file_header->tail = _tail;
+		_file_header->head = _head;
+	}
+}
+void BFring_impl::_write_sequence_file() {
+	// Note: This must be called with the ring's mutex held
+	if( _backing_path.empty() ) {
+		return;
+	}
+	std::string path     = _backing_path + ".seq";
+	std::string tmp_path = path + ".tmp";
+	{
+		std::ofstream out(tmp_path, std::ios::binary | std::ios::trunc);
+		out.write(BF_RINGFILE_SEQ_MAGIC, sizeof(BF_RINGFILE_SEQ_MAGIC));
+		write_u64(out, _sequence_queue.size());
+		// Note: Sequences in the queue are linked in order
+		BFsequence_sptr sequence;
+		if( !_sequence_queue.empty() ) {
+			sequence = _sequence_queue.front();
+		}
+		for( ; sequence; sequence = sequence->_next ) {
+			write_u64(out, sequence->_time_tag);
+			write_u64(out, sequence->_nringlet);
+			write_u64(out, sequence->_begin);
+			write_u64(out, sequence->_end);
+			write_u64(out, sequence->_name.size());
+			out.write(sequence->_name.data(), sequence->_name.size());
+			write_u64(out, sequence->_header.size());
+			out.write(sequence->_header.data(), sequence->_header.size());
+		}
+		BF_ASSERT_EXCEPTION(out.good(), BF_STATUS_INTERNAL_ERROR);
+	}
+	BF_ASSERT_EXCEPTION(::rename(tmp_path.c_str(), path.c_str()) == 0,
+	                    BF_STATUS_INTERNAL_ERROR);
+}
+void BFring_impl::_restore_from_backing_file() {
+	// Note: This must be called with the ring's mutex held
+	BFsize header_nbyte = get_ringfile_header_nbyte();
+	int fd = ::open(_backing_path.c_str(), O_RDWR | O_CLOEXEC);
+	BF_ASSERT_EXCEPTION(fd != -1, BF_STATUS_INVALID_ARGUMENT);
+	struct stat st;
+	BFringfile_header header;
+	bool valid = (::fstat(fd, &st) == 0 &&
+	              ::pread(fd, &header, sizeof(header), 0) == sizeof(header) &&
+	              std::memcmp(header.magic, BF_RINGFILE_MAGIC,
+	                          sizeof(BF_RINGFILE_MAGIC)) == 0 &&
+	              header.header_nbyte == header_nbyte &&
+	              header.span > 0 &&
+	              header.stride == header.span + header.ghost_span &&
+	              BFoffset(header.head - header.tail) <= header.span &&
+	              (BFsize)st.st_size == header_nbyte + header.stride*header.nringlet);
+	void* ptr = MAP_FAILED;
+	if( valid ) {
+		ptr = ::mmap(nullptr, st.st_size, PROT_READ | PROT_WRITE,
+		             MAP_SHARED, fd, 0);
+	}
+	::close(fd);
+	BF_ASSERT_EXCEPTION(ptr != MAP_FAILED, BF_STATUS_INVALID_ARGUMENT);
+	
+	// Read the sequences before changing any state
+	std::vector<BFsequence_sptr> sequences;
+	std::ifstream in(_backing_path + ".seq", std::ios::binary);
+	if( in ) {
+		char magic[sizeof(BF_RINGFILE_SEQ_MAGIC)] = {0};
+		in.read(magic, sizeof(magic));
+		uint64_t nsequence = read_u64(in);
+		bool seq_valid = (in.good() &&
+		                  std::memcmp(magic, BF_RINGFILE_SEQ_MAGIC, sizeof(magic)) == 0);
+		for( uint64_t i=0; seq_valid && i<nsequence; ++i ) {
+			BFoffset time_tag = read_u64(in);
+			BFsize   nringlet = read_u64(in);
+			BFoffset begin    = read_u64(in);
+			BFoffset end      = read_u64(in);
+			std::string name(read_u64(in), '\0');
+			in.read(&name[0], name.size());
+			std::vector<char> hdr(read_u64(in));
+			in.read(hdr.data(), hdr.size());
+			seq_valid = in.good();
+			if( !seq_valid ) {
+				break;
+			}
+			if( end == BFoffset(BFsequence_impl::BF_SEQUENCE_OPEN) ) {
+				// The writer did not finish the sequence
+				end = header.head;
+			}
+			if( BFoffset(header.head - end) >= BFoffset(header.head - header.tail) &&
+			    end != header.head ) {
+				// The sequence has since been overwritten
+				continue;
+			}
+			BFsequence_sptr sequence(new BFsequence_impl(this, name.c_str(), time_tag,
+			                                             hdr.size(), hdr.data(),
+			                                             nringlet, begin));
+			sequence->_end = end;
+			sequences.push_back(sequence);
+		}
+		if( !seq_valid ) {
+			::munmap(ptr, st.st_size);
+			throw BFexception(BF_STATUS_INVALID_ARGUMENT);
+		}
+	}
+	
+	_buf              = (pointer)ptr + header_nbyte;
+	_file_header      = (BFringfile_header*)ptr;
+	_buf_mapped_nbyte = st.st_size;
+	_ghost_span       = header.ghost_span;
+	_span             = header.span;
+	_stride           = header.stride;
+	_nringlet         = header.nringlet;
+	_offset0          = header.offset0;
+	_tail             = header.tail;
+	_head             = header.head;
+	_reserve_head     = header.head;
+	// Note: Only the front of the buffer is kept up to date, so the whole
+	//         ghost region must be refreshed before it is read.
+	_ghost_dirty_beg  = 0;
+	// Note: Prefaulting would overwrite the restored data
+	_buf_policy = _policy & BF_RING_POLICY_MLOCK;
+	this->_lock_and_prefault(_buf, _stride*_nringlet, _buf_policy);
+	for( BFsequence_sptr sequence : sequences ) {
+		if( _sequence_queue.size() ) {
+			_sequence_queue.back()->set_next(sequence);
+		}
+		_sequence_queue.push(sequence);
+		if( !sequence->_name.empty() ) {
+			_sequence_map.insert(std::make_pair(sequence->_name, sequence));
+		}
+		if( sequence->_time_tag != BFoffset(-1) ) {
+			_sequence_time_tag_map.insert(std::make_pair(sequence->_time_tag, sequence));
+		}
+	}
+	// The restored ring behaves as if its writer has ended
+	_writing_ended = true;
+	_eod = _head;
+	_update_stats();
+	_write_proclog_entry();
+}
+void BFring_impl::_lock_and_prefault(pointer buf, BFsize nbyte, int& policy) {
+	if( (policy & BF_RING_POLICY_MLOCK) && ::mlock(buf, nbyte) != 0 ) {
+		// Note: This is usually due to RLIMIT_MEMLOCK
+		policy &= ~BF_RING_POLICY_MLOCK;
+	}
+	if( policy & BF_RING_POLICY_PREFAULT ) {
+		// Note: This follows any NUMA binding so that pages are first
+		//         touched on the right node.
+		::memset(buf, 0, nbyte);
+	}
+}
+void BFring_impl::_deallocate(pointer            buf,
+                              BFsize             nbyte,
+                              std::string const& shared_name,
+                              BFsize             mapped_nbyte) {
+	if( !_backing_path.empty() ) {
+		::munmap(buf - get_ringfile_header_nbyte(), mapped_nbyte);
+		return;
+	}
+	if( mapped_nbyte ) {
+		::munmap(buf, mapped_nbyte);
+		return;
+	}
+	if( shared_name.empty() ) {
+		raw_free(buf, _space);
+		return;
+	}
+	// Note: Processes that have the segment mapped keep it alive until
+	//         they unmap it; unlinking only removes the name.
+	::munmap(buf, nbyte);
+	::shm_unlink(shared_name.c_str());
 }
 void BFring_impl::resize(BFsize contiguous_span,
                          BFsize total_span,
@@ -145,11 +761,24 @@ void BFring_impl::resize(BFsize contiguous_span,
 	// TODO: Not sure if this is a good idea or not
 	//new_ghost_span = round_up_pow2(new_ghost_span);
 	new_ghost_span = round_up(new_ghost_span, bfGetAlignment());
+	// Note: Mirrored mappings must be made in whole pages, and the ghost
+	//         region can only mirror data that exist in the ringlet.
+	bool mirror = ((_policy & BF_RING_POLICY_MIRROR) && !_shared &&
+	               _backing_path.empty());
+	if( mirror ) {
+		BFsize page_size = ::sysconf(_SC_PAGESIZE);
+		BFsize mirror_span       = std::max(new_span, page_size);
+		BFsize mirror_ghost_span = round_up(new_ghost_span, page_size);
+		mirror = (mirror_ghost_span <= mirror_span);
+		if( mirror ) {
+			new_span       = mirror_span;
+			new_ghost_span = mirror_ghost_span;
+		}
+	}
 	BFsize  new_stride = new_span + new_ghost_span;
 	BFsize  new_nbyte  = new_stride*new_nringlet;
 	//pointer new_buf    = (pointer)bfMalloc(new_nbyte, _space);
 	//std::std::cout << "new_buf = " << (void*)new_buf << std::endl; // HACK TESTING
-	pointer new_buf = nullptr;
 	//std::std::cout << "contig_span:    " << contiguous_span << std::endl;
 	//std::std::cout << "total_span:     " << total_span << std::endl;
 	//std::std::cout << "new_span:       " << new_span << std::endl;
@@ -157,8 +786,18 @@ void BFring_impl::resize(BFsize contiguous_span,
 	//std::std::cout << "new_nringlet:   " << new_nringlet << std::endl;
 	//std::std::cout << "new_stride:     " << new_stride << std::endl;
 	//std::std::cout << "Allocating " << new_nbyte << std::endl;
-	BF_ASSERT_EXCEPTION(bfMalloc((void**)&new_buf, new_nbyte, _space) == BF_STATUS_SUCCESS,
-	                    BF_STATUS_MEM_ALLOC_FAILED);
+	std::string new_shared_name;
+	int         new_policy;
+	BFsize      new_mapped_nbyte;
+	pointer new_buf = nullptr;
+	if( mirror ) {
+		new_buf = this->_allocate_mirrored(new_span, new_ghost_span, new_nringlet,
+		                                   new_policy, new_mapped_nbyte);
+	}
+	if( !new_buf ) {
+		new_buf = this->_allocate(new_nbyte, new_shared_name,
+		                          new_policy, new_mapped_nbyte);
+	}
 #if BF_HWLOC_ENABLED
 	if( _core != -1 ) {
 		int node = _hwloc.get_numa_node_of_core(_core);
@@ -166,6 +805,7 @@ void BFring_impl::resize(BFsize contiguous_span,
 		_hwloc.bind_memory_area_to_numa_node(new_buf, new_nbyte, node);
 	}
 #endif
+	this->_lock_and_prefault(new_buf, new_nbyte, new_policy);
 	if( _buf ) {
 		// Must move existing data and delete old buf
 		if( _buf_offset(_tail) < _buf_offset(_head) ) {
@@ -185,18 +825,23 @@ void BFring_impl::resize(BFsize contiguous_span,
 			           _span - _buf_offset(_tail), _nringlet);
 			_offset0 = _head - _buf_offset(_head); // TODO: Check this for sign/overflow issues
 		}
-		// Copy old ghost region to new buffer
-		bfMemcpy2D(new_buf + new_span, new_stride, _space,
-		           _buf    +    _span,    _stride, _space,
-		           _ghost_span, _nringlet);
-		// Copy the part of the beg corresponding to the extra ghost space
-		bfMemcpy2D(new_buf + new_span + _ghost_span, new_stride, _space,
-		           _buf + _ghost_span,                  _stride, _space,
-		           std::min(new_ghost_span, _span) - _ghost_span, _nringlet);
+		// Note: The ghost region of a mirrored buffer already holds the
+		//         data copied above.
+		if( !(new_policy & BF_RING_POLICY_MIRROR) ) {
+			// Copy old ghost region to new buffer
+			bfMemcpy2D(new_buf + new_span, new_stride, _space,
+			           _buf    +    _span,    _stride, _space,
+			           _ghost_span, _nringlet);
+			// Copy the part of the beg corresponding to the extra ghost space
+			bfMemcpy2D(new_buf + new_span + _ghost_span, new_stride, _space,
+			           _buf + _ghost_span,                  _stride, _space,
+			           std::min(new_ghost_span, _span) - _ghost_span, _nringlet);
+		}
 		//_ghost_dirty = true; // TODO: Is this the right thing to do?
 		//_ghost_dirty_beg = new_ghost_span; // TODO: Is this the right thing to do?
 		_ghost_dirty_beg = 0; // TODO: Is this the right thing to do?
-		bfFree(_buf, _space);
+		this->_deallocate(_buf, _stride*_nringlet, _shared_name,
+		                  _buf_mapped_nbyte);
 		bfStreamSynchronize();
 	}
 	_buf        = new_buf;
@@ -204,6 +849,13 @@ void BFring_impl::resize(BFsize contiguous_span,
 	_span       = new_span;
 	_stride     = new_stride;
 	_nringlet   = new_nringlet;
+	_shared_name = new_shared_name;
+	_buf_policy       = new_policy;
+	_buf_mapped_nbyte = new_mapped_nbyte;
+	if( !_backing_path.empty() ) {
+		this->_commit_backing_file();
+	}
+	_update_stats();
 	
 	// Update the ProcLog entry for this ring
 	_write_proclog_entry();
@@ -211,7 +863,10 @@ void BFring_impl::resize(BFsize contiguous_span,
 void BFring_impl::begin_writing() {
 	lock_guard_type lock(_mutex);
 	BF_ASSERT_EXCEPTION(!_writing_begun, BF_STATUS_INVALID_STATE);
-	BF_ASSERT_EXCEPTION(!_writing_ended, BF_STATUS_INVALID_STATE);
+	// Note: Writing may only have ended without having begun if the ring
+	//         was restored from its backing file, in which case a new
+	//         writer may append to it.
+	_writing_ended = false;
 	_writing_begun = true;
 }
 void BFring_impl::end_writing() {
@@ -222,6 +877,8 @@ void BFring_impl::end_writing() {
 	_writing_ended = true;
 	_eod = _head;
 	_sequence_condition.notify_all();
+	_signal_events();
+	_write_proclog_entry();
 }
 /*
 BFoffset BFring_impl::_wrap_offset(BFoffset offset) const {
@@ -247,6 +904,10 @@ BFring_impl::pointer BFring_impl::_buf_pointer(BFoffset offset) const {
 	return _buf + _buf_offset(offset);
 }
 void BFring_impl::_ghost_write(BFoffset offset, BFsize span) {
+	if( _buf_policy & BF_RING_POLICY_MIRROR ) {
+		// The ghost region is the front of the buffer
+		return;
+	}
 	BFoffset buf_offset_beg = _buf_offset(offset);
 	BFoffset buf_offset_end = _buf_offset(offset + span);
 	if( buf_offset_end < buf_offset_beg ) {
@@ -259,6 +920,9 @@ void BFring_impl::_ghost_write(BFoffset offset, BFsize span) {
 	}
 }
 void BFring_impl::_ghost_read(BFoffset offset, BFsize span) {
+	if( _buf_policy & BF_RING_POLICY_MIRROR ) {
+		return;
+	}
 	BFoffset buf_offset_beg = _buf_offset(offset);
 	BFoffset buf_offset_end = _buf_offset(offset + span);
 	if( buf_offset_end < buf_offset_beg ) {
@@ -312,12 +976,14 @@ BFsequence_sptr BFring_impl::begin_sequence(const char* name,
 	}
 	_sequence_queue.push(sequence);
 	_sequence_condition.notify_all();
+	_signal_events();
 	if( !std::string(name).empty() ) {
 		_sequence_map.insert(std::make_pair(std::string(name),sequence));
 	}
 	if( time_tag != BFoffset(-1) ) {
 		_sequence_time_tag_map.insert(std::make_pair(time_tag,sequence));
 	}
+	this->_write_sequence_file();
 	return sequence;
 }
 
@@ -390,9 +1056,9 @@ bool BFring_impl::_sequence_still_within_ring(BFsequence_sptr sequence) const {
 
 BFsequence_sptr BFring_impl::_get_earliest_or_latest_sequence(unique_lock_type& lock, bool latest) const {
 	// Wait until a sequence has been opened or writing has ended
-	_sequence_condition.wait(lock, [this]() {
+	this->_wait(lock, _sequence_condition, [this]() {
 			return !_sequence_queue.empty() || _writing_ended;
-		});
+		}, false);
 	BF_ASSERT_EXCEPTION(!(_sequence_queue.empty() && !_writing_ended), BF_STATUS_INVALID_STATE);
 	BF_ASSERT_EXCEPTION(!(_sequence_queue.empty() &&  _writing_ended), BF_STATUS_END_OF_DATA);
 	BFsequence_sptr sequence = (latest ?
@@ -416,9 +1082,9 @@ BFoffset BFring_impl::_get_start_of_sequence_within_ring(BFsequence_sptr sequenc
 BFsequence_sptr BFring_impl::_get_next_sequence(BFsequence_sptr sequence,
                                                 unique_lock_type& lock) const {
 	// Wait until the next sequence has been opened or writing has ended
-	_sequence_condition.wait(lock, [&]() {
+	this->_wait(lock, _sequence_condition, [&]() {
 			return ((bool)sequence->_next) || _writing_ended;
-		});
+		}, false);
 	BF_ASSERT_EXCEPTION(sequence->_next, BF_STATUS_END_OF_DATA);
 	return sequence->_next;
 }
@@ -470,22 +1136,65 @@ void BFring_impl::finish_sequence(BFsequence_sptr sequence,
 	                    BF_STATUS_INVALID_STATE);
 	// This marks the sequence as finished
 	sequence->_end = _head + offset_from_head;
+	this->_write_sequence_file();
 	_read_condition.notify_all();
+	_signal_events();
 }
 
 void BFring_impl::_write_proclog_entry() {
 	char cinfo[32]="";
 	#if BF_HWLOC_ENABLED
-	snprintf(cinfo, 31, "binding   : %i\n", _core);
+	snprintf(cinfo, 31, "binding      : %i\n", _core);
 	#endif
-	_size_log.update("space     : %s\n"
+	static const char* wait_policies[] = {"block", "spin", "yield"};
+	std::string policy;
+	if( _buf_policy & BF_RING_POLICY_HUGETLB )  policy += "hugetlb,";
+	if( _buf_policy & BF_RING_POLICY_THP )      policy += "thp,";
+	if( _buf_policy & BF_RING_POLICY_MLOCK )    policy += "mlock,";
+	if( _buf_policy & BF_RING_POLICY_PREFAULT ) policy += "prefault,";
+	if( _buf_policy & BF_RING_POLICY_MIRROR )   policy += "mirror,";
+	policy = policy.empty() ? "default" : policy.substr(0, policy.size()-1);
+	clock_type::time_point now = clock_type::now();
+	double elapsed = std::chrono::duration<double>(now - _proclog_time).count();
+	BFsize ncommitted = _stat_ncommitted.load(std::memory_order_relaxed);
+	double commit_rate = (elapsed > 0 ?
+	                      (ncommitted - _proclog_ncommitted) / elapsed : 0.);
+	_proclog_time       = now;
+	_proclog_ncommitted = ncommitted;
+	_size_log.update("space        : %s\n"
 	                 "%s"
-	                 "alignment : %llu\n"
-	                 "ghost     : %llu\n"
-	                 "span      : %llu\n"
-	                 "stride    : %llu\n"
-	                 "nringlet  : %llu\n", 
-	                 bfGetSpaceString(_space), cinfo, bfGetAlignment(), _span, _ghost_span, _stride, _nringlet);
+	                 "alignment    : %llu\n"
+	                 "ghost        : %llu\n"
+	                 "span         : %llu\n"
+	                 "stride       : %llu\n"
+	                 "nringlet     : %llu\n"
+	                 "policy       : %s\n"
+	                 "tail         : %llu\n"
+	                 "head         : %llu\n"
+	                 "reserve_head : %llu\n"
+	                 "guaranteed   : %llu\n"
+	                 "ncommitted   : %llu\n"
+	                 "nskipped     : %llu\n"
+	                 "noverwritten : %llu\n"
+	                 "commit_rate  : %f\n"
+	                 "wait_policy  : %s\n"
+	                 "spin_ns      : %llu\n"
+	                 "nread_wait   : %llu\n"
+	                 "read_wait    : %f\n"
+	                 "nwrite_wait  : %llu\n"
+	                 "write_wait   : %f\n",
+	                 bfGetSpaceString(_space), cinfo, bfGetAlignment(), _ghost_span, _span, _stride, _nringlet,
+	                 policy.c_str(),
+	                 _tail, _head, _reserve_head, locked_guaranteed_tail(),
+	                 ncommitted,
+	                 (BFsize)_stat_nskipped.load(std::memory_order_relaxed),
+	                 (BFsize)_stat_noverwritten.load(std::memory_order_relaxed),
+	                 commit_rate,
+	                 wait_policies[_wait_policy], _wait_spin_ns,
+	                 (BFsize)_stat_nread_wait.load(std::memory_order_relaxed),
+	                 _stat_read_wait_ns.load(std::memory_order_relaxed)*1e-9,
+	                 (BFsize)_stat_nwrite_wait.load(std::memory_order_relaxed),
+	                 _stat_write_wait_ns.load(std::memory_order_relaxed)*1e-9);
 }
 
 BFsequence_impl::BFsequence_impl(BFring      ring,
@@ -524,7 +1233,7 @@ bool BFring_impl::_advance_reserve_head(unique_lock_type& lock, BFsize size,
 		        _nrealloc_pending == 0);
 	};
 	if( !nonblocking ) {
-		_write_condition.wait(lock, postcondition_predicate);
+		this->_wait(lock, _write_condition, postcondition_predicate, true);
 	} else if( !postcondition_predicate() ) {
 		// Revert and return failure
 		_reserve_head -= size;
@@ -550,6 +1259,9 @@ bool BFring_impl::_advance_reserve_head(unique_lock_type& lock, BFsize size,
 			//delete _sequence_queue.front();
 			_sequence_queue.pop();
 		}
+		// Note: This must reach the backing file before the reserved span
+		//         is written to
+		this->_persist_offsets();
 	}
 	return true;
 }
@@ -562,6 +1274,7 @@ void BFring_impl::reserve_span(BFsize size, BFoffset* begin, void** data,
 	BF_ASSERT_EXCEPTION(this->_advance_reserve_head(lock, size, nonblocking),
 	                    BF_STATUS_WOULD_BLOCK);
 	++_nwrite_open;
+	_update_stats();
 	*data = _buf_pointer(*begin);
 }
 void BFring_impl::commit_span(BFoffset begin, BFsize reserve_size, BFsize commit_size) {
@@ -578,6 +1291,7 @@ void BFring_impl::commit_span(BFoffset begin, BFsize reserve_size, BFsize commit
 		//   the reserve head.
 		_reserve_head = begin;
 		--_nwrite_open;
+		_update_stats();
 		_realloc_condition.notify_all();
 		return;
 	}
@@ -588,9 +1302,9 @@ void BFring_impl::commit_span(BFoffset begin, BFsize reserve_size, BFsize commit
 	//         in order (i.e., they will automatically synchronise).
 	//         This is useful for multithreading with OpenMP
 	//std::std::cout << "(1) begin, head, rhead: " << begin << ", " << _head << ", " << _reserve_head << std::endl;
-	_write_close_condition.wait(lock, [&]() {
+	this->_wait(lock, _write_close_condition, [&]() {
 			return (begin == _head);
-		});
+		}, true);
 	_write_close_condition.notify_all();
 	
 	if( _reserve_head == _head + reserve_size ) {
@@ -607,9 +1321,17 @@ void BFring_impl::commit_span(BFoffset begin, BFsize reserve_size, BFsize commit
 		BF_ASSERT_EXCEPTION(false, BF_STATUS_INVALID_STATE);
 	}
 	_head += commit_size;
+	this->_persist_offsets();
 	
 	_read_condition.notify_all();
+	_signal_events();
 	--_nwrite_open;
+	_stat_ncommitted.fetch_add(commit_size, std::memory_order_relaxed);
+	_update_stats();
+	// Note: The ProcLog entry is updated at most once per second
+	if( clock_type::now() - _proclog_time >= std::chrono::seconds(1) ) {
+		_write_proclog_entry();
+	}
 	_realloc_condition.notify_all();
 }
 
@@ -677,12 +1399,12 @@ void BFring_impl::acquire_span(BFrsequence rsequence,
 	//   after the end of the sequence.
 	
 	// Wait until requested span has been written or sequence has ended
-	_read_condition.wait(lock, [&]() {
+	this->_wait(lock, _read_condition, [&]() {
 			return ((BFdelta(_head         - std::max(requested_begin, _tail)) >=
 			         BFdelta(requested_end - std::max(requested_begin, _tail)) ||
 			         sequence->is_finished()) &&
 			        _nrealloc_pending == 0);
-		});
+		}, false);
 	
 	// Constrain to what is in the buffer (i.e., what hasn't been overwritten)
 	BFoffset begin = std::max(requested_begin, _tail);
@@ -698,7 +1420,13 @@ void BFring_impl::acquire_span(BFrsequence rsequence,
 	*begin_ = begin;
 	*size_  = size;
 	
+	if( begin > requested_begin ) {
+		_stat_nskipped.fetch_add(std::min(BFsize(begin - requested_begin),
+		                                  BFsize(requested_end - requested_begin)),
+		                         std::memory_order_relaxed);
+	}
 	++_nread_open;
+	_update_stats();
 	_ghost_read(begin, size);
 	*data_ = _buf_pointer(begin);
 }
@@ -706,7 +1434,12 @@ void BFring_impl::release_span(BFrsequence sequence,
                                BFoffset    begin,
                                BFsize      size) {
 	unique_lock_type lock(_mutex);
+	BFdelta noverwritten = std::min(BFdelta(_tail - begin), BFdelta(size));
+	if( noverwritten > 0 ) {
+		_stat_noverwritten.fetch_add(noverwritten, std::memory_order_relaxed);
+	}
 	--_nread_open;
+	_update_stats();
 	_realloc_condition.notify_all();
 }
 
@@ -43,6 +43,8 @@
 #include <queue>
 #include <set>
 #include <memory>
+#include <atomic>
+#include <chrono>
 
 class BFsequence_impl;
 class BFspan_impl;
@@ -50,6 +52,7 @@ class BFrspan_impl;
 class BFwspan_impl;
 class RingReallocLock;
 class Guarantee;
+struct BFringfile_header;
 typedef std::shared_ptr<BFsequence_impl> BFsequence_sptr;
 
 class BFring_impl {
@@ -96,13 +99,52 @@ class BFring_impl {
 	BFsize         _nread_open;
 	BFsize         _nwrite_open;
 	BFsize         _nrealloc_pending;
+	// Note: These are signalled along with the conditions above so that
+	//         waiters can be woken by an event loop instead of a thread.
+	std::vector<int> _event_fds;
 
 #if BF_HWLOC_ENABLED
   HardwareLocality _hwloc;
 #endif
 	int              _core;    	
+	bool             _shared;
+	std::string      _shared_name;
+	BFsize           _shared_count;
+	int              _policy;
+	// Note: These describe the current allocation
+	int              _buf_policy;
+	BFsize           _buf_mapped_nbyte;
+	// Note: When set, the buffer is mapped from this file (after the header)
+	std::string        _backing_path;
+	BFringfile_header* _file_header;
 	ProcLog          _size_log;
 	
+	// Note: These mirror the ring's state so that it can be monitored
+	//         without taking the lock (see get_stats).
+	std::atomic<BFoffset> _stat_tail;
+	std::atomic<BFoffset> _stat_head;
+	std::atomic<BFoffset> _stat_reserve_head;
+	std::atomic<BFoffset> _stat_guaranteed_tail;
+	std::atomic<BFsize>   _stat_span;
+	std::atomic<BFsize>   _stat_nread_open;
+	std::atomic<BFsize>   _stat_nwrite_open;
+	std::atomic<BFsize>   _stat_ncommitted;
+	std::atomic<BFsize>   _stat_nskipped;
+	std::atomic<BFsize>   _stat_noverwritten;
+	std::atomic<int>      _stat_alloc_policy;
+	mutable std::atomic<BFsize> _stat_nread_wait;
+	mutable std::atomic<BFsize> _stat_read_wait_ns;
+	mutable std::atomic<BFsize> _stat_nwrite_wait;
+	mutable std::atomic<BFsize> _stat_write_wait_ns;
+	// Note: This is incremented whenever the ring's state changes, so that
+	//         spinning waiters can poll it instead of taking the lock.
+	std::atomic<BFsize>   _state_version;
+	int                   _wait_policy;
+	BFsize                _wait_spin_ns;
+	typedef std::chrono::steady_clock clock_type;
+	clock_type::time_point _proclog_time;
+	BFsize                 _proclog_ncommitted;
+	
 	std::queue<BFsequence_sptr>           _sequence_queue;
 	std::map<std::string,BFsequence_sptr> _sequence_map;
 	std::map<BFoffset,BFsequence_sptr>    _sequence_time_tag_map;
@@ -117,7 +159,15 @@ class BFring_impl {
 	void _ghost_read( BFoffset offset, BFsize size);
 	void _copy_to_ghost(  BFoffset buf_offset, BFsize span);
 	void _copy_from_ghost(BFoffset buf_offset, BFsize span);
+	void _signal_events();
+	void _update_stats();
+	void _persist_offsets();
+	void _write_sequence_file();
+	void _restore_from_backing_file();
 	bool _advance_reserve_head(unique_lock_type& lock, BFsize size, bool nonblocking);
+	template<typename Predicate>
+	void _wait(unique_lock_type& lock, condition_type& condition,
+	           Predicate pred, bool writer) const;
 	inline void _add_guarantee(BFoffset offset) {
 		auto iter = _guarantees.find(offset);
 		if( iter == _guarantees.end() ) {
@@ -126,6 +176,7 @@ class BFring_impl {
 		else {
 			++iter->second;
 		}
+		_update_stats();
 	}
 	inline void _remove_guarantee(BFoffset offset) {
 		auto iter = _guarantees.find(offset);
@@ -135,6 +186,8 @@ class BFring_impl {
 		if( !--iter->second ) {
 			_guarantees.erase(iter);
 			_write_condition.notify_all();
+			_signal_events();
+			_update_stats();
 		}
 	}
 	inline BFoffset _get_earliest_guarantee() {
@@ -168,6 +221,15 @@ class BFring_impl {
 	BFring_impl(BFring_impl&& )                 = delete;
 	BFring_impl& operator=(BFring_impl&& )      = delete;
 	
+	pointer _allocate(BFsize nbyte, std::string& shared_name,
+	                  int& policy, BFsize& mapped_nbyte);
+	void    _deallocate(pointer buf, BFsize nbyte, std::string const& shared_name,
+	                    BFsize mapped_nbyte);
+	pointer _allocate_mirrored(BFsize span, BFsize ghost_span, BFsize nringlet,
+	                           int& policy, BFsize& mapped_nbyte);
+	void    _lock_and_prefault(pointer buf, BFsize nbyte, int& policy);
+	pointer _allocate_file(BFsize nbyte, BFsize& mapped_nbyte);
+	void    _commit_backing_file();
 	void _write_proclog_entry();
 public:
 	BFring_impl(const char* name,
@@ -180,6 +242,20 @@ public:
 	inline BFspace space()    const { return _space; }
 	inline void set_core(int core)  { _core = core; }
 	inline int      core()    const { return _core; }
+	void set_shared(bool shared);
+	inline bool     shared()  const { return _shared; }
+	void set_alloc_policy(int policy);
+	inline int alloc_policy() const { return _policy; }
+	void set_backing_file(const char* path);
+	void set_wait_policy(int policy, BFsize spin_ns);
+	void get_wait_policy(int* policy, BFsize* spin_ns) const;
+	// Note: These override the wait policy of all rings for the calling thread
+	static void set_thread_wait_policy(int policy, BFsize spin_ns);
+	static void get_thread_wait_policy(int* policy, BFsize* spin_ns);
+	inline const char* backing_file() const { return _backing_path.c_str(); }
+	int  create_event_fd();
+	void destroy_event_fd(int fd);
+	void get_stats(BFringstats* stats) const;
 	inline void   lock()   { _mutex.lock(); }
 	inline void   unlock() { _mutex.unlock(); }
 	inline void*  locked_data()            const { return _buf; }
@@ -187,8 +263,16 @@ public:
 	inline BFsize locked_total_span()      const { return _span; }
 	inline BFsize locked_nringlet()        const { return _nringlet; }
 	inline BFsize locked_stride()          const { return _stride; }
-	// TODO: Add getters for debugging/monitoring queries
-	//         such as positions of tail, head etc. in buffer.
+	inline const char* locked_shared_name() const { return _shared_name.c_str(); }
+	inline int      locked_alloc_policy()  const { return _buf_policy; }
+	inline BFoffset locked_tail()          const { return _tail; }
+	inline BFoffset locked_head()          const { return _head; }
+	inline BFoffset locked_reserve_head()  const { return _reserve_head; }
+	inline BFsize   locked_nsequence()     const { return _sequence_queue.size(); }
+	// Note: Data before this offset may be overwritten by the writer
+	inline BFoffset locked_guaranteed_tail() const {
+		return _guarantees.empty() ? _reserve_head : _guarantees.begin()->first;
+	}
 	
 	void begin_writing();
 	void end_writing();
@@ -292,6 +376,7 @@ public:
 	inline BFsize      nringlet()    const { return _nringlet; }
 	inline BFoffset    begin()       const { return _begin; }
 	inline BFoffset    end()         const { return _end; }
+	inline bool        has_next()    const { return (bool)_next; }
 };
 
 class BFsequence_wrapper {
@@ -308,6 +393,8 @@ public:
 	inline BFsize      header_size() const { return _sequence->header_size(); }
 	inline BFsize      nringlet()    const { return _sequence->nringlet(); }
 	inline BFoffset    begin()       const { return _sequence->begin(); }
+	inline BFoffset    end()         const { return _sequence->end(); }
+	inline bool        has_next()    const { return _sequence->has_next(); }
 };
 
 class BFwsequence_impl : public BFsequence_wrapper {
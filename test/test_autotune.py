@@ -0,0 +1,91 @@
+
+# Copyright (c) 2016-2023, The Bifrost Authors. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# * Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the distribution.
+# * Neither the name of The Bifrost Authors nor the names of its
+#   contributors may be used to endorse or promote products derived
+#   from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS ``AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED.  IN NO EVENT SHALL THE COPYRIGHT OWNER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY
+# OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import unittest
+
+from bifrost.autotune import GulpAutotuner, frame_duration, MAX_SCALE_LOG2
+
+def run_sequence(tuner, base_nframes, gulp_cost, ngulp=8, frame_time=None):
+    """Runs the tuner through one sequence with a modelled gulp cost"""
+    nframes = tuner.begin_sequence(base_nframes, 4, frame_time)
+    for _ in range(ngulp):
+        tuner.record(nframes[0], 0., gulp_cost(nframes[0]))
+    return nframes
+
+class AutotuneTest(unittest.TestCase):
+    def test_invalid_target(self):
+        self.assertRaises(ValueError, GulpAutotuner, 'speed')
+        self.assertRaises(ValueError, GulpAutotuner, 'latency')
+        self.assertRaises(ValueError, GulpAutotuner, 'latency', -1.)
+    def test_frame_duration(self):
+        hdr = {'_tensor': {'shape':  [-1, 1, 2],
+                           'scales': [[0, 8e-2], None, [433.968, -0.062]],
+                           'units':  ['ms', None, 'MHz']}}
+        self.assertAlmostEqual(frame_duration(hdr), 8e-5)
+        hdr['_tensor']['units'][0] = None
+        self.assertIsNone(frame_duration(hdr))
+        self.assertIsNone(frame_duration({}))
+    def test_throughput_grows(self):
+        # Fixed per-gulp overhead => larger gulps are always better
+        tuner = GulpAutotuner('throughput')
+        cost = lambda nframe: 1e-3 + 1e-6 * nframe
+        sizes = [run_sequence(tuner, [100], cost)[0] for _ in range(10)]
+        self.assertEqual(sizes[:3], [100, 200, 400])
+        self.assertEqual(sizes[-1], 100 << MAX_SCALE_LOG2)
+    def test_throughput_settles(self):
+        # Per-frame cost is lowest at 400 frames per gulp
+        tuner = GulpAutotuner('throughput')
+        cost = lambda nframe: nframe * (1e-6 if nframe == 400 else 2e-6)
+        sizes = [run_sequence(tuner, [100], cost)[0] for _ in range(10)]
+        self.assertEqual(sizes[-1], 400)
+    def test_throughput_shrinks(self):
+        # Per-frame cost grows with gulp size (e.g., cache thrashing)
+        tuner = GulpAutotuner('throughput')
+        cost = lambda nframe: 1e-6 * nframe**2
+        sizes = [run_sequence(tuner, [24, 48], cost) for _ in range(10)]
+        # Gulps can only shrink while they remain integer multiples
+        self.assertEqual(sizes[-1], [3, 6])
+    def test_throughput_resets_on_new_shape(self):
+        tuner = GulpAutotuner('throughput')
+        cost = lambda nframe: 1e-3 + 1e-6 * nframe
+        for _ in range(4):
+            run_sequence(tuner, [100], cost)
+        self.assertEqual(run_sequence(tuner, [50], cost), [50])
+    def test_latency_budget(self):
+        # 1 ms per frame to accumulate plus 1 us per frame to process
+        tuner = GulpAutotuner('latency', latency_budget=0.1)
+        cost = lambda nframe: 1e-6 * nframe
+        sizes = [run_sequence(tuner, [16], cost, frame_time=1e-3)[0]
+                 for _ in range(3)]
+        self.assertEqual(sizes, [16, 64, 64])
+        self.assertLessEqual(tuner.predict_latency(64), 0.1)
+        self.assertGreater(tuner.predict_latency(128), 0.1)
+    def test_latency_budget_unreachable(self):
+        tuner = GulpAutotuner('latency', latency_budget=1e-9)
+        cost = lambda nframe: 1e-3 + 1e-6 * nframe
+        sizes = [run_sequence(tuner, [100], cost)[0] for _ in range(3)]
+        self.assertEqual(sizes, [100, 25, 25])
@@ -27,6 +27,7 @@
 
 import sys
 import ctypes
+import threading
 import unittest
 import numpy as np
 import bifrost as bf
@@ -36,8 +37,9 @@ from bifrost.libbifrost_generated import BF_CUDA_ENABLED
 
 _FIRST_TEST = True
 
-@unittest.skipUnless(BF_CUDA_ENABLED, "requires GPU support")
-class TestMap(unittest.TestCase):
+class MapTestMixin(object):
+    """Tests of bf.map that run in the memory space given by `space`"""
+    space = None
     # TODO: @classmethod; def setUpClass(kls)
     def setUp(self):
         np.random.seed(1234)
@@ -47,7 +49,7 @@ class TestMap(unittest.TestCase):
             _FIRST_TEST = False
     def run_simple_test(self, x, funcstr, func):
         x_orig = x
-        x = bf.asarray(x, 'cuda')
+        x = bf.asarray(x, self.space)
         y = bf.empty_like(x)
         x.flags['WRITEABLE'] = False
         x.bf.immutable = True # TODO: Is this actually doing anything? (flags is, just not sure about bf.immutable)
@@ -78,7 +80,7 @@ class TestMap(unittest.TestCase):
     def test_simple_2D_padded(self):
         n = 89
         x = np.random.randint(256, size=(n,n))
-        x = bf.asarray(x, space='cuda')
+        x = bf.asarray(x, space=self.space)
         x = x[:,1:]
         self.run_simple_test_funcs(x)
     def test_simple_3D(self):
@@ -88,7 +90,7 @@ class TestMap(unittest.TestCase):
     def test_simple_3D_padded(self):
         n = 23
         x = np.random.randint(256, size=(n,n,n))
-        x = bf.asarray(x, space='cuda')
+        x = bf.asarray(x, space=self.space)
         x = x[:,:,1:]
         self.run_simple_test_funcs(x)
         # TODO: These require bfArrayCopy to support >2D padded arrays
@@ -99,9 +101,9 @@ class TestMap(unittest.TestCase):
     def test_broadcast(self):
         n = 89
         a = np.arange(n).astype(np.float32)
-        a = bf.asarray(a, space='cuda')
+        a = bf.asarray(a, space=self.space)
         b = a[:,None]
-        c = bf.empty((a.shape[0],b.shape[0]), a.dtype, 'cuda') # TODO: Need way to compute broadcast shape
+        c = bf.empty((a.shape[0],b.shape[0]), a.dtype, self.space) # TODO: Need way to compute broadcast shape
         for _ in range(3):
             bf.map("c = a*b", data={'a': a, 'b': b, 'c': c})
         a = a.copy('system')
@@ -113,7 +115,7 @@ class TestMap(unittest.TestCase):
         # Note: Python integer division rounds to -inf, while C rounds toward 0
         #         We avoid the problem here by using only positive values
         x = np.random.randint(1, 256, size=n)
-        x = bf.asarray(x, space='cuda')
+        x = bf.asarray(x, space=self.space)
         y = bf.empty_like(x)
         for _ in range(3):
             bf.map("y = (x-m)/s", data={'x': x, 'y': y, 'm': 1, 's': 3})
@@ -122,7 +124,7 @@ class TestMap(unittest.TestCase):
         np.testing.assert_equal(y, (x - 1) // 3)
     def test_manydim(self):
         known_data = np.arange(3**8).reshape([3] * 8).astype(np.float32)
-        a = bf.asarray(known_data, space='cuda')
+        a = bf.asarray(known_data, space=self.space)
         a = a[:,:,:,:,:2,:,:,:]
         b = bf.empty_like(a)
         for _ in range(3):
@@ -133,7 +135,7 @@ class TestMap(unittest.TestCase):
     def test_shift(self):
         shape = (55,66,77)
         a = np.random.randint(65536, size=shape).astype(np.int32)
-        a = bf.asarray(a, space='cuda')
+        a = bf.asarray(a, space=self.space)
         b = bf.empty_like(a)
         for _ in range(3):
             bf.map("b = a(_-a.shape()/2)", data={'a': a, 'b': b})
@@ -161,8 +163,8 @@ class TestMap(unittest.TestCase):
                 # ci4 is different
                 a_orig['re_im'] = np.random.randint(256, size=n, dtype=np.uint8)
             for out_dtype in (in_dtype, 'cf32'):
-                a = a_orig.copy(space='cuda')
-                b = bf.ndarray(shape=(n,), dtype=out_dtype, space='cuda')
+                a = a_orig.copy(space=self.space)
+                b = bf.ndarray(shape=(n,), dtype=out_dtype, space=self.space)
                 bf.map('b(i) = a(i)', {'a': a, 'b': b}, shape=a.shape, axis_names=('i',))
                 a = a.copy(space='system')
                 try:
@@ -189,7 +191,7 @@ class TestMap(unittest.TestCase):
         imag = np.random.randint(-127, 128, size=(n,2)).astype(np.float32)
         a = real + 1j * imag
         a_orig = a
-        a = bf.asarray(a, space='cuda')
+        a = bf.asarray(a, space=self.space)
         b = bf.empty_like(a)
         for _ in range(3):
             bf.map('''
@@ -209,8 +211,8 @@ class TestMap(unittest.TestCase):
     def test_explicit_indexing(self):
         shape = (55,66,77)
         a = np.random.randint(65536, size=shape).astype(np.int32)
-        a = bf.asarray(a, space='cuda')
-        b = bf.empty((a.shape[2],a.shape[0], a.shape[1]), a.dtype, 'cuda')
+        a = bf.asarray(a, space=self.space)
+        b = bf.empty((a.shape[2],a.shape[0], a.shape[1]), a.dtype, self.space)
         for _ in range(3):
             bf.map("b(i,j,k) = a(j,k,i)", shape=b.shape, axis_names=('i','j','k'),
                    data={'a': a, 'b': b}, block_shape=(64,4), block_axes=('i','k'))
@@ -220,8 +222,8 @@ class TestMap(unittest.TestCase):
     def test_custom_shape(self):
         shape = (55,66,77)
         a = np.random.randint(65536, size=shape).astype(np.int32)
-        a = bf.asarray(a, space='cuda')
-        b = bf.empty((a.shape[0],a.shape[2]), a.dtype, 'cuda')
+        a = bf.asarray(a, space=self.space)
+        b = bf.empty((a.shape[0],a.shape[2]), a.dtype, self.space)
         j = 11
         for _ in range(3):
             bf.map("b(i,k) = a(i,j,k)", shape=b.shape, axis_names=('i','k'),
@@ -229,6 +231,76 @@ class TestMap(unittest.TestCase):
         a = a.copy('system')
         b = b.copy('system')
         np.testing.assert_equal(b, a[:,j,:])
+    def test_compile(self):
+        n = 89
+        scale = bf.map.compile("b = a*k")
+        for k in (3, 3, 5):
+            a = np.random.randint(256, size=n).astype(np.float32)
+            a = bf.asarray(a, space=self.space)
+            b = bf.empty_like(a)
+            scale({'a': a, 'b': b, 'k': k})
+            a = a.copy('system')
+            b = b.copy('system')
+            np.testing.assert_equal(b, a * k)
+        # Changing the shape of the arguments rebinds them
+        a = np.random.randint(256, size=(n,n)).astype(np.float32)
+        a = bf.asarray(a, space=self.space)
+        b = bf.empty_like(a)
+        scale({'a': a, 'b': b, 'k': 2})
+        a = a.copy('system')
+        b = b.copy('system')
+        np.testing.assert_equal(b, a * 2)
+    def test_compile_shape(self):
+        shape = (55,66,77)
+        a = np.random.randint(65536, size=shape).astype(np.int32)
+        a = bf.asarray(a, space=self.space)
+        b = bf.empty((a.shape[0],a.shape[2]), a.dtype, self.space)
+        func = bf.map.compile("b(i,k) = a(i,j,k)", axis_names=('i','k'),
+                              shape=b.shape)
+        for j in range(3):
+            func({'a': a, 'b': b, 'j': j})
+            np.testing.assert_equal(b.copy('system'), a.copy('system')[:,j,:])
+        # The shape may be overridden for each call
+        func({'a': a[:11], 'b': b[:11], 'j': 1}, shape=(11,77))
+        np.testing.assert_equal(b.copy('system')[:11], a.copy('system')[:11,1,:])
+    def test_compile_shape_override(self):
+        a = bf.asarray(np.arange(20, dtype=np.int32).reshape(4,5), space=self.space)
+        b = bf.zeros((4,5), a.dtype, self.space)
+        func = bf.map.compile("b(i,j) = a(i,j)", axis_names=('i','j'),
+                              shape=b.shape)
+        func({'a': a, 'b': b}, shape=(2,5))
+        np.testing.assert_equal(b.copy('system')[2:], 0)
+        # The override must not carry over to later calls
+        func({'a': a, 'b': b})
+        np.testing.assert_equal(b.copy('system'), a.copy('system'))
+    def test_map_fused(self):
+        n = 89
+        real = np.random.randint(-127, 128, size=(n,n)).astype(np.float32)
+        imag = np.random.randint(-127, 128, size=(n,n)).astype(np.float32)
+        x_orig = real + 1j * imag
+        y_orig = np.random.randint(256, size=(n,n)).astype(np.float32)
+        x = bf.asarray(x_orig, space=self.space)
+        y = bf.asarray(y_orig, space=self.space)
+        bf.map_fused(["p = x.mag2()",
+                      "s = p * gain",
+                      "y += s"],
+                     {'x': x, 'y': y, 'gain': 0.5})
+        y = y.copy('system')
+        np.testing.assert_equal(y, y_orig + 0.5 * (real**2 + imag**2))
+    def test_map_fused_indexing(self):
+        shape = (55,66)
+        a = np.random.randint(65536, size=shape).astype(np.int32)
+        a = bf.asarray(a, space=self.space)
+        b = bf.empty_like(a)
+        func = bf.map.compile(["v = a(i,j-a.shape(1)/2)",
+                               "v = v * 2",
+                               "b(i,j) = v + 1"],
+                              axis_names=('i','j'), shape=a.shape)
+        for _ in range(3):
+            func({'a': a, 'b': b})
+        a = a.copy('system')
+        b = b.copy('system')
+        np.testing.assert_equal(b, np.fft.fftshift(a, axes=1) * 2 + 1)
     def test_list_cache(self):
         # TODO: would be nicer as a context manager, something like
         #       contextlib.redirect_stdout
@@ -241,3 +313,51 @@ class TestMap(unittest.TestCase):
         finally:
             sys.stdout = orig_stdout
             new_stdout.close()
+
+    def test_cache_limits(self):
+        orig_limits = bf.get_map_cache_limits()
+        a = bf.asarray(np.arange(10, dtype=np.float32), self.space)
+        b = bf.empty_like(a)
+        try:
+            bf.clear_map_cache()
+            bf.set_map_cache_limits(max_entries=2)
+            self.assertEqual(bf.get_map_cache_limits(),
+                             (2, orig_limits[1]))
+            for i in range(4):
+                bf.map(f"b = a + {i}", {'a': a, 'b': b})
+            entries = bf.get_map_cache_entries()
+            self.assertEqual(len(entries), 2)
+            # The most recently compiled kernels are kept
+            self.assertGreater(entries[0]['last_loaded'], entries[1]['last_loaded'])
+            for entry in entries:
+                self.assertEqual(entry['hits'], 0)
+                self.assertGreater(entry['nbyte'], 0)
+            bf.set_map_cache_limits(max_entries=0, max_bytes=1)
+            bf.map("b = a + 4", {'a': a, 'b': b})
+            # The newly-compiled kernel is never evicted
+            self.assertEqual(len(bf.get_map_cache_entries()), 1)
+        finally:
+            bf.set_map_cache_limits(*orig_limits)
+        self.assertRaises(RuntimeError, bf.set_map_cache_limits, max_entries=-1)
+    def test_cache_hits(self):
+        a = bf.asarray(np.arange(10, dtype=np.float32), self.space)
+        b = bf.empty_like(a)
+        bf.clear_map_cache()
+        bf.map("b = a * 3", {'a': a, 'b': b})
+        self.assertEqual([e['hits'] for e in bf.get_map_cache_entries()], [0])
+        # Kernels are cached in memory per thread, so a new thread loads the
+        #   kernel from disk
+        for i in range(2):
+            thread = threading.Thread(
+                target=bf.map, args=("b = a * 3", {'a': a, 'b': b}))
+            thread.start()
+            thread.join()
+        self.assertEqual([e['hits'] for e in bf.get_map_cache_entries()], [2])
+        np.testing.assert_equal(b.copy('system'), np.arange(10) * 3)
+
+@unittest.skipUnless(BF_CUDA_ENABLED, "requires GPU support")
+class TestMap(MapTestMixin, unittest.TestCase):
+    space = 'cuda'
+
+class TestMapSystem(MapTestMixin, unittest.TestCase):
+    space = 'system'
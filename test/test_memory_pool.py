@@ -0,0 +1,105 @@
+# Copyright (c) 2016-2023,The Bifrost Authors. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# * Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the distribution.
+# * Neither the name of The Bifrost Authors nor the names of its
+#   contributors may be used to endorse or promote products derived
+#   from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS ``AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED.  IN NO EVENT SHALL THE COPYRIGHT OWNER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY
+# OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import unittest
+import os
+import threading
+import numpy as np
+import bifrost as bf
+from bifrost import memory
+from bifrost.proclog import load_by_pid
+
+class MemoryPoolTest(unittest.TestCase):
+    def setUp(self):
+        self.orig_limit = memory.get_pool_limit('system')
+        memory.release_pool('system')
+    def tearDown(self):
+        memory.set_pool_limit('system', self.orig_limit)
+    def test_reuse(self):
+        ptr = memory.raw_malloc(1000, 'system')
+        memory.raw_free(ptr, 'system')
+        stats = memory.pool_stats('system')
+        self.assertGreaterEqual(stats['nbyte_cached'], 1000)
+        # Similar sizes share a size class
+        ptr2 = memory.raw_malloc(1010, 'system')
+        self.assertEqual(ptr2, ptr)
+        stats2 = memory.pool_stats('system')
+        self.assertEqual(stats2['nalloc'] - stats['nalloc'], 1)
+        self.assertEqual(stats2['nhit'] - stats['nhit'], 1)
+        self.assertEqual(stats2['nbyte_in_use'] - stats['nbyte_in_use'],
+                         stats['nbyte_cached'] - stats2['nbyte_cached'])
+        memory.raw_free(ptr2, 'system')
+    def test_ndarray(self):
+        a = bf.zeros((100, 100), dtype='f32', space='system')
+        nbyte_in_use = memory.pool_stats('system')['nbyte_in_use']
+        self.assertGreaterEqual(memory.pool_stats('system')['nbyte_peak'],
+                                a.nbytes)
+        del a
+        stats = memory.pool_stats('system')
+        self.assertLessEqual(stats['nbyte_in_use'], nbyte_in_use - 40000)
+        b = bf.zeros((100, 100), dtype='f32', space='system')
+        self.assertEqual(memory.pool_stats('system')['nhit'], stats['nhit'] + 1)
+        # Reused blocks must still be zeroed
+        np.testing.assert_equal(b, 0)
+    def test_limit(self):
+        memory.set_pool_limit('system', 4096)
+        self.assertEqual(memory.get_pool_limit('system'), 4096)
+        ptrs = [memory.raw_malloc(2048, 'system') for _ in range(3)]
+        for ptr in ptrs:
+            memory.raw_free(ptr, 'system')
+        self.assertLessEqual(memory.pool_stats('system')['nbyte_cached'], 4096)
+        # Allocations too large for the pool are not cached
+        big = memory.raw_malloc(8192, 'system')
+        memory.raw_free(big, 'system')
+        self.assertLessEqual(memory.pool_stats('system')['nbyte_cached'], 4096)
+        memory.set_pool_limit('system', 0)
+        self.assertEqual(memory.pool_stats('system')['nbyte_cached'], 0)
+    def test_threads(self):
+        # Blocks that overflow a thread's free lists (or that remain in them
+        #   when it exits) can be reused by other threads
+        ptrs = []
+        def alloc_and_free():
+            for _ in range(10):
+                ptrs.append(memory.raw_malloc(5000, 'system'))
+            for ptr in ptrs:
+                memory.raw_free(ptr, 'system')
+        thread = threading.Thread(target=alloc_and_free)
+        thread.start()
+        thread.join()
+        nhit = memory.pool_stats('system')['nhit']
+        ptr = memory.raw_malloc(5000, 'system')
+        self.assertIn(ptr, ptrs)
+        self.assertEqual(memory.pool_stats('system')['nhit'], nhit + 1)
+        memory.raw_free(ptr, 'system')
+    def test_proclog(self):
+        ptr = memory.raw_malloc(100, 'system')
+        memory.raw_free(ptr, 'system')
+        contents = load_by_pid(os.getpid())
+        self.assertIn('memory', contents)
+        log = contents['memory']['system']
+        for key in ('nbyte_in_use', 'nbyte_peak', 'nbyte_cached', 'nhit',
+                    'hit_rate'):
+            self.assertIn(key, log)
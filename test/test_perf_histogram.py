@@ -0,0 +1,98 @@
+
+# Copyright (c) 2016-2023, The Bifrost Authors. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# * Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the distribution.
+# * Neither the name of The Bifrost Authors nor the names of its
+#   contributors may be used to endorse or promote products derived
+#   from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS ``AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED.  IN NO EVENT SHALL THE COPYRIGHT OWNER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY
+# OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import unittest
+import os
+import numpy as np
+
+from bifrost.perf_histogram import LogHistogram, PerfHistograms
+from bifrost.proclog import load_by_pid
+
+class LogHistogramTest(unittest.TestCase):
+    def test_invalid_range(self):
+        self.assertRaises(ValueError, LogHistogram, 0, 1)
+        self.assertRaises(ValueError, LogHistogram, 1, 1)
+    def test_empty(self):
+        hist = LogHistogram(1e-6, 1e3)
+        self.assertEqual(hist.count, 0)
+        self.assertIsNone(hist.max)
+        self.assertIsNone(hist.percentile(50))
+    def test_percentiles(self):
+        hist = LogHistogram(1e-6, 1e3, buckets_per_decade=20)
+        values = np.logspace(-5, 0, 10001)
+        for value in np.random.permutation(values):
+            hist.record(value)
+        self.assertEqual(hist.count, len(values))
+        self.assertEqual(hist.max, values.max())
+        tolerance = 10**(1 / 20.)
+        for q in (1, 50, 99, 99.9):
+            expected = np.percentile(values, q)
+            result = hist.percentile(q)
+            # Percentiles are upper bounds accurate to one bucket
+            self.assertGreaterEqual(result * (1 + 1e-12), expected)
+            self.assertLessEqual(result, expected * tolerance)
+        self.assertEqual(hist.percentile(100), values.max())
+    def test_out_of_range(self):
+        hist = LogHistogram(1e-3, 1e0)
+        hist.record(1e-9)
+        self.assertEqual(hist.percentile(50), 1e-9)
+        hist.record(1e6)
+        self.assertEqual(hist.percentile(100), 1e6)
+        self.assertEqual(hist.count, 2)
+    def test_reset(self):
+        hist = LogHistogram(1e-6, 1e3)
+        hist.record(1.)
+        hist.reset()
+        self.assertEqual(hist.count, 0)
+        self.assertIsNone(hist.percentile(99))
+
+class PerfHistogramsTest(unittest.TestCase):
+    def test_record(self):
+        perf = PerfHistograms('PerfHistogramsTest/perf_hist')
+        for i in range(100):
+            perf.record(None, 1e-4, 1e-3 * (i + 1), 1000)
+        summary = perf.summary()
+        self.assertEqual(summary['acquire_time']['count'], 0)
+        self.assertEqual(summary['process_time']['count'], 100)
+        self.assertAlmostEqual(summary['process_time']['max'], 0.1)
+        self.assertLessEqual(summary['process_time']['p50'], 0.1)
+        self.assertGreaterEqual(summary['process_time']['p99'], 0.099)
+        self.assertEqual(summary['throughput']['count'], 100)
+        perf.update_proclog()
+        contents = load_by_pid(os.getpid())['PerfHistogramsTest']['perf_hist']
+        self.assertEqual(contents['process_time_count'], 100)
+        self.assertEqual(contents['acquire_time_p99'], -1)
+        perf.reset()
+        self.assertEqual(perf.summary()['process_time']['count'], 0)
+    def test_window(self):
+        perf = PerfHistograms('PerfHistogramsTest/window', window=0.,
+                               update_interval=0.)
+        perf.record(1e-3, 1e-3, 1e-3, 1000)
+        # The window has elapsed, so the histograms are reset after publishing
+        self.assertEqual(perf.summary()['process_time']['count'], 0)
+        contents = load_by_pid(os.getpid())['PerfHistogramsTest']['window']
+        self.assertEqual(contents['process_time_count'], 1)
@@ -0,0 +1,99 @@
+
+# Copyright (c) 2016-2023, The Bifrost Authors. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# * Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the distribution.
+# * Neither the name of The Bifrost Authors nor the names of its
+#   contributors may be used to endorse or promote products derived
+#   from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS ``AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED.  IN NO EVENT SHALL THE COPYRIGHT OWNER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY
+# OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import unittest
+import os
+
+from bifrost.perf_histogram import PerfHistograms
+from bifrost.pipeline_analysis import analyze, load_by_pid
+
+def make_perf(name, acquire_time, reserve_time, process_time, fills=None,
+              ngulp=10):
+    perf = PerfHistograms(name)
+    for _ in range(ngulp):
+        perf.record(acquire_time, reserve_time, process_time, 1000, fills)
+    return perf
+
+class PipelineAnalysisTest(unittest.TestCase):
+    def setUp(self):
+        # src -> a -> b (slow) -> sink
+        #          \-> c -----------^
+        self.perfs = {
+            'src':  make_perf('PipelineAnalysisTest/src/perf_hist',
+                              None, 0.009, 0.001, [0.2]),
+            'a':    make_perf('PipelineAnalysisTest/a/perf_hist',
+                              0.008, 0.001, 0.001, [0.95]),
+            'b':    make_perf('PipelineAnalysisTest/b/perf_hist',
+                              0.0005, 0.0005, 0.009, [0.1]),
+            'c':    make_perf('PipelineAnalysisTest/c/perf_hist',
+                              0.003, 0.005, 0.002, [0.1]),
+            'sink': make_perf('PipelineAnalysisTest/sink/perf_hist',
+                              0.009, 0., 0.001)}
+        self.blocks = [
+            {'name': 'src',  'inputs': [],                  'outputs': ['r_src']},
+            {'name': 'a',    'inputs': ['r_src'],           'outputs': ['r_a']},
+            {'name': 'b',    'inputs': ['r_a'],             'outputs': ['r_b']},
+            {'name': 'c',    'inputs': ['r_a'],             'outputs': ['r_c']},
+            {'name': 'sink', 'inputs': ['r_b', 'r_c'],      'outputs': []}]
+        for block in self.blocks:
+            block['perf'] = self.perfs[block['name']].summary()
+    def check_analysis(self, analysis):
+        self.assertEqual(analysis.bottleneck, 'b')
+        self.assertEqual(analysis.critical_path, ['src', 'a', 'b', 'sink'])
+        blocks = {b['name']: b for b in analysis.blocks}
+        self.assertAlmostEqual(blocks['b']['utilization'], 0.9)
+        self.assertAlmostEqual(blocks['b']['slack'], 0.1)
+        self.assertAlmostEqual(blocks['src']['utilization'], 0.1)
+        self.assertEqual(blocks['sink']['ngulp'], 10)
+        rings = {r['name']: r for r in analysis.rings}
+        self.assertEqual(sorted(rings.keys()), ['r_a', 'r_b', 'r_c', 'r_src'])
+        self.assertEqual(rings['r_a']['writer'], 'a')
+        self.assertEqual(sorted(rings['r_a']['readers']), ['b', 'c'])
+        self.assertTrue(rings['r_a']['near_capacity'])
+        self.assertFalse(rings['r_src']['near_capacity'])
+        report = str(analysis)
+        self.assertIn('Bottleneck:    b', report)
+        self.assertIn('Rings near capacity: r_a', report)
+    def test_analyze(self):
+        self.check_analysis(analyze(self.blocks))
+    def test_load_by_pid(self):
+        # Note: This goes through the proclogs written by the histograms
+        for perf in self.perfs.values():
+            perf.update_proclog()
+        analysis = load_by_pid(os.getpid())
+        analysis.blocks = [b for b in analysis.blocks
+                           if b['name'] in self.perfs]
+        self.assertEqual(len(analysis.blocks), 5)
+        # The proclogs do not include the ring names, so only check timings
+        blocks = {b['name']: b for b in analysis.blocks}
+        self.assertAlmostEqual(blocks['b']['utilization'], 0.9, 3)
+    def test_empty(self):
+        analysis = analyze([{'name': 'idle', 'inputs': [], 'outputs': [],
+                             'perf': None}])
+        self.assertIsNone(analysis.bottleneck)
+        self.assertEqual(analysis.critical_path, ['idle'])
+        str(analysis)
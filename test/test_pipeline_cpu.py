@@ -27,6 +27,9 @@
 
 import unittest
 import os, sys
+import threading
+import tempfile
+import numpy as np
 import bifrost as bf
 
 from bifrost.blocks import *
@@ -54,6 +57,29 @@ class CallbackBlock(CopyBlock):
             self.data_ref['odata'] = ospan.data.copy()
         return super(CallbackBlock, self).on_data(ispan, ospan)
 
+class SaveBlock(bf.pipeline.SinkBlock):
+    """Testing-only block which writes raw data to a file, allowing data to
+        be checked after running a pipeline in separate processes"""
+    def __init__(self, iring, filename, *args, **kwargs):
+        super(SaveBlock, self).__init__(iring, *args, **kwargs)
+        self.filename = filename
+    def on_sequence(self, iseq):
+        self.ofile = open(self.filename, 'wb')
+    def on_sequence_end(self, iseq):
+        self.ofile.close()
+    def on_data(self, ispan):
+        ispan.data.tofile(self.ofile)
+
+class RepeatSigprocBlock(bf.blocks.sigproc.SigprocSourceBlock):
+    """Testing-only block which allows the same file to be read as multiple
+        sequences"""
+    def on_sequence(self, ireader, sourcename):
+        ohdrs = super(RepeatSigprocBlock, self).on_sequence(ireader, sourcename)
+        for ohdr in ohdrs:
+            ohdr['time_tag'] += self._seq_count
+            ohdr['name']     += f"-{self._seq_count}"
+        return ohdrs
+
 def identity_block(block, *args, **kwargs):
     return block
 
@@ -142,6 +168,58 @@ class PipelineTestCPU(unittest.TestCase):
         self.run_test_simple_copy(guarantee=True, test_views=True)
     def test_simple_views_unguaranteed(self):
         self.run_test_simple_copy(guarantee=False, test_views=True)
+    def test_map_blocks(self):
+        gulp_nframe = 101
+        idata = []
+        odata = []
+        def save_input(ispan, ospan):
+            idata.append(ispan.data.copy())
+        def save_output(ispan, ospan):
+            odata.append(ispan.data.copy())
+        with bf.Pipeline() as pipeline:
+            data = read_sigproc([self.fil_file], gulp_nframe)
+            data = bf.views.astype(data, 'i16')
+            data = CallbackBlock(data, lambda seq: None, save_input)
+            data = reverse(data, 'freq')
+            data = fftshift(data, 'freq')
+            data = CallbackBlock(data, lambda seq: None, save_output)
+            pipeline.run()
+        self.assertEqual(len(odata), len(idata))
+        # Note: The reverse of a 2-channel axis leaves it unchanged (index i
+        #         is read from index -i), and the fftshift swaps the channels
+        np.testing.assert_equal(np.concatenate(odata),
+                                np.concatenate(idata)[..., ::-1])
+    def run_test_prewarm(self, prewarm, filename):
+        with bf.Pipeline() as pipeline:
+            data = read_sigproc([self.fil_file], gulp_nframe=101)
+            data = bf.views.astype(data, 'i16')
+            data = reverse(data, 'freq')
+            with bf.block_scope(fuse=True):
+                data = copy(data)
+                data = fftshift(data, 'freq')
+            SaveBlock(data, filename)
+            prewarmed = pipeline.prewarm() if prewarm else None
+            entries = bf.get_map_cache_entries()
+            pipeline.run()
+        return prewarmed, entries, np.fromfile(filename, dtype=np.int16)
+    def test_prewarm(self):
+        tempdir = tempfile.mkdtemp()
+        _, _, expected = self.run_test_prewarm(
+            False, os.path.join(tempdir, 'cold.dat'))
+        bf.clear_map_cache()
+        prewarmed, entries, result = self.run_test_prewarm(
+            True, os.path.join(tempdir, 'prewarmed.dat'))
+        np.testing.assert_equal(result, expected)
+        # The reverse block and the fused copy+fftshift chain
+        self.assertEqual(len(prewarmed), 2)
+        self.assertEqual(len(entries), 2)
+        for entry in entries:
+            self.assertEqual(entry['hits'], 0)
+        # Each block thread loaded the kernels compiled by the prewarm
+        hits = {entry['path']: entry['hits']
+                for entry in bf.get_map_cache_entries()}
+        for entry in entries:
+            self.assertGreaterEqual(hits[entry['path']], 1)
     def test_block_chainer(self):
         with bf.Pipeline() as pipeline:
             bc = bf.BlockChainer()
@@ -172,3 +250,252 @@ class PipelineTestCPU(unittest.TestCase):
             finally:
                 sys.stderr = orig_stderr
                 new_stderr.close()
+    def run_test_executor(self, executor, filename, share_process=False):
+        with bf.Pipeline() as pipeline:
+            data = read_sigproc([self.fil_file], gulp_nframe=101)
+            data = bf.views.astype(data, 'i16')
+            with bf.block_scope(share_process=share_process):
+                for i in range(3):
+                    data = copy(data)
+            data = transpose(data, ['pol', 'freq', 'time'])
+            SaveBlock(data, filename)
+            pipeline.run(executor=executor)
+        return np.fromfile(filename, dtype=np.int16)
+    def run_test_fused(self, fuse, filename):
+        with bf.Pipeline() as pipeline:
+            data = read_sigproc([self.fil_file], gulp_nframe=101)
+            with bf.block_scope(fuse=fuse):
+                data = bf.views.astype(data, 'i16')
+                data = copy(data)
+                data = bf.views.split_axis(data, 'time', 1, 'fine_time')
+                data = copy(data)
+                data = bf.views.merge_axes(data, 'time', 'fine_time')
+                data = transpose(data, ['pol', 'freq', 'time'])
+                SaveBlock(data, filename)
+            nrunnable = len(pipeline._fuse_blocks(pipeline.blocks))
+            pipeline.run()
+        return nrunnable, np.fromfile(filename, dtype=np.int16)
+    def test_fused_scope(self):
+        tempdir = tempfile.mkdtemp()
+        nrunnable, expected = self.run_test_fused(False,
+                                                  os.path.join(tempdir, 'unfused.dat'))
+        self.assertEqual(nrunnable, 5)
+        nrunnable, result = self.run_test_fused(True,
+                                                os.path.join(tempdir, 'fused.dat'))
+        # The source block plus one chain for all of the fused blocks
+        self.assertEqual(nrunnable, 2)
+        np.testing.assert_equal(result, expected)
+    def test_process_executor(self):
+        tempdir = tempfile.mkdtemp()
+        expected = self.run_test_executor('thread',
+                                          os.path.join(tempdir, 'thread.dat'))
+        result = self.run_test_executor('process',
+                                        os.path.join(tempdir, 'process.dat'))
+        self.assertEqual(result.size, 2 * (101 * 500 + 29))
+        np.testing.assert_equal(result, expected)
+        result = self.run_test_executor('process',
+                                        os.path.join(tempdir, 'shared.dat'),
+                                        share_process=True)
+        np.testing.assert_equal(result, expected)
+    def test_process_executor_initialization_failure(self):
+        def check_sequence(seq):
+            raise ValueError("Intentional on_sequence failure")
+        def check_data(ispan, ospan):
+            pass
+        with bf.Pipeline() as pipeline:
+            data = read_sigproc([self.fil_file], gulp_nframe=101)
+            data = copy(data)
+            data = CallbackBlock(data, check_sequence, check_data)
+            data = copy(data)
+            orig_stderr = sys.stderr
+            new_stderr = StringIO()
+            sys.stderr = new_stderr
+            try:
+                self.assertRaises(bf.pipeline.PipelineInitError, pipeline.run,
+                                  executor='process')
+            finally:
+                sys.stderr = orig_stderr
+                new_stderr.close()
+    def run_test_scheduler(self, scheduler, filename):
+        threads = set()
+        def check_sequence(seq):
+            threads.add(threading.current_thread())
+        def check_data(ispan, ospan):
+            threads.add(threading.current_thread())
+        with bf.Pipeline() as pipeline:
+            data = read_sigproc([self.fil_file], gulp_nframe=101)
+            data = bf.views.astype(data, 'i16')
+            data = copy(data)
+            with bf.block_scope(fuse=True):
+                data = copy(data)
+                data = copy(data)
+            data = CallbackBlock(data, check_sequence, check_data)
+            data = transpose(data, ['pol', 'freq', 'time'])
+            SaveBlock(data, filename)
+            pipeline.run(scheduler=scheduler)
+        return threads, np.fromfile(filename, dtype=np.int16)
+    def test_cooperative_scheduler(self):
+        tempdir = tempfile.mkdtemp()
+        _, expected = self.run_test_scheduler(None,
+                                              os.path.join(tempdir, 'threaded.dat'))
+        threads, result = self.run_test_scheduler('cooperative',
+                                                  os.path.join(tempdir, 'cooperative.dat'))
+        self.assertEqual(threads, set([threading.current_thread()]))
+        self.assertEqual(result.size, 2 * (101 * 500 + 29))
+        np.testing.assert_equal(result, expected)
+    def test_cooperative_scheduler_initialization_failure(self):
+        def check_sequence(seq):
+            raise ValueError("Intentional on_sequence failure")
+        def check_data(ispan, ospan):
+            pass
+        with bf.Pipeline() as pipeline:
+            data = read_sigproc([self.fil_file], gulp_nframe=101)
+            data = copy(data)
+            data = CallbackBlock(data, check_sequence, check_data)
+            data = copy(data)
+            orig_stderr = sys.stderr
+            new_stderr = StringIO()
+            sys.stderr = new_stderr
+            try:
+                self.assertRaises(bf.pipeline.PipelineInitError, pipeline.run,
+                                  scheduler='cooperative')
+            finally:
+                sys.stderr = orig_stderr
+                new_stderr.close()
+    def test_invalid_scheduler(self):
+        with bf.Pipeline() as pipeline:
+            data = read_sigproc([self.fil_file], gulp_nframe=101)
+            copy(data)
+            self.assertRaises(ValueError, pipeline.run, scheduler='greedy')
+            self.assertRaises(ValueError, pipeline.run, executor='process',
+                              scheduler='cooperative')
+    def test_cooperative_scheduler_unsupported(self):
+        # Note: These would require rings to be resized while the scheduler
+        #         runs, which would deadlock it.
+        with bf.Pipeline() as pipeline:
+            data = read_sigproc([self.fil_file], gulp_nframe=101)
+            with bf.block_scope(autotune='throughput'):
+                copy(data)
+            self.assertRaises(ValueError, pipeline.run, scheduler='cooperative')
+        with bf.Pipeline() as pipeline:
+            data = read_sigproc(iter([self.fil_file]), gulp_nframe=101)
+            copy(data)
+            self.assertRaises(ValueError, pipeline.run, scheduler='cooperative')
+    def run_test_autotune(self, **kwargs):
+        gulp_nframes = []
+        nframes = []
+        def check_sequence(seq):
+            gulp_nframes.append(seq.header['gulp_nframe'])
+            nframes.append(0)
+        def check_data(ispan, ospan):
+            self.assertLessEqual(ispan.nframe, gulp_nframes[-1])
+            nframes[-1] += ispan.nframe
+        with bf.Pipeline() as pipeline:
+            data = RepeatSigprocBlock([self.fil_file] * 3, gulp_nframe=100)
+            with bf.block_scope(**kwargs):
+                data = copy(data)
+            data = CallbackBlock(data, check_sequence, check_data)
+            pipeline.run()
+        self.assertEqual(nframes, [101 * 500 + 29] * 3)
+        return gulp_nframes
+    def test_autotune_throughput(self):
+        gulp_nframes = self.run_test_autotune(autotune='throughput')
+        # The first sequence is measured at the original size, then larger
+        #   gulps are explored first
+        self.assertEqual(gulp_nframes[:2], [100, 200])
+    def test_autotune_latency(self):
+        gulp_nframes = self.run_test_autotune(autotune='latency',
+                                              latency_budget=1e-9)
+        self.assertEqual(gulp_nframes, [100, 25, 25])
+    def test_perf_histograms(self):
+        with bf.Pipeline() as pipeline:
+            data = read_sigproc([self.fil_file], gulp_nframe=101)
+            data = copy(data)
+            pipeline.run()
+        # 500 complete gulps plus one partial one
+        for block in pipeline.blocks:
+            summary = block.perf_histograms.summary()
+            self.assertEqual(summary['process_time']['count'], 501)
+            self.assertEqual(summary['throughput']['count'], 501)
+            self.assertGreaterEqual(summary['process_time']['max'],
+                                    summary['process_time']['p99'])
+        summary = pipeline.blocks[0].perf_histograms.summary()
+        self.assertEqual(summary['acquire_time']['count'], 0)
+        summary = pipeline.blocks[1].perf_histograms.summary()
+        self.assertEqual(summary['acquire_time']['count'], 501)
+    def test_analyze(self):
+        with bf.Pipeline() as pipeline:
+            data = read_sigproc([self.fil_file], gulp_nframe=101)
+            data = copy(data)
+            data = copy(data)
+            pipeline.run()
+            analysis = pipeline.analyze()
+        names = [block.name for block in pipeline.blocks]
+        self.assertEqual([b['name'] for b in analysis.blocks], names)
+        self.assertIn(analysis.bottleneck, names)
+        self.assertEqual(analysis.critical_path, names)
+        self.assertEqual([r['writer'] for r in analysis.rings], names)
+        self.assertEqual(analysis.rings[0]['readers'], names[1:2])
+        for ring in analysis.rings:
+            self.assertLessEqual(ring['fill_max'], 1.)
+        for block in analysis.blocks:
+            self.assertEqual(block['ngulp'], 501)
+            self.assertAlmostEqual(block['utilization'] + block['slack'], 1.)
+    def run_test_preallocate(self, preallocate, filename):
+        with bf.Pipeline() as pipeline:
+            data = read_sigproc([self.fil_file], gulp_nframe=101)
+            data = bf.views.astype(data, 'i16')
+            data = copy(data, gulp_nframe=64)
+            with bf.block_scope(fuse=True):
+                data = copy(data)
+                data = transpose(data, ['pol', 'freq', 'time'])
+            SaveBlock(data, filename, gulp_nframe=250)
+            sizes = pipeline.preallocate() if preallocate else None
+            pipeline.run()
+            final_sizes = {block.orings[0].name: block.orings[0].nbyte
+                           for block in pipeline.blocks if block.orings}
+        return sizes, final_sizes, np.fromfile(filename, dtype=np.int16)
+    def test_preallocate(self):
+        tempdir = tempfile.mkdtemp()
+        _, final_sizes, expected = self.run_test_preallocate(
+            False, os.path.join(tempdir, 'lazy.dat'))
+        sizes, presized_final_sizes, result = self.run_test_preallocate(
+            True, os.path.join(tempdir, 'presized.dat'))
+        np.testing.assert_equal(result, expected)
+        # The intermediate ring of the fused chain is never allocated
+        self.assertEqual(len(sizes), 3)
+        for name, nbyte in sizes.items():
+            self.assertGreater(nbyte, 0)
+            # No ring was reallocated once the pipeline started
+            self.assertEqual(presized_final_sizes[name], nbyte)
+        self.assertEqual(sorted(sizes.values()),
+                         sorted(nbyte for nbyte in final_sizes.values() if nbyte))
+    def test_preallocate_sink(self):
+        # Sinks must not create their outputs before any data flow
+        tempdir = tempfile.mkdtemp()
+        with bf.Pipeline() as pipeline:
+            data = read_sigproc([self.fil_file], gulp_nframe=101)
+            data = copy(data)
+            serialize(data, tempdir)
+            sizes = pipeline.preallocate()
+        self.assertEqual(len(sizes), 2)
+        self.assertEqual(os.listdir(tempdir), [])
+    def test_preallocate_process_executor(self):
+        tempdir = tempfile.mkdtemp()
+        expected = self.run_test_executor('thread',
+                                          os.path.join(tempdir, 'thread.dat'))
+        filename = os.path.join(tempdir, 'process.dat')
+        with bf.Pipeline() as pipeline:
+            data = read_sigproc([self.fil_file], gulp_nframe=101)
+            data = bf.views.astype(data, 'i16')
+            for i in range(3):
+                data = copy(data)
+            data = transpose(data, ['pol', 'freq', 'time'])
+            SaveBlock(data, filename)
+            pipeline.run(executor='process', preallocate=True)
+        np.testing.assert_equal(np.fromfile(filename, dtype=np.int16),
+                                expected)
+    def test_invalid_executor(self):
+        with bf.Pipeline() as pipeline:
+            data = read_sigproc([self.fil_file], gulp_nframe=101)
+            self.assertRaises(ValueError, pipeline.run, executor='fiber')
@@ -0,0 +1,132 @@
+
+# Copyright (c) 2016-2023, The Bifrost Authors. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# * Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the distribution.
+# * Neither the name of The Bifrost Authors nor the names of its
+#   contributors may be used to endorse or promote products derived
+#   from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS ``AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED.  IN NO EVENT SHALL THE COPYRIGHT OWNER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY
+# OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import unittest
+import os
+import bifrost as bf
+
+from bifrost.blocks import read_sigproc, copy
+from bifrost.placement import CPUTopology, plan_placement
+
+def make_topology(nnode=2, ncore_per_node=4, nthread=2):
+    """Returns a topology with one L3 cache per NUMA node and hyperthreading,
+    numbering CPUs the same way as Linux (siblings are ncore apart).
+    """
+    ncore = nnode * ncore_per_node
+    cpus = {}
+    for thread in range(nthread):
+        for core in range(ncore):
+            node = core // ncore_per_node
+            cpu = thread * ncore + core
+            cpus[cpu] = {
+                'package':  node,
+                'core':     core % ncore_per_node,
+                'siblings': frozenset(t * ncore + core for t in range(nthread)),
+                'l3':       frozenset(t * ncore + c
+                                      for t in range(nthread)
+                                      for c in range(node * ncore_per_node,
+                                                     (node + 1) * ncore_per_node)),
+                'node':     node}
+    return CPUTopology(cpus)
+
+class PlacementTest(unittest.TestCase):
+    def setUp(self):
+        self.fil_file = "./data/2chan16bitNoDM.fil"
+        self.topology = make_topology()
+    def build_chain(self, nblock, **kwargs):
+        blocks = [read_sigproc([self.fil_file], gulp_nframe=101, **kwargs)]
+        for _ in range(nblock - 1):
+            blocks.append(copy(blocks[-1]))
+        return blocks
+    def test_from_sysfs(self):
+        topology = CPUTopology.from_sysfs()
+        allowed = os.sched_getaffinity(0)
+        self.assertEqual(set(topology.cpus.keys()), allowed)
+        for cpu in allowed:
+            self.assertIn(cpu, topology.siblings(cpu))
+    def test_chain_shares_node(self):
+        with bf.Pipeline() as pipeline:
+            blocks = self.build_chain(4)
+            placement = plan_placement(pipeline.blocks, self.topology)
+        cores = [placement[block] for block in blocks]
+        self.assertEqual(cores, [0, 1, 2, 3])
+    def test_chains_do_not_straddle_nodes(self):
+        with bf.Pipeline() as pipeline:
+            chain0 = self.build_chain(3)
+            chain1 = self.build_chain(3)
+            placement = plan_placement(pipeline.blocks, self.topology)
+        # The second chain does not fit in the one core left on node 0
+        self.assertEqual([placement[b] for b in chain0], [0, 1, 2])
+        self.assertEqual([placement[b] for b in chain1], [4, 5, 6])
+    def test_branches_follow_writer(self):
+        with bf.Pipeline() as pipeline:
+            src = read_sigproc([self.fil_file], gulp_nframe=101)
+            a = copy(src)
+            b = copy(src)
+            a2 = copy(a)
+            placement = plan_placement(pipeline.blocks, self.topology)
+        self.assertEqual([placement[x] for x in (src, a, a2, b)], [0, 1, 2, 3])
+    def test_hyperthreads_used_last(self):
+        with bf.Pipeline() as pipeline:
+            blocks = self.build_chain(10)
+            placement = plan_placement(pipeline.blocks, self.topology)
+        cores = [placement[block] for block in blocks]
+        self.assertEqual(cores[:8], list(range(8)))
+        self.assertEqual(cores[8:], [8, 9])
+    def test_capture_and_reserved_cores(self):
+        with bf.Pipeline() as pipeline:
+            blocks = self.build_chain(4)
+            placement = plan_placement(pipeline.blocks, self.topology,
+                                       reserved_cores=[1],
+                                       capture_cores=[0])
+        cores = [placement[block] for block in blocks]
+        # Core 0 and its sibling 8 run capture and core 1 is reserved, which
+        #   leaves too few cores for the chain on node 0
+        self.assertEqual(cores, [4, 5, 6, 7])
+    def test_pinned_blocks_are_kept(self):
+        with bf.Pipeline() as pipeline:
+            blocks = self.build_chain(3, core=0)
+            placement = plan_placement(pipeline.blocks, self.topology)
+        self.assertNotIn(blocks[0], placement)
+        self.assertEqual([placement[b] for b in blocks[1:]], [1, 2])
+    def test_oversubscribed(self):
+        topology = make_topology(nnode=1, ncore_per_node=2, nthread=1)
+        with bf.Pipeline() as pipeline:
+            blocks = self.build_chain(5)
+            placement = plan_placement(pipeline.blocks, topology)
+        self.assertEqual([placement[b] for b in blocks], [0, 1, 0, 1, 0])
+    def test_place_and_run(self):
+        with bf.Pipeline() as pipeline:
+            blocks = self.build_chain(3)
+            cpu = sorted(os.sched_getaffinity(0))[0]
+            topology = make_topology(nnode=1, ncore_per_node=1, nthread=1)
+            topology.cpus = {cpu: dict(topology.cpus[0], siblings=frozenset([cpu]))}
+            placement = pipeline.place(topology=topology)
+            self.assertEqual(placement, {block.name: cpu for block in blocks})
+            for block in blocks:
+                self.assertEqual(block.core, cpu)
+            pipeline.run()
@@ -0,0 +1,109 @@
+# Copyright (c) 2016-2023, The Bifrost Authors. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# * Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the distribution.
+# * Neither the name of The Bifrost Authors nor the names of its
+#   contributors may be used to endorse or promote products derived
+#   from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS ``AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED.  IN NO EVENT SHALL THE COPYRIGHT OWNER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY
+# OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import unittest
+import asyncio
+import gc
+import os
+import numpy as np
+from bifrost.ring2 import Ring
+
+GULP_NFRAME = 16
+NCHAN = 4
+
+async def write_sequences(ring, nsequence, ngulp):
+    frame0 = 0
+    with ring.begin_writing() as writer:
+        for s in range(nsequence):
+            hdr = {'name':     f"seq{s}",
+                   'time_tag': s,
+                   '_tensor':  {'dtype': 'i32', 'shape': [-1, NCHAN]}}
+            # Note: The ring only holds a few gulps, so the writer must wait
+            #         for the readers.
+            with writer.begin_sequence(hdr, GULP_NFRAME, 2 * GULP_NFRAME) as oseq:
+                for g in range(ngulp):
+                    with await oseq.areserve(GULP_NFRAME) as ospan:
+                        frames = np.arange(frame0, frame0 + GULP_NFRAME)
+                        ospan.data[...] = frames[:, None]
+                        ospan.commit(GULP_NFRAME)
+                    frame0 += GULP_NFRAME
+                    # Emulate waiting for input data
+                    await asyncio.sleep(0)
+    return frame0
+
+async def read_sequences(ring, nframe):
+    names = []
+    frames = []
+    async for iseq in ring.aread(guarantee=True):
+        names.append(iseq.name)
+        async for ispan in iseq.aread(nframe):
+            frames.append(np.array(ispan.data[:, 0]))
+            # Give other coroutines a chance to run
+            await asyncio.sleep(0)
+    return names, np.concatenate(frames)
+
+class RingAsyncTest(unittest.TestCase):
+    def run_pipeline(self, nsequence, ngulp, reader_nframes):
+        ring = Ring(space='system')
+        async def main():
+            readers = [read_sequences(ring, nframe) for nframe in reader_nframes]
+            # Note: The readers start first so that they do not miss the
+            #         beginning of the first sequence.
+            results = await asyncio.gather(*readers,
+                                           write_sequences(ring, nsequence, ngulp))
+            return results[-1], results[:-1]
+        return asyncio.run(asyncio.wait_for(main(), timeout=30))
+    def test_single_loop(self):
+        nframe_total, results = self.run_pipeline(3, 50, [GULP_NFRAME, 7])
+        for names, frames in results:
+            self.assertEqual(names, ['seq0', 'seq1', 'seq2'])
+            np.testing.assert_equal(frames, np.arange(nframe_total))
+    def test_end_of_data(self):
+        ring = Ring(space='system')
+        async def main():
+            with ring.begin_writing():
+                pass
+            return [iseq async for iseq in ring.aread()]
+        self.assertEqual(asyncio.run(main()), [])
+    @unittest.skipUnless(os.path.isdir('/proc/self/fd'), "requires /proc")
+    def test_notifier_cleanup(self):
+        def nfd():
+            return len(os.listdir('/proc/self/fd'))
+        nfd0 = nfd()
+        ring = Ring(space='system')
+        with ring.begin_writing():
+            pass
+        async def main():
+            return [iseq async for iseq in ring.aread()]
+        # Each loop gets its own eventfd, which must not outlive the loop
+        for _ in range(5):
+            asyncio.run(main())
+            gc.collect()
+            self.assertLessEqual(len(ring._notifiers), 1)
+        self.assertLessEqual(nfd(), nfd0 + 1)
+        ring._close_notifiers()
+        self.assertEqual(len(ring._notifiers), 0)
+        self.assertEqual(nfd(), nfd0)
@@ -0,0 +1,96 @@
+# Copyright (c) 2016-2023, The Bifrost Authors. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# * Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the distribution.
+# * Neither the name of The Bifrost Authors nor the names of its
+#   contributors may be used to endorse or promote products derived
+#   from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS ``AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED.  IN NO EVENT SHALL THE COPYRIGHT OWNER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY
+# OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import unittest
+import os
+import sys
+import json
+import subprocess
+import numpy as np
+from bifrost.ring2 import Ring
+from bifrost.ring_server import RingPublisher, attach_ring
+
+GULP_NFRAME = 16
+NCHAN = 4
+
+READER_SCRIPT = """
+import sys, json
+from bifrost.ring_server import attach_ring
+ring = attach_ring(sys.argv[1], timeout=30)
+result = []
+for seq in ring.read(guarantee=True):
+    if not result:
+        print('ready', flush=True)
+    total = 0
+    for span in seq.read(%i):
+        total += int(span.data[:, 0].sum())
+    result.append([seq.name, total])
+ring.detach()
+print(json.dumps(result), flush=True)
+""" % GULP_NFRAME
+
+class RingAttachTest(unittest.TestCase):
+    def setUp(self):
+        self.name = f"test_attach_{os.getpid()}"
+    def test_attach_from_other_process(self):
+        ring = Ring(space='system')
+        with RingPublisher(ring, self.name):
+            reader = subprocess.Popen([sys.executable, '-c', READER_SCRIPT, self.name],
+                                      stdout=subprocess.PIPE, text=True)
+            expected = []
+            frame0 = 0
+            with ring.begin_writing() as writer:
+                for s in range(2):
+                    hdr = {'name':     f"seq{s}",
+                           'time_tag': s,
+                           '_tensor':  {'dtype': 'i32', 'shape': [-1, NCHAN]}}
+                    with writer.begin_sequence(hdr, GULP_NFRAME, 2 * GULP_NFRAME) as oseq:
+                        if s == 0:
+                            # Note: The reader's guarantee stops the writer
+                            #         from overwriting unread data
+                            self.assertEqual(reader.stdout.readline().strip(), 'ready')
+                        for g in range(10):
+                            with oseq.reserve(GULP_NFRAME) as ospan:
+                                frames = np.arange(frame0, frame0 + GULP_NFRAME)
+                                ospan.data[...] = frames[:, None]
+                                ospan.commit(GULP_NFRAME)
+                            frame0 += GULP_NFRAME
+                    expected.append([f"seq{s}",
+                                     int(np.arange(frame0 - 10 * GULP_NFRAME, frame0).sum())])
+            output, _ = reader.communicate(timeout=60)
+            self.assertEqual(reader.returncode, 0)
+            self.assertEqual(json.loads(output), expected)
+    def test_publish_errors(self):
+        ring = Ring(space='system')
+        with RingPublisher(ring, self.name):
+            self.assertTrue(ring.shared)
+            self.assertRaises(ValueError, RingPublisher, Ring(space='system'), self.name)
+            remote = attach_ring(self.name)
+            self.assertEqual(remote.name, ring.name)
+            self.assertEqual(remote.space, 'system')
+            remote.detach()
+        self.assertRaises(ValueError, attach_ring, self.name)
+        self.assertRaises(ValueError, RingPublisher, ring, 'bad/name')
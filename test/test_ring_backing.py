@@ -0,0 +1,127 @@
+# Copyright (c) 2016-2023, The Bifrost Authors. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# * Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the distribution.
+# * Neither the name of The Bifrost Authors nor the names of its
+#   contributors may be used to endorse or promote products derived
+#   from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS ``AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED.  IN NO EVENT SHALL THE COPYRIGHT OWNER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY
+# OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import unittest
+import os
+import sys
+import shutil
+import subprocess
+import tempfile
+from bifrost.ring2 import Ring
+
+GULP_NFRAME = 16
+NCHAN = 4
+
+# Writes one complete and one unfinished sequence and then exits abruptly
+WRITER_SCRIPT = """
+import os, sys
+import numpy as np
+from bifrost.ring2 import Ring
+ring = Ring(space='system', backing_file=sys.argv[1])
+writer = ring.begin_writing()
+frame0 = 0
+for s, ngulp in enumerate([3, 2]):
+    hdr = {'name':     'seq%%i' %% s,
+           'time_tag': 1000 * s,
+           '_tensor':  {'dtype': 'i32', 'shape': [-1, %i]}}
+    oseq = writer.begin_sequence(hdr, %i, 8 * %i)
+    for g in range(ngulp):
+        with oseq.reserve(%i) as ospan:
+            ospan.data[...] = np.arange(frame0, frame0 + %i)[:, None]
+            ospan.commit(%i)
+        frame0 += %i
+    if s == 0:
+        oseq.end()
+os._exit(0)
+""" % ((NCHAN,) + (GULP_NFRAME,) * 6)
+
+def read_sequences(ring):
+    result = []
+    for seq in ring.read(guarantee=True):
+        frames = []
+        for span in seq.read(GULP_NFRAME):
+            if span.nframe:
+                frames.extend(span.data[:, 0].tolist())
+        result.append((seq.name, seq.time_tag, frames))
+    return result
+
+class RingBackingFileTest(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.filename = os.path.join(self.path, 'ring.bfr')
+    def tearDown(self):
+        shutil.rmtree(self.path)
+    def test_restore_after_crash(self):
+        subprocess.check_call([sys.executable, '-c', WRITER_SCRIPT, self.filename])
+        ring = Ring(space='system', backing_file=self.filename)
+        self.assertEqual(ring.backing_file, self.filename)
+        self.assertTrue(ring.writing_ended)
+        expected = [('seq0', 0,    list(range(0, 3 * GULP_NFRAME))),
+                    ('seq1', 1000, list(range(3 * GULP_NFRAME, 5 * GULP_NFRAME)))]
+        self.assertEqual(read_sequences(ring), expected)
+        with ring.open_latest_sequence(guarantee=True) as iseq:
+            self.assertEqual(iseq.name, 'seq1')
+        with ring.open_sequence_at(500, guarantee=True) as iseq:
+            self.assertEqual(iseq.name, 'seq0')
+            self.assertEqual(iseq.header['time_tag'], 0)
+        # A new writer can append to the restored ring
+        with ring.begin_writing() as writer:
+            hdr = {'name':     'seq2',
+                   'time_tag': 2000,
+                   '_tensor':  {'dtype': 'i32', 'shape': [-1, NCHAN]}}
+            with writer.begin_sequence(hdr, GULP_NFRAME, 8 * GULP_NFRAME) as oseq:
+                with oseq.reserve(GULP_NFRAME) as ospan:
+                    ospan.data[...] = -1
+                    ospan.commit(GULP_NFRAME)
+        del ring
+        ring = Ring(space='system', backing_file=self.filename)
+        expected.append(('seq2', 2000, [-1] * GULP_NFRAME))
+        self.assertEqual(read_sequences(ring), expected)
+    def test_overwritten_sequences_dropped(self):
+        ring = Ring(space='system', backing_file=self.filename)
+        self.assertIsNone(ring.alloc_policy['hugepages'])
+        with ring.begin_writing() as writer:
+            for s in range(10):
+                hdr = {'name':     f"seq{s}",
+                       'time_tag': s,
+                       '_tensor':  {'dtype': 'i32', 'shape': [-1, NCHAN]}}
+                with writer.begin_sequence(hdr, GULP_NFRAME, 2 * GULP_NFRAME) as oseq:
+                    for g in range(16):
+                        with oseq.reserve(GULP_NFRAME) as ospan:
+                            ospan.data[...] = s
+                            ospan.commit(GULP_NFRAME)
+        del ring
+        ring = Ring(space='system', backing_file=self.filename)
+        sequences = read_sequences(ring)
+        self.assertEqual(sequences[-1][0], 'seq9')
+        self.assertNotEqual(sequences[0][0], 'seq0')
+        for name, time_tag, frames in sequences:
+            self.assertTrue(all(f == time_tag for f in frames))
+    def test_invalid_file(self):
+        with open(self.filename, 'wb') as f:
+            f.write(b'not a ring')
+        with self.assertRaises(RuntimeError):
+            Ring(space='system', backing_file=self.filename)
@@ -0,0 +1,84 @@
+# Copyright (c) 2016-2023, The Bifrost Authors. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# * Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the distribution.
+# * Neither the name of The Bifrost Authors nor the names of its
+#   contributors may be used to endorse or promote products derived
+#   from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS ``AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED.  IN NO EVENT SHALL THE COPYRIGHT OWNER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY
+# OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import unittest
+import ctypes
+import json
+from bifrost.ring2 import Ring, ring_view
+
+NCHAN = 4
+
+def header(name, time_tag):
+    return {'name':     name,
+            'time_tag': time_tag,
+            'units':    'Jy',
+            '_tensor':  {'dtype': 'f32', 'shape': [-1, NCHAN]}}
+
+class RingHeaderTest(unittest.TestCase):
+    def test_header_sharing(self):
+        ring = Ring(space='system', name='test_ring_header')
+        ncall = [0]
+        def transform(hdr):
+            ncall[0] += 1
+            hdr['units'] = 'mJy'
+            return hdr
+        view = ring_view(ring, transform)
+        with ring.begin_writing() as writer:
+            for s in range(3):
+                hdr = header(f"seq{s}", s)
+                with writer.begin_sequence(hdr, 1, 4) as oseq:
+                    with oseq.reserve(1) as ospan:
+                        ospan.commit(1)
+                iseq0 = ring.open_sequence(f"seq{s}")
+                iseq1 = ring.open_sequence_at(s)
+                iseq2 = view.open_sequence(f"seq{s}")
+                iseq2.header_transform = view.header_transform
+                # Headers are stored as compact JSON
+                raw = ctypes.string_at(iseq0._header_ptr, iseq0.header_size)
+                self.assertEqual(raw, json.dumps(hdr, separators=(',', ':')).encode())
+                self.assertEqual(json.loads(raw), hdr)
+                # Decoded headers are shared between readers
+                self.assertEqual(iseq0.header, hdr)
+                self.assertIs(iseq0.header, iseq1.header)
+                # Transforms are applied once per sequence
+                ncall[0] = 0
+                self.assertEqual(iseq2.header['units'], 'mJy')
+                self.assertEqual(iseq2.tensor['frame_shape'], [NCHAN])
+                self.assertIs(iseq2.header, iseq2.header)
+                self.assertEqual(ncall[0], 1)
+                self.assertEqual(iseq0.header['units'], 'Jy')
+                for iseq in (iseq0, iseq1, iseq2):
+                    iseq.close()
+    def test_transform_per_sequence(self):
+        ring = Ring(space='system', name='test_ring_header_increment')
+        view = ring_view(ring, lambda hdr: dict(hdr, seen=hdr['name']))
+        with ring.begin_writing() as writer:
+            for s in range(3):
+                with writer.begin_sequence(header(f"seq{s}", s), 1, 4) as oseq:
+                    with oseq.reserve(1) as ospan:
+                        ospan.commit(1)
+        names = [iseq.header['seen'] for iseq in view.read()]
+        self.assertEqual(names, ['seq0', 'seq1', 'seq2'])
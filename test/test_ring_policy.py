@@ -0,0 +1,86 @@
+# Copyright (c) 2016-2023, The Bifrost Authors. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# * Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the distribution.
+# * Neither the name of The Bifrost Authors nor the names of its
+#   contributors may be used to endorse or promote products derived
+#   from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS ``AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED.  IN NO EVENT SHALL THE COPYRIGHT OWNER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY
+# OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import unittest
+import numpy as np
+from bifrost.ring2 import Ring
+
+NCHAN = 1024
+
+class RingPolicyTest(unittest.TestCase):
+    def write_and_read(self, ring, nframe):
+        hdr = {'name':     'seq0',
+               'time_tag': 0,
+               '_tensor':  {'dtype': 'f32', 'shape': [-1, NCHAN]}}
+        with ring.begin_writing() as writer:
+            with writer.begin_sequence(hdr, nframe, 4 * nframe) as oseq:
+                for i in range(8):
+                    with oseq.reserve(nframe) as ospan:
+                        ospan.data[...] = i
+                        ospan.commit(nframe)
+        values = []
+        for iseq in ring.read():
+            for ispan in iseq.read(nframe):
+                if ispan.nframe:
+                    data = np.array(ispan.data)
+                    np.testing.assert_equal(data, data[0, 0])
+                    values.append(float(data[0, 0]))
+        return values
+    def test_default_policy(self):
+        ring = Ring(space='system')
+        self.write_and_read(ring, 16)
+        self.assertEqual(ring.alloc_policy, {'hugepages': None,
+                                             'mlock':     False,
+                                             'prefault':  False,
+                                             'mirror':    False})
+    def test_hugepages(self):
+        for hugepages in ('transparent', 'explicit'):
+            ring = Ring(space='system', hugepages=hugepages, mlock=True,
+                        prefault=True)
+            values = self.write_and_read(ring, 1024)
+            # Note: Which hugepage policies take effect depends on the system
+            policy = ring.alloc_policy
+            self.assertIn(policy['hugepages'], (None, 'transparent', hugepages))
+            self.assertTrue(policy['prefault'])
+            self.assertEqual(values[-4:], [4., 5., 6., 7.])
+            # Reallocation preserves the policy
+            ring.resize(ring.nbyte // 4, 2 * ring.nbyte)
+            self.assertTrue(ring.alloc_policy['prefault'])
+    def test_mirror(self):
+        for mirror in (False, True):
+            ring = Ring(space='system', mirror=mirror)
+            # Note: Gulps of 3 frames regularly wrap around the end of the ring
+            values = self.write_and_read(ring, 3)
+            self.assertEqual(values, [float(i) for i in range(8)][-len(values):])
+            self.assertEqual(ring.alloc_policy['mirror'], mirror)
+            ring.resize(ring.nbyte, 4 * ring.nbyte)
+            self.assertEqual(ring.alloc_policy['mirror'], mirror)
+        ring = Ring(space='system', mirror=True)
+        ring.shared = True
+        ring.resize(4096, 4 * 4096)
+        self.assertFalse(ring.alloc_policy['mirror'])
+    def test_invalid_policy(self):
+        self.assertRaises(ValueError, Ring, space='system', hugepages='always')
@@ -0,0 +1,148 @@
+# Copyright (c) 2016-2023, The Bifrost Authors. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# * Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the distribution.
+# * Neither the name of The Bifrost Authors nor the names of its
+#   contributors may be used to endorse or promote products derived
+#   from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS ``AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED.  IN NO EVENT SHALL THE COPYRIGHT OWNER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY
+# OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import unittest
+import threading
+import time
+from copy import deepcopy
+import numpy as np
+import bifrost.pipeline as bfp
+import bifrost.blocks as blocks
+from bifrost.ring2 import Ring, SequenceSelector
+
+GULP_NFRAME = 16
+
+class DelayBlock(bfp.TransformBlock):
+    """Copies its input, sleeping for `delay` seconds per gulp"""
+    def __init__(self, iring, delay, *args, **kwargs):
+        super(DelayBlock, self).__init__(iring, *args, **kwargs)
+        self.delay = delay
+    def on_sequence(self, iseq):
+        return deepcopy(iseq.header)
+    def on_data(self, ispan, ospan):
+        time.sleep(self.delay)
+        ospan.data[...] = ispan.data
+
+class PassBlock(bfp.SelectBlock):
+    """Copies each input to the corresponding output, recording the order in
+    which the inputs' gulps are processed"""
+    def __init__(self, irings, order, *args, **kwargs):
+        super(PassBlock, self).__init__(irings, *args, **kwargs)
+        self.order = order
+    def on_sequence(self, iseqs):
+        return [deepcopy(iseq.header) for iseq in iseqs]
+    def on_data(self, index, ispan, ospans):
+        self.order.append(index)
+        ospans[index].data[...] = ispan.data
+
+class CollectBlock(bfp.SinkBlock):
+    def __init__(self, iring, received, *args, **kwargs):
+        super(CollectBlock, self).__init__(iring, *args, **kwargs)
+        self.received = received
+    def on_sequence(self, iseq):
+        pass
+    def on_data(self, ispan):
+        self.received.append(ispan.data.copy())
+
+class SequenceSelectorTest(unittest.TestCase):
+    def test_select(self):
+        rings = [Ring(space='system', name=f"test_ring_select{i}") for i in range(3)]
+        with rings[0].begin_writing() as w0, rings[1].begin_writing() as w1, \
+             rings[2].begin_writing() as w2:
+            # Note: Only the readiness of each sequence matters here
+            hdrs = [{'name': f"seq{i}", 'time_tag': 0,
+                     '_tensor': {'dtype': 'u8', 'shape': [-1]}} for i in range(3)]
+            oseqs = [w.begin_sequence(hdr, GULP_NFRAME, 4 * GULP_NFRAME)
+                     for hdr, w in zip(hdrs, (w0, w1, w2))]
+            iseqs = [ring.open_earliest_sequence(guarantee=True) for ring in rings]
+            with SequenceSelector(iseqs) as selector:
+                offsets = [0, 0, 0]
+                nframes = [GULP_NFRAME] * 3
+                self.assertIsNone(selector.select(offsets, nframes, timeout=0.01))
+                # Data committed from another thread wakes the selector
+                def write():
+                    time.sleep(0.05)
+                    with oseqs[1].reserve(GULP_NFRAME) as ospan:
+                        ospan.commit(GULP_NFRAME)
+                thread = threading.Thread(target=write)
+                thread.start()
+                self.assertEqual(selector.select(offsets, nframes, timeout=5), 1)
+                thread.join()
+                # Ready sequences are chosen in turn
+                with oseqs[2].reserve(GULP_NFRAME) as ospan:
+                    ospan.commit(GULP_NFRAME)
+                self.assertEqual(selector.select(offsets, nframes), 2)
+                self.assertEqual(selector.select(offsets, nframes), 1)
+                # Ignored sequences are never chosen
+                self.assertEqual(selector.select(offsets, [None, None, GULP_NFRAME]), 2)
+                self.assertIsNone(selector.select(offsets, [GULP_NFRAME, None, None],
+                                                  timeout=0.01))
+                with self.assertRaises(ValueError):
+                    selector.select(offsets, [None, None, None])
+                # Finished sequences are ready
+                oseqs[0].end()
+                self.assertEqual(selector.select(offsets, [GULP_NFRAME, None, None]), 0)
+            for iseq in iseqs:
+                iseq.close()
+            for oseq in oseqs[1:]:
+                oseq.end()
+
+class SelectBlockTest(unittest.TestCase):
+    def test_select_block(self):
+        fil_file = './data/2chan16bitNoDM.fil'
+        order = []
+        received = [[], []]
+        with bfp.Pipeline() as pipeline:
+            fast = blocks.read_sigproc([fil_file], 1024)
+            slow = DelayBlock(blocks.read_sigproc([fil_file], 1024), 0.01)
+            merged = PassBlock([fast, slow], order)
+            for i in range(2):
+                CollectBlock(merged.orings[i], received[i])
+            pipeline.run()
+        received = [np.concatenate(r) for r in received]
+        np.testing.assert_equal(received[0], received[1])
+        self.assertEqual(order.count(0), order.count(1))
+        # The fast input is not held back by the slow one
+        nfirst = len(order) // 4
+        self.assertGreater(order[:nfirst].count(0), nfirst // 2)
+    def test_prewarm(self):
+        fil_file = './data/2chan16bitNoDM.fil'
+        order = []
+        received = [[], []]
+        with bfp.Pipeline() as pipeline:
+            data = [blocks.read_sigproc([fil_file], 1024) for _ in range(2)]
+            merged = PassBlock(data, order)
+            for i in range(2):
+                CollectBlock(merged.orings[i], received[i])
+            prewarmed = pipeline.prewarm()
+            self.assertEqual(prewarmed, [merged.name])
+            # One gulp is processed from each input
+            self.assertEqual(order, [0, 1])
+            del order[:]
+            pipeline.run(prewarm=True)
+        self.assertEqual(order[:2], [0, 1])
+        received = [np.concatenate(r) for r in received]
+        np.testing.assert_equal(received[0], received[1])
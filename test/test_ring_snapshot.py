@@ -0,0 +1,99 @@
+# Copyright (c) 2016-2023, The Bifrost Authors. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# * Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the distribution.
+# * Neither the name of The Bifrost Authors nor the names of its
+#   contributors may be used to endorse or promote products derived
+#   from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS ``AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED.  IN NO EVENT SHALL THE COPYRIGHT OWNER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY
+# OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import unittest
+import glob
+import json
+import shutil
+import tempfile
+import numpy as np
+from bifrost.ring2 import Ring
+
+GULP_NFRAME = 16
+NCHAN = 4
+FRAME_NBYTE = NCHAN * 4
+
+# Note: The time scale lets the snapshot's header offset be checked
+HEADER = {'name':     'seq0',
+          'time_tag': 0,
+          '_tensor':  {'dtype':  'i32',
+                       'shape':  [-1, NCHAN],
+                       'scales': [[0, 2], None]}}
+
+class RingSnapshotTest(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+    def tearDown(self):
+        shutil.rmtree(self.path)
+    def read_snapshot(self, snapshot):
+        with open(snapshot.basename + '.json', 'r') as hdr_file:
+            hdr = json.load(hdr_file)
+        filenames = sorted(glob.glob(snapshot.basename + '.*.dat'))
+        data = np.concatenate([np.fromfile(f, dtype=np.int32) for f in filenames])
+        return hdr, data.reshape(-1, NCHAN)
+    def test_snapshot(self):
+        ring = Ring(space='system', name='test_ring_snapshot')
+        with ring.begin_writing() as writer:
+            with writer.begin_sequence(HEADER, GULP_NFRAME, 4 * GULP_NFRAME) as oseq:
+                frame = 0
+                for g in range(13):
+                    if g == 3:
+                        # Trigger a snapshot of the previous 2 and next 2 gulps
+                        snapshot = ring.snapshot(self.path, frame_offset=-2 * GULP_NFRAME,
+                                                 nframe=4 * GULP_NFRAME,
+                                                 gulp_nframe=GULP_NFRAME,
+                                                 max_file_size=2 * GULP_NFRAME * FRAME_NBYTE)
+                    with oseq.reserve(GULP_NFRAME) as ospan:
+                        ospan.data[...] = np.arange(frame, frame + GULP_NFRAME)[:, None]
+                        ospan.commit(GULP_NFRAME)
+                    frame += GULP_NFRAME
+        self.assertTrue(snapshot.wait(timeout=10))
+        self.assertEqual(snapshot.frame_offset, GULP_NFRAME)
+        self.assertEqual(snapshot.nframe_written, 4 * GULP_NFRAME)
+        self.assertEqual(snapshot.nframe_skipped, 0)
+        self.assertEqual(len(glob.glob(snapshot.basename + '.*.dat')), 2)
+        hdr, data = self.read_snapshot(snapshot)
+        self.assertEqual(hdr['_tensor']['scales'][0], [2 * GULP_NFRAME, 2])
+        expected = np.arange(GULP_NFRAME, 5 * GULP_NFRAME)
+        np.testing.assert_equal(data, np.repeat(expected[:, None], NCHAN, axis=1))
+    def test_snapshot_until_end(self):
+        ring = Ring(space='system', name='test_ring_snapshot_end')
+        with ring.begin_writing() as writer:
+            with writer.begin_sequence(HEADER, GULP_NFRAME, 4 * GULP_NFRAME) as oseq:
+                snapshot = ring.snapshot(self.path, name='seq0')
+                for g in range(10):
+                    with oseq.reserve(GULP_NFRAME) as ospan:
+                        ospan.data[...] = g
+                        ospan.commit(GULP_NFRAME)
+        self.assertTrue(snapshot.wait(timeout=10))
+        self.assertEqual(snapshot.nframe_written, 10 * GULP_NFRAME)
+        hdr, data = self.read_snapshot(snapshot)
+        self.assertEqual(hdr['name'], 'seq0')
+        np.testing.assert_equal(data[:, 0], np.arange(10 * GULP_NFRAME) // GULP_NFRAME)
+    def test_invalid(self):
+        ring = Ring(space='system', name='test_ring_snapshot_invalid')
+        with self.assertRaises(ValueError):
+            ring.snapshot(self.path, name='seq0', time_tag=0)
@@ -0,0 +1,82 @@
+# Copyright (c) 2016-2023, The Bifrost Authors. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# * Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the distribution.
+# * Neither the name of The Bifrost Authors nor the names of its
+#   contributors may be used to endorse or promote products derived
+#   from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS ``AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED.  IN NO EVENT SHALL THE COPYRIGHT OWNER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY
+# OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import unittest
+import numpy as np
+from bifrost.ring2 import Ring
+
+GULP_NFRAME = 16
+NCHAN = 4
+
+class RingSpanTest(unittest.TestCase):
+    def test_span_reuse(self):
+        ring = Ring(space='system', name='test_ring_spans')
+        hdr = {'name':     'seq0',
+               'time_tag': 0,
+               '_tensor':  {'dtype': 'i32', 'shape': [-1, NCHAN]}}
+        with ring.begin_writing() as writer:
+            with writer.begin_sequence(hdr, GULP_NFRAME, 4 * GULP_NFRAME) as oseq:
+                iseq = ring.open_earliest_sequence(guarantee=True)
+                ospans = set()
+                ispans = set()
+                views = {}
+                for g in range(64):
+                    with oseq.reserve(GULP_NFRAME) as ospan:
+                        ospans.add(id(ospan))
+                        self.assertIs(ospan.data, ospan.data)
+                        ospan.data[...] = g
+                        ospan.commit(GULP_NFRAME)
+                    with iseq.acquire(g * GULP_NFRAME, GULP_NFRAME) as ispan:
+                        ispans.add(id(ispan))
+                        self.assertEqual(ispan.frame_offset, g * GULP_NFRAME)
+                        self.assertEqual(ispan.shape, [GULP_NFRAME, NCHAN])
+                        self.assertFalse(ispan.data.flags['WRITEABLE'])
+                        np.testing.assert_equal(ispan.data, g)
+                        views.setdefault(ispan.data.ctypes.data, set()).add(id(ispan.data))
+                iseq.close()
+        # Released spans are reused, and so are the views of their data
+        self.assertEqual(len(ospans), 1)
+        self.assertEqual(len(ispans), 1)
+        self.assertTrue(all(len(ids) == 1 for ids in views.values()))
+    def test_ringlet_layout(self):
+        ring = Ring(space='system', name='test_ring_spans_ringlets')
+        hdr = {'name':     'seq0',
+               'time_tag': 0,
+               '_tensor':  {'dtype': 'i16', 'shape': [2, 3, -1, NCHAN]}}
+        with ring.begin_writing() as writer:
+            with writer.begin_sequence(hdr, GULP_NFRAME, 4 * GULP_NFRAME) as oseq:
+                iseq = ring.open_earliest_sequence(guarantee=True)
+                with oseq.reserve(GULP_NFRAME) as ospan:
+                    expected = np.arange(ospan.data.size, dtype=np.int16)
+                    expected = expected.reshape(ospan.shape)
+                    ospan.data[...] = expected
+                    ospan.commit(GULP_NFRAME)
+                with iseq.acquire(0, GULP_NFRAME) as ispan:
+                    self.assertEqual(ispan.shape, [2, 3, GULP_NFRAME, NCHAN])
+                    stride = ispan._stride_bytes
+                    self.assertEqual(ispan.strides, [3 * stride, stride, NCHAN * 2, 2])
+                    np.testing.assert_equal(ispan.data, expected)
+                iseq.close()
@@ -0,0 +1,89 @@
+# Copyright (c) 2016-2023, The Bifrost Authors. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# * Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the distribution.
+# * Neither the name of The Bifrost Authors nor the names of its
+#   contributors may be used to endorse or promote products derived
+#   from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS ``AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED.  IN NO EVENT SHALL THE COPYRIGHT OWNER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY
+# OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import unittest
+import os
+from bifrost.ring2 import Ring
+from bifrost.proclog import load_by_pid
+
+GULP_NFRAME = 16
+FRAME_NBYTE = 16
+HEADER = {'name':     'seq0',
+          'time_tag': 0,
+          '_tensor':  {'dtype': 'u8', 'shape': [-1, FRAME_NBYTE]}}
+
+class RingStatsTest(unittest.TestCase):
+    def test_counters(self):
+        ring = Ring(space='system', name='test_ring_stats')
+        stats = ring.stats()
+        self.assertEqual(stats['ncommitted'], 0)
+        self.assertIsNone(stats['commit_rate'])
+        with ring.begin_writing() as writer:
+            with writer.begin_sequence(HEADER, GULP_NFRAME, 4 * GULP_NFRAME) as oseq:
+                # A guaranteed reader that has read one gulp
+                iseq = ring.open_earliest_sequence(guarantee=True)
+                for g in range(3):
+                    with oseq.reserve(GULP_NFRAME) as ospan:
+                        ospan.commit(GULP_NFRAME)
+                    if g == 0:
+                        with iseq.acquire(0, GULP_NFRAME):
+                            pass
+                stats = ring.stats()
+                nbyte = 3 * GULP_NFRAME * FRAME_NBYTE
+                self.assertEqual(stats['ncommitted'], nbyte)
+                self.assertEqual(stats['head'] - stats['tail'], nbyte)
+                self.assertEqual(stats['nread_open'], 0)
+                self.assertGreater(stats['occupancy'], 0)
+                self.assertIsNotNone(stats['commit_rate'])
+                self.assertEqual(stats['max_lag'], nbyte)
+                self.assertEqual(stats['readers'],
+                                 [{'sequence':  'seq0',
+                                   'guarantee': True,
+                                   'lag':       2 * GULP_NFRAME * FRAME_NBYTE}])
+                iseq.close()
+                self.assertEqual(ring.stats()['readers'], [])
+                # An unguaranteed reader that falls behind has data skipped
+                iseq = ring.open_earliest_sequence(guarantee=False)
+                for g in range(20):
+                    with oseq.reserve(GULP_NFRAME) as ospan:
+                        ospan.commit(GULP_NFRAME)
+                with iseq.acquire(0, GULP_NFRAME) as ispan:
+                    self.assertEqual(ispan.nframe_skipped, GULP_NFRAME)
+                iseq.close()
+        stats = ring.stats()
+        self.assertEqual(stats['nskipped'], GULP_NFRAME * FRAME_NBYTE)
+        self.assertEqual(stats['ncommitted'], 23 * GULP_NFRAME * FRAME_NBYTE)
+        # The final values are written to the ring's proclog
+        log = load_by_pid(os.getpid(), include_rings=True)['rings'][ring.name]
+        self.assertEqual(log['ncommitted'], stats['ncommitted'])
+        self.assertEqual(log['nskipped'], stats['nskipped'])
+    def test_proclog_sizes(self):
+        ring = Ring(space='system', name='test_ring_stats_sizes')
+        ring.resize(GULP_NFRAME * FRAME_NBYTE, 64 * GULP_NFRAME * FRAME_NBYTE)
+        log = load_by_pid(os.getpid(), include_rings=True)['rings'][ring.name]
+        self.assertEqual(log['span'], ring.stats()['capacity'])
+        self.assertEqual(log['span'], 64 * GULP_NFRAME * FRAME_NBYTE)
+        self.assertLess(log['ghost'], log['span'])
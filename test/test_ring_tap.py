@@ -0,0 +1,93 @@
+# Copyright (c) 2016-2023, The Bifrost Authors. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# * Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the distribution.
+# * Neither the name of The Bifrost Authors nor the names of its
+#   contributors may be used to endorse or promote products derived
+#   from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS ``AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED.  IN NO EVENT SHALL THE COPYRIGHT OWNER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY
+# OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import unittest
+import threading
+import time
+import numpy as np
+from bifrost.ring2 import Ring
+
+GULP_NFRAME = 16
+NCHAN = 4
+
+def write_sequences(ring, nsequence, ngulp, delay=0.):
+    """Writes sequences whose frames hold their (global) frame index"""
+    frame0 = 0
+    with ring.begin_writing() as writer:
+        for s in range(nsequence):
+            hdr = {'name':     f"seq{s}",
+                   'time_tag': s,
+                   '_tensor':  {'dtype': 'i32', 'shape': [-1, NCHAN]}}
+            with writer.begin_sequence(hdr, GULP_NFRAME, 4 * GULP_NFRAME) as oseq:
+                for g in range(ngulp):
+                    with oseq.reserve(GULP_NFRAME) as ospan:
+                        frames = np.arange(frame0, frame0 + GULP_NFRAME)
+                        ospan.data[...] = frames[:, None]
+                        ospan.commit(GULP_NFRAME)
+                    frame0 += GULP_NFRAME
+                    time.sleep(delay)
+    return frame0
+
+class RingTapTest(unittest.TestCase):
+    def test_tap_finished(self):
+        ring = Ring(space='system')
+        nframe_total = write_sequences(ring, 1, 10)
+        spans = []
+        for span in ring.tap(8):
+            spans.append((span.nframe, np.array(span.data[:, 0])))
+        # Only the newest data are seen
+        self.assertEqual(len(spans), 1)
+        nframe, data = spans[0]
+        self.assertEqual(nframe, 8)
+        np.testing.assert_equal(data, np.arange(nframe_total - 8, nframe_total))
+    def test_tap_does_not_block_writer(self):
+        ring = Ring(space='system')
+        writer = threading.Thread(target=write_sequences,
+                                  args=(ring, 3, 200, 1e-4))
+        ntap = 0
+        seq_names = []
+        writer.start()
+        for span in ring.tap(GULP_NFRAME, poll_interval=1e-3):
+            if span.sequence.name not in seq_names:
+                seq_names.append(span.sequence.name)
+            if span.nframe_overwritten == 0:
+                data = np.array(span.data[:, 0])
+                # Frames are always the most recent contiguous data
+                np.testing.assert_equal(np.diff(data), 1)
+            ntap += 1
+            # Note: A slow consumer would stall the writer if it held a
+            #         guarantee, as the ring only holds 4 gulps.
+            time.sleep(1e-2)
+        writer.join()
+        self.assertGreater(ntap, 0)
+        # Far fewer spans are seen than were written
+        self.assertLess(ntap, 3 * 200)
+        self.assertEqual(seq_names[-1], "seq2")
+    def test_tap_requires_unguaranteed(self):
+        ring = Ring(space='system')
+        write_sequences(ring, 1, 1)
+        with ring.open_latest_sequence(guarantee=True) as seq:
+            self.assertRaises(ValueError, next, seq.tap(GULP_NFRAME))
@@ -0,0 +1,135 @@
+# Copyright (c) 2016-2023, The Bifrost Authors. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# * Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the distribution.
+# * Neither the name of The Bifrost Authors nor the names of its
+#   contributors may be used to endorse or promote products derived
+#   from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS ``AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED.  IN NO EVENT SHALL THE COPYRIGHT OWNER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY
+# OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import unittest
+import glob
+import os
+import shutil
+import tempfile
+import threading
+import time
+import numpy as np
+import bifrost.pipeline as bfp
+import bifrost.blocks as blocks
+from bifrost.ring2 import Ring, set_thread_wait_policy, get_thread_wait_policy
+from bifrost.proclog import load_by_pid
+
+GULP_NFRAME = 16
+NGULP = 50
+
+class RingWaitTest(unittest.TestCase):
+    def transfer(self, ring):
+        """Writes NGULP gulps slowly to the ring while reading them in another
+        thread, so that the reader has to wait for each one"""
+        # Note: Each frame holds just the index of the gulp it was written in
+        hdr = {'name': 'seq0', 'time_tag': 0,
+               '_tensor': {'dtype': 'i32', 'shape': [-1]}}
+        received = []
+        started = threading.Event()
+        def reader():
+            iseq = ring.open_earliest_sequence(guarantee=True)
+            started.set()
+            with iseq:
+                for ispan in iseq.read(GULP_NFRAME):
+                    received.append(int(ispan.data[0]))
+        with ring.begin_writing() as writer:
+            with writer.begin_sequence(hdr, GULP_NFRAME,
+                                       4 * GULP_NFRAME) as oseq:
+                thread = threading.Thread(target=reader)
+                thread.start()
+                started.wait()
+                for g in range(NGULP):
+                    time.sleep(0.0005)
+                    with oseq.reserve(GULP_NFRAME) as ospan:
+                        ospan.data[...] = g
+                        ospan.commit(GULP_NFRAME)
+        thread.join()
+        return received
+    def test_policy(self):
+        ring = Ring(space='system', name='test_ring_wait_policy')
+        self.assertEqual(ring.wait_policy, ('block', 0.))
+        ring.set_wait_policy('yield', 1e-6)
+        self.assertEqual(ring.wait_policy[0], 'yield')
+        self.assertAlmostEqual(ring.wait_policy[1], 1e-6)
+        with self.assertRaises(ValueError):
+            ring.set_wait_policy('poll')
+        with self.assertRaises(ValueError):
+            Ring(space='system', wait_policy='spin', spin_time=-1)
+        log = load_by_pid(os.getpid(), include_rings=True)['rings'][ring.name]
+        self.assertEqual(log['wait_policy'], 'yield')
+    def test_thread_policy(self):
+        self.assertEqual(get_thread_wait_policy(), (None, 0.))
+        result = []
+        def set_policy():
+            set_thread_wait_policy('spin')
+            result.append(get_thread_wait_policy())
+        thread = threading.Thread(target=set_policy)
+        thread.start()
+        thread.join()
+        self.assertEqual(result, [('spin', 0.)])
+        # The policy only applies to the thread that set it
+        self.assertEqual(get_thread_wait_policy(), (None, 0.))
+    def test_transfer(self):
+        for policy, spin_time in [('block', 0.), ('block', 1e-4),
+                                  ('spin', 0.), ('yield', 1e-5)]:
+            with self.subTest(policy=policy, spin_time=spin_time):
+                ring = Ring(space='system', wait_policy=policy,
+                            spin_time=spin_time)
+                received = self.transfer(ring)
+                self.assertEqual(received, list(range(NGULP)))
+                stats = ring.stats()
+                self.assertGreater(stats['nread_wait'], 0)
+                self.assertGreater(stats['read_wait'], 0)
+                self.assertLess(stats['read_wait'], 10.)
+    def test_thread_policy_overrides_ring(self):
+        ring = Ring(space='system', wait_policy='block')
+        set_thread_wait_policy('yield')
+        try:
+            received = self.transfer(ring)
+        finally:
+            set_thread_wait_policy(None)
+        self.assertEqual(received, list(range(NGULP)))
+        self.assertEqual(ring.wait_policy, ('block', 0.))
+    def run_pipeline(self, **scope_kwargs):
+        path = tempfile.mkdtemp()
+        try:
+            with bfp.Pipeline() as pipeline:
+                data = blocks.read_sigproc(['./data/2chan16bitNoDM.fil'], 101)
+                with bfp.block_scope(**scope_kwargs):
+                    data = blocks.copy(data)
+                blocks.serialize(data, path)
+                pipeline.run()
+            filenames = sorted(glob.glob(os.path.join(path, '*.dat')))
+            received = np.concatenate([np.fromfile(f, dtype=np.uint8)
+                                       for f in filenames])
+        finally:
+            shutil.rmtree(path)
+        return data, received
+    def test_block_wait_policy(self):
+        _, expected = self.run_pipeline()
+        block, received = self.run_pipeline(wait_policy='yield', spin_time=1e-5)
+        self.assertEqual(block.wait_policy, 'yield')
+        np.testing.assert_equal(received, expected)
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+
+# Copyright (c) 2017-2023, The Bifrost Authors. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# * Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the distribution.
+# * Neither the name of The Bifrost Authors nor the names of its
+#   contributors may be used to endorse or promote products derived
+#   from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS ``AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED.  IN NO EVENT SHALL THE COPYRIGHT OWNER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY
+# OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import sys
+import argparse
+
+from bifrost.pipeline_analysis import load_by_pid
+
+from bifrost import telemetry
+telemetry.track_script()
+
+
+def main(args):
+    try:
+        analysis = load_by_pid(args.pid)
+    except RuntimeError as e:
+        print(f"ERROR: {str(e)}", file=sys.stderr)
+        sys.exit(1)
+    if not analysis.blocks:
+        print("No blocks with performance histograms found", file=sys.stderr)
+        sys.exit(1)
+    print(analysis)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description='Report the bottleneck, per-block slack, critical path and near-capacity rings of a running Bifrost pipeline',
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+        )
+    parser.add_argument('pid', type=int, nargs='+',
+                        help='process ID(s); give all of the PIDs of a pipeline run with executor=\'process\'')
+    args = parser.parse_args()
+    main(args)
@@ -87,6 +87,33 @@ def get_transmit_receive():
     return blockList
 
 
+def get_ring_rates():
+    """
+    Read in the /dev/bifrost ProcLog data and return the total rate at which
+    data are being committed to the rings of each process.
+    """
+
+    ## Find all running processes
+    pidDirs = glob.glob(os.path.join(BIFROST_STATS_BASE_DIR, '*'))
+
+    ## Load the data
+    rates = {}
+    for pidDir in pidDirs:
+        pid = int(os.path.basename(pidDir), 10)
+        try:
+            contents = load_by_pid(pid, include_rings=True)
+        except RuntimeError:
+            continue
+
+        rates[pid] = 0.0
+        for log in contents.get('rings', {}).values():
+            try:
+                rates[pid] += max([0.0, log['commit_rate']])
+            except KeyError:
+                pass
+    return rates
+
+
 def get_command_line(pid):
     """
     Given a PID, use the /proc interface to get the full command line for 
@@ -287,6 +314,7 @@ def main(args):
 
                 ## Stats
                 stats = get_statistics(blockList, prevList)
+                ringRates = get_ring_rates()
 
                 ## Mark
                 tLastPoll = time.time()
@@ -317,7 +345,7 @@ def main(args):
             k = _add_line(scr, k, 0, output, std)
             ### General - header
             k = _add_line(scr, k, 0, ' ', std)
-            output = '%7s       %9s        %6s        %9s        %6s' % ('PID', 'RX Rate', 'RX #/s', 'TX Rate', 'TX #/s')
+            output = '%7s       %9s        %6s        %9s        %6s        %9s' % ('PID', 'RX Rate', 'RX #/s', 'TX Rate', 'TX #/s', 'Ring Rate')
             output += ' '*(size[1]-len(output))
             output += '\n'
             k = _add_line(scr, k, 0, output, rev)
@@ -336,8 +364,10 @@ def main(args):
                 drateT, prateT = curr['tx']['drate'], curr['tx']['prate']
                 drateT, drateuT = _set_units(drateT)
 
+                drateG = ringRates.get(o, 0.0)
+                drateG, drateuG = _set_units(drateG)
 
-                output = '%7i       %7.2f%2s        %6i        %7.2f%2s        %6i\n' % (o, drateR, drateuR, prateR, drateT, drateuT, prateT)
+                output = '%7i       %7.2f%2s        %6i        %7.2f%2s        %6i        %7.2f%2s\n' % (o, drateR, drateuR, prateR, drateT, drateuT, prateT, drateG, drateuG)
                 try:
                     if o == order[sel]:
                         sty = std|curses.A_BOLD
@@ -224,6 +224,28 @@ def get_command_line(pid):
     return cmd
 
 
+def get_ring_statistics(pid, contents):
+    """
+    Given a PID and its ProcLog contents (loaded with include_rings=True), 
+    return the occupancy, throughput and lag of each of its rings.
+    """
+
+    ringList = {}
+    for ring, log in contents.get('rings', {}).items():
+        try:
+            span = log['span']
+            used = log['head'] - log['tail']
+            lag  = max([0, log['head'] - log['guaranteed']])
+            rate = max([0.0, log['commit_rate']])
+            skip = log['nskipped'] + log['noverwritten']
+        except KeyError:
+            continue
+        full = 100.0*used/span if span > 0 else 0.0
+        ringList[f"{pid}-{ring}"] = {'pid': pid, 'name': ring, 'full': full,
+                                     'rate': rate, 'lag': lag, 'lost': skip}
+    return ringList
+
+
 def _add_line(screen, y, x, string, *args):
     """
     Helper function for curses to add a line, clear the line to the end of 
@@ -309,14 +331,18 @@ def main(args):
 
                 ## Load the data
                 blockList = {}
+                ringList = {}
                 for pidDir in pidDirs:
                     pid = int(os.path.basename(pidDir), 10)
-                    contents = load_by_pid(pid)
+                    contents = load_by_pid(pid, include_rings=True)
 
                     cmd = get_command_line(pid)
                     if cmd == '':
                         continue
 
+                    ringList.update(get_ring_statistics(pid, contents))
+                    contents.pop('rings', None)
+
                     for block in contents.keys():
                         try:
                             log = contents[block]['bind']
@@ -389,6 +415,19 @@ def main(args):
                 k = _add_line(scr, k, 0, output, std)
                 if k >= size[0] - 1:
                     break
+            ### Rings, if there is room
+            if ringList and k < size[0] - 3:
+                k = _add_line(scr, k, 0, ' ', std)
+                output = '%6s  %15s  %5s  %9s  %9s  %9s' % ('PID', 'Ring', '%Full', 'MB/s', 'Lag MB', 'Lost MB')
+                output += ' '*max([0, size[1]-len(output)])
+                output += '\n'
+                k = _add_line(scr, k, 0, output, rev)
+                for o in sorted(ringList):
+                    d = ringList[o]
+                    output = '%6i  %15s  %5.1f  %9.2f  %9.2f  %9.2f' % (d['pid'], d['name'][:15], d['full'], d['rate']/1024.0**2, d['lag']/1024.0**2, d['lost']/1024.0**2)
+                    k = _add_line(scr, k, 0, output, std)
+                    if k >= size[0] - 1:
+                        break
             ### Clear to the bottom
             scr.clrtobot()
             ### Refresh
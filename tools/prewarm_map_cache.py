@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+
+# Copyright (c) 2016-2023, The Bifrost Authors. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# * Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+# * Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the distribution.
+# * Neither the name of The Bifrost Authors nor the names of its
+#   contributors may be used to endorse or promote products derived
+#   from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS ``AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED.  IN NO EVENT SHALL THE COPYRIGHT OWNER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY
+# OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import sys
+import runpy
+import argparse
+
+import bifrost
+import bifrost.pipeline
+
+from bifrost import telemetry
+telemetry.track_script()
+
+
+def main(args):
+    # Note: Any pipeline that the script runs is prewarmed instead
+    def prewarm_run(pipeline, *run_args, **run_kwargs):
+        prewarmed = pipeline.prewarm()
+        print(f"Prewarmed {len(prewarmed)} blocks: {', '.join(prewarmed)}")
+    bifrost.pipeline.Pipeline.run = prewarm_run
+    sys.argv = [args.script] + args.args
+    runpy.run_path(args.script, run_name='__main__')
+    if args.verbose:
+        bifrost.list_map_cache()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description='Compile and cache the map kernels used by a Bifrost pipeline script without running the pipeline',
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+        )
+    parser.add_argument('script', type=str,
+                        help='pipeline script to prewarm')
+    parser.add_argument('args', nargs=argparse.REMAINDER,
+                        help='arguments to pass to the script')
+    parser.add_argument('-v', '--verbose', action='store_true',
+                        help='list the contents of the map cache afterwards')
+    args = parser.parse_args()
+    main(args)